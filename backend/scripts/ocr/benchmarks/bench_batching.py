@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark: micro-batching daemon (handle_batch) dengan beberapa batch size
+
+Model di-load sekali, lalu N request diproses dalam potongan berukuran
+batch size (1 = jalur lama handle_request satu per satu). Untuk setiap batch
+size dilaporkan throughput dan latency per request (waktu sampai batch
+tempat request berada selesai), serta apakah response identik dengan
+hasil tanpa batching.
+
+Usage:
+    python benchmarks/bench_batching.py --daemon ocr
+    python benchmarks/bench_batching.py --daemon detect --model models/best.pt --images DIR
+    python benchmarks/bench_batching.py --daemon pipeline --batch-sizes 1,2,4,8 --json
+"""
+
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_decode import make_phone_jpeg
+
+
+def load_daemon(kind, model_path, request_dir, response_dir):
+    if kind == 'ocr':
+        from ocr_daemon import OCRDaemon
+        return OCRDaemon(request_dir, response_dir)
+    if kind == 'detect':
+        from ktp_detection_daemon import KTPDetectionDaemon
+        return KTPDetectionDaemon(request_dir, response_dir, model_path=model_path)
+    from ktp_pipeline_daemon import KTPPipelineDaemon
+    return KTPPipelineDaemon(request_dir, response_dir, model_path=model_path)
+
+
+def run_batches(daemon, requests, batch_size):
+    """Proses requests per potongan batch_size, return (responses, latency per request, total detik)"""
+    responses = []
+    latencies = []
+    start = time.perf_counter()
+    for offset in range(0, len(requests), batch_size):
+        chunk = requests[offset:offset + batch_size]
+        if batch_size == 1:
+            chunk_responses = [daemon.handle_request(chunk[0])]
+        else:
+            chunk_responses = daemon.handle_batch(chunk)
+        done = (time.perf_counter() - start) * 1000
+        responses.extend(chunk_responses)
+        # Semua request dianggap tiba di awal: latency = waktu sampai batch-nya selesai
+        latencies.extend([done] * len(chunk))
+    return responses, latencies, time.perf_counter() - start
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark daemon micro-batching')
+    parser.add_argument('--daemon', choices=['ocr', 'detect', 'pipeline'], default='ocr')
+    parser.add_argument('--model', help='Path model deteksi (detect / pipeline)')
+    parser.add_argument('--images', help='Folder berisi JPEG (default: JPEG sintetis)')
+    parser.add_argument('--requests', type=int, default=16, help='Jumlah request per batch size')
+    parser.add_argument('--batch-sizes', default='1,2,4,8', help='Daftar batch size, dipisah koma')
+    parser.add_argument('--json', action='store_true', help='Output JSON (machine-readable)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('SUPPRESS_OCR_LOGS', '1')
+
+    if args.images:
+        payloads = [
+            f.read_bytes() for f in sorted(Path(args.images).iterdir())
+            if f.suffix.lower() in ('.jpg', '.jpeg', '.png')
+        ]
+    else:
+        payloads = [make_phone_jpeg(1600, 1200, seed=i) for i in range(4)]
+
+    if not payloads:
+        print('No image files found', file=sys.stderr)
+        sys.exit(1)
+
+    requests = [
+        {'image': base64.b64encode(payloads[i % len(payloads)]).decode('utf-8')}
+        for i in range(args.requests)
+    ]
+    batch_sizes = [int(b) for b in args.batch_sizes.split(',')]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        daemon = load_daemon(args.daemon, args.model, Path(tmp) / 'req', Path(tmp) / 'res')
+
+        # Warmup supaya inisialisasi lazy model tidak masuk ke pengukuran
+        daemon.handle_request(requests[0])
+
+        reference = None
+        results = []
+        for batch_size in batch_sizes:
+            responses, latencies, total = run_batches(daemon, requests, batch_size)
+            encoded = [json.dumps(r, sort_keys=True, ensure_ascii=False) for r in responses]
+            if reference is None:
+                baseline, _, _ = run_batches(daemon, requests, 1) if batch_size != 1 else (responses, None, None)
+                reference = [json.dumps(r, sort_keys=True, ensure_ascii=False) for r in baseline]
+            results.append({
+                'batch_size': batch_size,
+                'requests': len(requests),
+                'throughput_rps': len(requests) / total,
+                'latency_p50_ms': statistics.median(latencies),
+                'latency_p95_ms': percentile(latencies, 95),
+                'identical_to_unbatched': encoded == reference,
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'batch':>6}{'req/s':>10}{'p50':>12}{'p95':>12}  identical")
+    for r in results:
+        print(f"{r['batch_size']:>6}{r['throughput_rps']:>10.2f}"
+              f"{r['latency_p50_ms']:>10.1f}ms{r['latency_p95_ms']:>10.1f}ms  {r['identical_to_unbatched']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark: encode crop response detection daemon per crop_mode
+
+Membandingkan jalur lama (BGR -> RGB -> PIL -> JPEG kualitas 95 -> base64) dengan
+encode_crop (cv2.imencode langsung dari BGR) untuk beberapa kombinasi
+crop_mode / crop_quality / crop_max_dim. Crop diambil dari dataset KTP sintetis
+(ktp_dataset.py) dengan variasi resolusi.
+
+Dilaporkan per kombinasi: median waktu encode, ukuran encoded dan ukuran field
+base64 di response JSON.
+
+Usage:
+    python benchmarks/bench_crop_encode.py
+    python benchmarks/bench_crop_encode.py --samples 12 --json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ktp_dataset import make_dataset
+from ktp_detection_daemon import encode_crop
+
+# (label, crop_mode, crop_quality, crop_max_dim)
+VARIANTS = [
+    ('jpeg q95', 'jpeg', 95, None),
+    ('jpeg q80 max1000', 'jpeg', 80, 1000),
+    ('jpeg q75 max480', 'jpeg', 75, 480),
+    ('webp q80', 'webp', 80, None),
+    ('webp q75 max480', 'webp', 75, 480),
+    ('png', 'png', 95, None),
+    ('png max480', 'png', 95, 480),
+]
+
+
+def encode_pil(crop_bgr):
+    """Jalur lama daemon: konversi RGB, PIL Image, JPEG kualitas 95"""
+    from PIL import Image
+    buffered = BytesIO()
+    Image.fromarray(cv2.cvtColor(crop_bgr, cv2.COLOR_BGR2RGB)).save(buffered, format='JPEG', quality=95)
+    return buffered.getvalue()
+
+
+def measure(encode, crops, repeat):
+    """Median ms per crop dan rata-rata ukuran encoded / base64"""
+    samples = []
+    sizes = []
+    for crop in crops:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            encoded = encode(crop)
+            samples.append((time.perf_counter() - start) * 1000)
+        sizes.append(len(encoded) if isinstance(encoded, bytes) else encoded.nbytes)
+    return {
+        'median_ms': statistics.median(samples),
+        'mean_bytes': statistics.mean(sizes),
+        'mean_base64_bytes': statistics.mean(4 * ((size + 2) // 3) for size in sizes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark crop encoding per crop_mode')
+    parser.add_argument('--samples', type=int, default=6, help='Jumlah crop dari dataset sintetis')
+    parser.add_argument('--repeat', type=int, default=5, help='Jumlah pengulangan per crop')
+    parser.add_argument('--json', action='store_true', help='Output JSON (machine-readable)')
+    args = parser.parse_args()
+
+    crops = [
+        cv2.imdecode(np.frombuffer(sample['crop'], np.uint8), cv2.IMREAD_COLOR)
+        for sample in make_dataset(args.samples, quality=95)
+    ]
+    # Warmup codec
+    encode_pil(crops[0])
+    for _, mode, quality, max_dim in VARIANTS:
+        encode_crop(crops[0], mode, quality, max_dim)
+
+    results = [{'variant': 'pil jpeg q95 (lama)', **measure(encode_pil, crops, args.repeat)}]
+    for label, mode, quality, max_dim in VARIANTS:
+        results.append({
+            'variant': label,
+            **measure(lambda crop: encode_crop(crop, mode, quality, max_dim), crops, args.repeat),
+        })
+    # Tanpa crop sama sekali (crop_mode none): hanya bbox di response
+    results.append({'variant': 'none', 'median_ms': 0.0, 'mean_bytes': 0, 'mean_base64_bytes': 0})
+
+    if args.json:
+        print(json.dumps({
+            'crops': [list(crop.shape[1::-1]) for crop in crops],
+            'results': results,
+        }, indent=2))
+        return
+
+    print(f"crop: {', '.join(f'{c.shape[1]}x{c.shape[0]}' for c in crops)}")
+    print(f"{'variant':<22}{'encode':>11}{'encoded':>11}{'base64':>11}")
+    for r in results:
+        print(f"{r['variant']:<22}{r['median_ms']:>9.2f}ms{r['mean_bytes'] / 1024:>9.0f}KB"
+              f"{r['mean_base64_bytes'] / 1024:>9.0f}KB")
+
+
+if __name__ == '__main__':
+    main()
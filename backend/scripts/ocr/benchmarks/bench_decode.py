@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark: decode gambar request lewat temp file vs langsung di memory
+
+Membandingkan jalur lama OCRDaemon (tulis bytes ke NamedTemporaryFile lalu
+cv2.imread) dengan jalur baru KTPOCR.extract_text(bytes)
+(cv2.imdecode pada view np.frombuffer). Hanya bagian decode yang diukur,
+PaddleOCR tidak di-load.
+
+Usage:
+    python benchmarks/bench_decode.py                 # JPEG sintetis ukuran HP
+    python benchmarks/bench_decode.py --images DIR    # JPEG asli dari folder
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Resolusi kamera HP yang umum (width, height)
+PHONE_SIZES = [(1600, 1200), (3264, 2448), (4000, 3000)]
+
+
+def make_phone_jpeg(width, height, quality=90, seed=0):
+    """Buat JPEG sintetis dengan tekstur + teks supaya ukuran file realistis"""
+    rng = np.random.default_rng(seed)
+    img = rng.integers(90, 200, size=(height // 8, width // 8, 3), dtype=np.uint8)
+    img = cv2.resize(img, (width, height), interpolation=cv2.INTER_CUBIC)
+    for i in range(12):
+        y = int(height * (0.1 + i * 0.07))
+        cv2.putText(img, f'NIK 3273 1726 0277 00{i:02d} NAMA CONTOH', (width // 10, y),
+                    cv2.FONT_HERSHEY_SIMPLEX, width / 1600, (20, 20, 20), max(1, width // 800))
+    ok, encoded = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError('Failed to encode synthetic JPEG')
+    return encoded.tobytes()
+
+
+def decode_via_tempfile(image_bytes):
+    """Jalur lama: bytes → temp file → cv2.imread → hapus file"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
+        temp_file.write(image_bytes)
+        temp_path = temp_file.name
+    try:
+        return cv2.imread(temp_path)
+    finally:
+        os.unlink(temp_path)
+
+
+def decode_in_memory(image_bytes):
+    """Jalur baru: cv2.imdecode langsung dari view buffer request"""
+    return cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+
+
+def time_ms(fn, payload, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(payload)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark temp-file vs in-memory image decode')
+    parser.add_argument('--images', help='Folder berisi JPEG (default: JPEG sintetis ukuran HP)')
+    parser.add_argument('--repeat', type=int, default=30, help='Jumlah pengulangan per gambar')
+    parser.add_argument('--json', action='store_true', help='Output JSON (machine-readable)')
+    args = parser.parse_args()
+
+    if args.images:
+        payloads = [
+            (f.name, f.read_bytes()) for f in sorted(Path(args.images).iterdir())
+            if f.suffix.lower() in ('.jpg', '.jpeg')
+        ]
+    else:
+        payloads = [(f'synthetic_{w}x{h}', make_phone_jpeg(w, h)) for w, h in PHONE_SIZES]
+
+    if not payloads:
+        print('No JPEG files found', file=sys.stderr)
+        sys.exit(1)
+
+    results = []
+    for name, payload in payloads:
+        # Warmup (page cache, codec init)
+        decode_via_tempfile(payload)
+        decode_in_memory(payload)
+
+        tempfile_ms = time_ms(decode_via_tempfile, payload, args.repeat)
+        memory_ms = time_ms(decode_in_memory, payload, args.repeat)
+        results.append({
+            'image': name,
+            'bytes': len(payload),
+            'tempfile_median_ms': statistics.median(tempfile_ms),
+            'memory_median_ms': statistics.median(memory_ms),
+            'saving_median_ms': statistics.median(tempfile_ms) - statistics.median(memory_ms),
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'image':<28}{'size':>10}{'tempfile':>12}{'memory':>12}{'saving':>12}")
+    for r in results:
+        print(f"{r['image']:<28}{r['bytes'] / 1024:>8.0f}KB"
+              f"{r['tempfile_median_ms']:>10.2f}ms{r['memory_median_ms']:>10.2f}ms"
+              f"{r['saving_median_ms']:>10.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
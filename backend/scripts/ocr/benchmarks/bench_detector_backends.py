@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Benchmark: backend deteksi KTP (PyTorch/ultralytics .pt vs ONNX fp32 vs ONNX int8)
+
+Setiap model dijalankan di subprocess terpisah supaya waktu load dan memori
+(RSS) tidak saling mempengaruhi. Dilaporkan waktu load, RSS setelah load dan
+puncak RSS, latensi p50/p95 per gambar, serta kesesuaian hasil terhadap model
+pertama (IoU box terbaik dan selisih confidence).
+
+Usage:
+    python benchmarks/bench_detector_backends.py models/best.pt models/best.onnx models/best.int8.onnx
+    python benchmarks/bench_detector_backends.py models/best.onnx models/best.int8.onnx --images DIR --json
+"""
+
+import argparse
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPT_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# Toleransi kesesuaian dengan model referensi
+MIN_IOU = 0.9
+MAX_CONF_DIFF = 0.05
+
+
+def current_rss_mb():
+    """RSS proses saat ini (Linux /proc), None jika tidak tersedia"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 1e6
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def load_payloads(images_dir):
+    if images_dir:
+        return [
+            (f.name, f.read_bytes()) for f in sorted(Path(images_dir).iterdir())
+            if f.suffix.lower() in ('.jpg', '.jpeg', '.png')
+        ]
+    from bench_decode import PHONE_SIZES, make_phone_jpeg
+    return [
+        (f'synthetic_{w}x{h}.jpg', make_phone_jpeg(w, h, seed=i))
+        for i, (w, h) in enumerate(PHONE_SIZES)
+    ]
+
+
+def run_worker(model_path, images_dir, repeat, warmup):
+    """Dijalankan di subprocess: load model, ukur latensi, print JSON ke stdout"""
+    import os
+    os.environ['SUPPRESS_OCR_LOGS'] = '1'
+
+    payloads = load_payloads(images_dir)
+    rss_before = current_rss_mb()
+
+    start = time.perf_counter()
+    from ktp_detect import KTPDetector
+    detector = KTPDetector(model_path)
+    load_ms = (time.perf_counter() - start) * 1000
+    rss_loaded = current_rss_mb()
+
+    for _ in range(warmup):
+        detector.detect_and_crop(payloads[0][1], crop_format='numpy')
+
+    samples = []
+    detections = {}
+    for name, data in payloads:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            result = detector.detect_and_crop(data, crop_format='numpy')
+            samples.append((time.perf_counter() - t0) * 1000)
+        if result.get('success'):
+            detections[name] = {'bbox': result['bbox'], 'confidence': result['confidence']}
+        else:
+            detections[name] = None
+
+    samples.sort()
+    print(json.dumps({
+        'model': str(model_path),
+        'model_type': detector.model_type,
+        'load_ms': load_ms,
+        'rss_before_mb': rss_before,
+        'rss_loaded_mb': rss_loaded,
+        # ru_maxrss dalam KB di Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1000,
+        'p50_ms': statistics.median(samples),
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'detections': detections,
+    }))
+
+
+def iou(a, b):
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x1 - x0) * max(0, y1 - y0)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def compare(reference, other):
+    """Bandingkan deteksi per gambar terhadap model referensi"""
+    ious = []
+    conf_diffs = []
+    missing = 0
+    for name, ref in reference['detections'].items():
+        det = other['detections'].get(name)
+        if ref is None and det is None:
+            continue
+        if ref is None or det is None:
+            missing += 1
+            continue
+        ious.append(iou(ref['bbox'], det['bbox']))
+        conf_diffs.append(abs(ref['confidence'] - det['confidence']))
+    return {
+        'min_iou': min(ious) if ious else None,
+        'max_conf_diff': max(conf_diffs) if conf_diffs else None,
+        'missing': missing,
+        'within_tolerance': missing == 0
+        and all(v >= MIN_IOU for v in ious)
+        and all(v <= MAX_CONF_DIFF for v in conf_diffs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark backend deteksi KTP (.pt / .onnx / int8 .onnx)')
+    parser.add_argument('models', nargs='+', help='Path model; model pertama menjadi referensi')
+    parser.add_argument('--images', help='Folder berisi foto KTP (default: JPEG sintetis ukuran HP)')
+    parser.add_argument('--repeat', type=int, default=10, help='Jumlah pengulangan per gambar')
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--json', action='store_true', help='Output JSON (machine-readable)')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.images, args.repeat, args.warmup)
+        return
+
+    results = []
+    for model in args.models:
+        cmd = [sys.executable, __file__, model, '--worker', model,
+               '--repeat', str(args.repeat), '--warmup', str(args.warmup)]
+        if args.images:
+            cmd += ['--images', args.images]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            results.append({'model': model, 'error': proc.stderr.strip().splitlines()[-1:] or ['failed']})
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    reference = next((r for r in results if 'error' not in r), None)
+    for result in results:
+        if 'error' not in result and result is not reference:
+            result['vs_reference'] = compare(reference, result)
+
+    if args.json:
+        print(json.dumps({'reference': reference and reference['model'], 'results': results}, indent=2))
+        return
+
+    print(f"{'model':<32}{'type':>8}{'load ms':>10}{'RSS MB':>9}{'peak MB':>9}{'p50 ms':>9}{'p95 ms':>9}{'min IoU':>9}{'conf Δ':>8}{'missing':>9}")
+    for r in results:
+        if 'error' in r:
+            print(f"{Path(r['model']).name:<32} error: {r['error'][0]}")
+            continue
+        vs = r.get('vs_reference', {})
+        min_iou = f"{vs['min_iou']:.3f}" if vs.get('min_iou') is not None else '-'
+        conf = f"{vs['max_conf_diff']:.3f}" if vs.get('max_conf_diff') is not None else '-'
+        rss = f"{r['rss_loaded_mb']:.0f}" if r['rss_loaded_mb'] is not None else '-'
+        print(f"{Path(r['model']).name:<32}{r['model_type']:>8}{r['load_ms']:>10.0f}{rss:>9}"
+              f"{r['peak_rss_mb']:>9.0f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{min_iou:>9}{conf:>8}{vs.get('missing', '-'):>9}")
+
+
+if __name__ == '__main__':
+    main()
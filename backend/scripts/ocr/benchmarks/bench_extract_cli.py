@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latensi CLI ktp_extract.py (cold vs warm daemon vs in-process)
+
+Setiap pemanggilan adalah proses Python baru, persis seperti subprocess dari
+backend TypeScript. Dilaporkan waktu wall-clock:
+
+- cold:       belum ada daemon; ktp_extract.py men-spawn daemon dan menunggu model siap
+- warm:       daemon sudah hangat; hanya biaya start interpreter + satu request socket
+- no-daemon:  --no-daemon, model di-load di setiap pemanggilan (perilaku lama)
+
+Benchmark memakai socket privat (KTP_OCR_SOCKET) dan idle timeout pendek
+supaya tidak mengganggu daemon lain yang sedang berjalan.
+
+Usage:
+    python benchmarks/bench_extract_cli.py
+    python benchmarks/bench_extract_cli.py --image ktp.jpg --warm 20 --json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPT_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+
+def run_cli(image_path, env, extra=()):
+    """Jalankan ktp_extract.py sekali; return (wall ms, response dict)"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, str(SCRIPT_DIR / 'ktp_extract.py'), image_path, *extra],
+        env=env, capture_output=True, text=True,
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    try:
+        response = json.loads(proc.stdout)
+    except json.JSONDecodeError:
+        response = {'success': False, 'error': proc.stdout.strip() or proc.stderr.strip()[-200:]}
+    return elapsed, response
+
+
+def summarize(samples):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return {
+        'n': len(samples),
+        'p50_ms': statistics.median(ordered),
+        'p95_ms': ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+        'min_ms': ordered[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark latensi CLI ktp_extract.py')
+    parser.add_argument('--image', help='Gambar KTP (default: JPEG sintetis)')
+    parser.add_argument('--warm', type=int, default=10, help='Jumlah pemanggilan warm')
+    parser.add_argument('--no-daemon', type=int, default=2, help='Jumlah pemanggilan --no-daemon (0 = skip)')
+    parser.add_argument('--idle-timeout', type=float, default=15,
+                        help='Idle timeout daemon benchmark (detik)')
+    parser.add_argument('--json', action='store_true', help='Output JSON (machine-readable)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_extract_')
+    image_path = args.image
+    if not image_path:
+        from bench_decode import make_phone_jpeg
+        image_path = os.path.join(workdir, 'ktp.jpg')
+        with open(image_path, 'wb') as f:
+            f.write(make_phone_jpeg(1600, 1200))
+
+    env = dict(os.environ,
+               SUPPRESS_OCR_LOGS='1',
+               KTP_OCR_SOCKET=os.path.join(workdir, 'daemon.sock'),
+               KTP_OCR_IDLE_TIMEOUT=str(args.idle_timeout))
+
+    cold_ms, response = run_cli(image_path, env)
+    if not response.get('success'):
+        print(f"Error: {response.get('error')}", file=sys.stderr)
+        sys.exit(1)
+
+    warm = [run_cli(image_path, env)[0] for _ in range(args.warm)]
+    no_daemon = [run_cli(image_path, env, ['--no-daemon'])[0] for _ in range(args.no_daemon)]
+
+    results = {
+        'image': image_path,
+        'cold_ms': cold_ms,
+        'warm': summarize(warm),
+        'no_daemon': summarize(no_daemon),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'mode':<12}{'n':>4}{'p50 ms':>10}{'p95 ms':>10}{'min ms':>10}")
+    print(f"{'cold':<12}{1:>4}{cold_ms:>10.1f}{cold_ms:>10.1f}{cold_ms:>10.1f}")
+    for name in ('warm', 'no_daemon'):
+        r = results[name]
+        if r:
+            print(f"{name.replace('_', '-'):<12}{r['n']:>4}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['min_ms']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Benchmark + cek kesetaraan: ktp_fields.extract_ktp_fields vs implementasi lama
+
+Setiap dokumen di corpus (JSONL, satu objek {"full_text": [...]} per baris)
+diproses oleh kedua implementasi; hasil harus identik. Dengan --fuzz N,
+ditambahkan N dokumen sintetis dengan variasi OCR (label terpotong, baris
+tertukar, huruf kecil, karakter non-ASCII) untuk menguji jalur fallback.
+
+Corpus hasil rekaman traffic (daemon --record-corpus, lihat ktp_corpus.py)
+bisa di-replay dengan --corpus. Selain kesetaraan dan throughput, dilaporkan:
+- hit rate per field (fraksi dokumen dengan nilai tidak None)
+- biaya cascade per field (fields=[field] dikurangi biaya dasar join + index)
+- per pattern di cascade: berapa kali dijalankan, dilewati (label tidak ada),
+  match, dan total waktu regex
+Output per dokumen bisa disimpan (--save-baseline) lalu dibandingkan setelah
+optimasi regex (--baseline), sehingga perubahan dicek terhadap versi
+sebelumnya, bukan hanya terhadap implementasi lama.
+
+Usage:
+    python benchmarks/bench_fields.py
+    python benchmarks/bench_fields.py --corpus recorded.jsonl --fuzz 2000 --json
+    python benchmarks/bench_fields.py --corpus recorded.jsonl --save-baseline /tmp/fields_before.jsonl
+    python benchmarks/bench_fields.py --corpus recorded.jsonl --baseline /tmp/fields_before.jsonl --patterns
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ktp_fields
+from ktp_fields import API_FIELDS, FIELD_NAMES, extract_ktp_fields
+from legacy_fields import extract_ktp_fields_legacy
+
+DEFAULT_CORPUS = Path(__file__).resolve().parent / 'corpus' / 'ktp_text_synthetic.jsonl'
+
+NAMES = ['YAN SEN NICO', 'DEBBY ANGGRAINI', 'SITI NURHALIZA', 'BUDI SANTOSO', 'AGUS', 'RINA MARLINA PUTRI']
+CITIES = ['BANDUNG', 'JAKARTA', 'SURABAYA', 'BEKASI', 'DEPOK']
+STREETS = ['JL KECAPI V', 'JL. MERDEKA NO. 12', 'LINGGABUANA NO.2', 'KP CIBOGO', 'PERUM GRIYA ASRI BLOK C']
+RELIGIONS = ['ISLAM', 'KRISTEN', 'KATHOLIK', 'HINDU', 'BUDHA']
+STATUSES = ['BELUM KAWIN', 'KAWIN', 'CERAI HIDUP', 'KAWIN KOTA BANDUNG']
+JOBS = ['KARYAWAN SWASTA', 'PELAJAR/MAHASISWA', 'WIRASWASTA', 'MENGURUS RUMAH TANGGA']
+GENDERS = ['LAKI-LAKI', 'LAK-LAKI', 'Laki laki', 'PEREMPUAN', 'Perempuan']
+LABEL_NOISE = {
+    'Tempat/Tgl Lahir': ['ToiLahir', 'at/Tgl Lahir', 'Tempat Tgl Lahir'],
+    'Kel/Desa': ['VDesa', 'Kel Desa', 'Kelurahan'],
+    'Kecamatan': ['camatan', 'Kecamatan'],
+    'Kewarganegaraan': ['negaraan', 'Kewarganegaraan'],
+    'RT/RW': ['ARW', 'RT RW', 'RT/RW'],
+}
+
+
+def synthetic_ktp_lines(rng):
+    """Satu dokumen full_text sintetis dengan variasi label dan urutan seperti output PaddleOCR"""
+    nik = ''.join(rng.choice('0123456789') for _ in range(16))
+    if rng.random() < 0.3:
+        nik = ' '.join(nik[i:i + 4] for i in range(0, 16, 4))
+    city = rng.choice(CITIES)
+    rows = [
+        ('PROVINSI', f'PROVINSI {rng.choice(["JAWA BARAT", "DKI JAKARTA", "JAWA TIMUR"])}'),
+        ('KOTA', f'KOTA {city}'),
+        ('NIK', nik if rng.random() < 0.5 else f'NIK : {nik}'),
+        ('Nama', rng.choice([f':{rng.choice(NAMES)}', rng.choice(NAMES), f'Nama : {rng.choice(NAMES)}'])),
+        ('Tempat/Tgl Lahir', f'{rng.choice(CITIES)}, {rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-{rng.randint(1950, 2005)}'),
+        ('Jenis Kelamin', rng.choice(GENDERS)),
+        ('Gol Darah', rng.choice(['Gol Darah', 'Gol. Darah : O', 'Gol Darah B'])),
+        ('Alamat', rng.choice([f'Alamat : {rng.choice(STREETS)}', f': {rng.choice(STREETS)}', rng.choice(STREETS)])),
+        ('RT/RW', f'{rng.randint(1, 20):03d}/{rng.randint(1, 20):03d}'),
+        ('Kel/Desa', rng.choice(['CIBEUNYING', 'SUKAJADI', 'MENTENG'])),
+        ('Kecamatan', rng.choice(['COBLONG', 'ANDIR', 'TEBET'])),
+        ('Agama', rng.choice(RELIGIONS)),
+        ('Status Perkawinan', rng.choice(STATUSES)),
+        ('Pekerjaan', rng.choice(JOBS)),
+        ('Kewarganegaraan', 'WNI'),
+        ('Berlaku Hingga', 'SEUMUR HIDUP'),
+    ]
+
+    lines = []
+    for label, value in rows:
+        if label in ('PROVINSI', 'KOTA', 'NIK', 'Nama', 'Gol Darah', 'Alamat'):
+            lines.append(value)
+            continue
+        label_text = rng.choice(LABEL_NOISE.get(label, [label]))
+        style = rng.random()
+        if style < 0.4:
+            lines.append(f'{label_text} : {value}')
+        elif style < 0.8:
+            lines.extend([label_text, f': {value}' if rng.random() < 0.5 else value])
+        else:
+            lines.append(value)
+    return mutate(lines, rng)
+
+
+def mutate(lines, rng):
+    """Variasi OCR: baris hilang, tertukar, huruf kecil, karakter non-ASCII"""
+    lines = list(lines)
+    for _ in range(rng.randint(0, 3)):
+        op = rng.random()
+        if not lines:
+            break
+        i = rng.randrange(len(lines))
+        if op < 0.25:
+            del lines[i]
+        elif op < 0.5 and len(lines) > 1:
+            j = rng.randrange(len(lines))
+            lines[i], lines[j] = lines[j], lines[i]
+        elif op < 0.7:
+            lines[i] = lines[i].lower()
+        elif op < 0.85:
+            lines[i] = lines[i][:max(1, len(lines[i]) // 2)]
+        else:
+            lines[i] = lines[i].replace('K', rng.choice(['K', 'K', 'Ķ'])).replace('a', rng.choice(['a', 'á']))
+    return lines
+
+
+def load_corpus(path):
+    docs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                docs.append(json.loads(line))
+    return docs
+
+
+def pattern_cascades():
+    """(field, nama tahap, list entry registry) sesuai urutan fallback di ktp_fields"""
+    cascades = [
+        ('nik', 'label', ktp_fields.NIK_PATTERNS),
+        ('nama', 'label', ktp_fields.NAMA_PATTERNS),
+        ('jenis_kelamin', 'label', ktp_fields.JENIS_KELAMIN_PATTERNS),
+        ('jenis_kelamin', 'fallback', [entry for entry, _ in ktp_fields.JENIS_KELAMIN_FALLBACK]),
+        ('alamat', 'label', ktp_fields.ALAMAT_PATTERNS),
+        ('alamat', 'gol_darah', ktp_fields.ALAMAT_GOL_DARAH_PATTERNS),
+        ('alamat', 'rt_rw', ktp_fields.ALAMAT_RT_PATTERNS),
+        ('rt_rw', 'label', ktp_fields.RT_RW_PATTERNS),
+    ]
+    cascades += [(name, 'label', patterns) for name, patterns, _ in ktp_fields.SIMPLE_FIELDS]
+    cascades.append(('status_perkawinan', 'label', ktp_fields.STATUS_PATTERNS))
+    return cascades
+
+
+def profile_patterns(docs):
+    """
+    Jalankan extract_ktp_fields dengan LabelIndex yang menghitung setiap search
+
+    Returns:
+        List per pattern: field, stage, index, label, runs, skipped, matches, total_us
+    """
+    stats = {}
+    for field, stage_name, entries in pattern_cascades():
+        for i, entry in enumerate(entries):
+            stats[id(entry)] = {
+                'field': field, 'stage': stage_name, 'index': i,
+                'label': entry[1] if not isinstance(entry[1], tuple) else '|'.join(entry[1]),
+                'runs': 0, 'skipped': 0, 'matches': 0, 'total_us': 0.0,
+            }
+
+    class CountingIndex(ktp_fields.LabelIndex):
+        def search(self, entry):
+            entry_stats = stats.get(id(entry))
+            if entry_stats is None:
+                return super().search(entry)
+            if self.start(entry[1]) < 0:
+                entry_stats['skipped'] += 1
+                return None
+            start = time.perf_counter()
+            match = super().search(entry)
+            entry_stats['total_us'] += (time.perf_counter() - start) * 1e6
+            entry_stats['runs'] += 1
+            entry_stats['matches'] += match is not None
+            return match
+
+    original = ktp_fields.LabelIndex
+    ktp_fields.LabelIndex = CountingIndex
+    try:
+        for doc in docs:
+            extract_ktp_fields(doc)
+    finally:
+        ktp_fields.LabelIndex = original
+    return list(stats.values())
+
+
+def field_costs_us(docs, repeat):
+    """Biaya per doc untuk setiap field sendiri, di atas biaya dasar (join + LabelIndex)"""
+    base_us = time_per_doc_us(lambda doc: extract_ktp_fields(doc, fields=()), docs, repeat)
+    costs = {'_base': base_us}
+    for name in FIELD_NAMES:
+        field = (name,)
+        costs[name] = time_per_doc_us(lambda doc: extract_ktp_fields(doc, fields=field), docs, repeat) - base_us
+    return costs
+
+
+def doc_key(doc):
+    return hashlib.sha1('\n'.join(doc['full_text']).encode('utf-8')).hexdigest()
+
+
+def compare_baseline(path, docs, outputs):
+    """
+    Bandingkan output per dokumen dengan baseline yang disimpan (--save-baseline)
+
+    Returns:
+        Tuple (jumlah dokumen yang dibandingkan, list perbedaan)
+    """
+    baseline = {}
+    for entry in load_corpus(path):
+        baseline[entry['key']] = entry['fields']
+    compared = 0
+    diffs = []
+    for doc, output in zip(docs, outputs):
+        expected = baseline.get(doc_key(doc))
+        if expected is None:
+            continue
+        compared += 1
+        if expected != output:
+            changed = {k: {'baseline': expected.get(k), 'current': v} for k, v in output.items() if expected.get(k) != v}
+            diffs.append({'full_text': doc['full_text'], 'changed': changed})
+    return compared, diffs
+
+
+def time_per_doc_us(fn, docs, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for doc in docs:
+            fn(doc)
+        samples.append((time.perf_counter() - start) / len(docs) * 1e6)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dan cek kesetaraan ekstraksi field KTP')
+    parser.add_argument('--corpus', action='append',
+                        help='File JSONL {"full_text": [...]} (boleh diulang). Default: corpus sintetis')
+    parser.add_argument('--fuzz', type=int, default=500, help='Jumlah dokumen sintetis tambahan')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save-baseline', help='Simpan output per dokumen ke file JSONL ini')
+    parser.add_argument('--baseline', help='Bandingkan output per dokumen dengan file --save-baseline')
+    parser.add_argument('--patterns', action='store_true', help='Tampilkan statistik per pattern di cascade')
+    parser.add_argument('--json', action='store_true', help='Output JSON (machine-readable)')
+    args = parser.parse_args()
+
+    docs = []
+    for path in args.corpus or [DEFAULT_CORPUS]:
+        docs.extend(load_corpus(path))
+    rng = random.Random(args.seed)
+    docs.extend({'full_text': synthetic_ktp_lines(rng)} for _ in range(args.fuzz))
+
+    mismatches = []
+    for i, doc in enumerate(docs):
+        expected = extract_ktp_fields_legacy(doc)
+        actual = extract_ktp_fields(doc)
+        if expected != actual:
+            mismatches.append({'index': i, 'full_text': doc['full_text'], 'expected': expected, 'actual': actual})
+
+    outputs = [extract_ktp_fields(doc) for doc in docs]
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            for doc, output in zip(docs, outputs):
+                f.write(json.dumps({'key': doc_key(doc), 'fields': output}, ensure_ascii=False) + '\n')
+    baseline_compared, baseline_diffs = compare_baseline(args.baseline, docs, outputs) if args.baseline else (0, [])
+
+    legacy_us = time_per_doc_us(extract_ktp_fields_legacy, docs, args.repeat)
+    new_us = time_per_doc_us(extract_ktp_fields, docs, args.repeat)
+    # Hanya field yang dikembalikan daemon (fields=API_FIELDS)
+    api_us = time_per_doc_us(lambda doc: extract_ktp_fields(doc, fields=API_FIELDS), docs, args.repeat)
+    result = {
+        'documents': len(docs),
+        'mismatches': len(mismatches),
+        'legacy_us_per_doc': legacy_us,
+        'new_us_per_doc': new_us,
+        'api_fields_us_per_doc': api_us,
+        'speedup': legacy_us / new_us if new_us else None,
+        'docs_per_s': 1e6 / new_us if new_us else None,
+        'hit_rate': {name: sum(o[name] is not None for o in outputs) / len(outputs) for name in FIELD_NAMES},
+        'field_cost_us': field_costs_us(docs, args.repeat),
+        'patterns': profile_patterns(docs),
+    }
+    if args.baseline:
+        result['baseline'] = {'compared': baseline_compared, 'changed': len(baseline_diffs)}
+
+    if args.json:
+        print(json.dumps({**result, 'mismatch_examples': mismatches[:5], 'baseline_examples': baseline_diffs[:5]},
+                         ensure_ascii=False, indent=2))
+    else:
+        print(f"documents: {result['documents']}  mismatches: {result['mismatches']}")
+        print(f"legacy: {legacy_us:.1f} us/doc  new: {new_us:.1f} us/doc  speedup: {result['speedup']:.2f}x"
+              f"  ({result['docs_per_s']:.0f} docs/s)")
+        print(f"new, fields={list(API_FIELDS)}: {api_us:.1f} us/doc")
+        if args.baseline:
+            print(f"baseline: {baseline_compared} compared, {len(baseline_diffs)} changed")
+        print(f"\n{'field':<20}{'hit rate':>9}{'us/doc':>9}")
+        print(f"{'(join + index)':<20}{'':>9}{result['field_cost_us']['_base']:>9.1f}")
+        for name in FIELD_NAMES:
+            print(f"{name:<20}{result['hit_rate'][name]:>9.1%}{result['field_cost_us'][name]:>9.1f}")
+        if args.patterns:
+            print(f"\n{'field':<20}{'stage':<10}{'#':>3} {'label':<18}{'runs':>7}{'skipped':>8}{'matches':>8}{'us/run':>8}")
+            for p in result['patterns']:
+                per_run = p['total_us'] / p['runs'] if p['runs'] else 0.0
+                print(f"{p['field']:<20}{p['stage']:<10}{p['index']:>3} {str(p['label'])[:17]:<18}"
+                      f"{p['runs']:>7}{p['skipped']:>8}{p['matches']:>8}{per_run:>8.2f}")
+        for m in mismatches[:5]:
+            print(json.dumps(m, ensure_ascii=False))
+        for d in baseline_diffs[:5]:
+            print(json.dumps(d, ensure_ascii=False))
+
+    if mismatches or baseline_diffs:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
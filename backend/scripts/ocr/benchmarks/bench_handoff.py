@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark: hand-off gambar base64 di dalam JSON vs by reference (image_ref.py)
+
+Request (sisi daemon, sampai gambar ter-decode):
+- base64: baca file request JSON, json.load, base64.b64decode, cv2.imdecode
+- ref:    baca file request JSON kecil, mmap "image_file" (/dev/shm/ktp-images), cv2.imdecode dari mapping
+
+Response (crop JPEG):
+- base64: base64.b64encode + json.dumps + tulis file response
+- ref:    tulis crop ke file (write_image_file) + json.dumps response kecil
+
+Model tidak di-load; hanya transport dan decode yang diukur.
+
+Usage:
+    python benchmarks/bench_handoff.py
+    python benchmarks/bench_handoff.py --images DIR --json
+"""
+
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_decode import PHONE_SIZES, make_phone_jpeg, time_ms
+from image_ref import default_shared_dir, map_image_file, write_image_file
+
+
+def request_base64(paths):
+    request_file, _ = paths
+    with open(request_file, 'r') as f:
+        request = json.load(f)
+    image_bytes = base64.b64decode(request['image'])
+    return cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+
+
+def request_ref(paths):
+    _, ref_request_file = paths
+    with open(ref_request_file, 'r') as f:
+        request = json.load(f)
+    image = map_image_file(request['image_file'])
+    return cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark base64-in-JSON vs by-reference image hand-off')
+    parser.add_argument('--images', help='Folder berisi JPEG (default: JPEG sintetis ukuran HP)')
+    parser.add_argument('--repeat', type=int, default=30, help='Jumlah pengulangan per gambar')
+    parser.add_argument('--json', action='store_true', help='Output JSON (machine-readable)')
+    args = parser.parse_args()
+
+    if args.images:
+        payloads = [
+            (f.name, f.read_bytes()) for f in sorted(Path(args.images).iterdir())
+            if f.suffix.lower() in ('.jpg', '.jpeg')
+        ]
+    else:
+        payloads = [(f'synthetic_{w}x{h}', make_phone_jpeg(w, h)) for w, h in PHONE_SIZES]
+
+    if not payloads:
+        print('No JPEG files found', file=sys.stderr)
+        sys.exit(1)
+
+    shared_dir = default_shared_dir(tempfile.gettempdir())
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        work_dir = Path(work_dir)
+        for name, payload in payloads:
+            request_file = work_dir / 'request.json'
+            request_file.write_text(json.dumps({'image': base64.b64encode(payload).decode('ascii')}))
+            image_file = write_image_file(payload, shared_dir, prefix='bench-handoff-')
+            ref_request_file = work_dir / 'request_ref.json'
+            ref_request_file.write_text(json.dumps({'image_file': image_file}))
+
+            # Crop kartu (~40% tengah foto) sebagai payload response
+            img = request_ref((request_file, ref_request_file))
+            height, width = img.shape[:2]
+            ok, crop = cv2.imencode('.jpg', img[height // 4:height * 3 // 4, width // 5:width * 4 // 5],
+                                    [cv2.IMWRITE_JPEG_QUALITY, 95])
+            crop = crop.tobytes()
+            response_file = work_dir / 'response.json'
+            crop_files = []
+
+            def response_base64(data):
+                response_file.write_text(json.dumps({'success': True, 'cropped_image': base64.b64encode(data).decode('utf-8')}))
+
+            def response_ref(data):
+                crop_files.append(write_image_file(data, shared_dir, prefix='bench-handoff-'))
+                response_file.write_text(json.dumps({'success': True, 'cropped_image_file': crop_files[-1]}))
+
+            try:
+                paths = (request_file, ref_request_file)
+                request_base64(paths)
+                request_ref(paths)
+                req_b64 = statistics.median(time_ms(request_base64, paths, args.repeat))
+                req_ref = statistics.median(time_ms(request_ref, paths, args.repeat))
+                resp_b64 = statistics.median(time_ms(response_base64, crop, args.repeat))
+                resp_ref = statistics.median(time_ms(response_ref, crop, args.repeat))
+            finally:
+                for path in [image_file, *crop_files]:
+                    os.unlink(path)
+
+            results.append({
+                'image': name,
+                'bytes': len(payload),
+                'request_json_bytes': {'base64': request_file.stat().st_size, 'ref': ref_request_file.stat().st_size},
+                'request_median_ms': {'base64': req_b64, 'ref': req_ref},
+                'crop_bytes': len(crop),
+                'response_median_ms': {'base64': resp_b64, 'ref': resp_ref},
+            })
+
+    if args.json:
+        print(json.dumps({'shared_dir': str(shared_dir), 'results': results}, indent=2))
+        return
+
+    print(f"shared dir: {shared_dir}")
+    print(f"{'image':<24}{'size':>9}{'req b64':>11}{'req ref':>11}{'crop':>9}{'resp b64':>11}{'resp ref':>11}")
+    for r in results:
+        print(f"{r['image']:<24}{r['bytes'] / 1024:>7.0f}KB"
+              f"{r['request_median_ms']['base64']:>9.2f}ms{r['request_median_ms']['ref']:>9.2f}ms"
+              f"{r['crop_bytes'] / 1024:>7.0f}KB"
+              f"{r['response_median_ms']['base64']:>9.2f}ms{r['response_median_ms']['ref']:>9.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
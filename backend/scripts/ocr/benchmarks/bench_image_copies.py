@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Benchmark: copy buffer pixel dan puncak memori per request di jalur detect -> OCR
+
+Foto KTP sintetis 12 MP (4000x3000, ktp_dataset.py) dijalankan melalui
+KTPDetector.detect_and_crop lalu KTPOCR.extract_text pada crop-nya (PaddleOCR
+diganti predictor kosong, jadi hanya jalur gambar yang diukur), untuk beberapa
+tipe input:
+- bytes:   JPEG dari request daemon (crop BGR view, seperti ktp_pipeline)
+- ndarray: numpy array RGB yang sudah di-decode (kontrak numpy KTPDetector)
+- pil:     PIL Image RGB (crop sebagai PIL Image, crop_format='pil')
+
+Dilaporkan per skenario:
+- peak_mb:   puncak memori yang dialokasikan selama request (tracemalloc; numpy
+             dan cv2 melaporkan buffer array ke tracemalloc), di luar input
+- copied_mb: total buffer pixel baru (>= 64 KB) dari decode, konversi warna,
+             resize dan copy array, dengan rinciannya per operasi
+- median_ms: waktu per request tanpa tracemalloc
+
+Jalankan pada dua revisi untuk membandingkan sebelum / sesudah perubahan.
+
+Usage:
+    python benchmarks/bench_image_copies.py models/best.onnx
+    python benchmarks/bench_image_copies.py models/best.onnx --json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ktp_dataset import make_sample
+
+# Buffer lebih kecil dari ini (box, tensor kecil, dll) tidak dihitung sebagai copy pixel
+MIN_COPY_BYTES = 64 * 1024
+
+SCENARIOS = ('bytes', 'ndarray', 'pil')
+
+
+class _NullPredictor:
+    """Pengganti PaddleOCR: jalur gambar KTPOCR tetap berjalan, tanpa model"""
+
+    def predict(self, images):
+        return [None] * (len(images) if isinstance(images, list) else 1)
+
+
+class CopyCounter:
+    """
+    Hitung buffer pixel baru yang dibuat selama blok: output cv2 (decode, konversi,
+    resize), np.array / np.asarray yang menyalin, ndarray.copy (input ndarray) dan
+    PIL Image.fromarray
+    """
+
+    CV2_FUNCTIONS = ('imdecode', 'imread', 'cvtColor', 'resize', 'warpPerspective')
+
+    def __init__(self):
+        self.bytes = Counter()
+        self._patched = []
+
+    def add(self, name, nbytes):
+        if nbytes >= MIN_COPY_BYTES:
+            self.bytes[name] += nbytes
+
+    def _wrap(self, module, name, label, source_index=0):
+        original = getattr(module, name)
+
+        def wrapper(*args, **kwargs):
+            result = original(*args, **kwargs)
+            array = result if isinstance(result, np.ndarray) else None
+            if array is None and hasattr(result, 'size') and hasattr(result, 'mode'):
+                # PIL Image dari array: pixel disalin ke memori PIL
+                self.add(label, result.size[0] * result.size[1] * len(result.getbands()))
+                return result
+            if array is None:
+                return result
+            dst = kwargs.get('dst')
+            source = args[source_index] if len(args) > source_index else None
+            if dst is not None and np.shares_memory(array, dst):
+                return result
+            if isinstance(source, np.ndarray) and np.shares_memory(array, source):
+                return result
+            self.add(label, array.nbytes)
+            return result
+
+        setattr(module, name, wrapper)
+        self._patched.append((module, name, original))
+
+    def __enter__(self):
+        for name in self.CV2_FUNCTIONS:
+            self._wrap(cv2, name, f'cv2.{name}')
+        self._wrap(np, 'array', 'np.array')
+        self._wrap(np, 'asarray', 'np.asarray')
+        self._wrap(np, 'ascontiguousarray', 'np.ascontiguousarray')
+        if 'PIL.Image' in sys.modules:
+            self._wrap(sys.modules['PIL.Image'], 'fromarray', 'Image.fromarray')
+        return self
+
+    def __exit__(self, *exc):
+        for module, name, original in reversed(self._patched):
+            setattr(module, name, original)
+        self._patched = []
+        return False
+
+
+class _TrackedArray(np.ndarray):
+    """Input ndarray yang mencatat ndarray.copy() ke counter aktif"""
+
+    counter = None
+
+    def copy(self, *args, **kwargs):
+        if _TrackedArray.counter is not None:
+            _TrackedArray.counter.add('ndarray.copy', self.nbytes)
+        return np.asarray(self).copy(*args, **kwargs)
+
+
+def make_inputs(photo_jpeg):
+    from PIL import Image
+
+    decoded = cv2.cvtColor(cv2.imdecode(np.frombuffer(photo_jpeg, np.uint8), cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
+    return {
+        'bytes': lambda: photo_jpeg,
+        'ndarray': lambda: decoded.view(_TrackedArray),
+        'pil': lambda: Image.fromarray(decoded),
+    }
+
+
+def run_request(detector, ocr, image_input, scenario):
+    crop_format = 'pil' if scenario == 'pil' else 'bgr'
+    result = detector.detect_and_crop(image_input, min_confidence=0.1, crop_format=crop_format)
+    if not result['success']:
+        raise RuntimeError(result['error'])
+    ocr.extract_text(result['cropped_image'])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark copy buffer pixel dan puncak memori detect -> OCR')
+    parser.add_argument('model', help='Model deteksi (.pt / .onnx)')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--repeat', type=int, default=5, help='Jumlah pengulangan untuk waktu')
+    parser.add_argument('--max-image-size', type=int, default=1200, help='max_image_size KTPOCR')
+    parser.add_argument('--json', action='store_true', help='Output JSON (machine-readable)')
+    args = parser.parse_args()
+
+    os.environ['SUPPRESS_OCR_LOGS'] = '1'
+    from ktp_detect import KTPDetector
+    from ktp_ocr import KTPOCR
+
+    detector = KTPDetector(model_path=args.model)
+    # KTPOCR tanpa load PaddleOCR: hanya decode / preprocess yang dijalankan
+    ocr = KTPOCR.__new__(KTPOCR)
+    ocr.ocr = _NullPredictor()
+    ocr.max_image_size = args.max_image_size
+    ocr.rectify = False
+
+    sample = make_sample(0, width=4000, angle=0, quality=90)
+    inputs = make_inputs(sample['photo'])
+
+    results = []
+    for scenario in args.scenarios:
+        make_input = inputs[scenario]
+        run_request(detector, ocr, make_input(), scenario)
+
+        samples = []
+        for _ in range(args.repeat):
+            image_input = make_input()
+            start = time.perf_counter()
+            run_request(detector, ocr, image_input, scenario)
+            samples.append((time.perf_counter() - start) * 1000)
+
+        image_input = make_input()
+        with CopyCounter() as counter:
+            _TrackedArray.counter = counter
+            tracemalloc.start()
+            try:
+                baseline = tracemalloc.get_traced_memory()[0]
+                result = run_request(detector, ocr, image_input, scenario)
+                peak = tracemalloc.get_traced_memory()[1] - baseline
+            finally:
+                tracemalloc.stop()
+                _TrackedArray.counter = None
+
+        results.append({
+            'scenario': scenario,
+            'photo': list(result['original_size']),
+            'bbox': list(result['bbox']),
+            'peak_mb': peak / 1e6,
+            'copied_mb': sum(counter.bytes.values()) / 1e6,
+            'copies_mb': {name: nbytes / 1e6 for name, nbytes in counter.bytes.most_common()},
+            'median_ms': statistics.median(samples),
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'scenario':<10}{'peak':>10}{'copied':>10}{'median':>11}  copies")
+    for r in results:
+        copies = ', '.join(f"{name} {mb:.1f}" for name, mb in r['copies_mb'].items())
+        print(f"{r['scenario']:<10}{r['peak_mb']:>8.1f}MB{r['copied_mb']:>8.1f}MB{r['median_ms']:>9.1f}ms  {copies}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ekstraksi field berbasis layout (ktp_layout) vs berbasis teks (ktp_fields)
+
+Membuat text_blocks sintetis dengan bbox seperti output PaddleOCR pada KTP
+(kolom label, kolom value, kolom foto di kanan), lalu mengacak urutan block.
+Dilaporkan akurasi per field terhadap ground truth dan waktu per dokumen,
+termasuk pertumbuhan waktu terhadap jumlah block.
+
+Usage:
+    python benchmarks/bench_layout.py
+    python benchmarks/bench_layout.py --docs 500 --shuffle 1.0 --json
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ktp_fields import FIELD_NAMES, extract_ktp_fields
+from ktp_layout import extract_ktp_fields_layout
+from bench_fields import NAMES, CITIES, STREETS, RELIGIONS, JOBS
+
+ROW_HEIGHT = 22
+ROW_PITCH = 30
+
+
+def synthetic_ktp_blocks(rng, shuffle=1.0):
+    """
+    Satu dokumen text_blocks sintetis beserta ground truth field
+
+    Args:
+        rng: random.Random
+        shuffle: Proporsi block yang urutannya diacak (0 = urut baris seperti OCR ideal)
+
+    Returns:
+        Tuple (extracted_data, truth)
+    """
+    nik = ''.join(rng.choice('0123456789') for _ in range(16))
+    gender = rng.choice(['LAKI-LAKI', 'PEREMPUAN'])
+    truth = {
+        'nik': nik,
+        'nama': rng.choice(NAMES),
+        'tempat_tgl_lahir': f'{rng.choice(CITIES)}, {rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-{rng.randint(1950, 2005)}',
+        'jenis_kelamin': 'Laki-laki' if gender == 'LAKI-LAKI' else 'Perempuan',
+        'alamat': rng.choice(STREETS),
+        'rt_rw': f'{rng.randint(1, 20):03d}/{rng.randint(1, 20):03d}',
+        'kelurahan': rng.choice(['CIBEUNYING', 'SUKAJADI', 'MENTENG']),
+        'kecamatan': rng.choice(['COBLONG', 'ANDIR', 'TEBET']),
+        'agama': rng.choice(RELIGIONS),
+        'status_perkawinan': rng.choice(['BELUM KAWIN', 'KAWIN', 'CERAI HIDUP']),
+        'pekerjaan': rng.choice(JOBS),
+        'kewarganegaraan': 'WNI',
+    }
+    city = rng.choice(CITIES)
+    rows = [
+        [f'PROVINSI {rng.choice(["JAWA BARAT", "DKI JAKARTA"])}'],
+        [f'KOTA {city}'],
+        ['NIK', f': {nik}'],
+        ['Nama', f': {truth["nama"]}'],
+        ['Tempat/Tgl Lahir', f': {truth["tempat_tgl_lahir"]}'],
+        ['Jenis Kelamin', f': {gender}', 'Gol. Darah : -'],
+        ['Alamat', f': {truth["alamat"]}'],
+        ['RT/RW', f': {truth["rt_rw"]}'],
+        ['Kel/Desa', f': {truth["kelurahan"]}'],
+        ['Kecamatan', f': {truth["kecamatan"]}'],
+        ['Agama', f': {truth["agama"]}'],
+        ['Status Perkawinan', f': {truth["status_perkawinan"]}', f'KOTA {city}'],
+        ['Pekerjaan', f': {truth["pekerjaan"]}', f'{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-2015'],
+        ['Kewarganegaraan', f': {truth["kewarganegaraan"]}'],
+        ['Berlaku Hingga', ': SEUMUR HIDUP'],
+    ]
+
+    blocks = []
+    skew = rng.uniform(-0.02, 0.02)  # foto sedikit miring
+    for r, row in enumerate(rows):
+        for j, text in enumerate(row):
+            x = [40, 260, 700][j] + rng.uniform(-4, 4)
+            y = 40 + r * ROW_PITCH + x * skew + rng.uniform(-3, 3)
+            w = len(text) * 11
+            blocks.append({
+                'text': text,
+                'confidence': 0.95,
+                'bbox': [[x, y], [x + w, y], [x + w, y + ROW_HEIGHT], [x, y + ROW_HEIGHT]],
+            })
+
+    count = int(len(blocks) * shuffle)
+    if count > 1:
+        indices = rng.sample(range(len(blocks)), count)
+        shuffled = [blocks[i] for i in indices]
+        rng.shuffle(shuffled)
+        for i, block in zip(indices, shuffled):
+            blocks[i] = block
+
+    extracted_data = {
+        'text_blocks': blocks,
+        'full_text': [b['text'] for b in blocks],
+    }
+    return extracted_data, truth
+
+
+def accuracy(extractor, docs):
+    correct = dict.fromkeys(FIELD_NAMES, 0)
+    for extracted_data, truth in docs:
+        fields = extractor(extracted_data)
+        for name in FIELD_NAMES:
+            correct[name] += fields[name] == truth[name]
+    return {name: count / len(docs) for name, count in correct.items()}
+
+
+def time_per_doc_us(extractor, docs, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for extracted_data, _ in docs:
+            extractor(extracted_data)
+        elapsed = (time.perf_counter() - start) / len(docs) * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ekstraksi field berbasis layout')
+    parser.add_argument('--docs', type=int, default=300)
+    parser.add_argument('--shuffle', type=float, default=1.0, help='Proporsi block yang diacak (0-1)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='Output JSON (machine-readable)')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    docs = [synthetic_ktp_blocks(rng, args.shuffle) for _ in range(args.docs)]
+    layout_only = lambda data: extract_ktp_fields_layout(data, fallback=False)
+
+    # Skala: gabungkan k dokumen menjadi satu (block digeser ke bawah) untuk melihat
+    # pertumbuhan waktu terhadap jumlah block
+    scaling = []
+    for k in (1, 4, 16, 64):
+        blocks = []
+        for i, (extracted_data, _) in enumerate(docs[:k]):
+            offset = i * 600
+            blocks.extend(
+                {**b, 'bbox': [[x, y + offset] for x, y in b['bbox']]}
+                for b in extracted_data['text_blocks']
+            )
+        combined = [({'text_blocks': blocks, 'full_text': [b['text'] for b in blocks]}, None)]
+        scaling.append({'blocks': len(blocks), 'layout_us': time_per_doc_us(layout_only, combined)})
+
+    result = {
+        'documents': len(docs),
+        'shuffle': args.shuffle,
+        'accuracy': {
+            'text': accuracy(extract_ktp_fields, docs),
+            'layout': accuracy(extract_ktp_fields_layout, docs),
+        },
+        'us_per_doc': {
+            'text': time_per_doc_us(extract_ktp_fields, docs),
+            'layout': time_per_doc_us(extract_ktp_fields_layout, docs),
+        },
+        'scaling': scaling,
+    }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{'field':<20}{'text':>8}{'layout':>8}")
+    for name in FIELD_NAMES:
+        print(f"{name:<20}{result['accuracy']['text'][name]:>8.2f}{result['accuracy']['layout'][name]:>8.2f}")
+    print(f"\nus/doc: text={result['us_per_doc']['text']:.1f} layout={result['us_per_doc']['layout']:.1f}")
+    for s in scaling:
+        print(f"{s['blocks']:>6} blocks: {s['layout_us']:.0f} us")
+
+
+if __name__ == '__main__':
+    main()
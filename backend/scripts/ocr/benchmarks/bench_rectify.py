@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark: rektifikasi kartu (ktp_rectify) pada crop sintetis yang miring
+
+Kartu sintetis di-warp dengan perspektif acak ke atas background bertekstur
+(meniru crop bbox dari KTPDetector). Dilaporkan error sudut terhadap ground
+truth, waktu rektifikasi per ukuran crop, dan jumlah pixel yang masuk OCR
+dibandingkan resize max_image_size biasa.
+
+Usage:
+    python benchmarks/bench_rectify.py
+    python benchmarks/bench_rectify.py --samples 100 --json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ktp_rectify import CANONICAL_SIZE, find_card_corners, rectify_card
+
+# Ukuran crop (width, height) dari foto HP dengan KTP mengisi sebagian besar frame
+CROP_SIZES = [(640, 480), (1400, 1000), (2800, 2000)]
+
+
+def synthetic_card(rng):
+    """Kartu kanonik sintetis: background terang dengan baris teks gelap"""
+    width, height = CANONICAL_SIZE
+    card = np.full((height, width, 3), (205, 190, 170), np.uint8)
+    card += rng.integers(0, 20, size=card.shape, dtype=np.uint8)
+    for i in range(12):
+        cv2.putText(card, f'NIK : 3273 1726 0277 00{i:02d}', (40, 120 + i * 40),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, (30, 30, 30), 2)
+    cv2.rectangle(card, (720, 150), (950, 450), (120, 110, 100), -1)
+    return card
+
+
+def synthetic_crop(rng, size, max_skew=0.08):
+    """
+    Crop bbox sintetis berisi kartu miring
+
+    Returns:
+        Tuple (crop BGR, sudut ground truth (4, 2) terurut)
+    """
+    crop_w, crop_h = size
+    card = synthetic_card(rng)
+    background = rng.integers(30, 90, size=(crop_h // 8, crop_w // 8, 3), dtype=np.uint8)
+    crop = cv2.resize(background, (crop_w, crop_h), interpolation=cv2.INTER_CUBIC)
+
+    # Kartu mengisi 75-90% lebar crop, dengan jitter perspektif per sudut
+    card_w = crop_w * rng.uniform(0.75, 0.9)
+    card_h = card_w * CANONICAL_SIZE[1] / CANONICAL_SIZE[0]
+    x0 = (crop_w - card_w) / 2
+    y0 = (crop_h - card_h) / 2
+    corners = np.array([[x0, y0], [x0 + card_w, y0], [x0 + card_w, y0 + card_h], [x0, y0 + card_h]])
+    corners += rng.uniform(-max_skew, max_skew, size=(4, 2)) * [card_w, card_h]
+    corners = corners.astype(np.float32)
+
+    source = np.array([[0, 0], [CANONICAL_SIZE[0], 0], CANONICAL_SIZE, [0, CANONICAL_SIZE[1]]], dtype=np.float32)
+    matrix = cv2.getPerspectiveTransform(source, corners)
+    warped = cv2.warpPerspective(card, matrix, (crop_w, crop_h))
+    mask = cv2.warpPerspective(np.full(card.shape[:2], 255, np.uint8), matrix, (crop_w, crop_h))
+    crop[mask > 0] = warped[mask > 0]
+    return crop, corners
+
+
+def time_ms(fn, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark rektifikasi kartu KTP')
+    parser.add_argument('--samples', type=int, default=30, help='Jumlah crop sintetis per ukuran')
+    parser.add_argument('--max-image-size', type=int, default=1200,
+                        help='max_image_size pembanding (resize tanpa rektifikasi)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='Output JSON (machine-readable)')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    results = []
+    for size in CROP_SIZES:
+        errors = []
+        found = 0
+        times = []
+        pixels = []
+        scale = min(1.0, args.max_image_size / max(size))
+        for _ in range(args.samples):
+            crop, truth = synthetic_crop(rng, size)
+            corners = find_card_corners(crop)
+            if corners is not None:
+                found += 1
+                # Error relatif terhadap lebar crop supaya bisa dibandingkan antar ukuran
+                errors.append(float(np.linalg.norm(corners - truth, axis=1).max()) / size[0])
+            gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+            times.append(time_ms(lambda: rectify_card(gray)))
+            warped, _ = rectify_card(gray, corners=corners)
+            # Tanpa sudut: KTPOCR kembali ke resize max_image_size
+            pixels.append(warped.shape[0] * warped.shape[1] if warped is not None
+                          else int(size[0] * scale) * int(size[1] * scale))
+
+        results.append({
+            'crop_size': list(size),
+            'found_ratio': found / args.samples,
+            'max_corner_error_pct_median': statistics.median(errors) * 100 if errors else None,
+            'rectify_ms_median': statistics.median(times),
+            'ocr_pixels_resize': int(size[0] * scale) * int(size[1] * scale),
+            'ocr_pixels_rectified': int(statistics.median(pixels)),
+        })
+
+    if args.json:
+        print(json.dumps({'canonical_size': list(CANONICAL_SIZE), 'results': results}, indent=2))
+        return
+
+    print(f"{'crop':>12}{'found':>8}{'err %':>8}{'ms':>8}{'px resize':>12}{'px rectified':>14}")
+    for r in results:
+        err = f"{r['max_corner_error_pct_median']:.2f}" if r['max_corner_error_pct_median'] is not None else '-'
+        print(f"{r['crop_size'][0]:>6}x{r['crop_size'][1]:<5}{r['found_ratio']:>8.2f}{err:>8}"
+              f"{r['rectify_ms_median']:>8.2f}{r['ocr_pixels_resize']:>12}{r['ocr_pixels_rectified']:>14}")
+
+
+if __name__ == '__main__':
+    main()
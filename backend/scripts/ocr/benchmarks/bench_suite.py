@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite end-to-end dengan dataset KTP sintetis (lihat ktp_dataset.py)
+
+Benchmark yang tersedia (--bench):
+- detect:  KTPDetector.detect_and_crop pada foto (butuh --detector-model);
+           akurasi = deteksi dengan IoU >= MIN_IOU terhadap bbox kartu sebenarnya
+- ocr:     KTPOCR.extract_text pada crop kartu
+- fields:  extract_ktp_fields pada hasil OCR (OCR dijalankan sekali di luar timing)
+- daemon:  round trip socket ke ocr_daemon.py (crop), dan ke ktp_pipeline_daemon.py
+           (foto) jika --detector-model diberikan
+
+Setiap benchmark in-process jalan di subprocess terpisah supaya model dan
+puncak RSS tidak saling mempengaruhi; untuk daemon, puncak RSS dibaca dari
+VmHWM proses daemon. Dilaporkan per benchmark: jumlah sampel, throughput,
+latensi p50/p95/p99, puncak RSS dan akurasi per field terhadap ground truth.
+
+Knob yang bisa dibandingkan antar run: --ocr-mode, --rectify, --field-extractor,
+--max-image-size (hanya benchmark in-process; daemon memakai 1200) dan
+--batch-size (daemon). Simpan output --json dengan --label
+berbeda untuk membandingkan konfigurasi.
+
+Usage:
+    python benchmarks/bench_suite.py --samples 30
+    python benchmarks/bench_suite.py --bench ocr daemon --max-image-size 800 --json --label mis800
+    python benchmarks/bench_suite.py --bench detect daemon --detector-model models/best.onnx
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPT_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from ktp_dataset import TRUTH_FIELDS, field_matches, make_dataset
+
+BENCHES = ('detect', 'ocr', 'fields', 'daemon')
+
+# Deteksi dianggap benar jika IoU dengan bbox kartu sebenarnya >= MIN_IOU
+MIN_IOU = 0.7
+
+# Waktu maksimum menunggu daemon benchmark siap
+DAEMON_STARTUP_TIMEOUT = 180
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize(samples_ms, wall_s):
+    """Throughput dan persentil latensi dari daftar durasi (ms)"""
+    if not samples_ms:
+        return {'n': 0}
+    ordered = sorted(samples_ms)
+    return {
+        'n': len(ordered),
+        'throughput_per_s': len(ordered) / wall_s if wall_s > 0 else None,
+        'mean_ms': sum(ordered) / len(ordered),
+        'p50_ms': percentile(ordered, 0.50),
+        'p95_ms': percentile(ordered, 0.95),
+        'p99_ms': percentile(ordered, 0.99),
+    }
+
+
+def accuracy(matches):
+    """Persentase benar per field dari list dict field -> bool"""
+    if not matches:
+        return None
+    result = {field: sum(m[field] for m in matches) / len(matches) for field in TRUTH_FIELDS}
+    result['all_fields'] = sum(all(m.values()) for m in matches) / len(matches)
+    return result
+
+
+def from_api_data(data):
+    """Field response daemon ('data') ke nama field extract_ktp_fields"""
+    data = data or {}
+    return {
+        'nik': data.get('identityNumber'),
+        'nama': data.get('name'),
+        'jenis_kelamin': data.get('gender'),
+        'alamat': data.get('alamat'),
+    }
+
+
+def iou(a, b):
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x1 - x0) * max(0, y1 - y0)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def peak_rss_mb():
+    # ru_maxrss dalam KB di Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1000
+
+
+def make_ocr(args):
+    from ktp_ocr import KTPOCR
+    return KTPOCR(
+        lang='id', max_image_size=args.max_image_size, field_extractor=args.field_extractor,
+        ocr_mode=args.ocr_mode, rectify=args.rectify,
+    )
+
+
+def bench_detect(args, dataset):
+    from ktp_detect import KTPDetector
+    detector = KTPDetector(args.detector_model)
+    detector.detect_and_crop(dataset[0]['photo'], crop_format='numpy')
+
+    samples = []
+    ious = []
+    start = time.perf_counter()
+    for sample in dataset:
+        t0 = time.perf_counter()
+        result = detector.detect_and_crop(sample['photo'], crop_format='numpy')
+        samples.append((time.perf_counter() - t0) * 1000)
+        ious.append(iou(result['bbox'], sample['card_bbox']) if result.get('success') else 0.0)
+    wall = time.perf_counter() - start
+
+    return dict(
+        summarize(samples, wall),
+        model_type=detector.model_type,
+        accuracy={
+            'detected': sum(v >= MIN_IOU for v in ious) / len(ious),
+            'mean_iou': sum(ious) / len(ious),
+        },
+    )
+
+
+def bench_ocr(args, dataset):
+    ocr = make_ocr(args)
+    ocr.extract_text(dataset[0]['crop'])
+
+    samples = []
+    matches = []
+    start = time.perf_counter()
+    for sample in dataset:
+        t0 = time.perf_counter()
+        extracted = ocr.extract_text(sample['crop'])
+        samples.append((time.perf_counter() - t0) * 1000)
+        matches.append(field_matches(ocr.extract_ktp_fields(extracted), sample['truth']))
+    wall = time.perf_counter() - start
+
+    return dict(summarize(samples, wall), accuracy=accuracy(matches))
+
+
+def bench_fields(args, dataset):
+    from ktp_fields import API_FIELDS
+    ocr = make_ocr(args)
+    extracted = [ocr.extract_text(sample['crop']) for sample in dataset]
+
+    samples = []
+    matches = []
+    rounds = max(1, args.field_rounds)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for data, sample in zip(extracted, dataset):
+            t0 = time.perf_counter()
+            fields = ocr.extract_ktp_fields(data, fields=API_FIELDS)
+            samples.append((time.perf_counter() - t0) * 1000)
+            if len(matches) < len(dataset):
+                matches.append(field_matches(fields, sample['truth']))
+    wall = time.perf_counter() - start
+
+    return dict(summarize(samples, wall), accuracy=accuracy(matches))
+
+
+def run_worker(args):
+    """Dijalankan di subprocess: satu benchmark in-process, print JSON ke stdout"""
+    os.environ['SUPPRESS_OCR_LOGS'] = '1'
+    dataset = make_dataset(args.samples, seed=args.seed)
+    bench = {'detect': bench_detect, 'ocr': bench_ocr, 'fields': bench_fields}[args.worker]
+    result = bench(args, dataset)
+    result['peak_rss_mb'] = peak_rss_mb()
+    print(json.dumps(result))
+
+
+def daemon_peak_rss_mb(pid):
+    """Puncak RSS proses daemon (VmHWM di /proc), None jika tidak tersedia"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1000
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def start_daemon(script, workdir, args, extra=()):
+    """Spawn daemon dengan socket privat; return (Popen, socket path) setelah ready file ada"""
+    socket_path = os.path.join(workdir, f'{Path(script).stem}.sock')
+    ready_file = os.path.join(workdir, f'{Path(script).stem}.ready')
+    cmd = [
+        sys.executable, str(SCRIPT_DIR / script),
+        os.path.join(workdir, 'requests'), os.path.join(workdir, 'responses'), *extra,
+        '--socket', socket_path, '--ready-file', ready_file,
+        # Cache dimatikan: yang diukur inference, bukan cache hit
+        '--cache-size-mb', '0',
+        '--batch-size', str(args.batch_size),
+        '--field-extractor', args.field_extractor,
+        '--ocr-mode', args.ocr_mode,
+    ]
+    if args.rectify:
+        cmd.append('--rectify')
+    proc = subprocess.Popen(cmd, env=dict(os.environ, SUPPRESS_OCR_LOGS='1'), cwd=str(SCRIPT_DIR),
+                            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    deadline = time.monotonic() + DAEMON_STARTUP_TIMEOUT
+    while not os.path.exists(ready_file):
+        if proc.poll() is not None:
+            raise RuntimeError(f'{script} exited: {proc.stderr.read().decode(errors="replace").strip()[-300:]}')
+        if time.monotonic() > deadline:
+            proc.kill()
+            raise TimeoutError(f'{script} not ready after {DAEMON_STARTUP_TIMEOUT}s')
+        time.sleep(0.1)
+    return proc, socket_path
+
+
+def stop_daemon(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def bench_daemon_round_trip(script, dataset, args, image_key, extra=()):
+    """Round trip socket ke satu daemon untuk setiap sampel dataset"""
+    from daemon_socket import SocketClient
+
+    workdir = tempfile.mkdtemp(prefix='bench_suite_')
+    proc, socket_path = start_daemon(script, workdir, args, extra)
+    try:
+        samples = []
+        matches = []
+        with SocketClient(socket_path=socket_path) as client:
+            start = time.perf_counter()
+            for sample in dataset:
+                t0 = time.perf_counter()
+                response = client.request(sample[image_key])
+                samples.append((time.perf_counter() - t0) * 1000)
+                if image_key == 'photo':
+                    cards = response.get('cards') or [{}]
+                    data = cards[0].get('data')
+                else:
+                    data = response.get('data')
+                matches.append(field_matches(from_api_data(data), sample['truth']))
+            wall = time.perf_counter() - start
+        return dict(
+            summarize(samples, wall),
+            accuracy=accuracy(matches),
+            peak_rss_mb=daemon_peak_rss_mb(proc.pid),
+        )
+    finally:
+        stop_daemon(proc)
+
+
+def run_in_worker(name, args):
+    cmd = [sys.executable, __file__, '--worker', name,
+           '--samples', str(args.samples), '--seed', str(args.seed),
+           '--max-image-size', str(args.max_image_size), '--ocr-mode', args.ocr_mode,
+           '--field-extractor', args.field_extractor, '--field-rounds', str(args.field_rounds)]
+    if args.rectify:
+        cmd.append('--rectify')
+    if args.detector_model:
+        cmd += ['--detector-model', args.detector_model]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {'error': (proc.stderr.strip().splitlines() or ['failed'])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def print_table(report):
+    print(f"dataset: {report['samples']} sampel, seed {report['seed']}"
+          + (f", label {report['label']}" if report['label'] else ''))
+    header = f"{'benchmark':<18}{'n':>5}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'peak MB':>9}  accuracy"
+    print(header)
+    for name, r in report['results'].items():
+        if 'error' in r:
+            print(f"{name:<18} error: {r['error']}")
+            continue
+        if not r.get('n'):
+            print(f"{name:<18} no samples")
+            continue
+        peak = f"{r['peak_rss_mb']:.0f}" if r.get('peak_rss_mb') is not None else '-'
+        acc = ' '.join(f"{k}={v:.0%}" if isinstance(v, float) and k != 'mean_iou' else f"{k}={v:.2f}"
+                       for k, v in (r.get('accuracy') or {}).items())
+        print(f"{name:<18}{r['n']:>5}{r['throughput_per_s']:>8.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+              f"{r['p99_ms']:>9.1f}{peak:>9}  {acc}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark suite KTP (dataset sintetis dengan ground truth)')
+    parser.add_argument('--bench', nargs='+', choices=BENCHES, default=list(BENCHES),
+                        help='Benchmark yang dijalankan (default: semua)')
+    parser.add_argument('--samples', type=int, default=20, help='Jumlah sampel dataset')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--detector-model', help='Model deteksi (.pt / .onnx) untuk detect dan pipeline daemon')
+    parser.add_argument('--max-image-size', type=int, default=1200)
+    parser.add_argument('--ocr-mode', choices=['full', 'roi'], default='full')
+    parser.add_argument('--field-extractor', choices=['text', 'layout'], default='text')
+    parser.add_argument('--rectify', action='store_true')
+    parser.add_argument('--batch-size', type=int, default=1, help='--batch-size daemon')
+    parser.add_argument('--field-rounds', type=int, default=20,
+                        help='Pengulangan dataset untuk benchmark fields (ekstraksi field sangat cepat)')
+    parser.add_argument('--label', help='Label konfigurasi di output (untuk membandingkan run)')
+    parser.add_argument('--json', action='store_true', help='Output JSON (machine-readable)')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    results = {}
+    for name in args.bench:
+        if name == 'detect':
+            if not args.detector_model:
+                results[name] = {'error': 'requires --detector-model'}
+                continue
+            results[name] = run_in_worker(name, args)
+        elif name in ('ocr', 'fields'):
+            results[name] = run_in_worker(name, args)
+        else:
+            dataset = make_dataset(args.samples, seed=args.seed)
+            try:
+                results['daemon_ocr'] = bench_daemon_round_trip('ocr_daemon.py', dataset, args, 'crop')
+            except (RuntimeError, TimeoutError, OSError) as e:
+                results['daemon_ocr'] = {'error': str(e)}
+            if args.detector_model:
+                try:
+                    results['daemon_pipeline'] = bench_daemon_round_trip(
+                        'ktp_pipeline_daemon.py', dataset, args, 'photo', extra=[args.detector_model])
+                except (RuntimeError, TimeoutError, OSError) as e:
+                    results['daemon_pipeline'] = {'error': str(e)}
+
+    report = {
+        'label': args.label,
+        'samples': args.samples,
+        'seed': args.seed,
+        'config': {
+            'max_image_size': args.max_image_size,
+            'ocr_mode': args.ocr_mode,
+            'field_extractor': args.field_extractor,
+            'rectify': args.rectify,
+            'batch_size': args.batch_size,
+            'detector_model': args.detector_model,
+        },
+        'results': results,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print_table(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Dataset KTP sintetis dengan ground truth untuk benchmark
+
+Setiap sampel adalah kartu KTP sintetis (ktp_synthetic.synthetic_ktp) dengan
+field acak yang diketahui, dirender sebagai:
+- photo: kartu di atas background ukuran foto HP (input detector / pipeline)
+- crop:  kartu saja (input OCR daemon, seperti output detector)
+
+dengan variasi resolusi, rotasi dan kualitas JPEG. Dataset deterministik
+dari seed, jadi dua run benchmark bisa dibandingkan langsung.
+
+Usage:
+    python benchmarks/ktp_dataset.py -o /tmp/ktp_synthetic --samples 50
+"""
+
+import json
+import math
+import random
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ktp_synthetic import synthetic_ktp
+
+# Lebar foto (px) untuk variasi resolusi; tinggi = 3/4 lebar
+RESOLUTIONS = (1280, 2560, 4000)
+# Rotasi foto / crop (derajat)
+ROTATIONS = (0, -3, 3, 8)
+# Kualitas JPEG
+JPEG_QUALITIES = (95, 75, 50)
+
+# Field yang dinilai akurasinya (sama dengan field response API)
+TRUTH_FIELDS = ('nik', 'nama', 'jenis_kelamin', 'alamat')
+
+FIRST_NAMES = ['BUDI', 'SITI', 'AGUS', 'DEWI', 'RINA', 'ANDI', 'YULIA', 'HENDRA', 'PUTRI', 'EKO']
+LAST_NAMES = ['SANTOSO', 'RAHAYU', 'PRATAMA', 'WIJAYA', 'LESTARI', 'HIDAYAT', 'KUSUMA', 'SAPUTRA']
+STREETS = ['JL. MERDEKA', 'JL. SUDIRMAN', 'JL KECAPI V', 'KP CIBOGO', 'PERUM GRIYA ASRI BLOK C', 'JL. ASIA AFRIKA']
+CITIES = ['BANDUNG', 'JAKARTA', 'SURABAYA', 'BEKASI', 'DEPOK']
+
+
+def random_fields(rng):
+    """
+    Field KTP acak (fiktif)
+
+    Returns:
+        Tuple (data untuk synthetic_ktp, ground truth dalam format output extract_ktp_fields)
+    """
+    female = rng.random() < 0.5
+    nik = f"32{rng.randint(0, 9999):04d}{rng.randint(1, 28) + (40 if female else 0):02d}" \
+          f"{rng.randint(1, 12):02d}{rng.randint(50, 99):02d}{rng.randint(1, 9999):04d}"
+    nama = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    alamat = f"{rng.choice(STREETS)} NO. {rng.randint(1, 99)}"
+    city = rng.choice(CITIES)
+    data = {
+        'kota': f'KOTA {city}',
+        'nik': nik,
+        'nama': nama,
+        'tempat_tanggal_lahir': f'{city}, {rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-{rng.randint(1950, 2005)}',
+        'jenis_kelamin': 'PEREMPUAN' if female else 'LAKI-LAKI',
+        'alamat': alamat,
+        'rt_rw': f'{rng.randint(1, 20):03d}/{rng.randint(1, 15):03d}',
+    }
+    truth = {
+        'nik': nik,
+        'nama': nama,
+        'jenis_kelamin': 'Perempuan' if female else 'Laki-laki',
+        'alamat': alamat,
+    }
+    return data, truth
+
+
+def rotate(img, angle):
+    """
+    Rotasi gambar di sekitar titik tengah (ukuran kanvas diperbesar, border replicate)
+
+    Returns:
+        Tuple (gambar, matrix affine 2x3)
+    """
+    if not angle:
+        return img, np.array([[1, 0, 0], [0, 1, 0]], dtype=np.float64)
+    height, width = img.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+    new_w = int(math.ceil(height * sin + width * cos))
+    new_h = int(math.ceil(height * cos + width * sin))
+    matrix[0, 2] += new_w / 2 - width / 2
+    matrix[1, 2] += new_h / 2 - height / 2
+    rotated = cv2.warpAffine(img, matrix, (new_w, new_h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    return rotated, matrix
+
+
+def encode_jpeg(img, quality):
+    ok, encoded = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError('Failed to encode synthetic JPEG')
+    return encoded.tobytes()
+
+
+def make_sample(index, seed=0, width=None, angle=None, quality=None):
+    """
+    Satu sampel dataset
+
+    Args:
+        index: Nomor sampel (bersama seed menentukan isi sampel)
+        width, angle, quality: Variasi; None = dipilih dari RESOLUTIONS / ROTATIONS / JPEG_QUALITIES
+
+    Returns:
+        Dictionary dengan name, params, truth, card_bbox (bbox kartu di photo),
+        photo (JPEG bytes) dan crop (JPEG bytes)
+    """
+    rng = random.Random(seed * 1000003 + index)
+    width = width or rng.choice(RESOLUTIONS)
+    angle = rng.choice(ROTATIONS) if angle is None else angle
+    quality = quality or rng.choice(JPEG_QUALITIES)
+    height = width * 3 // 4
+
+    data, truth = random_fields(rng)
+    card = synthetic_ktp(data=data, seed=index)
+
+    # Foto: kartu 60-80% lebar frame, posisi sedikit acak
+    background = np.random.default_rng(index).integers(40, 110, size=(height // 8, width // 8, 3), dtype=np.uint8)
+    photo = cv2.resize(background, (width, height), interpolation=cv2.INTER_CUBIC)
+    card_w = int(width * rng.uniform(0.6, 0.8))
+    card_h = card_w * card.shape[0] // card.shape[1]
+    x0 = (width - card_w) // 2 + rng.randint(-width // 20, width // 20)
+    y0 = (height - card_h) // 2 + rng.randint(-height // 20, height // 20)
+    interpolation = cv2.INTER_AREA if card_w < card.shape[1] else cv2.INTER_CUBIC
+    scaled = cv2.resize(card, (card_w, card_h), interpolation=interpolation)
+    photo[y0:y0 + card_h, x0:x0 + card_w] = scaled
+
+    # Rotasi foto (tetap ukuran frame) dan bbox kartu setelah rotasi
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    photo = cv2.warpAffine(photo, matrix, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT)
+    corners = np.array([[x0, y0, 1], [x0 + card_w, y0, 1], [x0 + card_w, y0 + card_h, 1], [x0, y0 + card_h, 1]],
+                       dtype=np.float64) @ matrix.T
+    card_bbox = [
+        max(0, int(corners[:, 0].min())), max(0, int(corners[:, 1].min())),
+        min(width, int(corners[:, 0].max())), min(height, int(corners[:, 1].max())),
+    ]
+
+    # Crop: kartu dengan resolusi yang sama seperti di foto, ikut dirotasi
+    crop, _ = rotate(scaled, angle)
+
+    return {
+        'name': f'ktp_{index:04d}_{width}px_{angle:+d}deg_q{quality}',
+        'params': {'width': width, 'angle': angle, 'quality': quality},
+        'truth': truth,
+        'card_bbox': card_bbox,
+        'photo': encode_jpeg(photo, quality),
+        'crop': encode_jpeg(crop, quality),
+    }
+
+
+def make_dataset(samples, seed=0, **variation):
+    """List sampel (lihat make_sample)"""
+    return [make_sample(i, seed=seed, **variation) for i in range(samples)]
+
+
+def normalize_value(value):
+    """Normalisasi untuk perbandingan dengan ground truth (spasi dan huruf besar)"""
+    if value is None:
+        return None
+    return ' '.join(str(value).upper().split())
+
+
+def field_matches(fields, truth):
+    """
+    Bandingkan field hasil ekstraksi dengan ground truth
+
+    Args:
+        fields: Dictionary field (nik, nama, jenis_kelamin, alamat)
+        truth: Ground truth dari make_sample
+
+    Returns:
+        Dictionary field -> bool
+    """
+    return {field: normalize_value(fields.get(field)) == normalize_value(truth[field]) for field in TRUTH_FIELDS}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Simpan dataset KTP sintetis (foto, crop, ground truth)')
+    parser.add_argument('--output', '-o', required=True, help='Folder output')
+    parser.add_argument('--samples', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    (output / 'photos').mkdir(parents=True, exist_ok=True)
+    (output / 'crops').mkdir(parents=True, exist_ok=True)
+    with open(output / 'truth.jsonl', 'w', encoding='utf-8') as f:
+        for sample in make_dataset(args.samples, seed=args.seed):
+            (output / 'photos' / f"{sample['name']}.jpg").write_bytes(sample['photo'])
+            (output / 'crops' / f"{sample['name']}.jpg").write_bytes(sample['crop'])
+            f.write(json.dumps({k: sample[k] for k in ('name', 'params', 'truth', 'card_bbox')}) + '\n')
+    print(f"{args.samples} sampel disimpan ke: {output}")
+
+
+if __name__ == '__main__':
+    main()
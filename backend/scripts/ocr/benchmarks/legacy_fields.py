@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Implementasi lama KTPOCR.extract_ktp_fields (sebelum ktp_fields.py)
+
+Disimpan apa adanya sebagai referensi untuk cek kesetaraan output dan
+pembanding di bench_fields.py. Jangan dipakai di jalur produksi.
+"""
+
+import re
+
+
+def extract_ktp_fields_legacy(extracted_data):
+    """
+    Ekstrak field spesifik dari hasil OCR KTP
+
+    Args:
+        extracted_data: Dictionary hasil dari extract_text()
+
+    Returns:
+        Dictionary dengan field: nik, nama, jenis_kelamin, alamat, dll
+    """
+    fields = {
+        'nik': None,
+        'nama': None,
+        'jenis_kelamin': None,
+        'alamat': None,
+        'rt_rw': None,
+        'kelurahan': None,
+        'kecamatan': None,
+        'tempat_tgl_lahir': None,
+        'agama': None,
+        'status_perkawinan': None,
+        'pekerjaan': None,
+        'kewarganegaraan': None,
+    }
+
+    # Gabungkan semua teks untuk pencarian
+    # Gunakan newline untuk mempertahankan struktur baris (penting untuk pattern matching)
+    all_text = '\n'.join(extracted_data['full_text'])
+    text_lines = extracted_data['full_text']
+
+    # 1. NIK - biasanya 16 digit angka, bisa ada spasi atau strip
+    nik_patterns = [
+        r'NIK[:\s]*(\d{16})',  # NIK: 1234567890123456
+        r'NIK[:\s]*(\d{4}\s?\d{4}\s?\d{4}\s?\d{4})',  # NIK dengan spasi
+        r'(\d{16})',  # Hanya 16 digit (ambil yang pertama)
+    ]
+    nik_found = None
+    for pattern in nik_patterns:
+        match = re.search(pattern, all_text, re.IGNORECASE)
+        if match and match.lastindex and match.lastindex >= 1:
+            nik = re.sub(r'\s+', '', match.group(1))  # Hapus spasi
+            if len(nik) == 16 and nik.isdigit():
+                fields['nik'] = nik
+                nik_found = match  # Simpan match untuk digunakan di pattern nama
+                break
+
+    # 2. Nama - bisa setelah NIK atau setelah label "Nama"
+    # Pattern 1: Setelah NIK (16 digit), biasanya nama langsung mengikuti di baris berikutnya
+    # Format: 3273172602770010\nYAN SEN NICO\nToiLahir
+    if nik_found:
+        nik_match = nik_found
+    else:
+        nik_match = re.search(r'(\d{16})', all_text)
+
+    if nik_match:
+        # Cari teks setelah NIK yang kemungkinan nama
+        nik_end = nik_match.end()
+        after_nik = all_text[nik_end:]
+
+        # Cari baris setelah NIK yang berisi huruf besar (nama biasanya huruf besar semua)
+        # Pattern: \n diikuti : (optional) lalu huruf besar, stop di \nat/Tgl atau label lain
+        # Format bisa: \n:DEBBY ANGGRAINI\n atau \nYAN SEN NICO\n
+        nama_after_nik = re.search(
+            r'\n:?\s*([A-Z][A-Z\s]{2,50}?)(?:\nat/Tgl|\nToiLahir|\nTempat|\nLahir|\nKelamin|\nJenis|\nGol|\nGol\s+Darah|\nAlamat|\nRT|\nRW|\nARW|\nKel|\nKec|\nVDesa|\ncamatan|\nAgama|\nStatus|\nPekerjaan|\nKewarganegaraan|\nPROVINSI|\nKOTA|\nnegaraan|$)',
+            after_nik,
+            re.MULTILINE
+        )
+        if nama_after_nik and nama_after_nik.lastindex and nama_after_nik.lastindex >= 1:
+            nama = nama_after_nik.group(1).strip()
+            nama = re.sub(r'\s+', ' ', nama)
+            # Pastikan bukan angka, bukan label, dan cukup panjang
+            excluded_words = ['nik', 'nama', 'tempat', 'lahir', 'toilahir', 'bandung', 'kota', 'kota bandung', 'provinsi', 'jakarta', 'jakarta selatan', 'dki jakarta']
+            if (len(nama) > 2 and 
+                not nama.replace(' ', '').isdigit() and 
+                not nama.lower() in excluded_words and
+                not re.match(r'^\d+', nama) and
+                len(nama.split()) <= 6 and  # Max 6 kata untuk nama
+                len(nama) >= 3):  # Min 3 karakter
+                fields['nama'] = nama
+
+    # Pattern 2: Setelah label "Nama" atau "Nama Lengkap"
+    if not fields['nama']:
+        nama_patterns = [
+            r'Nama\s+(?:Lengkap)?[:\s]*([A-Z][A-Z\s]+?)(?:\n|Tempat|Jenis|Alamat|RT|Kel|Kec|Agama|Status|Pekerjaan|Kewarganegaraan|PROVINSI|KOTA|NIK)',
+            r'Nama[:\s]*([A-Z][A-Z\s]{3,50})',
+        ]
+        for pattern in nama_patterns:
+            match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
+            if match and match.lastindex and match.lastindex >= 1:
+                nama = match.group(1).strip()
+                # Bersihkan nama dari karakter aneh
+                nama = re.sub(r'\s+', ' ', nama)
+                if len(nama) > 3 and not nama.isdigit():
+                    fields['nama'] = nama
+                    break
+
+    # 3. Jenis Kelamin
+    # Pattern lebih fleksibel untuk menangani variasi OCR seperti "LAK-LAKI", "LAKI-LAKI", "Laki-laki", dll
+    jenis_kelamin_patterns = [
+        r'Jenis\s+kelamin[:\s]*([A-Za-z/]+)',
+        # Pattern untuk menangkap "LAK-LAKI" (prioritas tinggi karena sering terjadi di OCR)
+        r'(LAK\s*[-]?\s*LAKI)',
+        # Pattern untuk "LAKI-LAKI" atau "Laki-laki"
+        r'(LAKI\s*[-]?\s*LAKI|Laki\s*[-\s]?laki)',
+        # Pattern untuk "Perempuan"
+        r'(Perempuan)',
+    ]
+    for pattern in jenis_kelamin_patterns:
+        match = re.search(pattern, all_text, re.IGNORECASE)
+        if match:
+            # Check if group 1 exists, otherwise use group 0
+            if match.lastindex and match.lastindex >= 1:
+                jk_text = match.group(1)
+            else:
+                jk_text = match.group(0)
+
+            # Normalize text untuk matching (remove spaces and hyphens)
+            jk_lower = jk_text.lower().replace('-', '').replace(' ', '')
+
+            # Check untuk laki-laki (menangani variasi: laklaki, lak-laki, laki-laki, dll)
+            if 'lak' in jk_lower:
+                # Jika mengandung "lak" dan panjang <= 8 karakter (untuk "laklaki" = 7 chars)
+                # atau mengandung "laki" (untuk "laki-laki")
+                if 'laki' in jk_lower or len(jk_lower) <= 8:
+                    fields['jenis_kelamin'] = 'Laki-laki'
+                else:
+                    fields['jenis_kelamin'] = 'Laki-laki'  # Default to Laki-laki if contains "lak"
+            elif 'perempuan' in jk_lower or 'female' in jk_lower:
+                fields['jenis_kelamin'] = 'Perempuan'
+            elif 'laki' in jk_text.lower() or 'male' in jk_text.lower():
+                fields['jenis_kelamin'] = 'Laki-laki'
+            else:
+                # Jika tidak match, coba extract dari text asli
+                fields['jenis_kelamin'] = jk_text.strip()
+            break
+
+    # Fallback: cari langsung di text jika pattern tidak match
+    # Ini penting untuk kasus seperti "LAK-LAKI" yang mungkin tidak terdeteksi pattern di atas
+    if not fields['jenis_kelamin']:
+        # Cari kata "LAK" diikuti oleh "-" atau spasi lalu "LAKI" (untuk kasus "LAK-LAKI")
+        lak_match = re.search(r'LAK\s*[-]?\s*LAKI', all_text, re.IGNORECASE)
+        if lak_match:
+            fields['jenis_kelamin'] = 'Laki-laki'
+        # Cari "LAKI-LAKI" atau variasi lainnya
+        elif re.search(r'LAKI\s*[-]?\s*LAKI', all_text, re.IGNORECASE):
+            fields['jenis_kelamin'] = 'Laki-laki'
+        # Cari "PEREMPUAN"
+        elif re.search(r'PEREMPUAN', all_text, re.IGNORECASE):
+            fields['jenis_kelamin'] = 'Perempuan'
+
+    # 4. Alamat - bisa setelah label "Alamat" atau setelah "Gol Darah" atau sebelum RT/RW
+    # Pattern 1: Setelah label "Alamat"
+    alamat_patterns = [
+        r'Alamat[:\s]*([A-Z0-9\s/,-]+?)(?:\n|RT|RW|Kel|Kec|Agama|Status|Pekerjaan)',
+        r'Alamat[:\s]*([^\n]{10,100})',
+    ]
+    for pattern in alamat_patterns:
+        match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
+        if match and match.lastindex and match.lastindex >= 1:
+            alamat = match.group(1).strip()
+            alamat = re.sub(r'\s+', ' ', alamat)
+            if len(alamat) > 5:
+                fields['alamat'] = alamat
+                break
+
+    # Pattern 2: Setelah "Gol Darah" (biasanya alamat langsung setelah gol darah)
+    # Format bisa: Gol Darah\n: JL KECAPI V atau Gol Darah\nLINGGABUIANANO atau Gol Darah\nJELINGGA BUANANO.2
+    if not fields['alamat']:
+        gol_darah_patterns = [
+            r'Gol\.?\s*Darah[:\s]*[A-Z]*\n:?\s*(JL[.\s]*[A-Z][A-Z\s/,-]+?)(?:\n:?\s*\d|\n:?\s*RT|\n:?\s*RW|\n:?\s*Kel|\n:?\s*Kec)',
+            r'Gol\.?\s*Darah[:\s]*[A-Z]*\n([A-Z][A-Z0-9\s/,-]+?)(?:\n\d{2,3}|\n00|\nRT|\nRW|\nKel|\nKec)',
+            # Pattern lebih sederhana: ambil baris setelah Gol Darah sampai sebelum RT/RW
+            r'Gol\.?\s*Darah[:\s]*\n([^\n]+)',
+        ]
+        for pattern in gol_darah_patterns:
+            gol_darah_match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
+            if gol_darah_match and gol_darah_match.lastindex and gol_darah_match.lastindex >= 1:
+                alamat = gol_darah_match.group(1).strip()
+                # Hapus ":" di awal jika ada
+                alamat = re.sub(r'^:\s*', '', alamat)
+                alamat = re.sub(r'\s+', ' ', alamat)
+                # Pastikan bukan RT/RW pattern (tidak dimulai dengan angka 2-3 digit)
+                if len(alamat) > 5 and not re.match(r'^\d{2,3}', alamat):
+                    fields['alamat'] = alamat
+                    break
+
+    # Pattern 3: Sebelum RT/RW dengan format ":" atau tanpa ":" (baris yang mengandung alamat pattern sebelum RT/RW)
+    # Cari setelah jenis kelamin atau gol darah, sebelum RT/RW
+    if not fields['alamat']:
+        rt_patterns = [
+            r':\s*(JL[.\s]*[A-Z][A-Z\s/,-]+?)(?:\n:?\s*\d{2,3}|\n:?\s*RT|\n:?\s*RW)',
+            r':\s*([A-Z][A-Z\s/,-]{3,}?)(?:\n:?\s*\d{2,3}|\n:?\s*RT|\n:?\s*RW)',
+            # Pattern yang lebih spesifik: setelah LAKI-LAKI atau PEREMPUAN atau Gol Darah, sebelum RT/RW
+            r'(?:LAKI-LAKI|PEREMPUAN|Gol\.?\s*Darah)[:\s]*\n([A-Z][A-Z0-9\s/,-]{3,}?)(?:\n\d{2,3}|\n00|\nRT|\nRW)',
+        ]
+        excluded = ['GOL', 'DARAH', 'KATHOLIK', 'ISLAM', 'CERAIHIDUP', 'BELUM KAWIN', 'KARYAWAN', 'SWASTA', 'WNI', 'SEUMUR HIDUP', 'PEREMPUAN', 'LAKILAKI', 'JAKARTA', 'BANDUNG', 'KARYAWANSWASTA', 'PROVINSI', 'JAWA BARAT', 'KOTA BANDUNG']
+        for pattern in rt_patterns:
+            rt_match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
+            if rt_match and rt_match.lastindex and rt_match.lastindex >= 1:
+                alamat = rt_match.group(1).strip()
+                alamat = re.sub(r'\s+', ' ', alamat)
+                # Pastikan bukan label lain dan cukup panjang
+                if (len(alamat) > 5 and 
+                    not alamat.upper() in excluded and
+                    not re.match(r'^\d+', alamat) and
+                    len(alamat) < 50):  # Max 50 karakter untuk alamat
+                    fields['alamat'] = alamat
+                    break
+
+    # 5. RT/RW
+    rt_rw_patterns = [
+        r'RT[/\s]*RW[:\s]*(\d{2,3})[/\s](\d{2,3})',
+        r'RT[/\s]*RW[:\s]*(\d{2,3}\s+\d{2,3})',
+        r'RT[:\s]*(\d{2,3})[/\s]RW[:\s]*(\d{2,3})',
+    ]
+    for pattern in rt_rw_patterns:
+        match = re.search(pattern, all_text, re.IGNORECASE)
+        if match:
+            # Check number of groups
+            num_groups = len(match.groups())
+            if num_groups >= 2:
+                # Two separate groups
+                fields['rt_rw'] = f"{match.group(1)}/{match.group(2)}"
+            elif num_groups == 1:
+                # Single group with both numbers
+                rt_rw_text = match.group(1).replace(' ', '/')
+                fields['rt_rw'] = rt_rw_text
+            break
+
+    # 6. Kelurahan
+    kelurahan_patterns = [
+        r'Kel[/\s]Desa[:\s]*([A-Z\s]+?)(?:\n|Kecamatan|Kec)',
+        r'Kelurahan[:\s]*([A-Z\s]+?)(?:\n|Kecamatan|Kec)',
+    ]
+    for pattern in kelurahan_patterns:
+        match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
+        if match and match.lastindex and match.lastindex >= 1:
+            kelurahan = match.group(1).strip()
+            kelurahan = re.sub(r'\s+', ' ', kelurahan)
+            if len(kelurahan) > 2:
+                fields['kelurahan'] = kelurahan
+                break
+
+    # 7. Kecamatan
+    kecamatan_patterns = [
+        r'Kecamatan[:\s]*([A-Z\s]+?)(?:\n|Agama|Status|Pekerjaan|Kewarganegaraan)',
+    ]
+    for pattern in kecamatan_patterns:
+        match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
+        if match and match.lastindex and match.lastindex >= 1:
+            kecamatan = match.group(1).strip()
+            kecamatan = re.sub(r'\s+', ' ', kecamatan)
+            if len(kecamatan) > 2:
+                fields['kecamatan'] = kecamatan
+                break
+
+    # 8. Tempat/Tanggal Lahir
+    ttl_patterns = [
+        r'Tempat[/\s]Tgl\s+Lahir[:\s]*([A-Z\s]+?[/\s]\d{2}[-/\s]\d{2}[-/\s]\d{4})(?:\n|Jenis|Alamat)',
+        r'Tempat[/\s]Tgl\s+Lahir[:\s]*([A-Z\s]+?)(?:\n|Jenis|Alamat)',
+    ]
+    for pattern in ttl_patterns:
+        match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
+        if match and match.lastindex and match.lastindex >= 1:
+            ttl = match.group(1).strip()
+            ttl = re.sub(r'\s+', ' ', ttl)
+            if len(ttl) > 5:
+                fields['tempat_tgl_lahir'] = ttl
+                break
+
+    # 9. Agama
+    agama_patterns = [
+        r'Agama[:\s]*([A-Za-z\s]+?)(?:\n|Status|Pekerjaan|Kewarganegaraan)',
+    ]
+    for pattern in agama_patterns:
+        match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
+        if match and match.lastindex and match.lastindex >= 1:
+            agama = match.group(1).strip()
+            agama = re.sub(r'\s+', ' ', agama)
+            if len(agama) > 2:
+                fields['agama'] = agama
+                break
+
+    # 10. Status Perkawinan
+    status_patterns = [
+        r'Status\s+Perkawinan[:\s]*([A-Za-z/\s]+?)(?:\n|Pekerjaan|Kewarganegaraan|KOTA)',
+    ]
+    for pattern in status_patterns:
+        match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
+        if match and match.lastindex and match.lastindex >= 1:
+            status = match.group(1).strip()
+            # Hapus text tambahan seperti "KOTA ANDA"
+            status = re.sub(r'\s+KOTA\s+[A-Z\s]+$', '', status, flags=re.IGNORECASE)
+            status = re.sub(r'\s+', ' ', status)
+            if len(status) > 2 and len(status) < 50:
+                fields['status_perkawinan'] = status
+                break
+
+    # 11. Pekerjaan
+    pekerjaan_patterns = [
+        r'Pekerjaan[:\s]*([A-Za-z\s]+?)(?:\n|Kewarganegaraan|Berlaku)',
+    ]
+    for pattern in pekerjaan_patterns:
+        match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
+        if match and match.lastindex and match.lastindex >= 1:
+            pekerjaan = match.group(1).strip()
+            pekerjaan = re.sub(r'\s+', ' ', pekerjaan)
+            if len(pekerjaan) > 2:
+                fields['pekerjaan'] = pekerjaan
+                break
+
+    # 12. Kewarganegaraan
+    kewarganegaraan_patterns = [
+        r'Kewarganegaraan[:\s]*([A-Z\s]+?)(?:\n|Berlaku)',
+    ]
+    for pattern in kewarganegaraan_patterns:
+        match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
+        if match and match.lastindex and match.lastindex >= 1:
+            kewarganegaraan = match.group(1).strip()
+            kewarganegaraan = re.sub(r'\s+', ' ', kewarganegaraan)
+            if len(kewarganegaraan) > 1:
+                fields['kewarganegaraan'] = kewarganegaraan
+                break
+
+    return fields
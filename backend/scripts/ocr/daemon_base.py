@@ -0,0 +1,1161 @@
+#!/usr/bin/env python3
+"""
+Base class untuk OCR / KTP detection daemon
+Berisi request loop yang dipakai bersama oleh kedua daemon:
+- File protocol: backend menulis <uuid>.json ke request_dir, daemon menulis response ke response_dir
+- Socket protocol (opsional): lihat daemon_socket.py
+
+Subclass cukup mengimplementasikan handle_request(request) -> response dict.
+
+Admission control (--max-queue): jika antrian sudah penuh, request baru langsung
+dijawab {"success": false, "error": "busy", "retry_after_ms": ...} supaya backend
+bisa menolak / mengalihkan beban alih-alih menunggu sampai timeout.
+
+Deadline: request boleh membawa "deadline" (epoch ms) dan / atau "budget_ms"
+(lihat request_deadline.py). Request yang deadline-nya lewat saat pickup atau di
+antara stage dijawab {"success": false, "error": "deadline_exceeded", "stage": ...}
+tanpa menghabiskan CPU untuk stage berikutnya.
+
+Gambar by reference: alih-alih base64 "image", request boleh membawa "image_file"
+(file di /dev/shm/ktp-images atau sidecar di request_dir) yang di-mmap dan di-decode langsung
+dari mapping; crop bisa dikembalikan sebagai file di shared_dir (lihat image_ref.py).
+
+Request identik (gambar + opsi sama) yang masuk selama request pertama diproses
+menunggu hasil request tersebut alih-alih menjalankan inference ulang; dengan
+--cache-size-mb hasil sukses juga di-cache (lihat result_cache.py).
+
+Startup: sebelum menerima request, daemon menjalankan satu warmup inference
+pada gambar KTP sintetis (ktp_synthetic.py) lalu menulis file readiness
+(--ready-file) secara atomik berisi waktu load dan warmup. Backend baru
+mengirim request setelah file tersebut ada.
+"""
+
+import sys
+import json
+import os
+import base64
+import queue
+import threading
+import time
+from pathlib import Path
+
+from daemon_socket import SocketServer
+from image_ref import ImageRefError, default_shared_dir, map_image_file, resolve_image_file, write_image_file
+from ktp_corpus import CorpusRecorder
+from request_deadline import DEADLINE_EXCEEDED, DeadlineExceeded, deadline_scope, resolve_deadline
+from request_watcher import create_watcher, PickupStats
+from result_cache import ResultCache, make_cache_key, DEFAULT_TTL
+from stage_metrics import METRICS, MetricsExporter, collect_timings, record_stage, stage
+from worker_pool import add_worker_arguments, create_supervisor
+
+
+def _process_start():
+    """
+    Waktu proses dimulai dalam skala time.monotonic() (Linux /proc), termasuk
+    start interpreter dan import; fallback: saat modul ini di-import
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            # Field ke-22 (starttime, clock tick sejak boot), setelah nama proses "(...)"
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return time.monotonic() - (uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return time.monotonic()
+
+
+PROCESS_START = _process_start()
+
+
+def elapsed_since_start_ms():
+    """Milidetik sejak proses dimulai"""
+    return round((time.monotonic() - PROCESS_START) * 1000, 1)
+
+
+def decode_image_data(image_data):
+    """
+    Ambil raw image bytes dari field "image" request
+
+    Args:
+        image_data: Base64 string (file protocol) atau raw bytes (socket protocol)
+
+    Returns:
+        Raw image bytes
+    """
+    if isinstance(image_data, (bytes, bytearray, memoryview)):
+        return image_data
+    with stage('base64_decode'):
+        return base64.b64decode(image_data)
+
+
+# Bobot sampel terbaru untuk rata-rata waktu proses per request (EWMA)
+SERVICE_TIME_ALPHA = 0.2
+
+# Batas bawah retry_after_ms pada response "busy"
+MIN_RETRY_AFTER_MS = 100
+
+
+class PendingRequest:
+    """Request yang sudah diterima (file sudah di-claim / frame socket) dan menunggu diproses"""
+
+    def __init__(self, request_id, request, respond, received_at=None):
+        self.request_id = request_id
+        self.request = request
+        # respond(response): tulis response file / kirim reply lewat socket
+        self.respond = respond
+        self.cache_key = None
+        # time.monotonic() saat request masuk antrian (untuk metrics queue_wait / total)
+        self.received_at = received_at
+        # Durasi stage milik request ini (detik), untuk response "timings" jika "trace": true
+        self.timings = {}
+        self.batch_size = 1
+        # Deadline request (time.monotonic()), None = tanpa deadline
+        self.deadline = None
+
+
+class BaseDaemon:
+    def __init__(self, request_dir, response_dir):
+        self.request_dir = Path(request_dir)
+        self.response_dir = Path(response_dir)
+
+        # Create directories if they don't exist
+        self.request_dir.mkdir(parents=True, exist_ok=True)
+        self.response_dir.mkdir(parents=True, exist_ok=True)
+
+        # Semua pekerjaan (request file dari watcher dan request socket) masuk ke
+        # satu antrian dan diproses berurutan di main thread
+        self.socket_server = None
+        self._jobs = queue.Queue()
+        # Request file yang sudah diantrikan tapi belum diproses (hindari duplikat)
+        self._queued_files = set()
+        self._queued_lock = threading.Lock()
+        # Backlog untuk admission control, dihitung inkremental (lihat queue_depth):
+        # request file yang diantrikan dan belum di-claim siapa pun, dan request
+        # socket yang belum diambil dari antrian
+        self._unclaimed = set()
+        self._socket_jobs = 0
+        # Counter shared memory (RawValue) dari PreforkSupervisor: jumlah request
+        # socket di antrian worker ini, dipakai supervisor untuk autoscale
+        self.socket_backlog = None
+
+        # Backend watcher untuk file protocol: 'auto', 'inotify' atau 'poll'
+        self.watcher_backend = 'auto'
+        self.watcher = None
+        self.pickup_stats = PickupStats()
+
+        # Micro-batching (opt-in): kumpulkan sampai batch_size request, tunggu
+        # paling lama batch_wait_ms setelah request pertama
+        self.batch_size = 1
+        self.batch_wait_ms = 0
+
+        # Admission control: jumlah maksimum request di antrian (0 = tanpa batas); request
+        # di atas batas langsung dijawab "busy". service_ms = EWMA waktu proses per request
+        # untuk estimasi waktu tunggu (sebelum ada request: waktu warmup)
+        self.max_queue = 0
+        self.service_ms = None
+        self.rejected = 0
+
+        # Cache hasil berbasis isi request (None = nonaktif), lihat result_cache.py
+        self.cache = None
+
+        # Request identik yang sedang diproses: cache_key -> request yang menunggu hasilnya.
+        # Terlepas dari cache; dipakai bersama oleh main loop dan thread koneksi socket
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self.coalesced = 0
+
+        # Berhenti sendiri setelah tidak ada request selama idle_timeout detik
+        # (None = jalan terus); dipakai daemon yang di-spawn oleh ktp_extract.py
+        self.idle_timeout = None
+
+        # Startup: warmup inference sebelum loop request, file readiness (None = tidak
+        # ditulis) dan log waktu sampai response pertama (--startup-profile)
+        self.warmup_enabled = True
+        self.ready_file = None
+        self.startup_profile = False
+        # Timing startup (ms): load_ms, warmup_ms, ready_ms, first_response_ms
+        self.startup = {}
+
+        # Ekspos metrics per stage (lihat stage_metrics.py): file Prometheus dan / atau
+        # endpoint HTTP lokal; per_process_metrics = worker pre-fork (file per PID)
+        self.metrics_file = None
+        self.metrics_port = None
+        self.per_process_metrics = False
+        self._metrics_exporter = None
+
+        # Rekam teks OCR yang dianonimkan ke corpus JSONL (--record-corpus, lihat
+        # ktp_corpus.py); recorder dibuat setelah warmup supaya kartu sintetis tidak ikut
+        self.corpus_file = None
+        self.corpus_sample_rate = 1.0
+        self.corpus_recorder = None
+
+        # Gambar by reference (image_ref.py): folder untuk file output (crop_output=file),
+        # juga diterima sebagai lokasi "image_file" di samping request_dir dan /dev/shm/ktp-images
+        self.shared_dir = default_shared_dir(self.response_dir)
+
+        # Di-set untuk berhenti dengan bersih setelah request yang sedang diproses
+        # (dipakai oleh worker pre-fork saat menerima SIGTERM)
+        self._stop_event = threading.Event()
+
+    def handle_request(self, request):
+        """
+        Proses satu request (dict hasil parse JSON / header socket) dan return response dict
+
+        Dipakai oleh file protocol maupun socket protocol.
+        """
+        raise NotImplementedError
+
+    def warmup_request(self):
+        """
+        Request untuk warmup inference: JPEG kartu KTP sintetis (lihat ktp_synthetic.py)
+
+        Subclass meng-override ini jika model butuh input lain (mis. foto utuh untuk detector).
+        """
+        import cv2
+        from ktp_synthetic import synthetic_ktp
+
+        ok, encoded = cv2.imencode('.jpg', synthetic_ktp(), [cv2.IMWRITE_JPEG_QUALITY, 90])
+        if not ok:
+            raise RuntimeError('Failed to encode warmup image')
+        return {'image': encoded.tobytes()}
+
+    def record_corpus(self, extracted_data):
+        """
+        Catat hasil OCR (full_text / text_blocks) ke corpus jika --record-corpus aktif
+
+        Dipanggil subclass saat menyusun response dari hasil KTPOCR. Error
+        penulisan corpus tidak boleh menggagalkan request.
+        """
+        if self.corpus_recorder is None:
+            return
+        try:
+            self.corpus_recorder.record(extracted_data)
+        except OSError as e:
+            if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+                print(f"Error writing corpus entry: {e}", file=sys.stderr)
+
+    def cacheable(self, request):
+        """
+        False jika response request ini tidak boleh dipakai ulang (cache / request identik)
+
+        Output per penerima (mis. crop sebagai file) tidak perlu membuat request
+        tidak bisa di-cache; gunakan finalize_response untuk itu.
+        """
+        return True
+
+    def finalize_response(self, request, response):
+        """
+        Response untuk satu penerima dari response yang bisa dipakai bersama
+
+        Dipanggil untuk setiap penerima (request yang diproses, request identik yang
+        menunggu hasilnya, cache hit) tepat sebelum response dikirim. Subclass
+        meng-override ini untuk output milik penerima, mis. crop sebagai file baru.
+        Jangan ubah `response` in-place: dict dan isinya bisa dipakai bersama.
+
+        Returns:
+            Response dict untuk penerima ini (default: `response` apa adanya)
+        """
+        return response
+
+    def write_output_image(self, data, suffix='.jpg'):
+        """Tulis gambar hasil (mis. crop) ke shared_dir untuk response by reference, return path"""
+        return write_image_file(data, self.shared_dir, suffix=suffix)
+
+    def _map_request_image(self, request):
+        """Ganti "image_file" dengan memoryview ke mapping file (jika tidak ada "image" inline)"""
+        name = request.pop('image_file')
+        if request.get('image'):
+            return
+        path = resolve_image_file(name, self.request_dir, allowed_dirs=(self.shared_dir,))
+        with stage('image_map'):
+            request['image'] = map_image_file(path)
+
+    def cache_options(self, request):
+        """
+        Opsi request / daemon yang mempengaruhi hasil, bagian dari cache key
+
+        Subclass meng-override ini (mis. return_multiple, min_confidence, max_image_size).
+        """
+        return {}
+
+    # ------------------------------------------------------------------
+    # Socket protocol
+    # ------------------------------------------------------------------
+
+    def start_socket_server(self, socket_path=None, host='127.0.0.1', port=None):
+        """
+        Aktifkan socket transport di samping file protocol
+
+        Listener langsung di-bind; thread accept baru dimulai di run() sehingga
+        worker hasil fork bisa berbagi listener yang sama.
+        """
+        self.socket_server = SocketServer(
+            self._on_socket_request,
+            socket_path=socket_path,
+            host=host,
+            port=port,
+        )
+        self.socket_server.bind()
+
+    def _on_socket_request(self, connection, header, body):
+        # Dipanggil dari thread koneksi: raw body menggantikan base64 "image"
+        if header.get('op') == 'stats':
+            # Counter dijawab langsung tanpa masuk antrian inference
+            connection.reply({'id': header.get('id'), 'success': True, 'stats': self.stats()})
+            return
+        if header.get('op') == 'queue':
+            connection.reply({'id': header.get('id'), 'success': True, 'queue': self.queue_status()})
+            return
+        if self.max_queue and self._queue_full(self.queue_depth()):
+            connection.reply({'id': header.get('id'), **self._busy_response()})
+            return
+        if body:
+            header['image'] = body
+        received_at = time.monotonic()
+        if self._attach_in_flight(self._socket_pending(connection, header, received_at)):
+            return
+        self._count_socket_job(1)
+        self._jobs.put(('socket', connection, header, received_at))
+
+    def _count_socket_job(self, delta):
+        with self._queued_lock:
+            self._socket_jobs += delta
+            if self.socket_backlog is not None:
+                self.socket_backlog.value = self._socket_jobs
+
+    def _socket_pending(self, connection, request, received_at):
+        return PendingRequest(
+            request.get('id'), request,
+            lambda response: connection.reply({'id': request.get('id'), **response}),
+            received_at,
+        )
+
+    # ------------------------------------------------------------------
+    # Admission control
+    # ------------------------------------------------------------------
+
+    def _queue_depth_locked(self):
+        """queue_depth() untuk pemanggil yang sudah memegang _queued_lock"""
+        return len(self._unclaimed) + self._socket_jobs
+
+    def queue_depth(self):
+        """
+        Jumlah request yang menunggu diproses
+
+        Request file dihitung sebagai file yang sudah diantrikan dan belum di-claim,
+        bukan dari qsize() antrian lokal: pada mode pre-fork setiap worker mengantrikan
+        semua file, sehingga antrian lokal juga berisi file yang sudah di-claim worker
+        lain. Claim oleh worker mana pun dilaporkan watcher (take_removed), jadi semua
+        worker melihat backlog yang sama tanpa listing request_dir.
+        """
+        with self._queued_lock:
+            return self._queue_depth_locked()
+
+    def _queue_full(self, depth):
+        return bool(self.max_queue) and depth >= self.max_queue
+
+    def estimated_wait_ms(self, depth=None):
+        """
+        Perkiraan waktu tunggu request baru (ms): antrian x rata-rata waktu proses
+
+        Returns:
+            ms, atau None jika belum ada perkiraan waktu proses
+        """
+        service_ms = self.service_ms if self.service_ms is not None else self.startup.get('warmup_ms')
+        if service_ms is None:
+            return None
+        depth = self.queue_depth() if depth is None else depth
+        return round(depth * service_ms, 1)
+
+    def queue_status(self, depth=None):
+        """Kedalaman antrian dan perkiraan waktu tunggu (stats / op "queue" / response busy)"""
+        depth = self.queue_depth() if depth is None else depth
+        return {
+            'depth': depth,
+            'max': self.max_queue or None,
+            'estimated_wait_ms': self.estimated_wait_ms(depth),
+            'service_ms': round(self.service_ms, 1) if self.service_ms is not None else None,
+            'rejected': self.rejected,
+        }
+
+    def _busy_response(self, depth=None):
+        """Response untuk request yang ditolak karena antrian penuh"""
+        self.rejected += 1
+        METRICS.inc('rejected')
+        status = self.queue_status(depth)
+        return {
+            'success': False,
+            'error': 'busy',
+            # Perkiraan waktu sampai antrian saat ini habis diproses
+            'retry_after_ms': max(MIN_RETRY_AFTER_MS, int(status['estimated_wait_ms'] or 0)),
+            'queue': status,
+        }
+
+    def _reject_request_file(self, request_file, depth):
+        """Claim request file lalu langsung tulis response busy (dari thread watcher)"""
+        processing_file = request_file.with_suffix('.processing')
+        try:
+            request_file.rename(processing_file)
+        except OSError:
+            # Sudah di-claim proses lain
+            return
+        try:
+            self._write_response(request_file.stem, self._busy_response(depth))
+        except OSError as e:
+            if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+                print(f"Error writing busy response {request_file.stem}: {e}", file=sys.stderr)
+        finally:
+            try:
+                processing_file.unlink()
+            except OSError:
+                pass
+
+    def _record_service_time(self, elapsed, count):
+        """Update EWMA waktu proses per request dari satu batch inference"""
+        per_request_ms = elapsed * 1000 / max(1, count)
+        if self.service_ms is None:
+            self.service_ms = per_request_ms
+        else:
+            self.service_ms += SERVICE_TIME_ALPHA * (per_request_ms - self.service_ms)
+
+    # ------------------------------------------------------------------
+    # File protocol
+    # ------------------------------------------------------------------
+
+    def _read_request_file(self, processing_file):
+        """
+        Baca request yang sudah di-claim (.processing)
+
+        Returns:
+            Request dict, atau None jika file tidak valid / hilang
+        """
+        max_retries = 10
+        retry_count = 0
+
+        while retry_count < max_retries:
+            try:
+                # Check file size
+                if not processing_file.exists():
+                    # File was deleted somehow, skip
+                    return None
+
+                file_size = processing_file.stat().st_size
+                if file_size == 0:
+                    # File is empty, might still be writing (shouldn't happen after rename)
+                    retry_count += 1
+                    time.sleep(0.1)
+                    continue
+
+                # Try to read file
+                with open(processing_file, 'r') as f, stage('json_parse'):
+                    request = json.load(f)
+
+                # Verify request has required fields
+                if request and isinstance(request, dict) and ('image' in request or 'image_file' in request):
+                    return request
+                # Invalid request format, skip
+                return None
+
+            except (json.JSONDecodeError, IOError, OSError, FileNotFoundError) as e:
+                # File might still be writing or was deleted
+                if isinstance(e, FileNotFoundError):
+                    # File was deleted, skip
+                    return None
+                retry_count += 1
+                time.sleep(0.1)
+
+        return None
+
+    def _write_response(self, request_id, response):
+        response_file = self.response_dir / f"{request_id}.json"
+
+        # Ensure response directory exists
+        response_file.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write response atomically using temp file then rename
+        temp_response_file = response_file.with_suffix('.tmp')
+        with open(temp_response_file, 'w') as f:
+            json.dump(response, f, ensure_ascii=False)
+        temp_response_file.replace(response_file)
+
+    def _pickup_latency_ms(self, request_file):
+        """
+        Latency dari file request ditulis (mtime) sampai diterima watcher
+
+        Diukur saat watcher menyerahkan file (bukan saat di-claim), supaya waktu
+        tunggu di antrian tidak ikut terhitung (itu queue_wait).
+
+        Returns:
+            ms, atau None jika file sudah tidak ada (di-claim proses lain)
+        """
+        try:
+            return max(0.0, (time.time() - request_file.stat().st_mtime) * 1000)
+        except OSError:
+            return None
+
+    def _record_pickup(self, request_id, latency_ms):
+        """Catat pickup latency request yang berhasil di-claim"""
+        self.pickup_stats.record(latency_ms)
+        record_stage('pickup', latency_ms / 1000)
+        if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+            print(f"Picked up request {request_id} after {latency_ms:.1f}ms ({self.watcher.backend})", file=sys.stderr)
+
+    def _watch_loop(self):
+        """Background thread: teruskan request file baru dari watcher ke antrian"""
+        while True:
+            try:
+                request_files = self.watcher.wait()
+            except Exception as e:
+                if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+                    print(f"Error in request watcher: {e}", file=sys.stderr)
+                time.sleep(1)
+                continue
+
+            with self._queued_lock:
+                # Backlog bersama (lihat queue_depth), dihitung sekali per batch event watcher
+                depth = self._queue_depth_locked()
+                for request_file in request_files:
+                    if request_file.name in self._queued_files:
+                        continue
+                    pickup_ms = self._pickup_latency_ms(request_file)
+                    if pickup_ms is None:
+                        continue
+                    if self._queue_full(depth):
+                        self._reject_request_file(request_file, depth)
+                        continue
+                    depth += 1
+                    self._queued_files.add(request_file.name)
+                    self._unclaimed.add(request_file.name)
+                    self._jobs.put(('file', request_file, pickup_ms, time.monotonic()))
+                # File yang sudah di-claim worker lain / dihapus tidak lagi dihitung;
+                # job-nya tetap di antrian dan dilewati saat claim gagal
+                for name in self.watcher.take_removed():
+                    self._unclaimed.discard(name)
+
+    def _claim_request_file(self, request_file, received_at=None, pickup_ms=None):
+        """
+        Claim dan baca satu request file
+
+        Args:
+            pickup_ms: Pickup latency yang diukur watcher, dicatat jika claim berhasil
+
+        Returns:
+            PendingRequest, atau None jika file sudah di-claim proses lain / tidak valid
+        """
+        # Lock mechanism: rename file to .processing to claim ownership
+        # This prevents multiple daemon instances from processing the same file
+        processing_file = request_file.with_suffix('.processing')
+        request_id = request_file.stem
+
+        # Try to claim the file by renaming it
+        # If rename fails, another process is already handling it
+        try:
+            request_file.rename(processing_file)
+        except (FileNotFoundError, OSError):
+            # File was already claimed or deleted, skip
+            return None
+
+        if pickup_ms is not None:
+            self._record_pickup(request_id, pickup_ms)
+
+        def cleanup():
+            try:
+                if processing_file.exists():
+                    processing_file.unlink()
+            except:
+                pass
+
+        # Now we own the file, read it safely
+        request = self._read_request_file(processing_file)
+
+        if request is None:
+            # File not ready after retries or was deleted, cleanup and skip
+            cleanup()
+            return None
+
+        def respond(response):
+            try:
+                self._write_response(request_id, response)
+            except Exception as e:
+                if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+                    print(f"Error writing response {request_id}: {e}", file=sys.stderr)
+            finally:
+                # Delete processing file after response is written
+                cleanup()
+
+        return PendingRequest(request_id, request, respond, received_at)
+
+    def _accept_job(self, job):
+        """Ubah job dari antrian menjadi PendingRequest (claim file / request socket)"""
+        received_at = job[-1]
+        timings = {}
+        with collect_timings(timings):
+            record_stage('queue_wait', time.monotonic() - received_at)
+            if job[0] == 'file':
+                request_file, pickup_ms = job[1], job[2]
+                try:
+                    pending = self._claim_request_file(request_file, received_at, pickup_ms)
+                finally:
+                    with self._queued_lock:
+                        self._queued_files.discard(request_file.name)
+                        self._unclaimed.discard(request_file.name)
+            else:
+                self._count_socket_job(-1)
+                pending = self._socket_pending(job[1], job[2], received_at)
+
+        if pending is None:
+            return None
+        pending.timings = timings
+
+        try:
+            pending.deadline = resolve_deadline(pending.request, received_at)
+        except ValueError as e:
+            self._respond(pending, {'success': False, 'error': str(e)})
+            return None
+        if pending.deadline is not None and time.monotonic() >= pending.deadline:
+            # Caller sudah berhenti menunggu sebelum request sempat diproses
+            self._respond(pending, self._deadline_response(pending, 'pickup'))
+            return None
+
+        if 'image_file' in pending.request:
+            try:
+                with collect_timings(pending.timings):
+                    self._map_request_image(pending.request)
+            except (ImageRefError, OSError) as e:
+                self._respond(pending, {'success': False, 'error': str(e)})
+                return None
+        return pending
+
+    def _deadline_response(self, pending, stage_name):
+        """Response untuk request yang deadline-nya lewat sebelum / di tengah pemrosesan"""
+        METRICS.inc('deadline_exceeded')
+        if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+            print(f"Request {pending.request_id} deadline exceeded ({stage_name}), skipped", file=sys.stderr)
+        return {
+            'success': False,
+            'error': DEADLINE_EXCEEDED,
+            'stage': stage_name,
+        }
+
+    def _trace_timings(self, pending):
+        """
+        Response "timings" untuk request dengan "trace": true (ms, monotonic)
+
+        Berisi <stage>_ms untuk setiap stage yang dilalui request (lihat stage_metrics.STAGES;
+        pickup_ms = file request ditulis sampai diterima watcher), total_ms = request diterima
+        daemon sampai response siap dikirim, dan batch_size jika diproses dalam batch
+        (durasi inference batch dihitung penuh untuk setiap request).
+        """
+        timings = {f'{name}_ms': round(seconds * 1000, 3) for name, seconds in pending.timings.items()}
+        if pending.received_at is not None:
+            timings['total_ms'] = round((time.monotonic() - pending.received_at) * 1000, 3)
+        if pending.batch_size > 1:
+            timings['batch_size'] = pending.batch_size
+        return timings
+
+    def _respond(self, pending, response):
+        """Kirim response lalu rekam metrics request (counter dan durasi total)"""
+        try:
+            response = self.finalize_response(pending.request, response)
+        except Exception as e:
+            response = {'success': False, 'error': str(e)}
+        if pending.request.get('trace'):
+            # Copy: response yang sama bisa tersimpan di cache / dipakai request identik
+            response = {**response, 'timings': self._trace_timings(pending)}
+        with stage('response_write'):
+            pending.respond(response)
+        METRICS.inc('requests')
+        if not response.get('success'):
+            METRICS.inc('errors')
+        if pending.received_at is not None:
+            record_stage('total', time.monotonic() - pending.received_at)
+
+    def _handle_one(self, pending):
+        """handle_request dengan error response jika terjadi exception"""
+        scope = deadline_scope(pending.deadline)
+        try:
+            with collect_timings(pending.timings), scope:
+                response = self.handle_request(pending.request)
+            if scope.exceeded:
+                # Layer di bawah (mis. detect_and_crop) bisa mengubah DeadlineExceeded menjadi error biasa
+                return self._deadline_response(pending, scope.exceeded)
+            return response
+        except DeadlineExceeded as e:
+            return self._deadline_response(pending, e.stage)
+        except Exception as e:
+            if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+                print(f"Error processing request {pending.request_id}: {e}", file=sys.stderr)
+            return {
+                'success': False,
+                'error': f'Processing error: {str(e)}'
+            }
+
+    def handle_batch(self, requests):
+        """
+        Proses beberapa request sekaligus (micro-batching, aktif jika batch_size > 1)
+
+        Default: handle_request satu per satu. Subclass meng-override ini untuk
+        menjalankan inference model sebagai satu batch.
+
+        Returns:
+            List response dict, urutan sama dengan requests
+        """
+        return [self.handle_request(request) for request in requests]
+
+    def _cache_key(self, request):
+        """Cache key request, atau None jika tidak bisa di-cache"""
+        image_data = request.get('image')
+        if not image_data or not self.cacheable(request):
+            return None
+        try:
+            # Simpan hasil decode supaya handle_request tidak decode base64 dua kali
+            image_bytes = decode_image_data(image_data)
+            request['image'] = image_bytes
+            options = self.cache_options(request)
+        except Exception:
+            return None
+        return make_cache_key(image_bytes, {'daemon': type(self).__name__, **options})
+
+    def _record_coalesced(self):
+        self.coalesced += 1
+        METRICS.inc('coalesced')
+
+    def _attach_in_flight(self, pending):
+        """
+        Request socket yang identik dengan request yang sedang diproses menunggu
+        hasilnya (tanpa masuk antrian); dipanggil dari thread koneksi
+
+        Returns:
+            True jika request ditambahkan sebagai follower
+        """
+        if not self._in_flight:
+            # Tidak ada yang sedang diproses: jangan hash gambar sia-sia
+            return False
+        try:
+            pending.deadline = resolve_deadline(pending.request, pending.received_at)
+        except ValueError:
+            # Dijawab dengan error oleh _accept_job
+            return False
+        pending.cache_key = self._cache_key(pending.request)
+        if pending.cache_key is None:
+            return False
+        with self._in_flight_lock:
+            followers = self._in_flight.get(pending.cache_key)
+            if followers is None:
+                return False
+            followers.append(pending)
+        self._record_coalesced()
+        return True
+
+    def _coalesce(self, pending):
+        """
+        Gabungkan request identik, lalu jawab request yang hasilnya ada di cache
+
+        Request yang cache key-nya sudah ada di _in_flight (request lain di batch ini
+        atau yang sedang diproses) menjadi follower dan menerima response yang sama.
+        Sisanya didaftarkan di _in_flight sampai response-nya dikirim, sehingga request
+        identik yang datang selama pemrosesan (socket) ikut menunggu hasilnya.
+
+        Returns:
+            List request yang perlu diproses
+        """
+        to_process = []
+        for p in pending:
+            with collect_timings(p.timings):
+                p.cache_key = self._cache_key(p.request)
+            if p.cache_key is None:
+                to_process.append(p)
+                continue
+
+            with self._in_flight_lock:
+                followers = self._in_flight.get(p.cache_key)
+                if followers is not None:
+                    followers.append(p)
+            if followers is not None:
+                self._record_coalesced()
+                continue
+
+            if self.cache is not None:
+                cached = self.cache.get(p.cache_key)
+                if cached is not None:
+                    self._respond(p, cached)
+                    continue
+
+            with self._in_flight_lock:
+                self._in_flight[p.cache_key] = []
+            to_process.append(p)
+        return to_process
+
+    def _release_in_flight(self, cache_key):
+        """Hapus request dari _in_flight, return follower yang menunggu hasilnya"""
+        if cache_key is None:
+            return []
+        with self._in_flight_lock:
+            return self._in_flight.pop(cache_key, [])
+
+    def _process_pending(self, pending):
+        """Proses request yang sudah diterima lalu kirim response ke masing-masing pengirim"""
+        pending = self._coalesce(pending)
+        if not pending:
+            return
+        try:
+            self._run_pending(pending)
+        finally:
+            # Jika batch gagal sebelum semua response terkirim, follower diproses sendiri
+            for p in pending:
+                for follower in self._release_in_flight(p.cache_key):
+                    self._respond(follower, self._handle_one(follower))
+
+    def _run_pending(self, pending):
+        """Jalankan batch / request satu per satu, lalu kirim response ke request dan follower-nya"""
+        METRICS.inc('batches')
+        started = time.monotonic()
+        responses = None
+        if len(pending) > 1:
+            # Batch jalan terus selama masih ada anggota yang ditunggu (deadline paling akhir)
+            deadlines = [p.deadline for p in pending]
+            scope = deadline_scope(None if None in deadlines else max(deadlines))
+            try:
+                batch_timings = {}
+                try:
+                    with collect_timings(batch_timings), scope:
+                        responses = self.handle_batch([p.request for p in pending])
+                except DeadlineExceeded:
+                    pass
+                if scope.exceeded:
+                    responses = [self._deadline_response(p, scope.exceeded) for p in pending]
+                for p in pending:
+                    for name, seconds in batch_timings.items():
+                        p.timings[name] = p.timings.get(name, 0.0) + seconds
+                    p.batch_size = len(pending)
+            except Exception as e:
+                # Batch gagal: ulangi satu per satu supaya error terisolasi per request
+                if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+                    print(f"Error processing batch of {len(pending)}, retrying individually: {e}", file=sys.stderr)
+
+        if responses is None:
+            responses = [self._handle_one(p) for p in pending]
+        self._record_service_time(time.monotonic() - started, len(pending))
+
+        for p, response in zip(pending, responses):
+            # Hanya hasil sukses yang di-cache; error bisa saja transient
+            if self.cache is not None and p.cache_key is not None and response.get('success'):
+                self.cache.put(p.cache_key, response)
+            self._respond(p, response)
+            for follower in self._release_in_flight(p.cache_key):
+                if response.get('error') == DEADLINE_EXCEEDED:
+                    # Deadline milik request pertama; request identik punya deadline sendiri
+                    self._respond(follower, self._handle_one(follower))
+                else:
+                    self._respond(follower, dict(response))
+
+    def stats(self):
+        """Counter daemon (pickup latency, cache, request identik, timing startup dan metrics per stage)"""
+        stats = {
+            'pickup': {
+                'count': self.pickup_stats.count,
+                'mean_ms': self.pickup_stats.mean_ms,
+            },
+            'startup': dict(self.startup),
+            'queue': self.queue_status(),
+            # Request yang menerima hasil request identik yang sedang diproses
+            'coalesced': self.coalesced,
+            'metrics': METRICS.snapshot(),
+        }
+        if self.cache is not None:
+            stats['cache'] = self.cache.stats()
+        return stats
+
+    def _next_batch(self, first_job):
+        """
+        Kumpulkan job berikutnya sampai batch_size atau batch_wait_ms tercapai
+
+        Dengan batch_size=1 (default) tidak ada penundaan sama sekali.
+        """
+        batch = [first_job]
+        if self.batch_size <= 1:
+            return batch
+
+        deadline = time.monotonic() + self.batch_wait_ms / 1000.0
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._jobs.get(timeout=remaining))
+                else:
+                    batch.append(self._jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    # ------------------------------------------------------------------
+    # Startup (warmup dan readiness)
+    # ------------------------------------------------------------------
+
+    def warmup(self):
+        """
+        Jalankan inference pada request warmup supaya inisialisasi graph / kernel
+        (dan import yang ditunda) tidak dibayar oleh request user pertama
+
+        Dengan micro-batching, jalur handle_batch ikut di-warmup.
+
+        Returns:
+            Waktu warmup dalam ms
+        """
+        start = time.monotonic()
+        responses = [self.handle_request(self.warmup_request())]
+        if self.batch_size > 1:
+            responses += self.handle_batch([self.warmup_request(), self.warmup_request()])
+        warmup_ms = round((time.monotonic() - start) * 1000, 1)
+
+        failed = [r.get('error') for r in responses if not r.get('success')]
+        if failed and os.getenv('SUPPRESS_OCR_LOGS') != '1':
+            # Model tetap sudah ter-load; gambar sintetis bisa saja tidak terdeteksi
+            print(f"Warmup inference returned an error: {failed[0]}", file=sys.stderr)
+        return warmup_ms
+
+    def _write_ready_file(self):
+        """Tulis file readiness secara atomik (temp file lalu rename)"""
+        ready_file = Path(self.ready_file)
+        ready_file.parent.mkdir(parents=True, exist_ok=True)
+        info = {
+            'ready': True,
+            'daemon': type(self).__name__,
+            'pid': os.getpid(),
+            'timestamp': time.time(),
+            **self.startup,
+        }
+        if self.socket_server is not None:
+            info['socket'] = self.socket_server.address
+        temp_file = ready_file.with_name(f".{ready_file.name}.{os.getpid()}.tmp")
+        with open(temp_file, 'w') as f:
+            json.dump(info, f)
+        temp_file.replace(ready_file)
+
+    def _start_up(self):
+        """Warmup lalu tandai daemon siap (file readiness)"""
+        self.startup.setdefault('load_ms', elapsed_since_start_ms())
+        if self.warmup_enabled:
+            self.startup['warmup_ms'] = self.warmup()
+        self.startup['ready_ms'] = elapsed_since_start_ms()
+
+        if self.ready_file:
+            self._write_ready_file()
+        if self.startup_profile:
+            print(f"Startup profile ({type(self).__name__}): load {self.startup['load_ms']:.0f} ms, "
+                  f"warmup {self.startup.get('warmup_ms', 0):.0f} ms, "
+                  f"ready {self.startup['ready_ms']:.0f} ms after process start", file=sys.stderr)
+
+    def _record_first_response(self):
+        """Catat waktu sejak proses dimulai sampai response pertama terkirim"""
+        self.startup['first_response_ms'] = elapsed_since_start_ms()
+        if self.startup_profile:
+            print(f"Startup profile ({type(self).__name__}): first response "
+                  f"{self.startup['first_response_ms']:.0f} ms after process start", file=sys.stderr)
+            if self.ready_file:
+                self._write_ready_file()
+
+    def _start_metrics(self):
+        """Daftarkan gauge daemon dan mulai exporter metrics (jika dikonfigurasi)"""
+        # Observasi selama warmup tidak mewakili traffic
+        METRICS.reset()
+        METRICS.labels = {'daemon': type(self).__name__}
+        METRICS.register('queue_depth', self.queue_depth, help_text='Request yang menunggu diproses')
+        METRICS.register('queue_estimated_wait_seconds',
+                         lambda: None if self.estimated_wait_ms() is None else self.estimated_wait_ms() / 1000,
+                         help_text='Perkiraan waktu tunggu request baru')
+        if self.max_queue:
+            METRICS.register('queue_max', lambda: self.max_queue, help_text='Batas antrian (--max-queue)')
+        if self.cache is not None:
+            METRICS.register('cache_hits', lambda: self.cache.stats()['hits'], kind='counter')
+            METRICS.register('cache_misses', lambda: self.cache.stats()['misses'], kind='counter')
+            METRICS.register('cache_bytes', lambda: self.cache.stats()['bytes'])
+
+        if not self.metrics_file and self.metrics_port is None:
+            return
+        path = self.metrics_file
+        if self.per_process_metrics:
+            # Worker pre-fork: satu file per PID (textfile collector membaca semua *.prom)
+            METRICS.labels['pid'] = str(os.getpid())
+            if path:
+                path = Path(path)
+                path = path.with_name(f"{path.stem}.{os.getpid()}{path.suffix}")
+        self._metrics_exporter = MetricsExporter(METRICS, path=path, port=self.metrics_port)
+        self._metrics_exporter.start()
+
+    def _stop_metrics(self):
+        if self._metrics_exporter is None:
+            return
+        self._metrics_exporter.stop()
+        if self.per_process_metrics and self._metrics_exporter.path is not None:
+            # Counter worker yang sudah berhenti tidak relevan lagi
+            try:
+                self._metrics_exporter.path.unlink()
+            except OSError:
+                pass
+
+    def run(self):
+        """Main loop: watch request directory, process files, write responses"""
+        self._start_up()
+        self._start_metrics()
+        if self.corpus_file:
+            self.corpus_recorder = CorpusRecorder(self.corpus_file, sample_rate=self.corpus_sample_rate)
+
+        self.watcher = create_watcher(self.request_dir, self.watcher_backend)
+        if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+            print(f"Watching request directory: {self.request_dir} ({self.watcher.backend})", file=sys.stderr)
+
+        threading.Thread(target=self._watch_loop, name='request-watcher', daemon=True).start()
+        if self.socket_server is not None:
+            self.socket_server.start()
+
+        last_activity = time.monotonic()
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    try:
+                        job = self._jobs.get(timeout=1.0)
+                    except queue.Empty:
+                        if self.idle_timeout and time.monotonic() - last_activity >= self.idle_timeout:
+                            if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+                                print(f"No requests for {self.idle_timeout:g}s, shutting down", file=sys.stderr)
+                            break
+                        continue
+
+                    pending = [
+                        p for p in (self._accept_job(j) for j in self._next_batch(job))
+                        if p is not None
+                    ]
+                    if pending:
+                        self._process_pending(pending)
+                        if 'first_response_ms' not in self.startup:
+                            self._record_first_response()
+                    last_activity = time.monotonic()
+
+                except KeyboardInterrupt:
+                    # Graceful shutdown on Ctrl+C
+                    break
+                except Exception as e:
+                    if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+                        print(f"Error in daemon loop: {e}", file=sys.stderr)
+                    time.sleep(1)  # Wait before retrying
+        finally:
+            if self.socket_server is not None:
+                self.socket_server.stop()
+            self._stop_metrics()
+            if os.getenv('SUPPRESS_OCR_LOGS') != '1' and self.pickup_stats.count:
+                print(self.pickup_stats.summary(), file=sys.stderr)
+            if os.getenv('SUPPRESS_OCR_LOGS') != '1' and self.cache is not None:
+                print(self.cache.summary(), file=sys.stderr)
+            if os.getenv('SUPPRESS_OCR_LOGS') != '1' and self.corpus_recorder is not None:
+                print(f"Corpus: {self.corpus_recorder.recorded} entries recorded to {self.corpus_file}",
+                      file=sys.stderr)
+
+    def stop(self):
+        """Minta main loop berhenti setelah request yang sedang diproses selesai"""
+        self._stop_event.set()
+
+
+def add_daemon_arguments(parser):
+    """Argumen CLI bersama untuk semua daemon (transport dan worker pool)"""
+    parser.add_argument('--socket', dest='socket_path',
+                        help='Unix domain socket path untuk socket transport (opsional)')
+    parser.add_argument('--port', type=int,
+                        help='Port TCP localhost untuk socket transport (opsional)')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='Host untuk TCP socket transport (default: 127.0.0.1)')
+    parser.add_argument('--watcher', choices=['auto', 'inotify', 'poll'], default='auto',
+                        help='Backend watcher untuk request directory (default: auto = inotify jika tersedia)')
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help='Micro-batching: jumlah request maksimum per batch inference (default: 1 = nonaktif)')
+    parser.add_argument('--batch-wait-ms', type=float, default=20,
+                        help='Micro-batching: waktu tunggu maksimum untuk mengisi batch (default: 20 ms)')
+    parser.add_argument('--cache-size-mb', type=float, default=0,
+                        help='Ukuran memory cache hasil dalam MB, opt-in (default: 0 = nonaktif; mis. 64)')
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL,
+                        help='Umur entry cache dalam detik (default: 3600, 0 = tidak expired)')
+    parser.add_argument('--cache-dir',
+                        help='Folder untuk disk cache yang bertahan setelah restart (opsional)')
+    parser.add_argument('--max-queue', type=int, default=0,
+                        help='Jumlah maksimum request di antrian; request di atasnya dijawab "busy" '
+                             '(default: 0 = tanpa batas)')
+    parser.add_argument('--shared-dir',
+                        help='Folder untuk gambar by reference: crop "crop_output": "file" dan lokasi '
+                             '"image_file" tambahan (default: /dev/shm/ktp-images, fallback: response_dir)')
+    parser.add_argument('--ready-file',
+                        help='Tulis file JSON ini (atomik) setelah model ter-load dan warmup selesai')
+    parser.add_argument('--no-warmup', action='store_true',
+                        help='Lewati warmup inference saat startup')
+    parser.add_argument('--startup-profile', action='store_true',
+                        help='Log waktu load, warmup dan response pertama sejak proses dimulai')
+    parser.add_argument('--metrics-file',
+                        help='Tulis metrics format Prometheus ke file ini secara berkala (mis. untuk textfile collector)')
+    parser.add_argument('--metrics-port', type=int,
+                        help='Endpoint HTTP lokal untuk metrics Prometheus (GET /metrics, hanya single process)')
+    parser.add_argument('--record-corpus',
+                        help='Append teks OCR yang dianonimkan ke file JSONL ini (corpus benchmark ekstraksi field)')
+    parser.add_argument('--record-corpus-rate', type=float, default=1.0,
+                        help='Fraksi request yang direkam ke corpus (default: 1.0)')
+    parser.add_argument('--idle-timeout', type=float, default=0,
+                        help='Berhenti setelah tidak ada request selama N detik (default: 0 = tidak pernah; '
+                             'hanya single process)')
+    add_worker_arguments(parser)
+
+
+def serve_daemon(daemon, args):
+    """
+    Jalankan daemon sesuai opsi CLI: transport (watcher + socket) lalu
+    single-process loop, atau supervisor pre-fork jika --workers diberikan
+    """
+    # Model sudah di-load di constructor daemon
+    daemon.startup['load_ms'] = elapsed_since_start_ms()
+    daemon.warmup_enabled = not args.no_warmup
+    daemon.ready_file = args.ready_file
+    daemon.startup_profile = args.startup_profile
+    daemon.metrics_file = args.metrics_file
+    daemon.metrics_port = args.metrics_port
+    daemon.corpus_file = args.record_corpus
+    daemon.corpus_sample_rate = args.record_corpus_rate
+    if args.shared_dir:
+        daemon.shared_dir = Path(args.shared_dir)
+        daemon.shared_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+
+    daemon.watcher_backend = args.watcher
+    daemon.batch_size = max(1, args.batch_size)
+    daemon.batch_wait_ms = max(0.0, args.batch_wait_ms)
+    daemon.max_queue = max(0, args.max_queue)
+    if args.cache_size_mb > 0:
+        daemon.cache = ResultCache(
+            max_bytes=int(args.cache_size_mb * 1024 * 1024),
+            ttl=args.cache_ttl or None,
+            disk_dir=args.cache_dir,
+        )
+    if args.socket_path or args.port is not None:
+        daemon.start_socket_server(
+            socket_path=args.socket_path,
+            host=args.host,
+            port=args.port,
+        )
+
+    supervisor = create_supervisor(daemon, args)
+    if supervisor is not None:
+        daemon.per_process_metrics = True
+        if args.metrics_port is not None:
+            # Worker tidak bisa berbagi satu port HTTP; pakai --metrics-file per worker
+            print("--metrics-port is not supported with --workers, use --metrics-file", file=sys.stderr)
+            daemon.metrics_port = None
+    try:
+        if supervisor is None:
+            daemon.idle_timeout = args.idle_timeout or None
+            daemon.run()
+        else:
+            # Setiap worker melakukan warmup sendiri setelah fork (lihat worker_pool.py);
+            # worker pertama yang siap menulis file readiness
+            supervisor.run()
+    finally:
+        if args.ready_file:
+            try:
+                os.unlink(args.ready_file)
+            except OSError:
+                pass
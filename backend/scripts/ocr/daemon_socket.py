@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Socket transport untuk OCR / KTP detection daemon
+Alternatif dari file-based communication: client membuka koneksi persisten
+(Unix domain socket atau TCP localhost) dan mengirim request sebagai frame biner.
+
+Format frame (semua integer big-endian):
+    [header_len: uint32][body_len: uint32][header: JSON UTF-8][body: raw bytes]
+
+Request:  header berisi options (id, return_multiple, min_confidence, ...),
+          body berisi raw image bytes (tanpa base64). Jika body kosong,
+          header boleh berisi field "image" base64 seperti file protocol.
+Response: header berisi response dict + "id" dari request, body kosong.
+"""
+
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+
+FRAME_HEADER = struct.Struct('!II')
+
+# Batas ukuran frame untuk mencegah client mengirim length yang tidak masuk akal
+MAX_HEADER_SIZE = 1024 * 1024          # 1 MB
+MAX_BODY_SIZE = 64 * 1024 * 1024       # 64 MB
+
+
+class FrameError(Exception):
+    """Frame tidak valid atau koneksi terputus di tengah frame"""
+
+
+def _recv_exact(sock, size):
+    """Baca tepat `size` bytes dari socket, return None jika koneksi ditutup sebelum mulai"""
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            if received == 0:
+                return None
+            raise FrameError('Connection closed in the middle of a frame')
+        received += n
+    return buf
+
+
+def send_frame(sock, header, body=b''):
+    """
+    Kirim satu frame ke socket
+
+    Args:
+        sock: socket yang sudah terkoneksi
+        header: dict yang akan di-encode sebagai JSON
+        body: raw bytes (opsional)
+    """
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    sock.sendall(FRAME_HEADER.pack(len(header_bytes), len(body)) + header_bytes)
+    if body:
+        sock.sendall(body)
+
+
+def recv_frame(sock):
+    """
+    Terima satu frame dari socket
+
+    Returns:
+        Tuple (header dict, body bytes), atau None jika koneksi ditutup dengan bersih
+    """
+    prefix = _recv_exact(sock, FRAME_HEADER.size)
+    if prefix is None:
+        return None
+
+    header_len, body_len = FRAME_HEADER.unpack(prefix)
+    if header_len > MAX_HEADER_SIZE or body_len > MAX_BODY_SIZE:
+        raise FrameError(f'Frame too large (header={header_len}, body={body_len})')
+
+    header_bytes = _recv_exact(sock, header_len) if header_len else bytearray()
+    if header_bytes is None:
+        raise FrameError('Connection closed in the middle of a frame')
+    body = _recv_exact(sock, body_len) if body_len else bytearray()
+    if body is None:
+        raise FrameError('Connection closed in the middle of a frame')
+
+    try:
+        header = json.loads(bytes(header_bytes).decode('utf-8')) if header_len else {}
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise FrameError(f'Invalid frame header: {e}')
+    if not isinstance(header, dict):
+        raise FrameError('Frame header must be a JSON object')
+
+    return header, bytes(body)
+
+
+class SocketConnection:
+    """Satu koneksi client; write di-serialize karena reply bisa dikirim dari thread worker"""
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self._write_lock = threading.Lock()
+        self.closed = False
+
+    def reply(self, header):
+        with self._write_lock:
+            if self.closed:
+                return False
+            try:
+                send_frame(self.sock, header)
+                return True
+            except OSError:
+                self.close()
+                return False
+
+    def close(self):
+        self.closed = True
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class SocketServer:
+    """
+    Listener untuk socket transport
+
+    Setiap koneksi dibaca di thread sendiri. Request yang sudah lengkap diteruskan
+    ke `on_request(connection, header, body)`; pemrosesan (inference) dilakukan oleh
+    daemon di main thread, lalu reply dikirim kembali lewat `connection.reply()`.
+    """
+
+    def __init__(self, on_request, socket_path=None, host='127.0.0.1', port=None):
+        if socket_path is None and port is None:
+            raise ValueError('Either socket_path or port must be given')
+
+        self.on_request = on_request
+        self.socket_path = str(socket_path) if socket_path else None
+        self.host = host
+        self.port = port
+        self._listener = None
+        self._owner_pid = None
+        self._connections = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    @property
+    def address(self):
+        return self.socket_path if self.socket_path else f'{self.host}:{self.port}'
+
+    def bind(self):
+        """
+        Bind listener tanpa memulai thread
+
+        Dipisah dari start() supaya supervisor pre-fork bisa bind sekali di parent,
+        lalu setiap worker hasil fork accept dari listener yang sama.
+        """
+        if self._listener is not None:
+            return
+
+        if self.socket_path:
+            # Hapus socket lama yang tertinggal dari proses sebelumnya
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            listener.bind(self.socket_path)
+            os.chmod(self.socket_path, 0o660)
+        else:
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind((self.host, self.port))
+            # Port 0 = pilih port bebas, simpan port yang sebenarnya
+            self.port = listener.getsockname()[1]
+
+        listener.listen(64)
+        self._listener = listener
+        self._owner_pid = os.getpid()
+
+    def start(self):
+        """Bind listener (jika belum) dan mulai accept koneksi di background thread"""
+        self.bind()
+
+        thread = threading.Thread(target=self._accept_loop, name='socket-accept', daemon=True)
+        thread.start()
+
+        if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+            print(f"Listening on socket: {self.address}", file=sys.stderr)
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                sock, address = self._listener.accept()
+            except OSError:
+                if self._stopped.is_set():
+                    break
+                continue
+
+            if sock.family == socket.AF_INET:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            connection = SocketConnection(sock, address)
+            with self._lock:
+                self._connections.add(connection)
+            thread = threading.Thread(
+                target=self._connection_loop, args=(connection,),
+                name='socket-conn', daemon=True
+            )
+            thread.start()
+
+    def _connection_loop(self, connection):
+        try:
+            while not self._stopped.is_set():
+                try:
+                    frame = recv_frame(connection.sock)
+                except FrameError as e:
+                    connection.reply({'success': False, 'error': f'Invalid frame: {e}'})
+                    break
+                except OSError:
+                    break
+
+                if frame is None:
+                    break
+
+                header, body = frame
+                self.on_request(connection, header, body)
+        finally:
+            connection.close()
+            with self._lock:
+                self._connections.discard(connection)
+
+    def stop(self):
+        self._stopped.set()
+        if self._listener is not None:
+            try:
+                self._listener.close()
+            except OSError:
+                pass
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            connection.close()
+        # Hanya proses yang bind yang menghapus socket file (bukan worker hasil fork)
+        if self.socket_path and self._owner_pid == os.getpid():
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+
+class SocketClient:
+    """
+    Client sederhana untuk socket transport (dipakai oleh script Python dan benchmark)
+
+    Koneksi dibuka sekali dan dipakai ulang untuk beberapa request.
+    """
+
+    def __init__(self, socket_path=None, host='127.0.0.1', port=None, timeout=None):
+        if socket_path:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(str(socket_path))
+        elif port is not None:
+            self.sock = socket.create_connection((host, port), timeout=timeout)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            raise ValueError('Either socket_path or port must be given')
+        self._next_id = 0
+
+    def request(self, image_bytes, **options):
+        """
+        Kirim satu request dan tunggu reply-nya
+
+        Args:
+            image_bytes: Raw image bytes
+            **options: Options request (return_multiple, min_confidence, ...)
+
+        Returns:
+            Response dict dari daemon
+        """
+        self._next_id += 1
+        header = dict(options)
+        header.setdefault('id', str(self._next_id))
+        send_frame(self.sock, header, image_bytes)
+
+        frame = recv_frame(self.sock)
+        if frame is None:
+            raise ConnectionError('Daemon closed the connection')
+        response, _ = frame
+        return response
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Export model deteksi KTP (models/best.pt) ke ONNX untuk KTPDetector model_type 'onnx'
+
+Opsional membuat varian int8 (static quantization, QDQ) yang dikalibrasi dengan
+contoh foto KTP. Hasil export dipakai dengan memberikan path .onnx ke
+KTPDetector / ktp_detection_daemon.py (atau env KTP_DETECTION_MODEL di backend).
+
+Usage:
+    python export_onnx.py                                   # models/best.pt → models/best.onnx
+    python export_onnx.py --int8 --calibration samples/     # + models/best.int8.onnx
+
+Butuh ultralytics + torch hanya saat export; inference ONNX cukup onnxruntime.
+"""
+
+import argparse
+import os
+import re
+import shutil
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from ktp_detect import ONNX_INPUT_SIZE, letterbox, to_input_tensor
+
+
+def export_fp32(model_path, output_path, imgsz=ONNX_INPUT_SIZE, opset=12):
+    """
+    Export model ultralytics .pt ke ONNX dengan batch dinamis
+
+    Returns:
+        Path file ONNX
+    """
+    from ultralytics import YOLO
+
+    model = YOLO(str(model_path))
+    exported = model.export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True, opset=opset)
+    exported = Path(exported)
+    if exported.resolve() != Path(output_path).resolve():
+        shutil.move(str(exported), str(output_path))
+    return Path(output_path)
+
+
+class KTPCalibrationReader:
+    """CalibrationDataReader onnxruntime: contoh foto KTP yang di-letterbox seperti saat inference"""
+
+    def __init__(self, input_name, image_paths, imgsz=ONNX_INPUT_SIZE):
+        self.input_name = input_name
+        self.image_paths = list(image_paths)
+        self.imgsz = imgsz
+        self._index = 0
+
+    def get_next(self):
+        while self._index < len(self.image_paths):
+            path = self.image_paths[self._index]
+            self._index += 1
+            img = cv2.imread(str(path))
+            if img is None:
+                continue
+            canvas, _ = letterbox(img, self.imgsz)
+            return {self.input_name: to_input_tensor(canvas)[np.newaxis]}
+        return None
+
+    def rewind(self):
+        self._index = 0
+
+
+def detect_head_nodes(onnx_path):
+    """
+    Nama node head deteksi YOLO (modul /model.N/ terakhir)
+
+    Head berisi decode box dan concat skor kelas; meng-kuantisasi bagian ini
+    membuat koordinat box melenceng jauh, jadi dibiarkan fp32.
+    """
+    import onnx
+
+    model = onnx.load(str(onnx_path))
+    pattern = re.compile(r'^/model\.(\d+)/')
+    indices = {}
+    for node in model.graph.node:
+        match = pattern.match(node.name)
+        if match:
+            indices.setdefault(int(match.group(1)), []).append(node.name)
+    if not indices:
+        return []
+    return indices[max(indices)]
+
+
+def quantize_int8(fp32_path, output_path, calibration_images, imgsz=ONNX_INPUT_SIZE):
+    """
+    Static int8 quantization (QDQ, per-channel weight) dengan kalibrasi MinMax
+
+    Returns:
+        Path file ONNX int8
+    """
+    import onnxruntime as ort
+    from onnxruntime.quantization import (
+        CalibrationMethod,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+
+    # Shape inference + optimasi graph sebelum quantization (disarankan onnxruntime)
+    source = Path(fp32_path)
+    prepared = source.with_suffix('.prep.onnx')
+    try:
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+        quant_pre_process(str(source), str(prepared))
+        source = prepared
+    except Exception as e:
+        print(f"Skipping quantization pre-processing: {e}", file=sys.stderr)
+
+    input_name = ort.InferenceSession(str(source), providers=['CPUExecutionProvider']).get_inputs()[0].name
+    reader = KTPCalibrationReader(input_name, calibration_images, imgsz=imgsz)
+
+    try:
+        quantize_static(
+            str(source),
+            str(output_path),
+            reader,
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            weight_type=QuantType.QInt8,
+            activation_type=QuantType.QUInt8,
+            calibrate_method=CalibrationMethod.MinMax,
+            nodes_to_exclude=detect_head_nodes(source),
+        )
+    finally:
+        if prepared.exists():
+            prepared.unlink()
+    return Path(output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export model deteksi KTP ke ONNX (opsional int8)')
+    script_dir = Path(__file__).parent
+    parser.add_argument('--model', '-m', default=str(script_dir / 'models' / 'best.pt'),
+                        help='Path model .pt (default: models/best.pt)')
+    parser.add_argument('--output', '-o', help='Path output .onnx (default: sama dengan model, ekstensi .onnx)')
+    parser.add_argument('--imgsz', type=int, default=ONNX_INPUT_SIZE, help='Ukuran input model (default: 640)')
+    parser.add_argument('--opset', type=int, default=12, help='ONNX opset (default: 12)')
+    parser.add_argument('--int8', action='store_true', help='Buat juga varian int8 (<output>.int8.onnx)')
+    parser.add_argument('--calibration', help='Folder contoh foto KTP untuk kalibrasi int8')
+    parser.add_argument('--calibration-limit', type=int, default=100,
+                        help='Jumlah maksimum gambar kalibrasi (default: 100)')
+    args = parser.parse_args()
+
+    model_path = Path(args.model)
+    if not model_path.exists():
+        print(f"Error: Model file not found: {model_path}")
+        sys.exit(1)
+
+    output_path = Path(args.output) if args.output else model_path.with_suffix('.onnx')
+
+    print(f"Exporting {model_path} → {output_path} ...")
+    export_fp32(model_path, output_path, imgsz=args.imgsz, opset=args.opset)
+    print(f"fp32: {output_path} ({os.path.getsize(output_path) / 1e6:.1f} MB)")
+
+    if args.int8:
+        if not args.calibration:
+            print("Error: --int8 requires --calibration DIR with sample KTP photos")
+            sys.exit(1)
+        images = sorted(
+            f for f in Path(args.calibration).iterdir()
+            if f.suffix.lower() in ('.jpg', '.jpeg', '.png')
+        )[:args.calibration_limit]
+        if not images:
+            print(f"Error: No calibration images found in {args.calibration}")
+            sys.exit(1)
+
+        int8_path = output_path.with_suffix('.int8.onnx')
+        print(f"Quantizing to int8 with {len(images)} calibration images → {int8_path} ...")
+        quantize_int8(output_path, int8_path, images, imgsz=args.imgsz)
+        print(f"int8: {int8_path} ({os.path.getsize(int8_path) / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Hand-off gambar lewat file (by reference) untuk request / response daemon
+
+Alternatif dari base64 di dalam JSON (payload +33%, json.load string multi-MB
+lalu base64.b64decode sebelum pekerjaan dimulai):
+
+Request:  "image_file" berisi path raw image bytes (JPEG / PNG apa adanya):
+          - file di /dev/shm/ktp-images (shared memory, tanpa I/O disk;
+            folder privat mode 0700), atau
+          - sidecar di samping file request; path relatif di-resolve terhadap
+            request_dir (mis. "<uuid>.jpg" di sebelah "<uuid>.json")
+          Hanya file reguler yang langsung berada di folder tersebut yang
+          diterima (bukan subfolder, bukan symlink).
+          Daemon me-mmap file tersebut dan men-decode langsung dari mapping.
+          File tetap milik pengirim: hapus setelah response diterima.
+
+Response: request dengan "crop_output": "file" menerima crop sebagai file
+          ("cropped_image_file") di shared dir daemon, bukan base64
+          "cropped_image". File crop menjadi milik penerima: hapus setelah dibaca.
+
+Field "image" (base64 / raw bytes socket) tetap didukung seperti sebelumnya.
+"""
+
+import mmap
+import os
+import stat
+import uuid
+from pathlib import Path
+
+SHM_DIR = Path('/dev/shm')
+# Folder privat di shared memory untuk hand-off gambar (bukan /dev/shm itu sendiri,
+# yang juga berisi segmen milik proses lain)
+SHM_IMAGE_DIR = SHM_DIR / 'ktp-images'
+
+# Nilai "crop_output"
+CROP_OUTPUT_BASE64 = 'base64'
+CROP_OUTPUT_FILE = 'file'
+CROP_OUTPUTS = (CROP_OUTPUT_BASE64, CROP_OUTPUT_FILE)
+
+
+class ImageRefError(ValueError):
+    """Referensi gambar tidak valid (di luar direktori yang diizinkan, kosong, tidak ada)"""
+
+
+def ensure_private_dir(directory):
+    """
+    Buat `directory` (mode 0700) jika belum ada, lalu pastikan folder tersebut
+    privat: folder sungguhan (bukan symlink), milik user ini, tanpa akses group / other
+
+    Returns:
+        True jika folder bisa dipakai, False jika tidak
+    """
+    directory = Path(directory)
+    try:
+        directory.mkdir(mode=0o700, exist_ok=True)
+        info = os.lstat(directory)
+    except OSError:
+        return False
+    return (
+        stat.S_ISDIR(info.st_mode)
+        and info.st_uid == os.getuid()
+        and not info.st_mode & 0o077
+    )
+
+
+def default_shared_dir(fallback):
+    """/dev/shm/ktp-images jika bisa dibuat sebagai folder privat, selain itu `fallback` (mis. response_dir)"""
+    if SHM_DIR.is_dir() and os.access(SHM_DIR, os.W_OK) and ensure_private_dir(SHM_IMAGE_DIR):
+        return SHM_IMAGE_DIR
+    return Path(fallback)
+
+
+def resolve_image_file(name, request_dir, allowed_dirs=()):
+    """
+    Path absolut file gambar dari field "image_file"
+
+    Hanya file yang langsung berada di request_dir, /dev/shm/ktp-images atau
+    allowed_dirs yang diterima, dan bukan symlink, supaya request tidak bisa
+    membuat daemon membaca file sembarang.
+
+    Raises:
+        ImageRefError: Jika path kosong, symlink atau di luar direktori yang diizinkan
+    """
+    if not isinstance(name, str) or not name:
+        raise ImageRefError(f"Invalid image_file: {name!r}")
+    path = Path(name)
+    if not path.is_absolute():
+        path = Path(request_dir) / path
+    path = Path(os.path.normpath(path))
+    if path.is_symlink():
+        raise ImageRefError(f"image_file must not be a symlink: {name}")
+    parent = path.parent.resolve()
+    for directory in (Path(request_dir), SHM_IMAGE_DIR, *map(Path, allowed_dirs)):
+        if parent == directory.resolve():
+            return parent / path.name
+    raise ImageRefError(f"image_file must be in the request directory or {SHM_IMAGE_DIR}: {name}")
+
+
+def map_image_file(path):
+    """
+    Memory-map file gambar (read-only)
+
+    Returns:
+        memoryview ke mapping; mapping dilepas otomatis setelah view tidak dipakai lagi
+
+    Raises:
+        ImageRefError: Jika file tidak ada, symlink, bukan file reguler atau kosong
+    """
+    try:
+        # O_NOFOLLOW: symlink yang dipasang setelah resolve_image_file tetap ditolak
+        fd = os.open(path, os.O_RDONLY | os.O_NOFOLLOW | os.O_NONBLOCK)
+    except FileNotFoundError:
+        raise ImageRefError(f"image_file not found: {path}") from None
+    except OSError as e:
+        raise ImageRefError(f"image_file cannot be opened: {path} ({e.strerror})") from None
+    try:
+        info = os.fstat(fd)
+        if not stat.S_ISREG(info.st_mode):
+            raise ImageRefError(f"image_file is not a regular file: {path}")
+        if info.st_size == 0:
+            raise ImageRefError(f"image_file is empty: {path}")
+        # Mapping tetap valid setelah fd ditutup (dan setelah file di-unlink pengirim)
+        return memoryview(mmap.mmap(fd, 0, access=mmap.ACCESS_READ))
+    finally:
+        os.close(fd)
+
+
+def write_image_file(data, directory, suffix='.jpg', prefix='ktp-crop-'):
+    """
+    Tulis image bytes ke file baru di `directory` (mis. crop untuk "crop_output": "file")
+
+    Returns:
+        Path file (str)
+    """
+    path = Path(directory) / f"{prefix}{uuid.uuid4().hex}{suffix}"
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        view = memoryview(data).cast('B')
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+    return str(path)
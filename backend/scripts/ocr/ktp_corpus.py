@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Corpus teks OCR KTP yang dianonimkan (untuk benchmark ekstraksi field)
+
+Hasil OCR dari traffic nyata (full_text / text_blocks) dicatat ke file JSONL
+dengan format yang sama seperti benchmarks/corpus/*.jsonl:
+
+    {"full_text": ["PROVINSI JAWA BARAT", ...], "text_blocks": [{"text", "confidence", "bbox"}, ...]}
+
+Anonimisasi menjaga format supaya pattern ekstraksi field tetap berperilaku sama:
+- setiap deret digit diganti digit acak dengan panjang sama (NIK tetap 16 digit,
+  spasi / tanda baca tetap)
+- setiap kata yang bukan bagian dari label / nilai umum KTP (nama, jalan,
+  kelurahan, ...) diganti kata sintetis dengan panjang dan huruf besar / kecil
+  yang sama; kata yang sama dalam satu dokumen selalu mendapat pengganti yang sama
+
+Posisi kata menentukan apa yang dipertahankan:
+- posisi label (sebelum ":" atau awal baris yang diawali label KTP, lihat
+  ktp_layout.match_label): kata label, termasuk label yang terpotong / tergabung
+  oleh OCR (mis. "camatan", "ToiLahir")
+- posisi value (selebihnya): hanya kata yang persis sama dengan kata label /
+  nilai umum KTP (ISLAM, KAWIN, JAWA BARAT, ...); kata lain selalu diganti,
+  termasuk nama yang kebetulan memuat kata label (mis. "ISLAMIATI", "GURUH")
+
+Sumber:
+- daemon dengan --record-corpus FILE (lihat daemon_base.py), atau
+- CLI ini untuk response daemon yang sudah tersimpan (raw.combined_text)
+
+Usage:
+    python ktp_corpus.py responses/*.json -o benchmarks/corpus/recorded.jsonl
+    python ktp_corpus.py captured_responses.jsonl -o recorded.jsonl
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import threading
+import unicodedata
+from functools import partial
+from pathlib import Path
+
+from ktp_layout import match_label
+
+# Kata label / nilai umum KTP yang tidak mengandung data pribadi (lowercase)
+KEEP_WORDS = frozenset('''
+    provinsi kota kabupaten kab nik nama lengkap tempat tgl tanggal lahir jenis kelamin laki perempuan
+    lak male female gol darah ab alamat rt rw kel desa kelurahan kecamatan agama status perkawinan pekerjaan
+    kewarganegaraan berlaku hingga seumur hidup wni wna republik indonesia
+    islam kristen protestan katholik katolik hindu budha buddha konghucu kepercayaan
+    belum kawin cerai mati
+    karyawan swasta pelajar mahasiswa wiraswasta mengurus rumah tangga pegawai negeri sipil pns tni polri
+    petani pekebun buruh harian lepas tidak bekerja pensiunan guru dosen dokter pedagang nelayan sopir
+    perdagangan transportasi honorer bumn bumd
+    jl jln jalan no blok gg gang kp kampung perum perumahan komp komplek dusun dsn lingk lk rtrw
+    aceh sumatera sumatra utara barat selatan tengah timur riau jambi bengkulu lampung bangka belitung
+    kepulauan dki jakarta jawa banten bali nusa tenggara kalimantan sulawesi gorontalo maluku papua
+    yogyakarta daerah istimewa
+'''.split())
+
+# Potongan label minimal yang masih dipertahankan di posisi label (mis. "camatan", "negaraan")
+MIN_FRAGMENT = 4
+
+# Kata pengganti (fiktif), dipilih berdasarkan panjang kata asli
+SYNTHETIC_WORDS = [
+    'ADI', 'EKA', 'IDA', 'AGUS', 'BAYU', 'DEWI', 'DONI', 'RINA', 'SARI', 'WATI', 'YUDI',
+    'ANDRI', 'BUDHI', 'CITRA', 'DIMAS', 'FITRI', 'INDAH', 'JOKO', 'LESTI', 'PUTRA', 'RATNA',
+    'ANGGUN', 'GILANG', 'HENDRA', 'KURNIA', 'MULYADI', 'SUSANTI', 'PERMANA', 'SETIAWAN',
+    'KUSNADI', 'HARTONO', 'PRATAMA', 'WIBOWO', 'SUGIARTO', 'RAHMAWATI', 'HERMAWAN', 'NURHAYATI',
+    'SUKMAWATI', 'KURNIAWAN', 'SETIABUDI', 'WIJAYAKUSUMA',
+]
+
+_SYLLABLES = ['BA', 'DI', 'GA', 'HA', 'JA', 'KA', 'LA', 'MA', 'NA', 'RA', 'SA', 'TA', 'WA', 'YA', 'NI', 'RI', 'TO']
+
+_WORD = re.compile(r'[^\W\d_]+')
+_DIGITS = re.compile(r'\d+')
+
+
+def _keep_word(lower, label=False):
+    """
+    Kata label / nilai umum KTP; di posisi label juga potongan atau gabungan
+    label hasil OCR
+    """
+    # Huruf tunggal (gol. darah, blok, nomor) tidak identifikatif
+    if len(lower) == 1 or lower in KEEP_WORDS:
+        return True
+    if not label or len(lower) < MIN_FRAGMENT:
+        return False
+    return any(
+        (len(word) >= MIN_FRAGMENT and word in lower) or lower in word
+        for word in KEEP_WORDS
+    )
+
+
+def _label_end(text):
+    """
+    Akhir bagian label dari satu baris / block teks OCR
+
+    Returns:
+        Offset: sampai ":" pertama, sampai akhir label jika baris diawali label
+        KTP tanpa ":", atau 0 jika seluruh baris adalah value
+    """
+    colon = text.find(':')
+    if colon >= 0:
+        return colon
+    label = match_label(text)
+    if label is None:
+        return 0
+    return len(text) - len(label[1])
+
+
+def _match_case(word, template):
+    if template.isupper():
+        return word.upper()
+    if template.islower():
+        return word.lower()
+    if template[:1].isupper():
+        return word.capitalize()
+    return word.lower()
+
+
+class Anonymizer:
+    """
+    Pengganti kata dan digit untuk satu dokumen
+
+    Satu instance per dokumen: kata (case-insensitive) dan deret digit yang
+    sama mendapat pengganti yang sama di full_text dan text_blocks.
+    """
+
+    def __init__(self, rng=None):
+        self.rng = rng or random.Random()
+        self._words = {}
+        self._digits = {}
+
+    def _synthetic_word(self, length):
+        candidates = [w for w in SYNTHETIC_WORDS if len(w) == length]
+        if candidates:
+            return self.rng.choice(candidates)
+        word = ''
+        while len(word) < length:
+            word += self.rng.choice(_SYLLABLES)
+        return word[:length]
+
+    def _replace_word(self, match, label=False):
+        word = match.group(0)
+        lower = word.lower()
+        if not lower.isascii():
+            # Diakritik hasil OCR (mis. "ĶAWIN") tetap dikenali sebagai label
+            lower = unicodedata.normalize('NFKD', lower).encode('ascii', 'ignore').decode()
+        if _keep_word(lower, label):
+            return word
+        replacement = self._words.get(lower)
+        if replacement is None:
+            replacement = self._words[lower] = self._synthetic_word(len(word))
+        return _match_case(replacement, word)
+
+    def _replace_digits(self, match):
+        digits = match.group(0)
+        replacement = self._digits.get(digits)
+        if replacement is None:
+            replacement = self._digits[digits] = ''.join(str(self.rng.randrange(10)) for _ in digits)
+        return replacement
+
+    def text(self, text):
+        """Anonimkan satu baris teks OCR"""
+        text = _DIGITS.sub(self._replace_digits, text)
+        end = _label_end(text)
+        return (_WORD.sub(partial(self._replace_word, label=True), text[:end])
+                + _WORD.sub(self._replace_word, text[end:]))
+
+
+def anonymize_entry(full_text, text_blocks=None, rng=None):
+    """
+    Entry corpus yang dianonimkan
+
+    Args:
+        full_text: List baris teks OCR
+        text_blocks: List blok {'text', 'confidence', 'bbox'} (opsional)
+
+    Returns:
+        Dictionary {'full_text': [...]} (+ 'text_blocks' jika diberikan)
+    """
+    anonymizer = Anonymizer(rng)
+    entry = {'full_text': [anonymizer.text(line) for line in full_text]}
+    if text_blocks:
+        entry['text_blocks'] = [
+            dict(block, text=anonymizer.text(block.get('text', ''))) for block in text_blocks
+        ]
+    return entry
+
+
+class CorpusRecorder:
+    """
+    Append entry corpus yang dianonimkan ke file JSONL (thread-safe)
+
+    Setiap entry ditulis dengan satu write() ke file O_APPEND, jadi worker
+    pre-fork bisa menulis ke file yang sama.
+    """
+
+    def __init__(self, path, sample_rate=1.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.sample_rate = sample_rate
+        self.recorded = 0
+        self._rng = random.SystemRandom()
+        self._lock = threading.Lock()
+
+    def record(self, extracted_data):
+        """
+        Catat hasil KTPOCR.extract_text (full_text / text_blocks)
+
+        Returns:
+            True jika entry ditulis
+        """
+        full_text = extracted_data.get('full_text')
+        if not full_text or self._rng.random() >= self.sample_rate:
+            return False
+        entry = anonymize_entry(full_text, extracted_data.get('text_blocks'), rng=self._rng)
+        line = (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+            self.recorded += 1
+        return True
+
+
+def _response_texts(response):
+    """full_text dari response daemon (OCR: raw, pipeline: cards[].raw)"""
+    raws = [response.get('raw')] + [card.get('raw') for card in response.get('cards') or []]
+    for raw in raws:
+        if raw and raw.get('combined_text'):
+            yield raw['combined_text'].split('\n')
+
+
+def _load_responses(path):
+    """Response daemon dari file .json (satu response) atau .jsonl (satu response per baris)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.suffix == '.jsonl':
+            return [json.loads(line) for line in f if line.strip()]
+        return [json.load(f)]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Buat corpus teks OCR KTP yang dianonimkan dari response daemon')
+    parser.add_argument('inputs', nargs='+', help='File response .json / .jsonl, atau folder berisi file tersebut')
+    parser.add_argument('--output', '-o', required=True, help='File corpus JSONL (di-append)')
+    args = parser.parse_args()
+
+    files = []
+    for item in map(Path, args.inputs):
+        if item.is_dir():
+            files.extend(sorted(p for p in item.iterdir() if p.suffix in ('.json', '.jsonl')))
+        else:
+            files.append(item)
+
+    recorder = CorpusRecorder(args.output)
+    skipped = 0
+    for path in files:
+        try:
+            responses = _load_responses(path)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Skip {path}: {e}", file=sys.stderr)
+            skipped += 1
+            continue
+        for response in responses:
+            for full_text in _response_texts(response):
+                recorder.record({'full_text': full_text})
+
+    print(f"{recorder.recorded} entry ditulis ke {args.output}" + (f" ({skipped} file dilewati)" if skipped else ''))
+
+
+if __name__ == '__main__':
+    main()
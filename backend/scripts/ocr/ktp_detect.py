@@ -1,22 +1,88 @@
 #!/usr/bin/env python3
 """
 Script untuk deteksi dan crop KTP menggunakan model machine learning
-Menggunakan PyTorch YOLO model untuk deteksi bounding box KTP
+Menggunakan PyTorch YOLO model untuk deteksi bounding box KTP, atau model
+ONNX hasil export_onnx.py (ONNX Runtime CPU, tanpa torch)
 """
 
-import torch
 import cv2
 import numpy as np
-from PIL import Image
 import os
 import sys
 from pathlib import Path
 
+from ktp_image import BGR, RGB, KTPImage
+from request_deadline import check_deadline
+from stage_metrics import stage
+
 # Suppress warnings
 if os.getenv('SUPPRESS_OCR_LOGS') == '1':
     import warnings
     warnings.filterwarnings('ignore')
 
+# Ukuran input default model ONNX (imgsz saat export)
+ONNX_INPUT_SIZE = 640
+
+# Sama dengan default ultralytics predict() supaya hasil ONNX setara dengan model .pt
+ONNX_CONF_THRESHOLD = 0.25
+ONNX_IOU_THRESHOLD = 0.7
+ONNX_MAX_DET = 300
+
+
+def letterbox(img, size, canvas=None):
+    """
+    Letterbox gambar 3 channel ke kanvas persegi (seperti LetterBox ultralytics, padding 114 di tengah)
+
+    Args:
+        img: numpy array BGR (atau RGB; urutan channel tidak diubah)
+        size: Sisi kanvas
+        canvas: Buffer uint8 (size, size, 3) yang dipakai ulang (opsional)
+
+    Returns:
+        Tuple (canvas, (ratio, left, top)) untuk mengembalikan koordinat ke gambar original
+    """
+    h, w = img.shape[:2]
+    ratio = min(size / h, size / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+    left = int(round((size - new_w) / 2 - 0.1))
+    top = int(round((size - new_h) / 2 - 0.1))
+
+    if canvas is None:
+        canvas = np.empty((size, size, 3), dtype=np.uint8)
+    canvas.fill(114)
+    if (new_w, new_h) != (w, h):
+        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    canvas[top:top + new_h, left:left + new_w] = img
+    return canvas, (ratio, left, top)
+
+
+def to_input_tensor(canvas, out=None, order=BGR):
+    """Kanvas uint8 (H, W, 3) BGR / RGB (`order`) → tensor RGB float32 (3, H, W) 0-1"""
+    chw = (canvas[..., ::-1] if order == BGR else canvas).transpose(2, 0, 1)
+    if out is None:
+        out = np.empty(chw.shape, dtype=np.float32)
+    np.divide(chw, 255.0, out=out, casting='unsafe')
+    return out
+
+
+def _nms(boxes, scores, iou_threshold):
+    """Non-maximum suppression (NumPy), return index box yang dipertahankan"""
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.maximum(0.0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+        h = np.maximum(0.0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
 class KTPDetector:
     def __init__(self, model_path=None):
         """
@@ -39,29 +105,58 @@ class KTPDetector:
         
         # Load model
         try:
-            # Try to load as YOLO model (ultralytics format)
-            try:
-                from ultralytics import YOLO
-                self.model = YOLO(str(model_path))
-                self.model_type = 'yolo'
-                if os.getenv('SUPPRESS_OCR_LOGS') != '1':
-                    print("Loaded as YOLO model", file=sys.stderr)
-            except ImportError:
-                # Fallback to torch.load for custom PyTorch models
-                device = 'cuda' if torch.cuda.is_available() else 'cpu'
-                self.model = torch.load(str(model_path), map_location=device)
-                self.model.eval()
-                self.model_type = 'pytorch'
-                self.device = device
-                if os.getenv('SUPPRESS_OCR_LOGS') != '1':
-                    print(f"Loaded as PyTorch model on {device}", file=sys.stderr)
+            if model_path.suffix.lower() == '.onnx':
+                # ONNX Runtime CPU (hasil export_onnx.py, fp32 atau int8)
+                self._load_onnx(model_path)
+            else:
+                self._load_torch(model_path)
         except Exception as e:
             raise RuntimeError(f"Failed to load model: {str(e)}")
         
         if os.getenv('SUPPRESS_OCR_LOGS') != '1':
             print("KTP detection model loaded successfully!", file=sys.stderr)
     
-    def detect_and_crop(self, image_input, return_multiple=False, min_confidence=0.5):
+    def _load_torch(self, model_path):
+        """Load model .pt sebagai YOLO (ultralytics) atau model PyTorch custom"""
+        # Try to load as YOLO model (ultralytics format)
+        try:
+            from ultralytics import YOLO
+            self.model = YOLO(str(model_path))
+            self.model_type = 'yolo'
+            if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+                print("Loaded as YOLO model", file=sys.stderr)
+        except ImportError:
+            # Fallback to torch.load for custom PyTorch models
+            import torch
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+            self.model = torch.load(str(model_path), map_location=device)
+            self.model.eval()
+            self.model_type = 'pytorch'
+            self.device = device
+            if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+                print(f"Loaded as PyTorch model on {device}", file=sys.stderr)
+    
+    def _load_onnx(self, model_path):
+        """Load model ONNX dengan ONNX Runtime (CPU execution provider)"""
+        import onnxruntime as ort
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.model = ort.InferenceSession(
+            str(model_path), sess_options=options, providers=['CPUExecutionProvider']
+        )
+        self.model_type = 'onnx'
+        
+        # Input: [batch, 3, H, W]; batch berupa string jika di-export dengan dynamic=True
+        model_input = self.model.get_inputs()[0]
+        self._onnx_input_name = model_input.name
+        shape = model_input.shape
+        self._onnx_size = shape[2] if isinstance(shape[2], int) else ONNX_INPUT_SIZE
+        self._onnx_batch = shape[0] if isinstance(shape[0], int) else None
+        if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+            print(f"Loaded as ONNX model (input {shape}, CPUExecutionProvider)", file=sys.stderr)
+    
+    def detect_and_crop(self, image_input, return_multiple=False, min_confidence=0.5, crop_format='pil'):
         """
         Deteksi KTP dalam gambar dan crop area KTP
         
@@ -69,15 +164,20 @@ class KTPDetector:
             image_input: Bisa berupa:
                 - Path ke file gambar (str atau Path)
                 - PIL Image object
-                - numpy array (BGR format dari cv2)
+                - numpy array RGB (atau grayscale), dipakai tanpa copy
                 - bytes (raw image data)
+                - KTPImage (mis. KTPImage(img, BGR) untuk array BGR dari cv2)
             return_multiple: Jika True, return semua detections. Jika False, return hanya yang terbaik.
             min_confidence: Minimum confidence threshold untuk detections (default: 0.5)
+            crop_format: Format cropped_image: 'pil' (PIL Image RGB, default),
+                         'bgr' (numpy array BGR, view ke gambar original tanpa konversi
+                         warna jika gambar BGR) atau 'image' (KTPImage view, urutan warna
+                         sama dengan input)
         
         Returns:
             Dictionary dengan:
                 - success: bool
-                - cropped_image: PIL Image (jika success dan return_multiple=False)
+                - cropped_image: PIL Image / numpy array / KTPImage (jika success dan return_multiple=False)
                 - cropped_images: List of dicts dengan cropped_image, bbox, confidence (jika return_multiple=True)
                 - bbox: bounding box coordinates (x1, y1, x2, y2) (jika success dan return_multiple=False)
                 - original_size: (width, height) dari gambar original
@@ -85,189 +185,27 @@ class KTPDetector:
                 - error: error message (jika failed)
         """
         try:
-            # Convert input to numpy array (BGR format)
-            if isinstance(image_input, (str, Path)):
-                # File path
-                img = cv2.imread(str(image_input))
-                if img is None:
-                    return {
-                        'success': False,
-                        'error': f'Failed to read image from path: {image_input}'
-                    }
-            elif isinstance(image_input, Image.Image):
-                # PIL Image
-                img = cv2.cvtColor(np.array(image_input), cv2.COLOR_RGB2BGR)
-            elif isinstance(image_input, np.ndarray):
-                # Already numpy array
-                img = image_input.copy()
-                # If RGB, convert to BGR
-                if len(img.shape) == 3 and img.shape[2] == 3:
-                    # Assume RGB if not already BGR
-                    img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
-            elif isinstance(image_input, bytes):
-                # Raw bytes
-                nparr = np.frombuffer(image_input, np.uint8)
-                img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                if img is None:
-                    return {
-                        'success': False,
-                        'error': 'Failed to decode image from bytes'
-                    }
-            else:
+            img, error = self._load_image(image_input)
+            if error:
                 return {
                     'success': False,
-                    'error': f'Unsupported image input type: {type(image_input)}'
+                    'error': error
                 }
-            
-            original_height, original_width = img.shape[:2]
+            check_deadline('image_decode')
             
             # Run detection
             if self.model_type == 'yolo':
                 # YOLO model (ultralytics)
-                results = self.model(img, verbose=False)
-                
-                # Get first result
-                if len(results) == 0 or len(results[0].boxes) == 0:
-                    return {
-                        'success': False,
-                        'error': 'No KTP detected in image'
-                    }
-                
-                # Get all boxes with confidence scores
-                boxes = results[0].boxes
-                detections = []
-                
-                for box in boxes:
-                    conf = float(box.conf[0]) if hasattr(box, 'conf') else 1.0
-                    if conf >= min_confidence:
-                        xyxy = box.xyxy[0].cpu().numpy()
-                        x1, y1, x2, y2 = map(int, xyxy)
-                        
-                        # Ensure coordinates are within image bounds
-                        x1 = max(0, min(x1, original_width))
-                        y1 = max(0, min(y1, original_height))
-                        x2 = max(0, min(x2, original_width))
-                        y2 = max(0, min(y2, original_height))
-                        
-                        # Ensure valid box
-                        if x2 > x1 and y2 > y1:
-                            detections.append({
-                                'bbox': (x1, y1, x2, y2),
-                                'confidence': conf
-                            })
-                
-                if len(detections) == 0:
-                    return {
-                        'success': False,
-                        'error': 'No valid KTP detection found (confidence too low)'
-                    }
-                
-                # Sort by confidence (highest first)
-                detections.sort(key=lambda x: x['confidence'], reverse=True)
-                
-                # If return_multiple, return all detections
-                if return_multiple:
-                    cropped_images = []
-                    for det in detections:
-                        x1, y1, x2, y2 = det['bbox']
-                        cropped = img[y1:y2, x1:x2]
-                        cropped_rgb = cv2.cvtColor(cropped, cv2.COLOR_BGR2RGB)
-                        cropped_pil = Image.fromarray(cropped_rgb)
-                        cropped_images.append({
-                            'cropped_image': cropped_pil,
-                            'bbox': det['bbox'],
-                            'confidence': det['confidence']
-                        })
-                    
-                    return {
-                        'success': True,
-                        'cropped_images': cropped_images,
-                        'original_size': (original_width, original_height),
-                    }
-                
-                # Otherwise, return only the best detection
-                best_det = detections[0]
-                x1, y1, x2, y2 = best_det['bbox']
-                cropped = img[y1:y2, x1:x2]
-                cropped_rgb = cv2.cvtColor(cropped, cv2.COLOR_BGR2RGB)
-                cropped_pil = Image.fromarray(cropped_rgb)
-                
-                return {
-                    'success': True,
-                    'cropped_image': cropped_pil,
-                    'bbox': best_det['bbox'],
-                    'original_size': (original_width, original_height),
-                    'confidence': best_det['confidence']
-                }
-                
+                with stage('detect'):
+                    results = self.model(img.bgr(), verbose=False)
+                return self._build_yolo_result(
+                    img, results[0] if len(results) > 0 else None,
+                    return_multiple, min_confidence, crop_format
+                )
+            elif self.model_type == 'onnx':
+                return self._detect_onnx_batch([img], return_multiple, min_confidence, crop_format)[0]
             else:
-                # Custom PyTorch model - only supports single detection
-                # Preprocess image
-                img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                img_tensor = self._preprocess_image(img_rgb)
-                
-                # Run inference
-                with torch.no_grad():
-                    if isinstance(self.model, torch.nn.Module):
-                        output = self.model(img_tensor.to(self.device))
-                    else:
-                        output = self.model(img_tensor.to(self.device))
-                
-                # Parse output (adjust based on your model's output format)
-                # Assuming output is [batch, 4] for bbox coordinates (normalized)
-                if isinstance(output, (list, tuple)):
-                    bbox = output[0] if len(output) > 0 else None
-                elif isinstance(output, torch.Tensor):
-                    bbox = output[0].cpu().numpy() if output.dim() > 1 else output.cpu().numpy()
-                else:
-                    bbox = output
-                
-                if bbox is None:
-                    return {
-                        'success': False,
-                        'error': 'Model output is invalid'
-                    }
-                
-                # Convert normalized coordinates to pixel coordinates
-                if len(bbox) >= 4:
-                    # Assuming format: [x1, y1, x2, y2] normalized (0-1)
-                    x1 = int(bbox[0] * original_width)
-                    y1 = int(bbox[1] * original_height)
-                    x2 = int(bbox[2] * original_width)
-                    y2 = int(bbox[3] * original_height)
-                else:
-                    return {
-                        'success': False,
-                        'error': 'Invalid bounding box format'
-                    }
-                
-                # Ensure coordinates are within image bounds
-                x1 = max(0, min(x1, original_width))
-                y1 = max(0, min(y1, original_height))
-                x2 = max(0, min(x2, original_width))
-                y2 = max(0, min(y2, original_height))
-                
-                # Ensure valid box
-                if x2 <= x1 or y2 <= y1:
-                    return {
-                        'success': False,
-                        'error': 'Invalid bounding box coordinates'
-                    }
-                
-                # Crop image
-                cropped = img[y1:y2, x1:x2]
-                
-                # Convert to PIL Image (RGB)
-                cropped_rgb = cv2.cvtColor(cropped, cv2.COLOR_BGR2RGB)
-                cropped_pil = Image.fromarray(cropped_rgb)
-                
-                return {
-                    'success': True,
-                    'cropped_image': cropped_pil,
-                    'bbox': (x1, y1, x2, y2),
-                    'original_size': (original_width, original_height),
-                    'confidence': None
-                }
+                return self._detect_pytorch(img, crop_format)
             
         except Exception as e:
             return {
@@ -275,33 +213,487 @@ class KTPDetector:
                 'error': f'Detection error: {str(e)}'
             }
     
+    def detect_and_crop_batch(self, image_inputs, return_multiple=False, min_confidence=0.5, crop_format='pil'):
+        """
+        Deteksi KTP pada beberapa gambar sekaligus (untuk micro-batching di daemon)
+        
+        Buffer letterbox / tensor yang dipakai ulang hanya berlaku untuk model
+        PyTorch custom dan ONNX. Model YOLO (ultralytics) tetap melakukan
+        preprocessing sendiri per panggilan: tensor letterbox dari luar akan
+        mengubah box dibanding detect_and_crop.
+        
+        Args:
+            image_inputs: List input gambar (tipe sama seperti detect_and_crop)
+            return_multiple, min_confidence, crop_format: Sama seperti detect_and_crop
+        
+        Returns:
+            List hasil dengan format sama seperti detect_and_crop, urutan sama dengan input
+        """
+        results = [None] * len(image_inputs)
+        
+        # Decode semua input; input yang gagal langsung dapat error result
+        # Untuk YOLO gambar dikelompokkan per shape: ultralytics mem-pad batch dengan
+        # ukuran berbeda ke kanvas persegi penuh sehingga box sedikit berbeda dibanding
+        # panggilan satu gambar. Dengan grouping, hasil identik dengan detect_and_crop.
+        # Model PyTorch custom dan ONNX selalu di-letterbox ke kanvas tetap, jadi satu grup saja.
+        groups = {}
+        for i, image_input in enumerate(image_inputs):
+            try:
+                img, error = self._load_image(image_input)
+            except Exception as e:
+                img, error = None, f'Detection error: {str(e)}'
+            if error:
+                results[i] = {
+                    'success': False,
+                    'error': error
+                }
+            else:
+                key = img.shape if self.model_type == 'yolo' else None
+                groups.setdefault(key, []).append((i, img))
+        check_deadline('image_decode')
+        
+        for members in groups.values():
+            try:
+                if self.model_type == 'yolo':
+                    # Satu forward pass untuk semua gambar dengan shape yang sama
+                    with stage('detect'):
+                        predictions = self.model([img.bgr() for _, img in members], verbose=False)
+                    for (i, img), prediction in zip(members, predictions):
+                        results[i] = self._build_yolo_result(
+                            img, prediction, return_multiple, min_confidence, crop_format
+                        )
+                elif self.model_type == 'onnx':
+                    batch_results = self._detect_onnx_batch(
+                        [img for _, img in members], return_multiple, min_confidence, crop_format
+                    )
+                    for (i, _), result in zip(members, batch_results):
+                        results[i] = result
+                else:
+                    # Satu forward pass untuk seluruh batch
+                    batch_results = self._detect_pytorch_batch([img for _, img in members], crop_format)
+                    for (i, _), result in zip(members, batch_results):
+                        results[i] = result
+            except Exception as e:
+                for i, _ in members:
+                    if results[i] is None:
+                        results[i] = {
+                            'success': False,
+                            'error': f'Detection error: {str(e)}'
+                        }
+        
+        return results
+    
+    def _load_image(self, image_input):
+        """
+        Bungkus input sebagai KTPImage tanpa copy / konversi warna
+        
+        Numpy array 3 channel tetap dianggap RGB seperti sebelumnya, tetapi hanya
+        diberi tag RGB (tanpa copy + cvtColor); kirim KTPImage untuk array BGR.
+        PIL Image tetap RGB; konversi baru dilakukan oleh tahap yang butuh layout lain.
+        
+        Returns:
+            Tuple (img, error): img KTPImage, atau None dengan error message
+        """
+        if isinstance(image_input, np.ndarray) and image_input.ndim == 3 and image_input.shape[2] == 3:
+            return KTPImage(image_input, RGB), None
+        
+        try:
+            img = KTPImage.from_input(image_input)
+        except TypeError:
+            return None, f'Unsupported image input type: {type(image_input)}'
+        if img is None:
+            if isinstance(image_input, (str, Path)):
+                return None, f'Failed to read image from path: {image_input}'
+            return None, 'Failed to decode image from bytes'
+        
+        return img, None
+    
+    def _build_yolo_result(self, img, prediction, return_multiple, min_confidence, crop_format):
+        """
+        Susun hasil detect_and_crop dari satu hasil prediksi YOLO (ultralytics)
+        """
+        # Get first result
+        if prediction is None or len(prediction.boxes) == 0:
+            return {
+                'success': False,
+                'error': 'No KTP detected in image'
+            }
+        
+        # Get all boxes with confidence scores
+        # Satu transfer .cpu().numpy() untuk semua box, filter dan clip secara vektor
+        boxes = prediction.boxes
+        xyxy = boxes.xyxy.cpu().numpy()
+        if getattr(boxes, 'conf', None) is not None:
+            confs = boxes.conf.cpu().numpy()
+        else:
+            confs = np.ones(len(xyxy), dtype=np.float32)
+        
+        return self._build_detection_result(img, xyxy, confs, return_multiple, min_confidence, crop_format)
+    
+    def _build_detection_result(self, img, xyxy, confs, return_multiple, min_confidence, crop_format):
+        """
+        Susun hasil detect_and_crop dari array box (N, 4) xyxy dan confidence (N,)
+        """
+        original_height, original_width = img.shape[:2]
+        
+        # int() memotong ke arah nol, sama dengan astype pada float
+        coords = xyxy[:, :4].astype(np.int64)
+        
+        # Ensure coordinates are within image bounds
+        coords[:, [0, 2]] = np.clip(coords[:, [0, 2]], 0, original_width)
+        coords[:, [1, 3]] = np.clip(coords[:, [1, 3]], 0, original_height)
+        
+        # Ensure valid box
+        keep = (
+            (confs >= min_confidence)
+            & (coords[:, 2] > coords[:, 0])
+            & (coords[:, 3] > coords[:, 1])
+        )
+        keep_indices = np.flatnonzero(keep)
+        
+        if len(keep_indices) == 0:
+            return {
+                'success': False,
+                'error': 'No valid KTP detection found (confidence too low)'
+            }
+        
+        # Sort by confidence (highest first); stable supaya urutan box dengan
+        # confidence sama tetap seperti output model
+        order = keep_indices[np.argsort(-confs[keep_indices], kind='stable')]
+        detections = [
+            {
+                'bbox': tuple(int(v) for v in coords[i]),
+                'confidence': float(confs[i])
+            }
+            for i in order
+        ]
+        
+        # If return_multiple, return all detections
+        if return_multiple:
+            cropped_images = []
+            for det in detections:
+                cropped_images.append({
+                    'cropped_image': self._crop(img, det['bbox'], crop_format),
+                    'bbox': det['bbox'],
+                    'confidence': det['confidence']
+                })
+            
+            return {
+                'success': True,
+                'cropped_images': cropped_images,
+                'original_size': (original_width, original_height),
+            }
+        
+        # Otherwise, return only the best detection
+        best_det = detections[0]
+        
+        return {
+            'success': True,
+            'cropped_image': self._crop(img, best_det['bbox'], crop_format),
+            'bbox': best_det['bbox'],
+            'original_size': (original_width, original_height),
+            'confidence': best_det['confidence']
+        }
+    
+    def _detect_onnx_batch(self, imgs, return_multiple, min_confidence, crop_format):
+        """
+        Model ONNX (YOLO export) untuk beberapa gambar
+        
+        Model dengan batch dinamis dijalankan sekali untuk seluruh batch; model
+        dengan batch tetap dijalankan per potongan sebesar batch tersebut.
+        
+        Returns:
+            List hasil (format detect_and_crop), urutan sama dengan imgs
+        """
+        step = self._onnx_batch or len(imgs)
+        results = []
+        for offset in range(0, len(imgs), step):
+            chunk = imgs[offset:offset + step]
+            with stage('preprocess'):
+                tensor, transforms = self._onnx_input(chunk, self._onnx_batch or len(chunk))
+            # Output YOLOv8: [batch, 4 + jumlah kelas, jumlah anchor]
+            with stage('detect'):
+                output = self.model.run(None, {self._onnx_input_name: tensor})[0]
+            for img, prediction, transform in zip(chunk, output, transforms):
+                xyxy, confs = self._onnx_postprocess(prediction, transform, img.shape)
+                if len(confs) == 0:
+                    results.append({
+                        'success': False,
+                        'error': 'No KTP detected in image'
+                    })
+                    continue
+                results.append(self._build_detection_result(
+                    img, xyxy, confs, return_multiple, min_confidence, crop_format
+                ))
+        return results
+    
+    def _onnx_input(self, imgs, rows):
+        """
+        Letterbox gambar ke buffer input ONNX yang dipakai ulang
+        
+        Args:
+            imgs: List KTPImage
+            rows: Jumlah baris tensor (>= len(imgs); sisa baris untuk model dengan batch tetap)
+        
+        Returns:
+            Tuple (tensor float32 [rows, 3, S, S], list transform (ratio, left, top) per gambar)
+        """
+        size = self._onnx_size
+        tensor = getattr(self, '_onnx_tensor', None)
+        if tensor is None or tensor.shape[0] < rows:
+            tensor = np.zeros((rows, 3, size, size), dtype=np.float32)
+            self._onnx_tensor = tensor
+            self._onnx_canvas = np.empty((size, size, 3), dtype=np.uint8)
+        
+        transforms = []
+        for i, img in enumerate(imgs):
+            # Letterbox dari urutan warna apa adanya; flip ke RGB saat isi tensor
+            pixels, order = img.color()
+            canvas, transform = letterbox(pixels, size, canvas=self._onnx_canvas)
+            to_input_tensor(canvas, out=tensor[i], order=order)
+            transforms.append(transform)
+        return tensor[:rows], transforms
+    
+    def _onnx_postprocess(self, prediction, transform, image_shape):
+        """
+        Decode satu output YOLOv8 ONNX: confidence threshold, NMS per kelas, lalu
+        kembalikan box ke koordinat gambar original
+        
+        Returns:
+            Tuple (xyxy float32 (N, 4), confidence float32 (N,)) urut confidence menurun
+        """
+        ratio, left, top = transform
+        pred = prediction.T  # [anchor, 4 + kelas]
+        scores = pred[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confs = scores[np.arange(len(pred)), class_ids]
+        
+        candidates = confs > ONNX_CONF_THRESHOLD
+        if not candidates.any():
+            return np.empty((0, 4), dtype=np.float32), np.empty((0,), dtype=np.float32)
+        
+        boxes = pred[candidates, :4]
+        confs = confs[candidates]
+        class_ids = class_ids[candidates]
+        
+        # cx, cy, w, h → x1, y1, x2, y2 (koordinat kanvas letterbox)
+        xyxy = np.empty_like(boxes)
+        xyxy[:, :2] = boxes[:, :2] - boxes[:, 2:] / 2
+        xyxy[:, 2:] = boxes[:, :2] + boxes[:, 2:] / 2
+        
+        # NMS per kelas: geser box setiap kelas supaya tidak saling overlap
+        offsets = class_ids[:, None].astype(np.float32) * 7680.0
+        keep = _nms(xyxy + offsets, confs, ONNX_IOU_THRESHOLD)[:ONNX_MAX_DET]
+        xyxy = xyxy[keep]
+        confs = confs[keep]
+        
+        # Kanvas letterbox → gambar original
+        xyxy[:, [0, 2]] -= left
+        xyxy[:, [1, 3]] -= top
+        xyxy /= ratio
+        height, width = image_shape[:2]
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, width)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, height)
+        return xyxy, confs
+    
+    def _detect_pytorch(self, img, crop_format):
+        """
+        Custom PyTorch model - only supports single detection
+        """
+        return self._detect_pytorch_batch([img], crop_format)[0]
+    
+    def _detect_pytorch_batch(self, imgs, crop_format):
+        """
+        Custom PyTorch model untuk beberapa gambar dengan satu forward pass
+        
+        Returns:
+            List hasil (format detect_and_crop), urutan sama dengan imgs
+        """
+        import torch
+        
+        # Preprocess image (letterbox ke buffer yang dipakai ulang)
+        with stage('preprocess'):
+            img_tensor = self._preprocess_batch(imgs)
+        
+        # Run inference
+        with torch.no_grad(), stage('detect'):
+            output = self.model(img_tensor.to(self.device))
+        
+        # Parse output (adjust based on your model's output format)
+        # Assuming output is [batch, 4] for bbox coordinates (normalized)
+        if len(imgs) == 1:
+            if isinstance(output, (list, tuple)):
+                bboxes = [output[0] if len(output) > 0 else None]
+            elif isinstance(output, torch.Tensor):
+                bboxes = [output[0].cpu().numpy() if output.dim() > 1 else output.cpu().numpy()]
+            else:
+                bboxes = [output]
+        elif isinstance(output, torch.Tensor) and output.dim() > 1 and output.shape[0] == len(imgs):
+            bboxes = list(output.cpu().numpy())
+        elif isinstance(output, (list, tuple)) and len(output) == len(imgs):
+            bboxes = list(output)
+        else:
+            # Format output tidak per gambar: jalankan satu per satu
+            return [self._detect_pytorch(img, crop_format) for img in imgs]
+        
+        return [
+            self._build_pytorch_result(img, bbox, crop_format)
+            for img, bbox in zip(imgs, bboxes)
+        ]
+    
+    def _build_pytorch_result(self, img, bbox, crop_format):
+        """
+        Susun hasil detect_and_crop dari bbox ternormalisasi model PyTorch custom
+        """
+        original_height, original_width = img.shape[:2]
+        
+        if bbox is None:
+            return {
+                'success': False,
+                'error': 'Model output is invalid'
+            }
+        
+        # Convert normalized coordinates to pixel coordinates
+        if len(bbox) >= 4:
+            # Assuming format: [x1, y1, x2, y2] normalized (0-1)
+            x1 = int(bbox[0] * original_width)
+            y1 = int(bbox[1] * original_height)
+            x2 = int(bbox[2] * original_width)
+            y2 = int(bbox[3] * original_height)
+        else:
+            return {
+                'success': False,
+                'error': 'Invalid bounding box format'
+            }
+        
+        # Ensure coordinates are within image bounds
+        x1 = max(0, min(x1, original_width))
+        y1 = max(0, min(y1, original_height))
+        x2 = max(0, min(x2, original_width))
+        y2 = max(0, min(y2, original_height))
+        
+        # Ensure valid box
+        if x2 <= x1 or y2 <= y1:
+            return {
+                'success': False,
+                'error': 'Invalid bounding box coordinates'
+            }
+        
+        return {
+            'success': True,
+            'cropped_image': self._crop(img, (x1, y1, x2, y2), crop_format),
+            'bbox': (x1, y1, x2, y2),
+            'original_size': (original_width, original_height),
+            'confidence': None
+        }
+    
+    def _crop(self, img, bbox, crop_format='pil'):
+        """
+        Crop area bbox dari gambar; konversi warna (jika perlu) hanya pada area crop
+        
+        Args:
+            img: KTPImage
+            bbox: (x1, y1, x2, y2)
+            crop_format: 'pil' untuk PIL Image (RGB), 'bgr' untuk numpy array BGR
+                         (view jika gambar BGR), 'image' untuk KTPImage view
+        """
+        cropped = img.crop(bbox)
+        if crop_format == 'image':
+            return cropped
+        if crop_format == 'bgr':
+            return cropped.bgr()
+        return cropped.to_pil()
+    
     def _preprocess_image(self, img_rgb, target_size=640):
         """
         Preprocess image for PyTorch model
+        
+        Returns:
+            Tensor [1, C, H, W] float32 (0-1)
         """
-        # Resize maintaining aspect ratio
-        h, w = img_rgb.shape[:2]
-        scale = target_size / max(h, w)
-        new_h, new_w = int(h * scale), int(w * scale)
+        return self._preprocess_batch([img_rgb], target_size=target_size, bgr=False)
+    
+    def _preprocess_batch(self, imgs, target_size=640, bgr=True):
+        """
+        Letterbox beberapa gambar ke buffer uint8 dan tensor float yang dipakai ulang
         
-        img_resized = cv2.resize(img_rgb, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        Buffer hanya dialokasikan ulang jika batch lebih besar dari sebelumnya.
+        Tensor yang dikembalikan adalah view ke buffer, jadi hanya valid sampai
+        panggilan berikutnya (inference daemon berjalan di satu thread).
         
-        # Pad to target_size
-        img_padded = np.zeros((target_size, target_size, 3), dtype=np.uint8)
-        img_padded[:new_h, :new_w] = img_resized
+        Args:
+            imgs: List KTPImage atau numpy array (BGR jika bgr=True, RGB jika bgr=False)
+            target_size: Ukuran kanvas persegi (default: 640)
+            
+        Returns:
+            Tensor [N, C, H, W] float32 (0-1)
+        """
+        import torch
         
-        # Normalize to [0, 1]
-        img_normalized = img_padded.astype(np.float32) / 255.0
+        n = len(imgs)
+        buffer = getattr(self, '_letterbox_buffer', None)
+        if buffer is None or buffer.shape[0] < n or buffer.shape[1] != target_size:
+            buffer = np.zeros((n, target_size, target_size, 3), dtype=np.uint8)
+            self._letterbox_buffer = buffer
+            self._tensor_buffer = torch.empty((n, 3, target_size, target_size), dtype=torch.float32)
         
-        # Convert to tensor: [C, H, W]
-        img_tensor = torch.from_numpy(img_normalized).permute(2, 0, 1)
+        for i, img in enumerate(imgs):
+            if isinstance(img, KTPImage):
+                img, order = img.color()
+            else:
+                order = BGR if bgr else RGB
+            
+            # Resize maintaining aspect ratio
+            h, w = img.shape[:2]
+            scale = target_size / max(h, w)
+            new_h, new_w = int(h * scale), int(w * scale)
+            
+            # Pad to target_size: hanya area di luar gambar yang di-nol-kan
+            canvas = buffer[i]
+            canvas[new_h:] = 0
+            canvas[:new_h, new_w:] = 0
+            resized = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+            if order == BGR:
+                # Model dilatih dengan input RGB
+                cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=resized)
+            canvas[:new_h, :new_w] = resized
         
-        # Add batch dimension: [1, C, H, W]
-        img_tensor = img_tensor.unsqueeze(0)
+        # Normalize to [0, 1] dan convert ke [N, C, H, W] tanpa alokasi baru
+        img_tensor = self._tensor_buffer[:n]
+        img_tensor.copy_(torch.from_numpy(buffer[:n]).permute(0, 3, 1, 2))
+        img_tensor.div_(255.0)
         
         return img_tensor
 
 
+def detect_folder(detector, input_dir, output_dir=None, batch_size=8):
+    """
+    Deteksi dan crop semua gambar dalam folder dengan detect_and_crop_batch
+    
+    Args:
+        detector: KTPDetector
+        input_dir: Folder berisi gambar (.jpg / .jpeg / .png)
+        output_dir: Folder untuk menyimpan crop (optional)
+        batch_size: Jumlah gambar per forward pass
+    """
+    paths = sorted(
+        f for f in input_dir.iterdir()
+        if f.suffix.lower() in ('.jpg', '.jpeg', '.png')
+    )
+    if output_dir:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+    
+    for offset in range(0, len(paths), batch_size):
+        chunk = paths[offset:offset + batch_size]
+        for path, result in zip(chunk, detector.detect_and_crop_batch(chunk)):
+            if not result['success']:
+                print(f"{path.name}: Error: {result['error']}")
+                continue
+            print(f"{path.name}: bbox={result['bbox']} confidence={result.get('confidence')}")
+            if output_dir:
+                result['cropped_image'].save(Path(output_dir) / f"{path.stem}_ktp.jpg")
+
+
 def main():
     """
     Test function untuk command line usage
@@ -309,14 +701,19 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Detect and crop KTP from image')
-    parser.add_argument('input', help='Path to input image')
-    parser.add_argument('--output', '-o', help='Path to save cropped image (optional)')
+    parser.add_argument('input', help='Path to input image (atau folder gambar)')
+    parser.add_argument('--output', '-o', help='Path to save cropped image (folder jika input folder) (optional)')
     parser.add_argument('--model', '-m', help='Path to model file (.pt)')
+    parser.add_argument('--batch-size', type=int, default=8, help='Jumlah gambar per forward pass untuk input folder')
     
     args = parser.parse_args()
     
     try:
         detector = KTPDetector(model_path=args.model)
+        
+        if Path(args.input).is_dir():
+            detect_folder(detector, Path(args.input), args.output, args.batch_size)
+            return
         result = detector.detect_and_crop(args.input)
         
         if result['success']:
@@ -2,17 +2,28 @@
 """
 KTP Detection Daemon Service untuk caching model detection
 Model di-load sekali saat startup, kemudian reuse untuk semua request
-Menggunakan file-based communication untuk kompatibilitas dengan Bun
+Menggunakan file-based communication untuk kompatibilitas dengan Bun,
+dengan socket transport opsional (--socket / --port) untuk latency yang lebih rendah
+
+Isi crop pada response diatur per request:
+- crop_mode:    "none" (bbox saja), "jpeg" (default), "webp" atau "png"
+- crop_quality: kualitas JPEG / WebP 1-100 (default: 95)
+- crop_max_dim: sisi terpanjang crop maksimum dalam pixel (default: ukuran asli)
+Crop di-encode langsung dari array BGR dengan cv2.imencode; ukuran dan waktu
+encode dilaporkan di "crop_encoding".
+
+Response disusun dengan crop sebagai base64 supaya bisa dipakai bersama (cache,
+request identik); untuk "crop_output": "file" setiap penerima mendapat file crop
+baru miliknya sendiri (finalize_response), termasuk saat hasil diambil dari cache.
 """
 
 import sys
-import json
 import os
+import argparse
 import base64
-import tempfile
 import time
-from pathlib import Path
-from io import BytesIO
+
+import cv2
 
 # Suppress warnings
 if os.getenv('SUPPRESS_OCR_LOGS') == '1':
@@ -20,8 +31,90 @@ if os.getenv('SUPPRESS_OCR_LOGS') == '1':
     warnings.filterwarnings('ignore')
 
 from ktp_detect import KTPDetector
+from daemon_base import BaseDaemon, decode_image_data, add_daemon_arguments, serve_daemon
+from image_ref import CROP_OUTPUT_BASE64, CROP_OUTPUT_FILE, CROP_OUTPUTS
+from request_deadline import check_deadline
+from stage_metrics import METRICS, stage
+
+# Isi crop pada response: "none" = bbox saja, selain itu codec untuk encode crop
+CROP_MODES = ('none', 'jpeg', 'webp', 'png')
+DEFAULT_CROP_MODE = 'jpeg'
+DEFAULT_CROP_QUALITY = 95
+
+# Level kompresi PNG (0-9, cv2.IMWRITE_PNG_COMPRESSION); PNG lossless, crop_quality tidak dipakai
+PNG_COMPRESSION = 3
+
+# mode -> (ekstensi cv2.imencode, media type, flag kualitas)
+_CROP_CODECS = {
+    'jpeg': ('.jpg', 'image/jpeg', cv2.IMWRITE_JPEG_QUALITY),
+    'webp': ('.webp', 'image/webp', cv2.IMWRITE_WEBP_QUALITY),
+    'png': ('.png', 'image/png', None),
+}
+
+
+def encode_crop(crop_bgr, mode=DEFAULT_CROP_MODE, quality=DEFAULT_CROP_QUALITY, max_dim=None):
+    """
+    Encode crop BGR langsung dengan cv2.imencode (tanpa konversi RGB / PIL)
+    
+    Args:
+        crop_bgr: numpy array BGR (view ke gambar original dari detect_and_crop)
+        mode: 'jpeg', 'webp' atau 'png'
+        quality: Kualitas JPEG / WebP (1-100)
+        max_dim: Sisi terpanjang maksimum dalam pixel (None = ukuran asli)
+        
+    Returns:
+        numpy array uint8 berisi encoded bytes
+    """
+    height, width = crop_bgr.shape[:2]
+    if max_dim and max(height, width) > max_dim:
+        scale = max_dim / max(height, width)
+        # INTER_AREA hanya untuk pengecilan > 2x (aliasing); di atas itu INTER_LINEAR
+        # hasilnya hampir sama dan beberapa kali lebih cepat
+        crop_bgr = cv2.resize(
+            crop_bgr, (max(1, round(width * scale)), max(1, round(height * scale))),
+            interpolation=cv2.INTER_AREA if scale < 0.5 else cv2.INTER_LINEAR
+        )
+    extension, _, quality_flag = _CROP_CODECS[mode]
+    if quality_flag is None:
+        params = [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION]
+    else:
+        params = [quality_flag, int(quality)]
+    ok, encoded = cv2.imencode(extension, crop_bgr, params)
+    if not ok:
+        raise RuntimeError(f'Failed to encode crop as {mode}')
+    return encoded
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
 
-class KTPDetectionDaemon:
+
+def crop_options(request):
+    """
+    Opsi crop dari request, sudah divalidasi
+    
+    Returns:
+        Dictionary output ("base64" / "file"), mode, quality, max_dim
+        
+    Raises:
+        ValueError: Jika salah satu opsi tidak valid
+    """
+    output = request.get('crop_output', CROP_OUTPUT_BASE64)
+    mode = request.get('crop_mode', DEFAULT_CROP_MODE)
+    quality = request.get('crop_quality', DEFAULT_CROP_QUALITY)
+    max_dim = request.get('crop_max_dim') or None
+    if output not in CROP_OUTPUTS:
+        raise ValueError(f'Invalid crop_output: {output!r} (expected one of {", ".join(CROP_OUTPUTS)})')
+    if mode not in CROP_MODES:
+        raise ValueError(f'Invalid crop_mode: {mode!r} (expected one of {", ".join(CROP_MODES)})')
+    if not _is_int(quality) or not 1 <= quality <= 100:
+        raise ValueError(f'Invalid crop_quality: {quality!r} (expected 1-100)')
+    if max_dim is not None and (not _is_int(max_dim) or max_dim < 1):
+        raise ValueError(f'Invalid crop_max_dim: {max_dim!r} (expected pixels > 0)')
+    return {'output': output, 'mode': mode, 'quality': quality, 'max_dim': max_dim}
+
+
+class KTPDetectionDaemon(BaseDaemon):
     def __init__(self, request_dir, response_dir, model_path=None):
         """Initialize detection model once - this is the expensive operation"""
         if os.getenv('SUPPRESS_OCR_LOGS') != '1':
@@ -29,39 +122,74 @@ class KTPDetectionDaemon:
         
         # Load model once - cached in memory
         self.detector = KTPDetector(model_path=model_path)
-        self.request_dir = Path(request_dir)
-        self.response_dir = Path(response_dir)
-        
-        # Create directories if they don't exist
-        self.request_dir.mkdir(parents=True, exist_ok=True)
-        self.response_dir.mkdir(parents=True, exist_ok=True)
+        super().__init__(request_dir, response_dir)
         
         if os.getenv('SUPPRESS_OCR_LOGS') != '1':
             print("KTP detection model loaded and ready!", file=sys.stderr)
     
-    def process_request(self, image_data_base64, return_multiple=False, min_confidence=0.5):
+    def process_request(self, image_data_base64, return_multiple=False, min_confidence=0.5, crop=None):
         """
         Process detection request using cached model
         
         Args:
-            image_data_base64: Base64 encoded image data
+            image_data_base64: Base64 encoded image data (atau raw bytes dari socket transport /
+                mapping "image_file")
             return_multiple: If True, return all detections. If False, return only the best one.
             min_confidence: Minimum confidence threshold (default: 0.5)
+            crop: Opsi crop dari crop_options() (default: JPEG kualitas 95 sebagai base64)
             
         Returns:
-            Dictionary with detection results and cropped image(s) (base64)
+            Dictionary with detection results and cropped image(s) (base64 atau path file),
+            plus crop_encoding (mode, media_type, bytes, encode_ms) jika crop di-encode
         """
         try:
             # Decode base64 image
-            image_bytes = base64.b64decode(image_data_base64)
+            image_bytes = decode_image_data(image_data_base64)
             
             # Run detection and crop
             result = self.detector.detect_and_crop(
                 image_bytes, 
                 return_multiple=return_multiple,
-                min_confidence=min_confidence
+                min_confidence=min_confidence,
+                crop_format='bgr'
             )
+            check_deadline('detect')
             
+            with stage('crop_encode'):
+                return self._format_result(result, return_multiple, crop)
+                    
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def _encode_crop(self, crop_bgr, crop, encoding):
+        """
+        Crop sebagai field "cropped_image" (base64); ukuran dan waktu encode
+        ditambahkan ke `encoding`. File untuk "crop_output": "file" ditulis per
+        penerima oleh finalize_response.
+        """
+        if crop['mode'] == 'none':
+            return {}
+        started = time.perf_counter()
+        encoded = encode_crop(crop_bgr, crop['mode'], crop['quality'], crop['max_dim'])
+        encoding['encode_ms'] += (time.perf_counter() - started) * 1000
+        encoding['bytes'] += encoded.nbytes
+        return {'cropped_image': base64.b64encode(encoded).decode('utf-8')}
+
+    def _crop_file(self, item, suffix):
+        """Copy `item` dengan "cropped_image" (base64) diganti "cropped_image_file" (file baru)"""
+        item = dict(item)
+        data = base64.b64decode(item.pop('cropped_image'))
+        item['cropped_image_file'] = self.write_output_image(data, suffix=suffix)
+        return item
+
+    def _format_result(self, result, return_multiple, crop=None):
+        """Susun response (crop ter-encode sebagai base64 / file, atau bbox saja) dari hasil detect_and_crop"""
+        crop = crop or crop_options({})
+        encoding = {'mode': crop['mode'], 'bytes': 0, 'encode_ms': 0.0}
+        try:
             if not result['success']:
                 return {
                     'success': False,
@@ -72,13 +200,8 @@ class KTPDetectionDaemon:
             if return_multiple and 'cropped_images' in result:
                 cropped_images = []
                 for det in result['cropped_images']:
-                    cropped_pil = det['cropped_image']
-                    buffered = BytesIO()
-                    cropped_pil.save(buffered, format='JPEG', quality=95)
-                    cropped_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
-                    
                     cropped_images.append({
-                        'cropped_image': cropped_base64,
+                        **self._encode_crop(det['cropped_image'], crop, encoding),
                         'bbox': det['bbox'],
                         'confidence': det['confidence']
                     })
@@ -88,22 +211,14 @@ class KTPDetectionDaemon:
                     'cropped_images': cropped_images,
                     'original_size': result['original_size'],
                 }
-                return response
+                return self._add_crop_encoding(response, encoding)
             
             # Handle single detection
             if 'cropped_image' in result:
-                # Convert cropped image to base64
-                cropped_pil = result['cropped_image']
-                buffered = BytesIO()
-                
-                # Save as JPEG with good quality
-                cropped_pil.save(buffered, format='JPEG', quality=95)
-                cropped_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
-                
                 # Format response
                 response = {
                     'success': True,
-                    'cropped_image': cropped_base64,
+                    **self._encode_crop(result['cropped_image'], crop, encoding),
                     'bbox': result['bbox'],
                     'original_size': result['original_size'],
                 }
@@ -111,7 +226,7 @@ class KTPDetectionDaemon:
                 if result.get('confidence') is not None:
                     response['confidence'] = result['confidence']
                 
-                return response
+                return self._add_crop_encoding(response, encoding)
             
             return {
                 'success': False,
@@ -123,173 +238,139 @@ class KTPDetectionDaemon:
                 'success': False,
                 'error': str(e)
             }
+
+    def _add_crop_encoding(self, response, encoding):
+        """Laporkan ukuran (bytes sebelum base64) dan waktu encode crop di response dan metrics"""
+        if encoding['mode'] != 'none':
+            METRICS.inc('crop_bytes', encoding['bytes'])
+            response['crop_encoding'] = {
+                'mode': encoding['mode'],
+                'media_type': _CROP_CODECS[encoding['mode']][1],
+                'bytes': encoding['bytes'],
+                'encode_ms': round(encoding['encode_ms'], 2),
+            }
+        return response
+
+    def warmup_request(self):
+        """Warmup dengan foto utuh (kartu sintetis di atas background), input normal detector"""
+        import cv2
+        from ktp_synthetic import synthetic_photo
+
+        ok, encoded = cv2.imencode('.jpg', synthetic_photo(), [cv2.IMWRITE_JPEG_QUALITY, 90])
+        if not ok:
+            raise RuntimeError('Failed to encode warmup image')
+        return {'image': encoded.tobytes(), 'min_confidence': 0.1}
+
+    def finalize_response(self, request, response):
+        """
+        "crop_output": "file": tulis crop ke file baru untuk penerima ini
+
+        File crop dihapus oleh penerimanya, jadi setiap penerima (termasuk request
+        identik dan cache hit) mendapat file sendiri dari crop yang sama.
+        """
+        if request.get('crop_output') != CROP_OUTPUT_FILE or not response.get('crop_encoding'):
+            return response
+        suffix = _CROP_CODECS[response['crop_encoding']['mode']][0]
+        with stage('crop_write'):
+            if 'cropped_images' in response:
+                return {
+                    **response,
+                    'cropped_images': [
+                        self._crop_file(item, suffix) if 'cropped_image' in item else item
+                        for item in response['cropped_images']
+                    ],
+                }
+            if 'cropped_image' in response:
+                return self._crop_file(response, suffix)
+        return response
+
+    def cache_options(self, request):
+        """Opsi deteksi dan encode crop yang mempengaruhi hasil"""
+        crop = crop_options(request)
+        return {
+            'return_multiple': request.get('return_multiple', False),
+            'min_confidence': request.get('min_confidence', 0.5),
+            'crop_mode': crop['mode'],
+            'crop_quality': crop['quality'],
+            'crop_max_dim': crop['max_dim'],
+        }
     
-    def run(self):
-        """Main loop: watch request directory, process files, write responses"""
-        if os.getenv('SUPPRESS_OCR_LOGS') != '1':
-            print(f"Watching request directory: {self.request_dir}", file=sys.stderr)
+    def handle_request(self, request):
+        """Handle one parsed request (file or socket transport)"""
+        # Extract image data and options
+        image_data = request.get('image')
+        return_multiple = request.get('return_multiple', False)
+        min_confidence = request.get('min_confidence', 0.5)
+        
+        if not image_data:
+            return {
+                'success': False,
+                'error': 'Missing "image" field in request'
+            }
+        try:
+            crop = crop_options(request)
+        except ValueError as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
         
-        while True:
+        # Process detection request
+        return self.process_request(
+            image_data,
+            return_multiple=return_multiple,
+            min_confidence=min_confidence,
+            crop=crop
+        )
+    
+    def handle_batch(self, requests):
+        """
+        Micro-batching: satu forward pass detector untuk beberapa request
+        
+        Request dikelompokkan per (return_multiple, min_confidence) karena
+        opsi tersebut berlaku untuk seluruh panggilan detect_and_crop_batch.
+        """
+        responses = [None] * len(requests)
+        groups = {}
+        
+        for i, request in enumerate(requests):
+            image_data = request.get('image')
+            if not image_data:
+                responses[i] = self.handle_request(request)
+                continue
             try:
-                # Check for request files (exclude .tmp and .processing files)
-                request_files = [
-                    f for f in self.request_dir.glob("*.json")
-                    if f.suffix == '.json' and not f.name.endswith('.tmp') and not f.name.endswith('.processing')
-                ]
-                
-                for request_file in request_files:
-                    # Skip temp files
-                    if request_file.suffix == '.tmp':
-                        continue
-                    
-                    # Lock mechanism: rename file to .processing to claim ownership
-                    processing_file = request_file.with_suffix('.processing')
-                    request_id = request_file.stem
-                    
-                    try:
-                        # Try to claim the file by renaming it
-                        try:
-                            request_file.rename(processing_file)
-                        except (FileNotFoundError, OSError):
-                            # File was already claimed or deleted, skip
-                            continue
-                        
-                        # Now we own the file, read it safely
-                        max_retries = 10
-                        retry_count = 0
-                        file_ready = False
-                        request = None
-                        
-                        while retry_count < max_retries:
-                            try:
-                                # Check file size
-                                if not processing_file.exists():
-                                    break
-                                
-                                file_size = processing_file.stat().st_size
-                                if file_size == 0:
-                                    retry_count += 1
-                                    time.sleep(0.1)
-                                    continue
-                                
-                                # Try to read file
-                                with open(processing_file, 'r') as f:
-                                    request = json.load(f)
-                                
-                                # Verify request has required fields
-                                if request and isinstance(request, dict) and 'image' in request:
-                                    file_ready = True
-                                    break
-                                else:
-                                    break
-                                    
-                            except (json.JSONDecodeError, IOError, OSError, FileNotFoundError) as e:
-                                if isinstance(e, FileNotFoundError):
-                                    break
-                                retry_count += 1
-                                time.sleep(0.1)
-                        
-                        if not file_ready or request is None:
-                            # File not ready after retries or was deleted, cleanup and skip
-                            try:
-                                if processing_file.exists():
-                                    processing_file.unlink()
-                            except:
-                                pass
-                            continue
-                        
-                        # Extract image data and options
-                        image_data = request.get('image')
-                        return_multiple = request.get('return_multiple', False)
-                        min_confidence = request.get('min_confidence', 0.5)
-                        
-                        if not image_data:
-                            response = {
-                                'success': False,
-                                'error': 'Missing "image" field in request'
-                            }
-                        else:
-                            # Process detection request
-                            response = self.process_request(
-                                image_data,
-                                return_multiple=return_multiple,
-                                min_confidence=min_confidence
-                            )
-                        
-                        # Write response
-                        response_file = self.response_dir / f"{request_id}.json"
-                        
-                        # Ensure response directory exists
-                        response_file.parent.mkdir(parents=True, exist_ok=True)
-                        
-                        # Write response atomically using temp file then rename
-                        temp_response_file = response_file.with_suffix('.tmp')
-                        with open(temp_response_file, 'w') as f:
-                            json.dump(response, f, ensure_ascii=False)
-                        temp_response_file.replace(response_file)
-                        
-                        # Delete processing file after response is written
-                        try:
-                            if processing_file.exists():
-                                processing_file.unlink()
-                        except:
-                            pass
-                        
-                    except FileNotFoundError:
-                        # File was deleted before we could process it
-                        try:
-                            if 'processing_file' in locals() and processing_file.exists():
-                                processing_file.unlink()
-                        except:
-                            pass
-                        continue
-                    except Exception as e:
-                        # Write error response
-                        if 'processing_file' in locals() and processing_file.exists():
-                            response_file = self.response_dir / f"{request_id}.json"
-                            error_response = {
-                                'success': False,
-                                'error': f'Processing error: {str(e)}'
-                            }
-                            try:
-                                response_file.parent.mkdir(parents=True, exist_ok=True)
-                                temp_response_file = response_file.with_suffix('.tmp')
-                                with open(temp_response_file, 'w') as f:
-                                    json.dump(error_response, f, ensure_ascii=False)
-                                temp_response_file.replace(response_file)
-                            except Exception as cleanup_error:
-                                if os.getenv('SUPPRESS_OCR_LOGS') != '1':
-                                    print(f"Error writing error response: {cleanup_error}", file=sys.stderr)
-                        
-                        # Always cleanup processing file
-                        try:
-                            if 'processing_file' in locals() and processing_file.exists():
-                                processing_file.unlink()
-                        except:
-                            pass
-                        
-                        if os.getenv('SUPPRESS_OCR_LOGS') != '1':
-                            print(f"Error processing request {request_id}: {e}", file=sys.stderr)
-                
-                # Sleep a bit to avoid busy waiting
-                time.sleep(0.1)
-                
-            except KeyboardInterrupt:
-                # Graceful shutdown on Ctrl+C
-                break
+                crop = crop_options(request)
+                image_bytes = decode_image_data(image_data)
             except Exception as e:
-                if os.getenv('SUPPRESS_OCR_LOGS') != '1':
-                    print(f"Error in daemon loop: {e}", file=sys.stderr)
-                time.sleep(1)  # Wait before retrying
+                responses[i] = {
+                    'success': False,
+                    'error': str(e)
+                }
+                continue
+            options = (request.get('return_multiple', False), request.get('min_confidence', 0.5))
+            groups.setdefault(options, []).append((i, image_bytes, crop))
+        
+        for (return_multiple, min_confidence), members in groups.items():
+            results = self.detector.detect_and_crop_batch(
+                [image_bytes for _, image_bytes, _ in members],
+                return_multiple=return_multiple,
+                min_confidence=min_confidence,
+                crop_format='bgr'
+            )
+            check_deadline('detect')
+            for (i, _, crop), result in zip(members, results):
+                with stage('crop_encode'):
+                    responses[i] = self._format_result(result, return_multiple, crop)
+        
+        return responses
 
 if __name__ == '__main__':
-    if len(sys.argv) < 3:
-        print("Usage: ktp_detection_daemon.py <request_dir> <response_dir> [model_path]", file=sys.stderr)
-        sys.exit(1)
-    
-    request_dir = sys.argv[1]
-    response_dir = sys.argv[2]
-    model_path = sys.argv[3] if len(sys.argv) > 3 else None
+    parser = argparse.ArgumentParser(description='KTP detection daemon (model cached in memory)')
+    parser.add_argument('request_dir', help='Directory untuk request file')
+    parser.add_argument('response_dir', help='Directory untuk response file')
+    parser.add_argument('model_path', nargs='?', default=None, help='Path ke model file (.pt)')
+    add_daemon_arguments(parser)
+    args = parser.parse_args()
     
-    daemon = KTPDetectionDaemon(request_dir, response_dir, model_path=model_path)
-    daemon.run()
+    daemon = KTPDetectionDaemon(args.request_dir, args.response_dir, model_path=args.model_path)
+    serve_daemon(daemon, args)
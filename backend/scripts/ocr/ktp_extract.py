@@ -3,11 +3,30 @@
 Script untuk ekstraksi field KTP dari gambar
 Digunakan untuk dipanggil dari subprocess oleh backend TypeScript
 Output: JSON ke stdout
+
+Script ini adalah client tipis: gambar dikirim ke OCR daemon yang sudah
+hangat (model PaddleOCR sudah di-load) lewat socket transport. Jika belum ada
+daemon di socket tersebut, daemon di-spawn di background dan tetap hidup
+sampai tidak ada request selama idle timeout, sehingga pemanggilan berikutnya
+tidak membayar biaya import + load model lagi.
+
+Usage:
+    python ktp_extract.py image.jpg
+    python ktp_extract.py image.jpg --idle-timeout 600
+    python ktp_extract.py image.jpg --no-daemon      # load model di proses ini (perilaku lama)
+
+Environment:
+    KTP_OCR_SOCKET        Path Unix socket daemon (default: <tmp>/ktp_ocr_daemon.sock)
+    KTP_OCR_IDLE_TIMEOUT  Idle timeout daemon yang di-spawn, detik (default: 300)
 """
 
 import sys
 import os
 import json
+import subprocess
+import tempfile
+import time
+from pathlib import Path
 
 # Suppress warnings when called from subprocess
 if os.getenv('SUPPRESS_OCR_LOGS') == '1':
@@ -16,51 +35,170 @@ if os.getenv('SUPPRESS_OCR_LOGS') == '1':
     # Set environment to suppress PaddleOCR connectivity check
     os.environ['DISABLE_MODEL_SOURCE_CHECK'] = 'True'
 
-from ktp_ocr import KTPOCR
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), 'ktp_ocr_daemon.sock')
+DEFAULT_IDLE_TIMEOUT = 300
+
+# Waktu maksimum menunggu daemon baru siap (import + load model PaddleOCR)
+STARTUP_TIMEOUT = 180
+
+# max_image_size KTPOCR untuk CLI ini (daemon yang di-spawn dan --no-daemon),
+# supaya input dan output OCR sama dengan perilaku lama
+MAX_IMAGE_SIZE = 400
+
+
+def _connect(socket_path, timeout=None):
+    """SocketClient ke daemon, atau None jika belum ada daemon yang listen"""
+    from daemon_socket import SocketClient
+    try:
+        return SocketClient(socket_path=socket_path, timeout=timeout)
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+
+
+def _spawn_daemon(socket_path, idle_timeout):
+    """Jalankan ocr_daemon.py di background (session baru, lepas dari proses ini)"""
+    base = Path(tempfile.gettempdir())
+    env = dict(os.environ, SUPPRESS_OCR_LOGS='1')
+    cmd = [
+        sys.executable, str(SCRIPT_DIR / 'ocr_daemon.py'),
+        str(base / 'ktp_extract_requests'), str(base / 'ktp_extract_responses'),
+        '--socket', socket_path,
+        '--idle-timeout', str(idle_timeout),
+        '--max-image-size', str(MAX_IMAGE_SIZE),
+    ]
+    with open(f'{socket_path}.log', 'ab') as log:
+        subprocess.Popen(
+            cmd, env=env, cwd=str(SCRIPT_DIR),
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=log,
+            start_new_session=True, close_fds=True,
+        )
+
+
+def connect_or_spawn(socket_path, idle_timeout, startup_timeout=STARTUP_TIMEOUT):
+    """
+    Koneksi ke daemon yang sudah hangat, atau spawn daemon baru lalu tunggu siap
+
+    Spawn dilindungi file lock supaya pemanggilan paralel tidak menjalankan
+    beberapa daemon untuk socket yang sama.
+
+    Returns:
+        SocketClient yang sudah terkoneksi
+
+    Raises:
+        TimeoutError: Jika daemon tidak siap dalam startup_timeout detik
+    """
+    client = _connect(socket_path)
+    if client is not None:
+        return client
+
+    import fcntl
+    with open(f'{socket_path}.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        # Proses lain mungkin sudah men-spawn daemon selagi menunggu lock
+        client = _connect(socket_path)
+        if client is not None:
+            return client
+
+        _spawn_daemon(socket_path, idle_timeout)
+        deadline = time.monotonic() + startup_timeout
+        while time.monotonic() < deadline:
+            client = _connect(socket_path)
+            if client is not None:
+                return client
+            time.sleep(0.1)
+
+    raise TimeoutError(f'OCR daemon tidak siap setelah {startup_timeout}s (log: {socket_path}.log)')
+
+
+def extract_via_daemon(image_path, socket_path, idle_timeout):
+    """
+    Kirim gambar ke daemon hangat
+
+    Returns:
+        Response dict dengan format sama seperti OCRDaemon (success, data, raw)
+    """
+    if not os.path.exists(image_path):
+        raise FileNotFoundError(f"File tidak ditemukan: {image_path}")
+    with open(image_path, 'rb') as f:
+        image_bytes = f.read()
+
+    # Satu kali retry: daemon bisa saja berhenti (idle timeout) tepat saat kita terkoneksi
+    for attempt in range(2):
+        client = connect_or_spawn(socket_path, idle_timeout)
+        try:
+            response = client.request(image_bytes)
+            response.pop('id', None)
+            return response
+        except (ConnectionError, OSError):
+            if attempt:
+                raise
+        finally:
+            client.close()
+
+
+def extract_in_process(image_path):
+    """Perilaku lama: load KTPOCR di proses ini (lambat, untuk debugging / tanpa daemon)"""
+    from ktp_ocr import KTPOCR, format_ktp_data
+    from ktp_fields import API_FIELDS
+
+    # Inisialisasi OCR (akan load model, ini yang lambat)
+    ocr = KTPOCR(lang='id', max_image_size=MAX_IMAGE_SIZE)
+
+    # Ekstrak teks dari gambar
+    extracted_data = ocr.extract_text(image_path)
+
+    # Ekstrak field spesifik (hanya field yang ada di response)
+    fields = ocr.extract_ktp_fields(extracted_data, fields=API_FIELDS)
+
+    # Format response - NIK, Nama, Jenis Kelamin, dan Alamat
+    return {
+        'success': True,
+        'data': format_ktp_data(fields),
+        # Raw OCR data untuk debugging
+        'raw': {
+            'text_blocks_count': len(extracted_data.get('text_blocks', [])),
+            'combined_text': extracted_data.get('combined_text', ''),
+        }
+    }
+
 
 def main():
-    if len(sys.argv) < 2:
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Ekstraksi field KTP (client OCR daemon)')
+    parser.add_argument('image', nargs='?', help='Path ke file gambar KTP')
+    parser.add_argument('--socket', default=os.getenv('KTP_OCR_SOCKET', DEFAULT_SOCKET),
+                        help='Unix socket OCR daemon (default: $KTP_OCR_SOCKET atau <tmp>/ktp_ocr_daemon.sock)')
+    parser.add_argument('--idle-timeout', type=float,
+                        default=float(os.getenv('KTP_OCR_IDLE_TIMEOUT', DEFAULT_IDLE_TIMEOUT)),
+                        help='Idle timeout daemon yang di-spawn, detik (default: 300)')
+    parser.add_argument('--no-daemon', action='store_true',
+                        help='Load model di proses ini, tanpa daemon')
+    args = parser.parse_args()
+
+    if not args.image:
         error_response = {
             'success': False,
             'error': 'Missing image path argument'
         }
         print(json.dumps(error_response, ensure_ascii=False))
         sys.exit(1)
-    
-    image_path = sys.argv[1]
-    
+
+    image_path = args.image
+
     try:
-        # Inisialisasi OCR (akan load model, ini yang lambat)
-        # Untuk production, bisa dioptimasi dengan keep-alive process
-        ocr = KTPOCR(lang='id', max_image_size=400)
-        
-        # Ekstrak teks dari gambar
-        extracted_data = ocr.extract_text(image_path)
-        
-        # Ekstrak field spesifik
-        fields = ocr.extract_ktp_fields(extracted_data)
-        
-        # Format response - NIK, Nama, Jenis Kelamin, dan Alamat
-        response = {
-            'success': True,
-            'data': {
-                'identityNumber': fields.get('nik'),
-                'name': fields.get('nama'),
-                'gender': fields.get('jenis_kelamin'),
-                'alamat': fields.get('alamat'),
-            },
-            # Raw OCR data untuk debugging
-            'raw': {
-                'text_blocks_count': len(extracted_data.get('text_blocks', [])),
-                'combined_text': extracted_data.get('combined_text', ''),
-            }
-        }
-        
+        if args.no_daemon:
+            response = extract_in_process(image_path)
+        else:
+            response = extract_via_daemon(image_path, args.socket, args.idle_timeout)
+
         # Output JSON ke stdout (tanpa print statement lain untuk parsing yang mudah)
         # Flush stdout untuk memastikan output langsung terkirim
         print(json.dumps(response, ensure_ascii=False), flush=True)
-        sys.exit(0)  # Explicit exit with success code
-        
+        sys.exit(0 if response.get('success') else 1)
+
     except FileNotFoundError as e:
         error_response = {
             'success': False,
@@ -78,4 +216,3 @@ def main():
 
 if __name__ == '__main__':
     main()
-
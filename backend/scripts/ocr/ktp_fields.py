@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Ekstraksi field KTP dari hasil OCR (dipakai oleh KTPOCR.extract_ktp_fields)
+
+Semua pattern di-compile sekali saat import dan dikelompokkan per field.
+Setiap pattern yang diawali label (mis. "Kecamatan", "RT") hanya dicari mulai
+dari posisi pertama label tersebut di teks; pattern yang labelnya tidak ada
+sama sekali dilewati tanpa menjalankan regex. Urutan fallback, validasi dan
+hasilnya sama persis dengan implementasi sebelumnya
+(benchmarks/legacy_fields.py, dicek dengan benchmarks/bench_fields.py).
+"""
+
+import re
+
+_I = re.IGNORECASE
+_IM = re.IGNORECASE | re.MULTILINE
+
+FIELD_NAMES = (
+    'nik',
+    'nama',
+    'jenis_kelamin',
+    'alamat',
+    'rt_rw',
+    'kelurahan',
+    'kecamatan',
+    'tempat_tgl_lahir',
+    'agama',
+    'status_perkawinan',
+    'pekerjaan',
+    'kewarganegaraan',
+)
+
+
+# Field yang dikembalikan ke backend (lihat ktp_ocr.format_ktp_data)
+API_FIELDS = ('nik', 'nama', 'jenis_kelamin', 'alamat')
+
+
+def resolve_fields(fields=None):
+    """
+    Validasi daftar field yang diminta caller
+
+    Args:
+        fields: Iterable nama field (subset FIELD_NAMES), atau None untuk semua field
+
+    Returns:
+        frozenset nama field
+
+    Raises:
+        ValueError: Jika fields bukan list nama field atau berisi field yang tidak dikenal
+    """
+    if fields is None:
+        return frozenset(FIELD_NAMES)
+    if isinstance(fields, str) or not all(isinstance(name, str) for name in fields):
+        raise ValueError(f"fields harus berupa list nama field: {fields!r}")
+    unknown = sorted(set(fields) - set(FIELD_NAMES))
+    if unknown:
+        raise ValueError(f"Field tidak dikenal: {', '.join(unknown)} (pilihan: {', '.join(FIELD_NAMES)})")
+    return frozenset(fields)
+
+
+def request_fields(request):
+    """
+    Field yang diminta request daemon ("fields"), default API_FIELDS
+
+    Returns:
+        Tuple nama field (urutan FIELD_NAMES), dipakai juga sebagai key grouping batch
+    """
+    wanted = resolve_fields(request.get('fields') or API_FIELDS)
+    return tuple(name for name in FIELD_NAMES if name in wanted)
+
+
+def _p(pattern, flags=0, label=None):
+    """
+    Entry registry: (compiled pattern, label)
+
+    label: literal (lowercase) yang pasti menjadi awal setiap match, tuple
+    beberapa alternatif, atau None jika pattern bisa match di mana saja.
+    """
+    return re.compile(pattern, flags), label
+
+
+WHITESPACE = re.compile(r'\s+')
+LEADING_COLON = re.compile(r'^:\s*')
+LEADING_DIGITS = re.compile(r'^\d+')
+LEADING_RT_DIGITS = re.compile(r'^\d{2,3}')
+TRAILING_KOTA = re.compile(r'\s+KOTA\s+[A-Z\s]+$', _I)
+SIXTEEN_DIGITS = re.compile(r'(\d{16})')
+
+# 1. NIK - biasanya 16 digit angka, bisa ada spasi atau strip
+NIK_PATTERNS = [
+    _p(r'NIK[:\s]*(\d{16})', _I, 'nik'),  # NIK: 1234567890123456
+    _p(r'NIK[:\s]*(\d{4}\s?\d{4}\s?\d{4}\s?\d{4})', _I, 'nik'),  # NIK dengan spasi
+    _p(r'(\d{16})', _I),  # Hanya 16 digit (ambil yang pertama)
+]
+
+# 2. Nama - baris huruf besar setelah NIK, stop di label berikutnya
+NAMA_AFTER_NIK = re.compile(
+    r'\n:?\s*([A-Z][A-Z\s]{2,50}?)(?:\nat/Tgl|\nToiLahir|\nTempat|\nLahir|\nKelamin|\nJenis|\nGol|\nGol\s+Darah|\nAlamat|\nRT|\nRW|\nARW|\nKel|\nKec|\nVDesa|\ncamatan|\nAgama|\nStatus|\nPekerjaan|\nKewarganegaraan|\nPROVINSI|\nKOTA|\nnegaraan|$)',
+    re.MULTILINE
+)
+NAMA_EXCLUDED = {
+    'nik', 'nama', 'tempat', 'lahir', 'toilahir', 'bandung', 'kota', 'kota bandung',
+    'provinsi', 'jakarta', 'jakarta selatan', 'dki jakarta',
+}
+NAMA_PATTERNS = [
+    _p(r'Nama\s+(?:Lengkap)?[:\s]*([A-Z][A-Z\s]+?)(?:\n|Tempat|Jenis|Alamat|RT|Kel|Kec|Agama|Status|Pekerjaan|Kewarganegaraan|PROVINSI|KOTA|NIK)', _IM, 'nama'),
+    _p(r'Nama[:\s]*([A-Z][A-Z\s]{3,50})', _IM, 'nama'),
+]
+
+# 3. Jenis Kelamin - menangani variasi OCR seperti "LAK-LAKI", "LAKI-LAKI", "Laki-laki"
+JENIS_KELAMIN_PATTERNS = [
+    _p(r'Jenis\s+kelamin[:\s]*([A-Za-z/]+)', _I, 'jenis'),
+    _p(r'(LAK\s*[-]?\s*LAKI)', _I, 'lak'),
+    _p(r'(LAKI\s*[-]?\s*LAKI|Laki\s*[-\s]?laki)', _I, 'laki'),
+    _p(r'(Perempuan)', _I, 'perempuan'),
+]
+JENIS_KELAMIN_FALLBACK = [
+    (_p(r'LAK\s*[-]?\s*LAKI', _I, 'lak'), 'Laki-laki'),
+    (_p(r'LAKI\s*[-]?\s*LAKI', _I, 'laki'), 'Laki-laki'),
+    (_p(r'PEREMPUAN', _I, 'perempuan'), 'Perempuan'),
+]
+
+# 4. Alamat - setelah label "Alamat", setelah "Gol Darah", atau sebelum RT/RW
+ALAMAT_PATTERNS = [
+    _p(r'Alamat[:\s]*([A-Z0-9\s/,-]+?)(?:\n|RT|RW|Kel|Kec|Agama|Status|Pekerjaan)', _IM, 'alamat'),
+    _p(r'Alamat[:\s]*([^\n]{10,100})', _IM, 'alamat'),
+]
+ALAMAT_GOL_DARAH_PATTERNS = [
+    _p(r'Gol\.?\s*Darah[:\s]*[A-Z]*\n:?\s*(JL[.\s]*[A-Z][A-Z\s/,-]+?)(?:\n:?\s*\d|\n:?\s*RT|\n:?\s*RW|\n:?\s*Kel|\n:?\s*Kec)', _IM, 'gol'),
+    _p(r'Gol\.?\s*Darah[:\s]*[A-Z]*\n([A-Z][A-Z0-9\s/,-]+?)(?:\n\d{2,3}|\n00|\nRT|\nRW|\nKel|\nKec)', _IM, 'gol'),
+    _p(r'Gol\.?\s*Darah[:\s]*\n([^\n]+)', _IM, 'gol'),
+]
+ALAMAT_RT_PATTERNS = [
+    _p(r':\s*(JL[.\s]*[A-Z][A-Z\s/,-]+?)(?:\n:?\s*\d{2,3}|\n:?\s*RT|\n:?\s*RW)', _IM, ':'),
+    _p(r':\s*([A-Z][A-Z\s/,-]{3,}?)(?:\n:?\s*\d{2,3}|\n:?\s*RT|\n:?\s*RW)', _IM, ':'),
+    _p(r'(?:LAKI-LAKI|PEREMPUAN|Gol\.?\s*Darah)[:\s]*\n([A-Z][A-Z0-9\s/,-]{3,}?)(?:\n\d{2,3}|\n00|\nRT|\nRW)', _IM, ('laki-laki', 'perempuan', 'gol')),
+]
+ALAMAT_EXCLUDED = {
+    'GOL', 'DARAH', 'KATHOLIK', 'ISLAM', 'CERAIHIDUP', 'BELUM KAWIN', 'KARYAWAN', 'SWASTA', 'WNI',
+    'SEUMUR HIDUP', 'PEREMPUAN', 'LAKILAKI', 'JAKARTA', 'BANDUNG', 'KARYAWANSWASTA', 'PROVINSI',
+    'JAWA BARAT', 'KOTA BANDUNG',
+}
+
+# 5. RT/RW
+RT_RW_PATTERNS = [
+    _p(r'RT[/\s]*RW[:\s]*(\d{2,3})[/\s](\d{2,3})', _I, 'rt'),
+    _p(r'RT[/\s]*RW[:\s]*(\d{2,3}\s+\d{2,3})', _I, 'rt'),
+    _p(r'RT[:\s]*(\d{2,3})[/\s]RW[:\s]*(\d{2,3})', _I, 'rt'),
+]
+
+# 6-12. Field "Label: VALUE" sederhana: (field, patterns, panjang minimum)
+KELURAHAN_PATTERNS = [
+    _p(r'Kel[/\s]Desa[:\s]*([A-Z\s]+?)(?:\n|Kecamatan|Kec)', _IM, 'kel'),
+    _p(r'Kelurahan[:\s]*([A-Z\s]+?)(?:\n|Kecamatan|Kec)', _IM, 'kelurahan'),
+]
+KECAMATAN_PATTERNS = [
+    _p(r'Kecamatan[:\s]*([A-Z\s]+?)(?:\n|Agama|Status|Pekerjaan|Kewarganegaraan)', _IM, 'kecamatan'),
+]
+TTL_PATTERNS = [
+    _p(r'Tempat[/\s]Tgl\s+Lahir[:\s]*([A-Z\s]+?[/\s]\d{2}[-/\s]\d{2}[-/\s]\d{4})(?:\n|Jenis|Alamat)', _IM, 'tempat'),
+    _p(r'Tempat[/\s]Tgl\s+Lahir[:\s]*([A-Z\s]+?)(?:\n|Jenis|Alamat)', _IM, 'tempat'),
+]
+AGAMA_PATTERNS = [
+    _p(r'Agama[:\s]*([A-Za-z\s]+?)(?:\n|Status|Pekerjaan|Kewarganegaraan)', _IM, 'agama'),
+]
+STATUS_PATTERNS = [
+    _p(r'Status\s+Perkawinan[:\s]*([A-Za-z/\s]+?)(?:\n|Pekerjaan|Kewarganegaraan|KOTA)', _IM, 'status'),
+]
+PEKERJAAN_PATTERNS = [
+    _p(r'Pekerjaan[:\s]*([A-Za-z\s]+?)(?:\n|Kewarganegaraan|Berlaku)', _IM, 'pekerjaan'),
+]
+KEWARGANEGARAAN_PATTERNS = [
+    _p(r'Kewarganegaraan[:\s]*([A-Z\s]+?)(?:\n|Berlaku)', _IM, 'kewarganegaraan'),
+]
+
+SIMPLE_FIELDS = [
+    ('kelurahan', KELURAHAN_PATTERNS, 2),
+    ('kecamatan', KECAMATAN_PATTERNS, 2),
+    ('tempat_tgl_lahir', TTL_PATTERNS, 5),
+    ('agama', AGAMA_PATTERNS, 2),
+    ('pekerjaan', PEKERJAAN_PATTERNS, 2),
+    ('kewarganegaraan', KEWARGANEGARAAN_PATTERNS, 1),
+]
+
+
+class LabelIndex:
+    """
+    Posisi pertama setiap label (case-insensitive) di teks OCR
+
+    Teks di-lowercase sekali; posisi label dicari saat pertama dibutuhkan lalu
+    disimpan. Untuk teks non-ASCII, lower() bisa mengubah panjang string dan
+    IGNORECASE juga mencocokkan karakter seperti KELVIN SIGN dengan 'k', jadi
+    semua pencarian dimulai dari awal teks (selalu aman).
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self._lower = text.lower() if text.isascii() else None
+        self._positions = {}
+
+    def start(self, label):
+        """
+        Offset awal pencarian untuk pattern dengan label ini
+
+        Returns:
+            Offset (>= 0), atau -1 jika label tidak ada sehingga pattern pasti tidak match
+        """
+        if label is None or self._lower is None:
+            return 0
+        if isinstance(label, tuple):
+            positions = [p for p in (self.start(l) for l in label) if p >= 0]
+            return min(positions) if positions else -1
+
+        position = self._positions.get(label)
+        if position is None:
+            position = self._lower.find(label)
+            self._positions[label] = position
+        return position
+
+    def search(self, entry):
+        """Jalankan satu entry registry, return match atau None"""
+        pattern, label = entry
+        start = self.start(label)
+        if start < 0:
+            return None
+        return pattern.search(self.text, start)
+
+
+def _has_group(match):
+    return match and match.lastindex and match.lastindex >= 1
+
+
+def _extract_nik(index):
+    for entry in NIK_PATTERNS:
+        match = index.search(entry)
+        if _has_group(match):
+            nik = WHITESPACE.sub('', match.group(1))  # Hapus spasi
+            if len(nik) == 16 and nik.isdigit():
+                return nik, match
+    return None, None
+
+
+def _extract_nama(index, nik_match):
+    all_text = index.text
+
+    # Pattern 1: Setelah NIK (16 digit), biasanya nama langsung mengikuti di baris berikutnya
+    # Format: 3273172602770010\nYAN SEN NICO\nToiLahir
+    if nik_match is None:
+        nik_match = SIXTEEN_DIGITS.search(all_text)
+
+    if nik_match:
+        nama_after_nik = NAMA_AFTER_NIK.search(all_text[nik_match.end():])
+        if _has_group(nama_after_nik):
+            nama = WHITESPACE.sub(' ', nama_after_nik.group(1).strip())
+            # Pastikan bukan angka, bukan label, dan cukup panjang
+            if (len(nama) > 2 and
+                    not nama.replace(' ', '').isdigit() and
+                    nama.lower() not in NAMA_EXCLUDED and
+                    not LEADING_DIGITS.match(nama) and
+                    len(nama.split()) <= 6 and  # Max 6 kata untuk nama
+                    len(nama) >= 3):  # Min 3 karakter
+                return nama
+
+    # Pattern 2: Setelah label "Nama" atau "Nama Lengkap"
+    for entry in NAMA_PATTERNS:
+        match = index.search(entry)
+        if _has_group(match):
+            nama = WHITESPACE.sub(' ', match.group(1).strip())
+            if len(nama) > 3 and not nama.isdigit():
+                return nama
+
+    return None
+
+
+def _normalize_jenis_kelamin(jk_text):
+    # Normalize text untuk matching (remove spaces and hyphens)
+    jk_lower = jk_text.lower().replace('-', '').replace(' ', '')
+
+    # Menangani variasi: laklaki, lak-laki, laki-laki, dll
+    if 'lak' in jk_lower:
+        return 'Laki-laki'
+    if 'perempuan' in jk_lower or 'female' in jk_lower:
+        return 'Perempuan'
+    if 'laki' in jk_text.lower() or 'male' in jk_text.lower():
+        return 'Laki-laki'
+    # Jika tidak match, ambil text asli
+    return jk_text.strip()
+
+
+def _extract_jenis_kelamin(index):
+    for entry in JENIS_KELAMIN_PATTERNS:
+        match = index.search(entry)
+        if match:
+            jk_text = match.group(1) if match.lastindex and match.lastindex >= 1 else match.group(0)
+            return _normalize_jenis_kelamin(jk_text)
+
+    # Fallback: cari langsung di text jika pattern tidak match
+    for entry, value in JENIS_KELAMIN_FALLBACK:
+        if index.search(entry):
+            return value
+
+    return None
+
+
+def _extract_alamat(index):
+    # Pattern 1: Setelah label "Alamat"
+    for entry in ALAMAT_PATTERNS:
+        match = index.search(entry)
+        if _has_group(match):
+            alamat = WHITESPACE.sub(' ', match.group(1).strip())
+            if len(alamat) > 5:
+                return alamat
+
+    # Pattern 2: Setelah "Gol Darah" (biasanya alamat langsung setelah gol darah)
+    for entry in ALAMAT_GOL_DARAH_PATTERNS:
+        match = index.search(entry)
+        if _has_group(match):
+            alamat = LEADING_COLON.sub('', match.group(1).strip())
+            alamat = WHITESPACE.sub(' ', alamat)
+            # Pastikan bukan RT/RW pattern (tidak dimulai dengan angka 2-3 digit)
+            if len(alamat) > 5 and not LEADING_RT_DIGITS.match(alamat):
+                return alamat
+
+    # Pattern 3: Sebelum RT/RW (baris yang mengandung alamat pattern sebelum RT/RW)
+    for entry in ALAMAT_RT_PATTERNS:
+        match = index.search(entry)
+        if _has_group(match):
+            alamat = WHITESPACE.sub(' ', match.group(1).strip())
+            # Pastikan bukan label lain dan cukup panjang
+            if (len(alamat) > 5 and
+                    alamat.upper() not in ALAMAT_EXCLUDED and
+                    not LEADING_DIGITS.match(alamat) and
+                    len(alamat) < 50):  # Max 50 karakter untuk alamat
+                return alamat
+
+    return None
+
+
+def _extract_rt_rw(index):
+    for entry in RT_RW_PATTERNS:
+        match = index.search(entry)
+        if match:
+            if len(match.groups()) >= 2:
+                return f"{match.group(1)}/{match.group(2)}"
+            # Single group with both numbers
+            return match.group(1).replace(' ', '/')
+    return None
+
+
+def _extract_simple(index, patterns, min_length):
+    for entry in patterns:
+        match = index.search(entry)
+        if _has_group(match):
+            value = WHITESPACE.sub(' ', match.group(1).strip())
+            if len(value) > min_length:
+                return value
+    return None
+
+
+def _extract_status(index):
+    for entry in STATUS_PATTERNS:
+        match = index.search(entry)
+        if _has_group(match):
+            # Hapus text tambahan seperti "KOTA ANDA"
+            status = TRAILING_KOTA.sub('', match.group(1).strip())
+            status = WHITESPACE.sub(' ', status)
+            if 2 < len(status) < 50:
+                return status
+    return None
+
+
+def extract_ktp_fields(extracted_data, fields=None):
+    """
+    Ekstrak field spesifik dari hasil OCR KTP
+
+    Hanya field yang diminta yang dihitung; setiap field berhenti pada pattern
+    pertama yang valid.
+
+    Args:
+        extracted_data: Dictionary hasil dari KTPOCR.extract_text()
+        fields: List field yang dibutuhkan (subset FIELD_NAMES), None = semua field
+
+    Returns:
+        Dictionary dengan semua key FIELD_NAMES (nik, nama, jenis_kelamin, alamat, dll);
+        field yang tidak diminta bernilai None
+    """
+    wanted = resolve_fields(fields)
+
+    # Gunakan newline untuk mempertahankan struktur baris (penting untuk pattern matching)
+    index = LabelIndex('\n'.join(extracted_data['full_text']))
+
+    result = dict.fromkeys(FIELD_NAMES)
+    if 'nik' in wanted or 'nama' in wanted:
+        # Nama dicari setelah posisi NIK, jadi NIK tetap dicari jika hanya nama yang diminta
+        nik, nik_match = _extract_nik(index)
+        if 'nik' in wanted:
+            result['nik'] = nik
+        if 'nama' in wanted:
+            result['nama'] = _extract_nama(index, nik_match)
+    if 'jenis_kelamin' in wanted:
+        result['jenis_kelamin'] = _extract_jenis_kelamin(index)
+    if 'alamat' in wanted:
+        result['alamat'] = _extract_alamat(index)
+    if 'rt_rw' in wanted:
+        result['rt_rw'] = _extract_rt_rw(index)
+    for name, patterns, min_length in SIMPLE_FIELDS:
+        if name in wanted:
+            result[name] = _extract_simple(index, patterns, min_length)
+    if 'status_perkawinan' in wanted:
+        result['status_perkawinan'] = _extract_status(index)
+    return result
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Tipe gambar internal untuk jalur detect -> OCR
+
+KTPImage membawa pixel (numpy array) beserta urutan warnanya (BGR, RGB atau
+GRAY), sehingga setiap tahap tahu layout gambar tanpa menebak dan tidak perlu
+menyalin / mengonversi "untuk jaga-jaga":
+- input di-decode sekali (path / bytes) atau dibungkus tanpa copy (numpy array,
+  PIL Image apa adanya)
+- crop adalah view ke gambar original
+- konversi warna hanya dilakukan saat konsumen butuh layout lain (to / bgr /
+  rgb / gray), dan hasilnya di-cache per gambar
+
+Numpy array tanpa tag dianggap BGR (format cv2), atau GRAY jika 2 dimensi.
+KTPDetector mempertahankan kontrak lamanya: array 3 channel di sana dianggap RGB.
+"""
+
+import cv2
+import numpy as np
+import sys
+from pathlib import Path
+
+from stage_metrics import stage
+
+BGR = 'BGR'
+RGB = 'RGB'
+GRAY = 'GRAY'
+COLOR_ORDERS = (BGR, RGB, GRAY)
+
+# Jumlah channel per urutan warna
+_CHANNELS = {BGR: 3, RGB: 3, GRAY: 1}
+
+# (dari, ke) -> kode konversi cv2
+_CONVERSIONS = {
+    (BGR, RGB): cv2.COLOR_BGR2RGB,
+    (BGR, GRAY): cv2.COLOR_BGR2GRAY,
+    (RGB, BGR): cv2.COLOR_RGB2BGR,
+    (RGB, GRAY): cv2.COLOR_RGB2GRAY,
+    (GRAY, BGR): cv2.COLOR_GRAY2BGR,
+    (GRAY, RGB): cv2.COLOR_GRAY2RGB,
+}
+
+
+def _is_pil_image(obj):
+    """isinstance(obj, PIL.Image.Image) tanpa meng-import PIL jika belum pernah di-import"""
+    if 'PIL.Image' not in sys.modules:
+        return False
+    return isinstance(obj, sys.modules['PIL.Image'].Image)
+
+
+class KTPImage:
+    """
+    Pixel gambar + urutan warna
+
+    Attributes:
+        pixels: numpy array uint8 (H, W, 3) untuk BGR / RGB, (H, W) untuk GRAY.
+                Bisa berupa view (crop, array milik pemanggil): jangan diubah in-place.
+        order: BGR, RGB atau GRAY
+    """
+
+    __slots__ = ('pixels', 'order', '_converted')
+
+    def __init__(self, pixels, order=BGR):
+        if order not in _CHANNELS:
+            raise ValueError(f"Unknown color order: {order!r}")
+        channels = pixels.shape[2] if pixels.ndim == 3 else 1
+        if pixels.ndim not in (2, 3) or channels != _CHANNELS[order]:
+            raise ValueError(f"{order} image needs {_CHANNELS[order]} channel(s), got shape {pixels.shape}")
+        self.pixels = pixels
+        self.order = order
+        self._converted = {}
+
+    @classmethod
+    def from_input(cls, image_input):
+        """
+        Bungkus input gambar tanpa copy jika memungkinkan
+
+        Args:
+            image_input: KTPImage, path (str / Path), bytes / bytearray / memoryview
+                         (raw image data), numpy array (BGR, BGRA atau grayscale)
+                         atau PIL Image
+
+        Returns:
+            KTPImage, atau None jika file / bytes tidak bisa di-decode
+
+        Raises:
+            TypeError: Jika tipe input tidak didukung
+        """
+        if isinstance(image_input, KTPImage):
+            return image_input
+
+        if isinstance(image_input, (str, Path)):
+            with stage('image_decode'):
+                pixels = cv2.imread(str(image_input))
+            return None if pixels is None else cls(pixels, BGR)
+
+        if isinstance(image_input, (bytes, bytearray, memoryview)):
+            # np.frombuffer membuat view ke buffer request (zero-copy),
+            # cv2.imdecode langsung decode dari buffer tersebut
+            with stage('image_decode'):
+                pixels = cv2.imdecode(np.frombuffer(image_input, np.uint8), cv2.IMREAD_COLOR)
+            return None if pixels is None else cls(pixels, BGR)
+
+        if isinstance(image_input, np.ndarray):
+            if image_input.ndim == 2:
+                return cls(image_input, GRAY)
+            if image_input.ndim == 3 and image_input.shape[2] == 4:
+                return cls(cv2.cvtColor(image_input, cv2.COLOR_BGRA2BGR), BGR)
+            return cls(image_input, BGR)
+
+        if _is_pil_image(image_input):
+            if image_input.mode not in ('RGB', 'L'):
+                image_input = image_input.convert('RGB')
+            # Satu copy dari memori PIL ke numpy; urutan RGB dipertahankan
+            return cls(np.asarray(image_input), GRAY if image_input.mode == 'L' else RGB)
+
+        raise TypeError(f"Unsupported image input type: {type(image_input)}")
+
+    @property
+    def shape(self):
+        return self.pixels.shape
+
+    @property
+    def width(self):
+        return self.pixels.shape[1]
+
+    @property
+    def height(self):
+        return self.pixels.shape[0]
+
+    @property
+    def channels(self):
+        return _CHANNELS[self.order]
+
+    def crop(self, bbox):
+        """Crop (x1, y1, x2, y2) sebagai view, urutan warna sama"""
+        x1, y1, x2, y2 = bbox
+        return KTPImage(self.pixels[y1:y2, x1:x2], self.order)
+
+    def to(self, order):
+        """
+        Pixel dalam urutan warna `order`
+
+        Tanpa konversi jika urutannya sudah sama; selain itu dikonversi sekali
+        lalu di-cache (panggilan berikutnya dengan urutan sama tidak mengonversi lagi).
+        """
+        if order == self.order:
+            return self.pixels
+        pixels = self._converted.get(order)
+        if pixels is None:
+            if (self.order, order) not in _CONVERSIONS:
+                raise ValueError(f"Unknown color order: {order!r}")
+            pixels = cv2.cvtColor(self.pixels, _CONVERSIONS[(self.order, order)])
+            self._converted[order] = pixels
+        return pixels
+
+    def bgr(self):
+        return self.to(BGR)
+
+    def rgb(self):
+        return self.to(RGB)
+
+    def gray(self):
+        return self.to(GRAY)
+
+    def color(self):
+        """
+        Pixel 3 channel dengan konversi seminimal mungkin
+
+        Returns:
+            Tuple (pixels, order): apa adanya untuk BGR / RGB, GRAY dikonversi ke BGR
+        """
+        if self.order == GRAY:
+            return self.bgr(), BGR
+        return self.pixels, self.order
+
+    def to_pil(self):
+        """PIL Image RGB (PIL di-import di sini, tidak dipakai jalur numpy)"""
+        from PIL import Image
+        return Image.fromarray(self.rgb())
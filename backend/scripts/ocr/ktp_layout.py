@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Ekstraksi field KTP berbasis posisi text block (bbox dari PaddleOCR)
+
+Alih-alih menebak struktur dari urutan baris full_text, block dikelompokkan
+menjadi baris berdasarkan posisi vertikal, lalu setiap label ("NIK", "Nama",
+"Agama", ...) dipasangkan dengan block di sebelah kanannya pada baris yang
+sama. Urutan block dari PaddleOCR tidak berpengaruh.
+
+Kompleksitas: pengelompokan baris memakai bucket vertikal (hash), jadi
+waktu tumbuh linear dengan jumlah block; hanya block dalam satu baris yang
+diurutkan berdasarkan x (biasanya < 10 block).
+"""
+
+import re
+import statistics
+
+import numpy as np
+
+from ktp_fields import (
+    FIELD_NAMES,
+    TRAILING_KOTA,
+    WHITESPACE,
+    extract_ktp_fields,
+    resolve_fields,
+    _normalize_jenis_kelamin,
+)
+
+# Alias label (lowercase, tanpa spasi) -> field. Termasuk variasi hasil OCR.
+# Field None = label dikenali (supaya value sebelumnya berhenti) tapi tidak diekstrak.
+LABEL_ALIASES = [
+    ('tempat/tgllahir', 'tempat_tgl_lahir'),
+    ('tempattgllahir', 'tempat_tgl_lahir'),
+    ('tempat/tgl', 'tempat_tgl_lahir'),
+    ('at/tgllahir', 'tempat_tgl_lahir'),
+    ('toilahir', 'tempat_tgl_lahir'),
+    ('jeniskelamin', 'jenis_kelamin'),
+    ('statusperkawinan', 'status_perkawinan'),
+    ('kewarganegaraan', 'kewarganegaraan'),
+    ('negaraan', 'kewarganegaraan'),
+    ('kelurahan', 'kelurahan'),
+    ('kel/desa', 'kelurahan'),
+    ('keldesa', 'kelurahan'),
+    ('vdesa', 'kelurahan'),
+    ('kecamatan', 'kecamatan'),
+    ('camatan', 'kecamatan'),
+    ('pekerjaan', 'pekerjaan'),
+    ('goldarah', None),
+    ('gol.darah', None),
+    ('berlakuhingga', None),
+    ('alamat', 'alamat'),
+    ('rt/rw', 'rt_rw'),
+    ('rtrw', 'rt_rw'),
+    ('arw', 'rt_rw'),
+    ('agama', 'agama'),
+    ('nama', 'nama'),
+    ('nik', 'nik'),
+]
+
+# Satu regex untuk semua alias; urutan alternatif = urutan LABEL_ALIASES
+LABEL_PATTERN = re.compile('|'.join(re.escape(alias) for alias, _ in LABEL_ALIASES))
+LABEL_FIELDS = dict(LABEL_ALIASES)
+
+# Jarak horizontal maksimum (kelipatan tinggi baris) antar block dalam satu value;
+# block yang lebih jauh (mis. kota/tanggal terbit di kolom foto) tidak ikut
+MAX_VALUE_GAP = 3.0
+
+
+def _block_box(bbox):
+    """(x0, y0, x1, y1) dari polygon rec_polys atau box rec_boxes, None jika tidak valid"""
+    if bbox is None:
+        return None
+    try:
+        points = np.asarray(bbox, dtype=np.float32).reshape(-1, 2)
+    except (TypeError, ValueError):
+        return None
+    if len(points) == 0:
+        return None
+    x0, y0 = points.min(axis=0)
+    x1, y1 = points.max(axis=0)
+    return float(x0), float(y0), float(x1), float(y1)
+
+
+def _block_boxes(text_blocks):
+    """
+    Box semua block sekaligus
+
+    Polygon PaddleOCR biasanya berbentuk sama (4 titik), jadi min/max dihitung
+    dalam satu operasi numpy; bentuk campuran dihitung per block.
+
+    Returns:
+        List (x0, y0, x1, y1), atau None jika ada block tanpa bbox yang valid
+    """
+    if not text_blocks:
+        return []
+    try:
+        points = np.asarray([block.get('bbox') for block in text_blocks], dtype=np.float32)
+        points = points.reshape(len(text_blocks), -1, 2)
+    except (TypeError, ValueError):
+        points = None
+
+    if points is None or points.shape[1] == 0:
+        boxes = [_block_box(block.get('bbox')) for block in text_blocks]
+        return None if any(box is None for box in boxes) else boxes
+
+    return np.concatenate([points.min(axis=1), points.max(axis=1)], axis=1).tolist()
+
+
+def group_rows(text_blocks):
+    """
+    Kelompokkan text block menjadi baris (atas ke bawah, kiri ke kanan)
+
+    Args:
+        text_blocks: List block dengan 'text' dan 'bbox'
+
+    Returns:
+        Tuple (rows, row_height): setiap baris adalah list (x0, x1, text) urut
+        berdasarkan x0. None jika ada block tanpa bbox yang valid.
+    """
+    boxes = _block_boxes(text_blocks)
+    if boxes is None:
+        return None
+    items = [
+        ((y0 + y1) / 2, y1 - y0, x0, x1, block['text'])
+        for block, (x0, y0, x1, y1) in zip(text_blocks, boxes)
+    ]
+
+    if not items:
+        return [], 1.0
+
+    # Bucket setengah tinggi baris: block di baris yang sama jatuh ke bucket yang sama
+    # atau bucket tetangga
+    row_height = max(1.0, statistics.median(item[1] for item in items))
+    bucket_size = row_height / 2
+    buckets = {}
+    for item in items:
+        buckets.setdefault(int(item[0] // bucket_size), []).append(item)
+
+    rows = []
+    current = None
+    current_key = None
+    current_center = None
+    for key in sorted(buckets):
+        members = buckets[key]
+        center = sum(m[0] for m in members) / len(members)
+        # Gabung dengan baris sebelumnya jika pusatnya cukup dekat
+        if current is not None and key - current_key <= 2 and center - current_center < row_height * 0.6:
+            current.extend(members)
+            current_center = sum(m[0] for m in current) / len(current)
+        else:
+            current = list(members)
+            current_center = center
+            rows.append(current)
+        current_key = key
+
+    return [
+        [(m[2], m[3], m[4]) for m in sorted(row, key=lambda m: m[2])]
+        for row in rows
+    ], row_height
+
+
+def match_label(text):
+    """
+    Cek apakah text diawali label KTP
+
+    Returns:
+        Tuple (field atau None, sisa text setelah label) jika diawali label, selain itu None
+    """
+    compact = text.lower().replace(' ', '')
+    match = LABEL_PATTERN.match(compact)
+    if match is None:
+        return None
+
+    # Cari posisi akhir alias di text asli (lewati spasi)
+    alias = match.group(0)
+    consumed = 0
+    end = 0
+    while end < len(text) and consumed < len(alias):
+        if text[end] != ' ':
+            consumed += 1
+        end += 1
+    rest = text[end:]
+
+    # Label tanpa pemisah yang menempel ke kata lain (mis. "NIKAH") bukan label
+    if rest and rest[0].isalpha():
+        return None
+    return LABEL_FIELDS[alias], rest
+
+
+def _clean(value):
+    value = WHITESPACE.sub(' ', value).strip()
+    return value.lstrip(':').strip()
+
+
+def _normalize(field, value):
+    """Normalisasi value sesuai field, None jika tidak valid"""
+    if field == 'nik':
+        digits = ''.join(ch for ch in value if ch.isdigit())
+        return digits[:16] if len(digits) >= 16 else None
+    if field == 'jenis_kelamin':
+        # Baris jenis kelamin juga berisi "Gol. Darah" di KTP
+        return _normalize_jenis_kelamin(value.split()[0]) if value else None
+    if field == 'rt_rw':
+        digits = [part for part in value.replace('/', ' ').split() if part.isdigit()]
+        return f'{digits[0]}/{digits[1]}' if len(digits) >= 2 else None
+    if field == 'status_perkawinan':
+        value = TRAILING_KOTA.sub('', value)
+    return value if len(value) > 1 else None
+
+
+def extract_ktp_fields_layout(extracted_data, fallback=True, fields=None):
+    """
+    Ekstrak field KTP dari posisi text block
+
+    Args:
+        extracted_data: Dictionary hasil dari KTPOCR.extract_text() (text_blocks dengan bbox)
+        fallback: Jika True, field yang tidak ditemukan (atau block tanpa bbox)
+            diisi dari ekstraksi berbasis teks (ktp_fields.extract_ktp_fields)
+        fields: List field yang dibutuhkan (subset FIELD_NAMES), None = semua field.
+            Baris berhenti diproses begitu semua field yang diminta ditemukan.
+
+    Returns:
+        Dictionary dengan field yang sama seperti extract_ktp_fields
+    """
+    wanted = resolve_fields(fields)
+    result = dict.fromkeys(FIELD_NAMES)
+    remaining = set(wanted)
+    grouped = group_rows(extracted_data.get('text_blocks', []))
+
+    if grouped is not None:
+        rows, row_height = grouped
+        max_gap = row_height * MAX_VALUE_GAP
+        for row in rows:
+            if not remaining:
+                break
+            field = None
+            parts = []
+            last_x1 = None
+
+            def flush():
+                if field in remaining and parts:
+                    result[field] = _normalize(field, _clean(' '.join(parts)))
+                    if result[field] is not None:
+                        remaining.discard(field)
+
+            for x0, x1, text in row:
+                label = match_label(text)
+                if label is not None:
+                    flush()
+                    field, rest = label
+                    parts = [rest] if rest.strip(' :') else []
+                    # Kolom value KTP rata kiri, jadi jarak label -> value pertama
+                    # bisa jauh; batas jarak hanya berlaku antar block value
+                    last_x1 = x1 if parts else None
+                    continue
+                if field is None:
+                    continue
+                if last_x1 is not None and x0 - last_x1 > max_gap:
+                    # Terlalu jauh dari value (kolom foto / tanggal terbit)
+                    flush()
+                    field = None
+                    continue
+                parts.append(text)
+                last_x1 = x1
+            flush()
+
+    if fallback and remaining:
+        text_fields = extract_ktp_fields(extracted_data, fields=remaining)
+        for name in remaining:
+            result[name] = text_fields[name]
+
+    return result
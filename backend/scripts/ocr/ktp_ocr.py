@@ -3,17 +3,61 @@
 Script untuk ekstraksi teks dari KTP menggunakan PaddleOCR
 """
 
-from paddleocr import PaddleOCR
 import cv2
 import os
 import sys
 import json
-import re
+import time
 from pathlib import Path
 
+from ktp_fields import FIELD_NAMES, extract_ktp_fields, resolve_fields
+from ktp_image import GRAY, KTPImage
+from ktp_layout import extract_ktp_fields_layout
+from ktp_rectify import rectify_card
+from ktp_template import REQUIRED_FIELDS, load_template, parse_roi_text, roi_boxes
+from request_deadline import check_deadline
+from stage_metrics import stage
+
+# Model recognition untuk mode 'roi' (model latin, sama dengan yang dipakai PaddleOCR untuk lang='id')
+ROI_REC_MODEL = 'latin_PP-OCRv5_mobile_rec'
+
+OCR_MODES = ('full', 'roi')
+
+
+def resolve_ocr_mode(request, default):
+    """
+    Mode OCR dari request ("ocr_mode")
+
+    Args:
+        request: Dict request daemon
+        default: Mode yang dipakai jika request tidak menentukan ocr_mode
+
+    Raises:
+        ValueError: Jika ocr_mode bukan salah satu OCR_MODES
+    """
+    ocr_mode = request.get('ocr_mode') or default
+    if ocr_mode not in OCR_MODES:
+        expected = ' or '.join(f"'{mode}'" for mode in OCR_MODES)
+        raise ValueError(f"Invalid ocr_mode: {ocr_mode} (expected {expected})")
+    return ocr_mode
+
+
+def format_ktp_data(fields):
+    """
+    Format field hasil extract_ktp_fields() menjadi payload 'data' untuk backend
+    (NIK, Nama, Jenis Kelamin, dan Alamat)
+    """
+    return {
+        'identityNumber': fields.get('nik'),
+        'name': fields.get('nama'),
+        'gender': fields.get('jenis_kelamin'),
+        'alamat': fields.get('alamat'),
+    }
+
 
 class KTPOCR:
-    def __init__(self, lang='id', max_image_size=1200):
+    def __init__(self, lang='id', max_image_size=1200, field_extractor='text', ocr_mode='full',
+                 roi_template=None, rectify=False):
         """
         Inisialisasi PaddleOCR untuk ekstraksi teks KTP
         
@@ -22,7 +66,23 @@ class KTPOCR:
             max_image_size: Ukuran maksimal gambar (lebar atau tinggi) sebelum resize.
                            Jika None, tidak akan di-resize. Default: 1200 pixels
                            (Optimal untuk KTP: cukup besar untuk akurasi, cukup kecil untuk kecepatan)
+            field_extractor: 'text' (pattern pada full_text) atau 'layout' (posisi bbox
+                           text block, field yang tidak ditemukan diisi dari 'text')
+            ocr_mode: Mode default untuk extract_ktp(): 'full' (deteksi + recognition
+                           seluruh kartu) atau 'roi' (recognition pada region field wajib saja,
+                           lihat ktp_template.py)
+            roi_template: Path template region JSON untuk mode 'roi' (default: models/ktp_template.json
+                           jika ada, selain itu ktp_template.DEFAULT_TEMPLATE)
+            rectify: Jika True, kartu di dalam crop di-warp ke rasio kanonik (maksimal
+                           ktp_rectify.CANONICAL_SIZE, tanpa upscale) sebelum OCR, menggantikan
+                           resize max_image_size. Jika sudut kartu tidak ditemukan, resize
+                           max_image_size tetap dipakai. Input harus crop KTP (output KTPDetector).
         """
+        if field_extractor not in ('text', 'layout'):
+            raise ValueError(f"field_extractor harus 'text' atau 'layout': {field_extractor}")
+        if ocr_mode not in OCR_MODES:
+            raise ValueError(f"ocr_mode harus 'full' atau 'roi': {ocr_mode}")
+
         # Suppress print statements when called from subprocess
         if os.getenv('SUPPRESS_OCR_LOGS') != '1':
             print("Memuat model PaddleOCR...", file=sys.stderr)
@@ -31,6 +91,9 @@ class KTPOCR:
         # - use_angle_cls=False: Skip angle classification (KTP biasanya sudah lurus)
         # - det_db_thresh=0.3: Threshold untuk deteksi teks (default 0.3, bisa dinaikkan untuk skip area non-teks)
         # - rec_batch_num=6: Batch size untuk recognition (default 6, bisa disesuaikan dengan RAM)
+        # Import PaddleOCR (dan Paddle) baru di sini: modul ini juga di-import untuk
+        # helper ringan (format_ktp_data, OCR_MODES) tanpa butuh model
+        from paddleocr import PaddleOCR
         self.ocr = PaddleOCR(
             lang=lang,
             use_angle_cls=False,  # Skip angle classification untuk mempercepat (KTP biasanya lurus)
@@ -38,35 +101,154 @@ class KTPOCR:
             rec_batch_num=6       # Batch size untuk recognition
         )
         self.max_image_size = max_image_size
+        self.field_extractor = field_extractor
+        self.ocr_mode = ocr_mode
+        self.rectify = rectify
+        self.roi_template = load_template(roi_template)
+        self._recognizer = None
+        if ocr_mode == 'roi':
+            self._get_recognizer()
         if os.getenv('SUPPRESS_OCR_LOGS') != '1':
             print("Model PaddleOCR siap digunakan!", file=sys.stderr)
     
-    def extract_text(self, image_path):
+    def extract_text(self, image_input):
         """
         Ekstrak teks dari gambar KTP
         
         Args:
-            image_path: Path ke file gambar KTP
+            image_input: Bisa berupa:
+                - Path ke file gambar KTP (str atau Path)
+                - bytes / bytearray / memoryview (raw image data, di-decode di memory)
+                - numpy array (BGR format dari cv2, atau grayscale)
+                - PIL Image object
+                - KTPImage (mis. crop KTPDetector dengan crop_format='image')
             
         Returns:
             Dictionary berisi hasil OCR dengan teks dan koordinat
         """
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"File tidak ditemukan: {image_path}")
+        img, image_path = self._load(image_input)
+        check_deadline('image_decode')
+        return self._extract_text_from_image(img, image_path)
+    
+    def load_image(self, image_input):
+        """
+        Convert input gambar menjadi numpy array BGR (atau grayscale) tanpa menulis ke disk
         
-        # Suppress logs when called from subprocess
-        if os.getenv('SUPPRESS_OCR_LOGS') != '1':
-            print(f"\nMemproses gambar: {image_path}", file=sys.stderr)
+        Args:
+            image_input: Path, bytes / bytearray / memoryview, numpy array, PIL Image atau KTPImage
+            
+        Returns:
+            Tuple (numpy array BGR / grayscale, image_path atau None jika bukan dari file)
+        """
+        img, image_path = self._load(image_input)
+        return (img.pixels if img.order == GRAY else img.bgr()), image_path
+    
+    def _load(self, image_input):
+        """
+        Bungkus input gambar sebagai KTPImage (numpy array / crop dipakai tanpa copy)
+        
+        Returns:
+            Tuple (KTPImage, image_path atau None jika bukan dari file)
+        """
+        image_path = None
+        if isinstance(image_input, (str, Path)):
+            image_path = str(image_input)
+            if not os.path.exists(image_path):
+                raise FileNotFoundError(f"File tidak ditemukan: {image_path}")
+            
+            # Suppress logs when called from subprocess
+            if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+                print(f"\nMemproses gambar: {image_path}", file=sys.stderr)
         
-        # Baca gambar untuk cek ukuran dan resize jika perlu
-        img = cv2.imread(image_path)
+        try:
+            img = KTPImage.from_input(image_input)
+        except TypeError:
+            raise TypeError(f"Tipe input gambar tidak didukung: {type(image_input)}") from None
         if img is None:
-            raise ValueError(f"Tidak dapat membaca gambar: {image_path}")
+            if image_path is not None:
+                raise ValueError(f"Tidak dapat membaca gambar: {image_path}")
+            raise ValueError("Tidak dapat men-decode gambar dari bytes")
+        return img, image_path
+    
+    def _extract_text_from_image(self, img, image_path=None):
+        """
+        Ekstrak teks dari gambar yang sudah di-decode
         
+        Dipakai oleh extract_text() untuk semua tipe input setelah di-decode.
+        
+        Args:
+            img: KTPImage
+            image_path: Path asal gambar (hanya untuk informasi di hasil), None jika dari memory
+            
+        Returns:
+            Dictionary berisi hasil OCR dengan teks dan koordinat
+        """
+        with stage('preprocess'):
+            img = self._prepare_image(img)
+        check_deadline('preprocess')
+        
+        # Lakukan OCR
+        with stage('ocr_predict'):
+            result = self.ocr.predict(img)
+        
+        return self._parse_ocr_result(result[0] if result and len(result) > 0 else None, image_path)
+    
+    def extract_text_batch(self, image_inputs):
+        """
+        Ekstrak teks dari beberapa gambar KTP dengan satu panggilan PaddleOCR
+        
+        Dipakai oleh scheduler micro-batching di daemon: deteksi teks tetap per gambar,
+        tetapi PaddleOCR bisa menggabungkan recognition dari beberapa gambar.
+        
+        Args:
+            image_inputs: List input (tipe sama seperti extract_text)
+            
+        Returns:
+            List hasil extract_text, urutan sama dengan input
+        """
+        loaded = [self._load(image_input) for image_input in image_inputs]
+        if not loaded:
+            return []
+        check_deadline('image_decode')
+        
+        with stage('preprocess'):
+            images = [self._prepare_image(img) for img, _ in loaded]
+        check_deadline('preprocess')
+        with stage('ocr_predict'):
+            results = list(self.ocr.predict(images))
+        
+        return [
+            self._parse_ocr_result(results[i] if i < len(results) else None, image_path)
+            for i, (_, image_path) in enumerate(loaded)
+        ]
+    
+    def _prepare_image(self, img):
+        """
+        Resize (max_image_size) atau rektifikasi (rectify=True) dan konversi grayscale sebelum OCR
+        
+        Urutan sama seperti sebelumnya (resize gambar berwarna, lalu grayscale), tetapi
+        tanpa konversi ke BGR terlebih dulu: resize berjalan pada urutan warna input
+        (per channel, jadi hasilnya identik) dan grayscale diambil langsung dari urutan itu.
+        
+        Args:
+            img: KTPImage
+            
+        Returns:
+            numpy array BGR (atau grayscale untuk input grayscale) siap untuk PaddleOCR
+        """
         original_height, original_width = img.shape[:2]
         if os.getenv('SUPPRESS_OCR_LOGS') != '1':
             print(f"Ukuran gambar: {original_width}x{original_height} pixels", file=sys.stderr)
         
+        if self.rectify:
+            # Warp gambar grayscale (1 channel) supaya warpPerspective lebih murah
+            warped, _ = rectify_card(img.gray())
+            if warped is not None:
+                if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+                    print(f"Kartu di-rektifikasi ke {warped.shape[1]}x{warped.shape[0]}", file=sys.stderr)
+                return cv2.cvtColor(warped, cv2.COLOR_GRAY2BGR)
+            # Sudut tidak ditemukan / kartu portrait: lanjut dengan resize max_image_size
+        
         # Resize jika gambar terlalu besar (untuk mempercepat proses)
         if self.max_image_size and (original_width > self.max_image_size or original_height > self.max_image_size):
             # Hitung scale factor
@@ -75,20 +257,27 @@ class KTPOCR:
             new_height = int(original_height * scale)
             
             # Resize dengan INTER_AREA untuk downscaling (lebih cepat dan lebih baik untuk teks)
-            img = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_AREA)
+            resized = cv2.resize(img.pixels, (new_width, new_height), interpolation=cv2.INTER_AREA)
+            img = KTPImage(resized, img.order)
             if os.getenv('SUPPRESS_OCR_LOGS') != '1':
                 print(f"Gambar di-resize menjadi: {new_width}x{new_height} pixels (scale: {scale:.2f}) untuk mempercepat proses", file=sys.stderr)
         
+        if img.order == GRAY:
+            return img.pixels
+        
         # Convert ke grayscale untuk mempercepat OCR (KTP biasanya hitam putih)
         # Ini mengurangi data yang diproses tanpa mengurangi akurasi signifikan
-        if len(img.shape) == 3:
-            img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            # Convert kembali ke BGR untuk PaddleOCR (beberapa model expect BGR)
-            img = cv2.cvtColor(img_gray, cv2.COLOR_GRAY2BGR)
-        
-        # Lakukan OCR
-        result = self.ocr.predict(img)
+        # Convert kembali ke BGR untuk PaddleOCR (beberapa model expect BGR)
+        return cv2.cvtColor(img.gray(), cv2.COLOR_GRAY2BGR)
+    
+    def _parse_ocr_result(self, ocr_result, image_path=None):
+        """
+        Format satu OCRResult dari PaddleOCR menjadi dictionary extract_text
         
+        Args:
+            ocr_result: Elemen hasil self.ocr.predict(), atau None jika tidak ada hasil
+            image_path: Path asal gambar (hanya untuk informasi di hasil)
+        """
         # Format hasil
         extracted_data = {
             'image_path': image_path,
@@ -97,9 +286,7 @@ class KTPOCR:
         }
         
         # Parse hasil OCR - hasil dari predict() adalah OCRResult object
-        if result and len(result) > 0:
-            ocr_result = result[0]  # Ambil OCRResult object
-            
+        if ocr_result is not None:
             # OCRResult adalah dict-like, akses data menggunakan keys yang diketahui
             # Keys: rec_texts (teks), rec_scores (confidence), rec_polys/rec_boxes (bounding boxes)
             texts = ocr_result.get('rec_texts', [])
@@ -230,331 +417,201 @@ class KTPOCR:
         
         return results
     
-    def extract_ktp_fields(self, extracted_data):
+    def extract_ktp(self, image_input, ocr_mode=None, fields=None):
+        """
+        OCR + ekstraksi field KTP dalam satu langkah
+
+        Args:
+            image_input: Input gambar crop KTP (tipe sama seperti extract_text)
+            ocr_mode: 'full' atau 'roi'. Jika None, pakai self.ocr_mode
+            fields: List field yang dibutuhkan (lihat extract_ktp_fields). Pada mode 'roi'
+                    juga membatasi region yang di-OCR.
+
+        Returns:
+            Dictionary dengan 'fields', 'extracted_data', dan 'roi' (None pada mode 'full',
+            lihat extract_ktp_roi_batch)
+        """
+        return self.extract_ktp_batch([image_input], ocr_mode=ocr_mode, fields=fields)[0]
+
+    def extract_ktp_batch(self, image_inputs, ocr_mode=None, fields=None):
+        """
+        Versi batch dari extract_ktp() untuk micro-batching di daemon
+
+        Returns:
+            List hasil extract_ktp, urutan sama dengan input
+        """
+        if (ocr_mode or self.ocr_mode) == 'roi':
+            return self.extract_ktp_roi_batch(image_inputs, fields=fields)
+        resolve_fields(fields)
+        return [
+            {
+                'fields': self.extract_ktp_fields(extracted_data, fields=fields),
+                'extracted_data': extracted_data,
+                'roi': None,
+            }
+            for extracted_data in self.extract_text_batch(image_inputs)
+        ]
+
+    def extract_ktp_roi_batch(self, image_inputs, fields=None):
+        """
+        Mode OCR 'roi': recognition hanya pada region field wajib (NIK, nama,
+        jenis kelamin, alamat) dari template layout, tanpa deteksi teks full-page
+
+        Gambar dengan field yang diminta kosong / tidak valid di-OCR ulang full-page,
+        dan field yang kosong diisi dari hasil tersebut.
+
+        Args:
+            image_inputs: List input crop KTP (tipe sama seperti extract_text)
+            fields: List field yang dibutuhkan; hanya region field tersebut yang di-OCR.
+                    None = semua field template. Field di luar template selalu diambil
+                    dari OCR full-page.
+
+        Returns:
+            List dictionary (urutan sama dengan input) dengan:
+                - fields: Dictionary field seperti extract_ktp_fields
+                - extracted_data: text_blocks / full_text dari region (atau dari OCR full-page
+                  jika fallback)
+                - roi: {'timings_ms': waktu per region (dan 'fallback' jika terjadi),
+                        'fallback': list field yang diisi dari OCR full-page}
+                  Pada batch, waktu per field adalah waktu panggilan recognition dibagi
+                  jumlah gambar.
+        """
+        wanted = resolve_fields(REQUIRED_FIELDS if fields is None else fields)
+        loaded = [self._load(image_input) for image_input in image_inputs]
+        check_deadline('image_decode')
+        with stage('preprocess'):
+            images = [self._prepare_image(img) for img, _ in loaded]
+        check_deadline('preprocess')
+        results = [
+            {
+                'fields': dict.fromkeys(FIELD_NAMES),
+                'extracted_data': {'image_path': image_path, 'text_blocks': [], 'full_text': []},
+                'roi': {'timings_ms': {}, 'fallback': []},
+            }
+            for _, image_path in loaded
+        ]
+        if not images:
+            return results
+
+        for field in REQUIRED_FIELDS:
+            if field not in wanted:
+                continue
+            start = time.perf_counter()
+            boxes = []
+            crops = []
+            for img in images:
+                height, width = img.shape[:2]
+                x0, y0, x1, y1 = roi_boxes({field: self.roi_template[field]}, width, height)[field]
+                boxes.append((x0, y0, x1, y1))
+                crops.append(img[y0:y1, x0:x1])
+            with stage('ocr_predict'):
+                recognized = self._recognize(crops)
+            elapsed_ms = (time.perf_counter() - start) * 1000 / len(images)
+
+            for result, (x0, y0, x1, y1), texts in zip(results, boxes, recognized):
+                result['fields'][field] = parse_roi_text(field, [text for text, _ in texts])
+                result['roi']['timings_ms'][field] = elapsed_ms
+                for text, confidence in texts:
+                    result['extracted_data']['text_blocks'].append({
+                        'text': text,
+                        'confidence': float(confidence),
+                        'bbox': [[x0, y0], [x1, y0], [x1, y1], [x0, y1]],
+                    })
+                    result['extracted_data']['full_text'].append(text)
+
+        # Fallback OCR full-page untuk gambar dengan field yang diminta masih kosong
+        pending = [
+            i for i, result in enumerate(results)
+            if any(result['fields'][field] is None for field in wanted)
+        ]
+        if pending:
+            start = time.perf_counter()
+            with stage('ocr_predict'):
+                predicted = list(self.ocr.predict([images[i] for i in pending]))
+            elapsed_ms = (time.perf_counter() - start) * 1000 / len(pending)
+            for j, i in enumerate(pending):
+                result = results[i]
+                extracted_data = self._parse_ocr_result(
+                    predicted[j] if j < len(predicted) else None, result['extracted_data']['image_path']
+                )
+                missing = [field for field in FIELD_NAMES if field in wanted and result['fields'][field] is None]
+                full_fields = self.extract_ktp_fields(extracted_data, fields=missing)
+                for field in missing:
+                    result['fields'][field] = full_fields[field]
+                result['roi']['fallback'] = missing
+                result['extracted_data'] = extracted_data
+                result['roi']['timings_ms']['fallback'] = elapsed_ms
+
+        for result in results:
+            extracted_data = result['extracted_data']
+            extracted_data['combined_text'] = '\n'.join(extracted_data['full_text'])
+        return results
+
+    def _get_recognizer(self):
+        """
+        Model recognition saja (tanpa deteksi teks) untuk mode 'roi', di-load sekali
+
+        Returns:
+            paddleocr.TextRecognition, atau None jika tidak tersedia (versi PaddleOCR lama);
+            region lalu di-OCR dengan pipeline lengkap
+        """
+        if self._recognizer is None:
+            try:
+                from paddleocr import TextRecognition
+                self._recognizer = TextRecognition(model_name=ROI_REC_MODEL)
+            except Exception as e:
+                if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+                    print(f"TextRecognition tidak tersedia, region di-OCR dengan pipeline lengkap: {e}",
+                          file=sys.stderr)
+                self._recognizer = False
+        return self._recognizer or None
+
+    def _recognize(self, crops):
+        """
+        Recognition beberapa region sekaligus
+
+        Returns:
+            List (per crop) berisi list (text, confidence)
+        """
+        recognized = [[] for _ in crops]
+        indices = [i for i, crop in enumerate(crops) if crop.size > 0]
+        if not indices:
+            return recognized
+
+        batch = [crops[i] for i in indices]
+        recognizer = self._get_recognizer()
+        if recognizer is not None:
+            for i, output in zip(indices, recognizer.predict(batch)):
+                text = output.get('rec_text')
+                if text:
+                    recognized[i].append((text, output.get('rec_score', 1.0)))
+        else:
+            for i, output in zip(indices, self.ocr.predict(batch)):
+                recognized[i] = [
+                    (block['text'], block['confidence'])
+                    for block in self._parse_ocr_result(output)['text_blocks']
+                ]
+        return recognized
+
+    def extract_ktp_fields(self, extracted_data, fields=None):
         """
         Ekstrak field spesifik dari hasil OCR KTP
         
+        Mode 'text': pattern per label, lihat ktp_fields.py
+        Mode 'layout': pasangan label → value dari posisi block, lihat ktp_layout.py
+        
         Args:
             extracted_data: Dictionary hasil dari extract_text()
+            fields: List field yang dibutuhkan (mis. ktp_fields.API_FIELDS), None = semua
+                    field. Field lain tidak dihitung dan bernilai None.
             
         Returns:
             Dictionary dengan field: nik, nama, jenis_kelamin, alamat, dll
         """
-        fields = {
-            'nik': None,
-            'nama': None,
-            'jenis_kelamin': None,
-            'alamat': None,
-            'rt_rw': None,
-            'kelurahan': None,
-            'kecamatan': None,
-            'tempat_tgl_lahir': None,
-            'agama': None,
-            'status_perkawinan': None,
-            'pekerjaan': None,
-            'kewarganegaraan': None,
-        }
-        
-        # Gabungkan semua teks untuk pencarian
-        # Gunakan newline untuk mempertahankan struktur baris (penting untuk pattern matching)
-        all_text = '\n'.join(extracted_data['full_text'])
-        text_lines = extracted_data['full_text']
-        
-        # 1. NIK - biasanya 16 digit angka, bisa ada spasi atau strip
-        nik_patterns = [
-            r'NIK[:\s]*(\d{16})',  # NIK: 1234567890123456
-            r'NIK[:\s]*(\d{4}\s?\d{4}\s?\d{4}\s?\d{4})',  # NIK dengan spasi
-            r'(\d{16})',  # Hanya 16 digit (ambil yang pertama)
-        ]
-        nik_found = None
-        for pattern in nik_patterns:
-            match = re.search(pattern, all_text, re.IGNORECASE)
-            if match and match.lastindex and match.lastindex >= 1:
-                nik = re.sub(r'\s+', '', match.group(1))  # Hapus spasi
-                if len(nik) == 16 and nik.isdigit():
-                    fields['nik'] = nik
-                    nik_found = match  # Simpan match untuk digunakan di pattern nama
-                    break
-        
-        # 2. Nama - bisa setelah NIK atau setelah label "Nama"
-        # Pattern 1: Setelah NIK (16 digit), biasanya nama langsung mengikuti di baris berikutnya
-        # Format: 3273172602770010\nYAN SEN NICO\nToiLahir
-        if nik_found:
-            nik_match = nik_found
-        else:
-            nik_match = re.search(r'(\d{16})', all_text)
-        
-        if nik_match:
-            # Cari teks setelah NIK yang kemungkinan nama
-            nik_end = nik_match.end()
-            after_nik = all_text[nik_end:]
-            
-            # Cari baris setelah NIK yang berisi huruf besar (nama biasanya huruf besar semua)
-            # Pattern: \n diikuti : (optional) lalu huruf besar, stop di \nat/Tgl atau label lain
-            # Format bisa: \n:DEBBY ANGGRAINI\n atau \nYAN SEN NICO\n
-            nama_after_nik = re.search(
-                r'\n:?\s*([A-Z][A-Z\s]{2,50}?)(?:\nat/Tgl|\nToiLahir|\nTempat|\nLahir|\nKelamin|\nJenis|\nGol|\nGol\s+Darah|\nAlamat|\nRT|\nRW|\nARW|\nKel|\nKec|\nVDesa|\ncamatan|\nAgama|\nStatus|\nPekerjaan|\nKewarganegaraan|\nPROVINSI|\nKOTA|\nnegaraan|$)',
-                after_nik,
-                re.MULTILINE
-            )
-            if nama_after_nik and nama_after_nik.lastindex and nama_after_nik.lastindex >= 1:
-                nama = nama_after_nik.group(1).strip()
-                nama = re.sub(r'\s+', ' ', nama)
-                # Pastikan bukan angka, bukan label, dan cukup panjang
-                excluded_words = ['nik', 'nama', 'tempat', 'lahir', 'toilahir', 'bandung', 'kota', 'kota bandung', 'provinsi', 'jakarta', 'jakarta selatan', 'dki jakarta']
-                if (len(nama) > 2 and 
-                    not nama.replace(' ', '').isdigit() and 
-                    not nama.lower() in excluded_words and
-                    not re.match(r'^\d+', nama) and
-                    len(nama.split()) <= 6 and  # Max 6 kata untuk nama
-                    len(nama) >= 3):  # Min 3 karakter
-                    fields['nama'] = nama
-        
-        # Pattern 2: Setelah label "Nama" atau "Nama Lengkap"
-        if not fields['nama']:
-            nama_patterns = [
-                r'Nama\s+(?:Lengkap)?[:\s]*([A-Z][A-Z\s]+?)(?:\n|Tempat|Jenis|Alamat|RT|Kel|Kec|Agama|Status|Pekerjaan|Kewarganegaraan|PROVINSI|KOTA|NIK)',
-                r'Nama[:\s]*([A-Z][A-Z\s]{3,50})',
-            ]
-            for pattern in nama_patterns:
-                match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
-                if match and match.lastindex and match.lastindex >= 1:
-                    nama = match.group(1).strip()
-                    # Bersihkan nama dari karakter aneh
-                    nama = re.sub(r'\s+', ' ', nama)
-                    if len(nama) > 3 and not nama.isdigit():
-                        fields['nama'] = nama
-                        break
-        
-        # 3. Jenis Kelamin
-        # Pattern lebih fleksibel untuk menangani variasi OCR seperti "LAK-LAKI", "LAKI-LAKI", "Laki-laki", dll
-        jenis_kelamin_patterns = [
-            r'Jenis\s+kelamin[:\s]*([A-Za-z/]+)',
-            # Pattern untuk menangkap "LAK-LAKI" (prioritas tinggi karena sering terjadi di OCR)
-            r'(LAK\s*[-]?\s*LAKI)',
-            # Pattern untuk "LAKI-LAKI" atau "Laki-laki"
-            r'(LAKI\s*[-]?\s*LAKI|Laki\s*[-\s]?laki)',
-            # Pattern untuk "Perempuan"
-            r'(Perempuan)',
-        ]
-        for pattern in jenis_kelamin_patterns:
-            match = re.search(pattern, all_text, re.IGNORECASE)
-            if match:
-                # Check if group 1 exists, otherwise use group 0
-                if match.lastindex and match.lastindex >= 1:
-                    jk_text = match.group(1)
-                else:
-                    jk_text = match.group(0)
-                
-                # Normalize text untuk matching (remove spaces and hyphens)
-                jk_lower = jk_text.lower().replace('-', '').replace(' ', '')
-                
-                # Check untuk laki-laki (menangani variasi: laklaki, lak-laki, laki-laki, dll)
-                if 'lak' in jk_lower:
-                    # Jika mengandung "lak" dan panjang <= 8 karakter (untuk "laklaki" = 7 chars)
-                    # atau mengandung "laki" (untuk "laki-laki")
-                    if 'laki' in jk_lower or len(jk_lower) <= 8:
-                        fields['jenis_kelamin'] = 'Laki-laki'
-                    else:
-                        fields['jenis_kelamin'] = 'Laki-laki'  # Default to Laki-laki if contains "lak"
-                elif 'perempuan' in jk_lower or 'female' in jk_lower:
-                    fields['jenis_kelamin'] = 'Perempuan'
-                elif 'laki' in jk_text.lower() or 'male' in jk_text.lower():
-                    fields['jenis_kelamin'] = 'Laki-laki'
-                else:
-                    # Jika tidak match, coba extract dari text asli
-                    fields['jenis_kelamin'] = jk_text.strip()
-                break
-        
-        # Fallback: cari langsung di text jika pattern tidak match
-        # Ini penting untuk kasus seperti "LAK-LAKI" yang mungkin tidak terdeteksi pattern di atas
-        if not fields['jenis_kelamin']:
-            # Cari kata "LAK" diikuti oleh "-" atau spasi lalu "LAKI" (untuk kasus "LAK-LAKI")
-            lak_match = re.search(r'LAK\s*[-]?\s*LAKI', all_text, re.IGNORECASE)
-            if lak_match:
-                fields['jenis_kelamin'] = 'Laki-laki'
-            # Cari "LAKI-LAKI" atau variasi lainnya
-            elif re.search(r'LAKI\s*[-]?\s*LAKI', all_text, re.IGNORECASE):
-                fields['jenis_kelamin'] = 'Laki-laki'
-            # Cari "PEREMPUAN"
-            elif re.search(r'PEREMPUAN', all_text, re.IGNORECASE):
-                fields['jenis_kelamin'] = 'Perempuan'
-        
-        # 4. Alamat - bisa setelah label "Alamat" atau setelah "Gol Darah" atau sebelum RT/RW
-        # Pattern 1: Setelah label "Alamat"
-        alamat_patterns = [
-            r'Alamat[:\s]*([A-Z0-9\s/,-]+?)(?:\n|RT|RW|Kel|Kec|Agama|Status|Pekerjaan)',
-            r'Alamat[:\s]*([^\n]{10,100})',
-        ]
-        for pattern in alamat_patterns:
-            match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
-            if match and match.lastindex and match.lastindex >= 1:
-                alamat = match.group(1).strip()
-                alamat = re.sub(r'\s+', ' ', alamat)
-                if len(alamat) > 5:
-                    fields['alamat'] = alamat
-                    break
-        
-        # Pattern 2: Setelah "Gol Darah" (biasanya alamat langsung setelah gol darah)
-        # Format bisa: Gol Darah\n: JL KECAPI V atau Gol Darah\nLINGGABUIANANO atau Gol Darah\nJELINGGA BUANANO.2
-        if not fields['alamat']:
-            gol_darah_patterns = [
-                r'Gol\.?\s*Darah[:\s]*[A-Z]*\n:?\s*(JL[.\s]*[A-Z][A-Z\s/,-]+?)(?:\n:?\s*\d|\n:?\s*RT|\n:?\s*RW|\n:?\s*Kel|\n:?\s*Kec)',
-                r'Gol\.?\s*Darah[:\s]*[A-Z]*\n([A-Z][A-Z0-9\s/,-]+?)(?:\n\d{2,3}|\n00|\nRT|\nRW|\nKel|\nKec)',
-                # Pattern lebih sederhana: ambil baris setelah Gol Darah sampai sebelum RT/RW
-                r'Gol\.?\s*Darah[:\s]*\n([^\n]+)',
-            ]
-            for pattern in gol_darah_patterns:
-                gol_darah_match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
-                if gol_darah_match and gol_darah_match.lastindex and gol_darah_match.lastindex >= 1:
-                    alamat = gol_darah_match.group(1).strip()
-                    # Hapus ":" di awal jika ada
-                    alamat = re.sub(r'^:\s*', '', alamat)
-                    alamat = re.sub(r'\s+', ' ', alamat)
-                    # Pastikan bukan RT/RW pattern (tidak dimulai dengan angka 2-3 digit)
-                    if len(alamat) > 5 and not re.match(r'^\d{2,3}', alamat):
-                        fields['alamat'] = alamat
-                        break
-        
-        # Pattern 3: Sebelum RT/RW dengan format ":" atau tanpa ":" (baris yang mengandung alamat pattern sebelum RT/RW)
-        # Cari setelah jenis kelamin atau gol darah, sebelum RT/RW
-        if not fields['alamat']:
-            rt_patterns = [
-                r':\s*(JL[.\s]*[A-Z][A-Z\s/,-]+?)(?:\n:?\s*\d{2,3}|\n:?\s*RT|\n:?\s*RW)',
-                r':\s*([A-Z][A-Z\s/,-]{3,}?)(?:\n:?\s*\d{2,3}|\n:?\s*RT|\n:?\s*RW)',
-                # Pattern yang lebih spesifik: setelah LAKI-LAKI atau PEREMPUAN atau Gol Darah, sebelum RT/RW
-                r'(?:LAKI-LAKI|PEREMPUAN|Gol\.?\s*Darah)[:\s]*\n([A-Z][A-Z0-9\s/,-]{3,}?)(?:\n\d{2,3}|\n00|\nRT|\nRW)',
-            ]
-            excluded = ['GOL', 'DARAH', 'KATHOLIK', 'ISLAM', 'CERAIHIDUP', 'BELUM KAWIN', 'KARYAWAN', 'SWASTA', 'WNI', 'SEUMUR HIDUP', 'PEREMPUAN', 'LAKILAKI', 'JAKARTA', 'BANDUNG', 'KARYAWANSWASTA', 'PROVINSI', 'JAWA BARAT', 'KOTA BANDUNG']
-            for pattern in rt_patterns:
-                rt_match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
-                if rt_match and rt_match.lastindex and rt_match.lastindex >= 1:
-                    alamat = rt_match.group(1).strip()
-                    alamat = re.sub(r'\s+', ' ', alamat)
-                    # Pastikan bukan label lain dan cukup panjang
-                    if (len(alamat) > 5 and 
-                        not alamat.upper() in excluded and
-                        not re.match(r'^\d+', alamat) and
-                        len(alamat) < 50):  # Max 50 karakter untuk alamat
-                        fields['alamat'] = alamat
-                        break
-        
-        # 5. RT/RW
-        rt_rw_patterns = [
-            r'RT[/\s]*RW[:\s]*(\d{2,3})[/\s](\d{2,3})',
-            r'RT[/\s]*RW[:\s]*(\d{2,3}\s+\d{2,3})',
-            r'RT[:\s]*(\d{2,3})[/\s]RW[:\s]*(\d{2,3})',
-        ]
-        for pattern in rt_rw_patterns:
-            match = re.search(pattern, all_text, re.IGNORECASE)
-            if match:
-                # Check number of groups
-                num_groups = len(match.groups())
-                if num_groups >= 2:
-                    # Two separate groups
-                    fields['rt_rw'] = f"{match.group(1)}/{match.group(2)}"
-                elif num_groups == 1:
-                    # Single group with both numbers
-                    rt_rw_text = match.group(1).replace(' ', '/')
-                    fields['rt_rw'] = rt_rw_text
-                break
-        
-        # 6. Kelurahan
-        kelurahan_patterns = [
-            r'Kel[/\s]Desa[:\s]*([A-Z\s]+?)(?:\n|Kecamatan|Kec)',
-            r'Kelurahan[:\s]*([A-Z\s]+?)(?:\n|Kecamatan|Kec)',
-        ]
-        for pattern in kelurahan_patterns:
-            match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
-            if match and match.lastindex and match.lastindex >= 1:
-                kelurahan = match.group(1).strip()
-                kelurahan = re.sub(r'\s+', ' ', kelurahan)
-                if len(kelurahan) > 2:
-                    fields['kelurahan'] = kelurahan
-                    break
-        
-        # 7. Kecamatan
-        kecamatan_patterns = [
-            r'Kecamatan[:\s]*([A-Z\s]+?)(?:\n|Agama|Status|Pekerjaan|Kewarganegaraan)',
-        ]
-        for pattern in kecamatan_patterns:
-            match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
-            if match and match.lastindex and match.lastindex >= 1:
-                kecamatan = match.group(1).strip()
-                kecamatan = re.sub(r'\s+', ' ', kecamatan)
-                if len(kecamatan) > 2:
-                    fields['kecamatan'] = kecamatan
-                    break
-        
-        # 8. Tempat/Tanggal Lahir
-        ttl_patterns = [
-            r'Tempat[/\s]Tgl\s+Lahir[:\s]*([A-Z\s]+?[/\s]\d{2}[-/\s]\d{2}[-/\s]\d{4})(?:\n|Jenis|Alamat)',
-            r'Tempat[/\s]Tgl\s+Lahir[:\s]*([A-Z\s]+?)(?:\n|Jenis|Alamat)',
-        ]
-        for pattern in ttl_patterns:
-            match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
-            if match and match.lastindex and match.lastindex >= 1:
-                ttl = match.group(1).strip()
-                ttl = re.sub(r'\s+', ' ', ttl)
-                if len(ttl) > 5:
-                    fields['tempat_tgl_lahir'] = ttl
-                    break
-        
-        # 9. Agama
-        agama_patterns = [
-            r'Agama[:\s]*([A-Za-z\s]+?)(?:\n|Status|Pekerjaan|Kewarganegaraan)',
-        ]
-        for pattern in agama_patterns:
-            match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
-            if match and match.lastindex and match.lastindex >= 1:
-                agama = match.group(1).strip()
-                agama = re.sub(r'\s+', ' ', agama)
-                if len(agama) > 2:
-                    fields['agama'] = agama
-                    break
-        
-        # 10. Status Perkawinan
-        status_patterns = [
-            r'Status\s+Perkawinan[:\s]*([A-Za-z/\s]+?)(?:\n|Pekerjaan|Kewarganegaraan|KOTA)',
-        ]
-        for pattern in status_patterns:
-            match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
-            if match and match.lastindex and match.lastindex >= 1:
-                status = match.group(1).strip()
-                # Hapus text tambahan seperti "KOTA ANDA"
-                status = re.sub(r'\s+KOTA\s+[A-Z\s]+$', '', status, flags=re.IGNORECASE)
-                status = re.sub(r'\s+', ' ', status)
-                if len(status) > 2 and len(status) < 50:
-                    fields['status_perkawinan'] = status
-                    break
-        
-        # 11. Pekerjaan
-        pekerjaan_patterns = [
-            r'Pekerjaan[:\s]*([A-Za-z\s]+?)(?:\n|Kewarganegaraan|Berlaku)',
-        ]
-        for pattern in pekerjaan_patterns:
-            match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
-            if match and match.lastindex and match.lastindex >= 1:
-                pekerjaan = match.group(1).strip()
-                pekerjaan = re.sub(r'\s+', ' ', pekerjaan)
-                if len(pekerjaan) > 2:
-                    fields['pekerjaan'] = pekerjaan
-                    break
-        
-        # 12. Kewarganegaraan
-        kewarganegaraan_patterns = [
-            r'Kewarganegaraan[:\s]*([A-Z\s]+?)(?:\n|Berlaku)',
-        ]
-        for pattern in kewarganegaraan_patterns:
-            match = re.search(pattern, all_text, re.IGNORECASE | re.MULTILINE)
-            if match and match.lastindex and match.lastindex >= 1:
-                kewarganegaraan = match.group(1).strip()
-                kewarganegaraan = re.sub(r'\s+', ' ', kewarganegaraan)
-                if len(kewarganegaraan) > 1:
-                    fields['kewarganegaraan'] = kewarganegaraan
-                    break
-        
-        return fields
+        with stage('field_extract'):
+            if self.field_extractor == 'layout':
+                return extract_ktp_fields_layout(extracted_data, fields=fields)
+            return extract_ktp_fields(extracted_data, fields=fields)
     
     def print_results(self, extracted_data):
         """
@@ -588,13 +645,15 @@ def main():
     parser.add_argument('--lang', default='id', help='Bahasa OCR (default: id)')
     parser.add_argument('--max-size', type=int, default=800, 
                         help='Ukuran maksimal gambar (lebar/tinggi) sebelum resize untuk mempercepat proses. Default: 800. Set 0 untuk disable resize.')
+    parser.add_argument('--rectify', action='store_true',
+                        help='Input adalah crop KTP: warp kartu ke ukuran kanonik 1000x630 sebelum OCR')
     
     args = parser.parse_args()
     
     # Inisialisasi OCR
     # Note: PaddleOCR otomatis mendeteksi GPU jika tersedia
     max_size = args.max_size if args.max_size > 0 else None
-    ktp_ocr = KTPOCR(lang=args.lang, max_image_size=max_size)
+    ktp_ocr = KTPOCR(lang=args.lang, max_image_size=max_size, rectify=args.rectify)
     
     # Cek apakah input adalah file atau folder
     input_path = Path(args.input)
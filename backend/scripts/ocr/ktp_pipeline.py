@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Pipeline detect→OCR dalam satu proses
+KTPDetector dan KTPOCR di-load bersama; crop hasil deteksi (KTPImage, view ke
+gambar original) langsung diteruskan ke OCR tanpa encode JPEG / base64 / tulis
+file sementara
+"""
+
+import sys
+import json
+
+from ktp_detect import KTPDetector
+from ktp_ocr import KTPOCR, format_ktp_data
+from request_deadline import check_deadline
+
+
+class KTPPipeline:
+    def __init__(self, model_path=None, lang='id', max_image_size=1200, field_extractor='text',
+                 ocr_mode='full', roi_template=None, rectify=False):
+        """
+        Inisialisasi detector dan OCR sekaligus
+
+        Args:
+            model_path: Path ke model deteksi (.pt). Jika None, akan mencari di models/best.pt
+            lang: Bahasa OCR (default: 'id')
+            max_image_size: Ukuran maksimal crop sebelum OCR (default: 1200, sama dengan OCRDaemon)
+            field_extractor: 'text' atau 'layout' (lihat KTPOCR)
+            ocr_mode: 'full' atau 'roi' (lihat KTPOCR)
+            roi_template: Path template region JSON untuk mode 'roi'
+            rectify: Jika True, kartu di dalam crop di-warp ke ukuran kanonik sebelum OCR
+                     (lihat ktp_rectify.py)
+        """
+        self.detector = KTPDetector(model_path=model_path)
+        self.ocr = KTPOCR(
+            lang=lang, max_image_size=max_image_size, field_extractor=field_extractor,
+            ocr_mode=ocr_mode, roi_template=roi_template, rectify=rectify
+        )
+
+    def process(self, image_input, return_multiple=False, min_confidence=0.5, ocr_mode=None, fields=None):
+        """
+        Deteksi KTP lalu OCR setiap crop
+
+        Args:
+            image_input: Path, PIL Image, numpy array, atau bytes (lihat KTPDetector.detect_and_crop)
+            return_multiple: Jika True, OCR semua KTP yang terdeteksi. Jika False, hanya yang terbaik.
+            min_confidence: Minimum confidence threshold deteksi (default: 0.5)
+            ocr_mode: 'full' atau 'roi'. Jika None, pakai mode default KTPOCR
+            fields: List field yang dibutuhkan (lihat KTPOCR.extract_ktp), None = semua
+
+        Returns:
+            Dictionary dengan:
+                - success: bool
+                - cards: List of dicts dengan bbox, confidence, fields, extracted_data, roi
+                - original_size: (width, height) dari gambar original
+                - error: error message (jika failed)
+        """
+        detection = self.detector.detect_and_crop(
+            image_input,
+            return_multiple=return_multiple,
+            min_confidence=min_confidence,
+            crop_format='image',
+        )
+        if not detection['success']:
+            return {
+                'success': False,
+                'error': detection.get('error', 'Unknown error')
+            }
+
+        detections = self._detections(detection, return_multiple)
+        check_deadline('detect')
+
+        cards = []
+        for det in detections:
+            # Crop adalah view ke gambar original (urutan warna input), langsung ke OCR
+            ocr_result = self.ocr.extract_ktp(det['cropped_image'], ocr_mode=ocr_mode, fields=fields)
+            cards.append(self._build_card(det, ocr_result))
+
+        return {
+            'success': True,
+            'cards': cards,
+            'original_size': detection['original_size'],
+        }
+
+    def process_batch(self, image_inputs, return_multiple=False, min_confidence=0.5, ocr_mode=None,
+                      fields=None):
+        """
+        Versi batch dari process() untuk micro-batching di daemon
+
+        Deteksi dijalankan dengan detect_and_crop_batch, lalu semua crop dari
+        semua gambar di-OCR dengan satu panggilan extract_ktp_batch.
+
+        Returns:
+            List hasil dengan format sama seperti process(), urutan sama dengan input
+        """
+        detections = self.detector.detect_and_crop_batch(
+            image_inputs,
+            return_multiple=return_multiple,
+            min_confidence=min_confidence,
+            crop_format='image',
+        )
+
+        results = [None] * len(image_inputs)
+        crops = []  # (index gambar, detection)
+        for i, detection in enumerate(detections):
+            if not detection['success']:
+                results[i] = {
+                    'success': False,
+                    'error': detection.get('error', 'Unknown error')
+                }
+                continue
+            results[i] = {
+                'success': True,
+                'cards': [],
+                'original_size': detection['original_size'],
+            }
+            crops.extend((i, det) for det in self._detections(detection, return_multiple))
+        check_deadline('detect')
+
+        if crops:
+            extracted = self.ocr.extract_ktp_batch(
+                [det['cropped_image'] for _, det in crops], ocr_mode=ocr_mode, fields=fields
+            )
+            for (i, det), ocr_result in zip(crops, extracted):
+                results[i]['cards'].append(self._build_card(det, ocr_result))
+
+        return results
+
+    def _detections(self, detection, return_multiple):
+        """List deteksi (cropped_image, bbox, confidence) dari hasil detect_and_crop"""
+        if return_multiple:
+            return detection['cropped_images']
+        return [{
+            'cropped_image': detection['cropped_image'],
+            'bbox': detection['bbox'],
+            'confidence': detection.get('confidence'),
+        }]
+
+    def _build_card(self, det, ocr_result):
+        """Gabungkan hasil deteksi dengan hasil KTPOCR.extract_ktp"""
+        return {
+            'bbox': det['bbox'],
+            'confidence': det['confidence'],
+            'fields': ocr_result['fields'],
+            'extracted_data': ocr_result['extracted_data'],
+            'roi': ocr_result['roi'],
+        }
+
+
+def main():
+    """
+    Test function untuk command line usage
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Detect KTP and extract fields in one pass')
+    parser.add_argument('input', help='Path to input image')
+    parser.add_argument('--model', '-m', help='Path to detection model file (.pt)')
+    parser.add_argument('--multiple', action='store_true', help='OCR every detected KTP')
+    parser.add_argument('--min-confidence', type=float, default=0.5, help='Minimum detection confidence')
+    parser.add_argument('--ocr-mode', choices=['full', 'roi'], default='full',
+                        help="'full' (OCR seluruh kartu) atau 'roi' (region field dari template)")
+    parser.add_argument('--rectify', action='store_true', help='Warp kartu ke ukuran kanonik 1000x630 sebelum OCR')
+
+    args = parser.parse_args()
+
+    try:
+        pipeline = KTPPipeline(model_path=args.model, ocr_mode=args.ocr_mode, rectify=args.rectify)
+        result = pipeline.process(
+            args.input,
+            return_multiple=args.multiple,
+            min_confidence=args.min_confidence,
+        )
+
+        if not result['success']:
+            print(f"Error: {result['error']}")
+            sys.exit(1)
+
+        for i, card in enumerate(result['cards'], 1):
+            print(f"\n[{i}] Bounding box: {card['bbox']}")
+            if card['confidence'] is not None:
+                print(f"    Confidence: {card['confidence']:.2%}")
+            print(json.dumps(format_ktp_data(card['fields']), ensure_ascii=False, indent=2))
+            if card['roi'] is not None:
+                print(f"    ROI timings (ms): {json.dumps(card['roi']['timings_ms'])}")
+                if card['roi']['fallback']:
+                    print(f"    Fallback full-page: {', '.join(card['roi']['fallback'])}")
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
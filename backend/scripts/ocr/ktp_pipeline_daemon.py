@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+KTP Pipeline Daemon Service (detect→OCR dalam satu proses)
+Model deteksi dan PaddleOCR di-load sekali saat startup; crop hasil deteksi
+diteruskan ke OCR di memory, sehingga backend cukup mengirim satu request
+Menggunakan file-based communication untuk kompatibilitas dengan Bun,
+dengan socket transport opsional (--socket / --port) untuk latency yang lebih rendah
+"""
+
+import sys
+import os
+import argparse
+
+# Suppress warnings
+if os.getenv('SUPPRESS_OCR_LOGS') == '1':
+    import warnings
+    warnings.filterwarnings('ignore')
+    os.environ['DISABLE_MODEL_SOURCE_CHECK'] = 'True'
+
+from ktp_pipeline import KTPPipeline
+from ktp_ocr import OCR_MODES, format_ktp_data, resolve_ocr_mode
+from ktp_fields import API_FIELDS, request_fields
+from daemon_base import BaseDaemon, decode_image_data, add_daemon_arguments, serve_daemon
+
+class KTPPipelineDaemon(BaseDaemon):
+    def __init__(self, request_dir, response_dir, model_path=None, field_extractor='text',
+                 ocr_mode='full', roi_template=None, rectify=False):
+        """Initialize detection and OCR models once - this is the expensive operation"""
+        if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+            print("Initializing KTP detection + OCR models (this may take a few seconds)...", file=sys.stderr)
+
+        # Load both models once - cached in memory
+        self.pipeline = KTPPipeline(
+            model_path=model_path, lang='id', max_image_size=1200, field_extractor=field_extractor,
+            ocr_mode=ocr_mode, roi_template=roi_template, rectify=rectify
+        )
+        super().__init__(request_dir, response_dir)
+
+        if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+            print("KTP pipeline loaded and ready!", file=sys.stderr)
+
+    def process_request(self, image_data_base64, return_multiple=False, min_confidence=0.5, ocr_mode=None,
+                        fields=API_FIELDS):
+        """
+        Process detect→OCR request using cached models
+
+        Args:
+            image_data_base64: Base64 encoded image data (atau raw bytes dari socket transport)
+            return_multiple: If True, OCR every detected card. If False, only the best one.
+            min_confidence: Minimum detection confidence threshold (default: 0.5)
+            ocr_mode: 'full' atau 'roi' (default: mode daemon, --ocr-mode)
+            fields: Field yang dihitung (default: field yang dikembalikan di 'data')
+
+        Returns:
+            Dictionary with one entry per card: bbox, confidence and extracted fields
+        """
+        try:
+            # Decode base64 image
+            image_bytes = decode_image_data(image_data_base64)
+
+            result = self.pipeline.process(
+                image_bytes,
+                return_multiple=return_multiple,
+                min_confidence=min_confidence,
+                ocr_mode=ocr_mode,
+                fields=fields
+            )
+
+            return self._format_result(result)
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def _format_result(self, result):
+        """Susun response dari hasil KTPPipeline.process"""
+        if not result['success']:
+            return {
+                'success': False,
+                'error': result.get('error', 'Unknown error')
+            }
+
+        cards = []
+        for card in result['cards']:
+            extracted_data = card['extracted_data']
+            self.record_corpus(extracted_data)
+            entry = {
+                'bbox': card['bbox'],
+                'confidence': card['confidence'],
+                'data': format_ktp_data(card['fields']),
+                'raw': {
+                    'text_blocks_count': len(extracted_data.get('text_blocks', [])),
+                    'combined_text': extracted_data.get('combined_text', ''),
+                }
+            }
+            if card['roi'] is not None:
+                # Mode roi: waktu recognition per field dan field yang diisi dari OCR full-page
+                entry['roi'] = card['roi']
+            cards.append(entry)
+
+        return {
+            'success': True,
+            'cards': cards,
+            'original_size': result['original_size'],
+        }
+
+    def warmup_request(self):
+        """Warmup deteksi + OCR dengan foto utuh (kartu sintetis di atas background)"""
+        import cv2
+        from ktp_synthetic import synthetic_photo
+
+        ok, encoded = cv2.imencode('.jpg', synthetic_photo(), [cv2.IMWRITE_JPEG_QUALITY, 90])
+        if not ok:
+            raise RuntimeError('Failed to encode warmup image')
+        return {'image': encoded.tobytes(), 'min_confidence': 0.1}
+
+    def cache_options(self, request):
+        """Opsi deteksi dan ukuran resize OCR yang mempengaruhi hasil"""
+        return {
+            'return_multiple': request.get('return_multiple', False),
+            'min_confidence': request.get('min_confidence', 0.5),
+            'max_image_size': self.pipeline.ocr.max_image_size,
+            'rectify': self.pipeline.ocr.rectify,
+            'field_extractor': self.pipeline.ocr.field_extractor,
+            'ocr_mode': resolve_ocr_mode(request, self.pipeline.ocr.ocr_mode),
+            'fields': list(request_fields(request)),
+        }
+
+    def handle_request(self, request):
+        """Handle one parsed request (file or socket transport)"""
+        # Extract image data and options
+        image_data = request.get('image')
+        return_multiple = request.get('return_multiple', False)
+        min_confidence = request.get('min_confidence', 0.5)
+
+        if not image_data:
+            return {
+                'success': False,
+                'error': 'Missing "image" field in request'
+            }
+
+        try:
+            ocr_mode = resolve_ocr_mode(request, self.pipeline.ocr.ocr_mode)
+            fields = request_fields(request)
+        except ValueError as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+        return self.process_request(
+            image_data,
+            return_multiple=return_multiple,
+            min_confidence=min_confidence,
+            ocr_mode=ocr_mode,
+            fields=fields
+        )
+
+    def handle_batch(self, requests):
+        """
+        Micro-batching: deteksi dan OCR dijalankan sebagai batch
+
+        Request dikelompokkan per (return_multiple, min_confidence, ocr_mode, fields).
+        """
+        responses = [None] * len(requests)
+        groups = {}
+
+        for i, request in enumerate(requests):
+            image_data = request.get('image')
+            if not image_data:
+                responses[i] = self.handle_request(request)
+                continue
+            try:
+                ocr_mode = resolve_ocr_mode(request, self.pipeline.ocr.ocr_mode)
+                fields = request_fields(request)
+                image_bytes = decode_image_data(image_data)
+            except Exception as e:
+                responses[i] = {
+                    'success': False,
+                    'error': str(e)
+                }
+                continue
+            options = (request.get('return_multiple', False), request.get('min_confidence', 0.5), ocr_mode, fields)
+            groups.setdefault(options, []).append((i, image_bytes))
+
+        for (return_multiple, min_confidence, ocr_mode, fields), members in groups.items():
+            results = self.pipeline.process_batch(
+                [image_bytes for _, image_bytes in members],
+                return_multiple=return_multiple,
+                min_confidence=min_confidence,
+                ocr_mode=ocr_mode,
+                fields=fields
+            )
+            for (i, _), result in zip(members, results):
+                responses[i] = self._format_result(result)
+
+        return responses
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='KTP detect→OCR pipeline daemon (models cached in memory)')
+    parser.add_argument('request_dir', help='Directory untuk request file')
+    parser.add_argument('response_dir', help='Directory untuk response file')
+    parser.add_argument('model_path', nargs='?', default=None, help='Path ke model deteksi (.pt)')
+    parser.add_argument('--field-extractor', choices=['text', 'layout'], default='text',
+                        help="Ekstraksi field: 'text' (pattern) atau 'layout' (posisi bbox)")
+    parser.add_argument('--ocr-mode', choices=list(OCR_MODES), default='full',
+                        help="Mode OCR default: 'full' atau 'roi' (region field dari template, fallback full-page)")
+    parser.add_argument('--roi-template', help='Path template region JSON untuk mode roi (lihat ktp_template.py)')
+    parser.add_argument('--rectify', action='store_true',
+                        help='Warp kartu di dalam crop ke ukuran kanonik 1000x630 sebelum OCR')
+    add_daemon_arguments(parser)
+    args = parser.parse_args()
+
+    daemon = KTPPipelineDaemon(
+        args.request_dir, args.response_dir,
+        model_path=args.model_path, field_extractor=args.field_extractor,
+        ocr_mode=args.ocr_mode, roi_template=args.roi_template, rectify=args.rectify
+    )
+    serve_daemon(daemon, args)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Gambar KTP sintetis (tanpa data pribadi asli)
+
+Dipakai untuk warmup daemon saat startup: inference pertama membayar
+inisialisasi graph / kernel sekali di sini, bukan di request user pertama.
+Gambar dibuat deterministik dari kode (tidak perlu file binary di repo);
+layout mengikuti DEFAULT_TEMPLATE di ktp_template.py.
+
+Usage:
+    python ktp_synthetic.py -o synthetic_ktp.jpg
+"""
+
+import cv2
+import numpy as np
+
+from ktp_rectify import CANONICAL_SIZE
+
+# Data contoh (fiktif) yang ditulis ke kartu
+SAMPLE_KTP = {
+    'provinsi': 'PROVINSI JAWA BARAT',
+    'kota': 'KOTA BANDUNG',
+    'nik': '3273172608900001',
+    'nama': 'BUDI SANTOSO',
+    'tempat_tanggal_lahir': 'BANDUNG, 26-08-1990',
+    'jenis_kelamin': 'LAKI-LAKI',
+    'alamat': 'JL. MERDEKA NO. 12',
+    'rt_rw': '001/002',
+    'kelurahan_desa': 'CITARUM',
+    'kecamatan': 'BANDUNG WETAN',
+    'agama': 'ISLAM',
+    'status_perkawinan': 'KAWIN',
+    'pekerjaan': 'KARYAWAN SWASTA',
+    'kewarganegaraan': 'WNI',
+    'berlaku_hingga': 'SEUMUR HIDUP',
+}
+
+# (label, key SAMPLE_KTP, posisi y baris sebagai fraksi tinggi kartu)
+KTP_ROWS = [
+    ('NIK', 'nik', 0.215),
+    ('Nama', 'nama', 0.295),
+    ('Tempat/Tgl Lahir', 'tempat_tanggal_lahir', 0.350),
+    ('Jenis Kelamin', 'jenis_kelamin', 0.405),
+    ('Alamat', 'alamat', 0.465),
+    ('RT/RW', 'rt_rw', 0.520),
+    ('Kel/Desa', 'kelurahan_desa', 0.570),
+    ('Kecamatan', 'kecamatan', 0.620),
+    ('Agama', 'agama', 0.670),
+    ('Status Perkawinan', 'status_perkawinan', 0.720),
+    ('Pekerjaan', 'pekerjaan', 0.770),
+    ('Kewarganegaraan', 'kewarganegaraan', 0.820),
+    ('Berlaku Hingga', 'berlaku_hingga', 0.870),
+]
+
+# Kolom label, ':' dan value (fraksi lebar kartu)
+LABEL_X = 0.03
+COLON_X = 0.20
+VALUE_X = 0.23
+
+
+def synthetic_ktp(data=None, size=CANONICAL_SIZE, seed=0):
+    """
+    Render kartu KTP sintetis (hanya area kartu, sudah lurus)
+
+    Args:
+        data: Dictionary seperti SAMPLE_KTP (key yang tidak ada memakai SAMPLE_KTP)
+        size: Ukuran kartu (width, height)
+        seed: Seed noise background
+
+    Returns:
+        numpy array BGR (height, width, 3)
+    """
+    values = dict(SAMPLE_KTP, **(data or {}))
+    width, height = size
+    scale = width / CANONICAL_SIZE[0]
+    rng = np.random.default_rng(seed)
+
+    # Background biru muda khas KTP dengan sedikit noise
+    card = np.full((height, width, 3), (225, 200, 160), np.uint8)
+    card = cv2.add(card, rng.integers(0, 18, size=card.shape, dtype=np.uint8))
+
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    dark = (25, 25, 25)
+    thickness = max(1, int(round(2 * scale)))
+
+    def put(text, x, y, font_scale):
+        cv2.putText(card, text, (int(x * width), int(y * height)), font, font_scale * scale, dark,
+                    thickness, cv2.LINE_AA)
+
+    put(values['provinsi'], 0.33, 0.07, 0.9)
+    put(values['kota'], 0.40, 0.13, 0.9)
+    for label, key, y in KTP_ROWS:
+        big = key == 'nik'
+        put(label, LABEL_X, y, 0.9 if big else 0.6)
+        put(':', COLON_X - (0.05 if big else 0), y, 0.9 if big else 0.6)
+        put(values[key], VALUE_X - (0.04 if big else 0), y, 1.0 if big else 0.6)
+
+    # Area foto di kanan
+    cv2.rectangle(card, (int(0.76 * width), int(0.22 * height)), (int(0.96 * width), int(0.72 * height)),
+                  (150, 140, 135), -1)
+    return card
+
+
+def synthetic_photo(card=None, size=(1280, 960), seed=0):
+    """
+    Kartu sintetis di tengah background bertekstur, seperti foto HP (input detector)
+
+    Returns:
+        numpy array BGR (height, width, 3)
+    """
+    if card is None:
+        card = synthetic_ktp(seed=seed)
+    width, height = size
+    rng = np.random.default_rng(seed)
+    photo = rng.integers(40, 110, size=(height // 8, width // 8, 3), dtype=np.uint8)
+    photo = cv2.resize(photo, (width, height), interpolation=cv2.INTER_CUBIC)
+
+    card_w = int(width * 0.7)
+    card_h = int(card_w * card.shape[0] / card.shape[1])
+    x0 = (width - card_w) // 2
+    y0 = (height - card_h) // 2
+    photo[y0:y0 + card_h, x0:x0 + card_w] = cv2.resize(card, (card_w, card_h), interpolation=cv2.INTER_AREA)
+    return photo
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Simpan gambar KTP sintetis')
+    parser.add_argument('--output', '-o', default='synthetic_ktp.jpg', help='Path output')
+    parser.add_argument('--photo', action='store_true', help='Kartu di atas background (input detector)')
+    args = parser.parse_args()
+
+    img = synthetic_photo() if args.photo else synthetic_ktp()
+    cv2.imwrite(args.output, img)
+    print(f"Disimpan ke: {args.output} ({img.shape[1]}x{img.shape[0]})")
+
+
+if __name__ == '__main__':
+    main()
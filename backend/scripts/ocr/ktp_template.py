@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Template layout KTP untuk OCR per region (mode OCR 'roi')
+
+KTP punya layout tetap, jadi setelah kartu di-crop oleh KTPDetector, posisi
+value NIK / Nama / Jenis Kelamin / Alamat bisa diperkirakan sebagai region
+relatif terhadap ukuran crop. Pada mode 'roi', KTPOCR hanya menjalankan
+recognition pada region tersebut (tanpa model deteksi teks) dan kembali ke
+OCR full-page jika ada field wajib yang kosong.
+
+Koordinat template adalah fraksi (x0, y0, x1, y1) dari lebar/tinggi crop.
+DEFAULT_TEMPLATE adalah perkiraan dari layout KTP standar; kalibrasi dari
+contoh foto asli dengan:
+
+    python ktp_template.py calibrate folder_crop_ktp/ -o models/ktp_template.json
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+from ktp_fields import API_FIELDS
+from ktp_layout import match_label, _block_boxes, _clean, _normalize
+
+# Field yang punya region di template: field yang dikembalikan ke backend
+REQUIRED_FIELDS = API_FIELDS
+
+# Region value per field, fraksi dari ukuran crop kartu (x0, y0, x1, y1)
+DEFAULT_TEMPLATE = {
+    'nik': (0.18, 0.16, 0.72, 0.27),
+    'nama': (0.22, 0.26, 0.72, 0.33),
+    'jenis_kelamin': (0.22, 0.37, 0.48, 0.44),
+    'alamat': (0.22, 0.43, 0.72, 0.50),
+}
+
+DEFAULT_TEMPLATE_PATH = Path(__file__).parent / 'models' / 'ktp_template.json'
+
+# Margin tambahan (fraksi ukuran crop) untuk toleransi crop yang sedikit bergeser
+ROI_MARGIN = 0.01
+
+
+def load_template(path=None):
+    """
+    Load template dari JSON {"field": [x0, y0, x1, y1], ...}
+
+    Args:
+        path: Path file template. Jika None, pakai models/ktp_template.json bila ada,
+              selain itu DEFAULT_TEMPLATE.
+
+    Returns:
+        Dictionary field -> (x0, y0, x1, y1)
+    """
+    if path is None:
+        if not DEFAULT_TEMPLATE_PATH.exists():
+            return dict(DEFAULT_TEMPLATE)
+        path = DEFAULT_TEMPLATE_PATH
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    template = {}
+    for field in REQUIRED_FIELDS:
+        box = data.get(field, DEFAULT_TEMPLATE[field])
+        if len(box) != 4 or not (0 <= box[0] < box[2] <= 1 and 0 <= box[1] < box[3] <= 1):
+            raise ValueError(f"Region template tidak valid untuk {field}: {box}")
+        template[field] = tuple(float(v) for v in box)
+    return template
+
+
+def roi_boxes(template, width, height, margin=ROI_MARGIN):
+    """
+    Region template dalam pixel crop
+
+    Returns:
+        Dictionary field -> (x0, y0, x1, y1) int, sudah di-clip ke ukuran crop
+    """
+    boxes = {}
+    for field, (x0, y0, x1, y1) in template.items():
+        boxes[field] = (
+            max(0, int((x0 - margin) * width)),
+            max(0, int((y0 - margin) * height)),
+            min(width, int(round((x1 + margin) * width))),
+            min(height, int(round((y1 + margin) * height))),
+        )
+    return boxes
+
+
+def parse_roi_text(field, texts):
+    """
+    Value field dari teks hasil recognition satu region
+
+    Label yang ikut terbaca (mis. "Nama : BUDI" jika region bergeser ke kiri)
+    dibuang, lalu dinormalisasi seperti ekstraksi layout.
+
+    Returns:
+        Value ter-normalisasi, atau None jika kosong / tidak valid
+    """
+    parts = []
+    for text in texts:
+        label = match_label(text)
+        parts.append(label[1] if label is not None else text)
+    value = _normalize(field, _clean(' '.join(parts)))
+    if field == 'jenis_kelamin' and value not in ('Laki-laki', 'Perempuan'):
+        return None
+    return value
+
+
+def calibrate_template(samples, margin=0.01):
+    """
+    Hitung template dari hasil OCR full-page contoh crop KTP
+
+    Untuk setiap contoh, block value tiap field adalah block di kanan label
+    pada baris yang sama; region template adalah gabungan (union) posisi relatif
+    value tersebut dari semua contoh, ditambah margin.
+
+    Args:
+        samples: List (extracted_data, (width, height)) dari KTPOCR.extract_text pada crop
+        margin: Margin tambahan (fraksi ukuran crop)
+
+    Returns:
+        Tuple (template, counts): template field -> (x0, y0, x1, y1); counts jumlah
+        contoh yang menyumbang per field. Field tanpa contoh memakai DEFAULT_TEMPLATE.
+    """
+    regions = {field: [] for field in REQUIRED_FIELDS}
+
+    for extracted_data, (width, height) in samples:
+        blocks = extracted_data.get('text_blocks', [])
+        boxes = _block_boxes(blocks)
+        if not boxes:
+            continue
+
+        for block, (lx0, ly0, lx1, ly1) in zip(blocks, boxes):
+            label = match_label(block['text'])
+            if label is None or label[0] not in regions:
+                continue
+            field, rest = label
+            if rest.strip(' :'):
+                # Label dan value terbaca sebagai satu block
+                value_box = (lx0, ly0, lx1, ly1)
+            else:
+                # Value: block terdekat di kanan label pada baris yang sama
+                center = (ly0 + ly1) / 2
+                candidates = [b for b in boxes if b[0] >= lx1 - 1 and b[1] <= center <= b[3]]
+                if not candidates:
+                    continue
+                value_box = min(candidates, key=lambda b: b[0])
+            x0, y0, x1, y1 = value_box
+            regions[field].append((x0 / width, y0 / height, x1 / width, y1 / height))
+
+    template = {}
+    counts = {}
+    for field in REQUIRED_FIELDS:
+        boxes = regions[field]
+        counts[field] = len(boxes)
+        if not boxes:
+            template[field] = DEFAULT_TEMPLATE[field]
+            continue
+        template[field] = (
+            round(max(0.0, min(b[0] for b in boxes) - margin), 4),
+            round(max(0.0, min(b[1] for b in boxes) - margin), 4),
+            round(min(1.0, max(b[2] for b in boxes) + margin), 4),
+            round(min(1.0, max(b[3] for b in boxes) + margin), 4),
+        )
+    return template, counts
+
+
+def main():
+    """
+    Kalibrasi template dari folder berisi crop KTP (output KTPDetector)
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Template region field KTP untuk mode OCR roi')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    calibrate = subparsers.add_parser('calibrate', help='Hitung template dari contoh crop KTP')
+    calibrate.add_argument('input', help='Folder berisi crop KTP')
+    calibrate.add_argument('--output', '-o', default=str(DEFAULT_TEMPLATE_PATH),
+                           help='Path file template JSON (default: models/ktp_template.json)')
+    calibrate.add_argument('--margin', type=float, default=0.01, help='Margin region (fraksi ukuran crop)')
+    args = parser.parse_args()
+
+    from ktp_ocr import KTPOCR
+
+    # OCR full-page tanpa resize supaya koordinat bbox sama dengan ukuran crop
+    ocr = KTPOCR(lang='id', max_image_size=None)
+    samples = []
+    for image_file in sorted(Path(args.input).iterdir()):
+        if image_file.suffix.lower() not in ('.jpg', '.jpeg', '.png'):
+            continue
+        img, _ = ocr.load_image(str(image_file))
+        samples.append((ocr.extract_text(img), (img.shape[1], img.shape[0])))
+
+    if not samples:
+        print(f"Error: Tidak ada gambar di {args.input}")
+        sys.exit(1)
+
+    template, counts = calibrate_template(samples, margin=args.margin)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({field: list(box) for field, box in template.items()}, f, indent=2)
+
+    for field in REQUIRED_FIELDS:
+        print(f"{field:<15} {template[field]}  ({counts[field]}/{len(samples)} contoh)")
+    print(f"\nTemplate disimpan ke: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,17 +2,13 @@
 """
 OCR Daemon Service untuk caching model PaddleOCR
 Model di-load sekali saat startup, kemudian reuse untuk semua request
-Menggunakan file-based communication untuk kompatibilitas dengan Bun
+Menggunakan file-based communication untuk kompatibilitas dengan Bun,
+dengan socket transport opsional (--socket / --port) untuk latency yang lebih rendah
 """
 
 import sys
-import json
 import os
-import base64
-import tempfile
-import time
-from pathlib import Path
-import glob
+import argparse
 
 # Suppress warnings
 if os.getenv('SUPPRESS_OCR_LOGS') == '1':
@@ -20,75 +16,49 @@ if os.getenv('SUPPRESS_OCR_LOGS') == '1':
     warnings.filterwarnings('ignore')
     os.environ['DISABLE_MODEL_SOURCE_CHECK'] = 'True'
 
-from ktp_ocr import KTPOCR
+from ktp_ocr import KTPOCR, OCR_MODES, format_ktp_data, resolve_ocr_mode
+from ktp_fields import API_FIELDS, request_fields
+from daemon_base import BaseDaemon, decode_image_data, add_daemon_arguments, serve_daemon
 
-class OCRDaemon:
-    def __init__(self, request_dir, response_dir):
+class OCRDaemon(BaseDaemon):
+    def __init__(self, request_dir, response_dir, field_extractor='text', ocr_mode='full', roi_template=None,
+                 rectify=False, max_image_size=1200):
         """Initialize OCR model once - this is the expensive operation"""
         if os.getenv('SUPPRESS_OCR_LOGS') != '1':
             print("Initializing OCR model (this may take a few seconds)...", file=sys.stderr)
         
         # Load model once - cached in memory
-        # max_image_size=1200: Optimal untuk KTP - cukup besar untuk akurasi, cukup kecil untuk kecepatan
-        self.ocr = KTPOCR(lang='id', max_image_size=1200)
-        self.request_dir = Path(request_dir)
-        self.response_dir = Path(response_dir)
-        
-        # Create directories if they don't exist
-        self.request_dir.mkdir(parents=True, exist_ok=True)
-        self.response_dir.mkdir(parents=True, exist_ok=True)
+        # max_image_size=1200 (default): Optimal untuk KTP - cukup besar untuk akurasi, cukup kecil untuk kecepatan
+        self.ocr = KTPOCR(
+            lang='id', max_image_size=max_image_size, field_extractor=field_extractor,
+            ocr_mode=ocr_mode, roi_template=roi_template, rectify=rectify
+        )
+        super().__init__(request_dir, response_dir)
         
         if os.getenv('SUPPRESS_OCR_LOGS') != '1':
             print("OCR model loaded and ready!", file=sys.stderr)
     
-    def process_request(self, image_data_base64):
+    def process_request(self, image_data_base64, ocr_mode=None, fields=API_FIELDS):
         """
         Process OCR request using cached model
         
         Args:
-            image_data_base64: Base64 encoded image data
+            image_data_base64: Base64 encoded image data (atau raw bytes dari socket transport)
+            ocr_mode: 'full' atau 'roi' (default: mode daemon, --ocr-mode)
+            fields: Field yang dihitung (default: field yang dikembalikan di 'data')
             
         Returns:
             Dictionary with OCR results
         """
         try:
             # Decode base64 image
-            image_bytes = base64.b64decode(image_data_base64)
+            image_bytes = decode_image_data(image_data_base64)
             
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-                temp_file.write(image_bytes)
-                temp_path = temp_file.name
+            # Extract text using cached OCR model
+            # Bytes di-decode langsung di memory (tanpa temp file)
+            result = self.ocr.extract_ktp(image_bytes, ocr_mode=ocr_mode, fields=fields)
             
-            try:
-                # Extract text using cached OCR model
-                extracted_data = self.ocr.extract_text(temp_path)
-                
-                # Extract KTP fields
-                fields = self.ocr.extract_ktp_fields(extracted_data)
-                
-                # Format response
-                response = {
-                    'success': True,
-                    'data': {
-                        'identityNumber': fields.get('nik'),
-                        'name': fields.get('nama'),
-                        'gender': fields.get('jenis_kelamin'),
-                        'alamat': fields.get('alamat'),
-                    },
-                    'raw': {
-                        'text_blocks_count': len(extracted_data.get('text_blocks', [])),
-                        'combined_text': extracted_data.get('combined_text', ''),
-                    }
-                }
-                
-                return response
-            finally:
-                # Cleanup temporary file
-                try:
-                    os.unlink(temp_path)
-                except:
-                    pass
+            return self._format_response(result)
                     
         except Exception as e:
             return {
@@ -96,176 +66,111 @@ class OCRDaemon:
                 'error': str(e)
             }
     
-    def run(self):
-        """Main loop: watch request directory, process files, write responses"""
-        if os.getenv('SUPPRESS_OCR_LOGS') != '1':
-            print(f"Watching request directory: {self.request_dir}", file=sys.stderr)
+    def _format_response(self, result):
+        """Susun response dari hasil KTPOCR.extract_ktp"""
+        extracted_data = result['extracted_data']
+        self.record_corpus(extracted_data)
         
-        while True:
+        # Format response
+        response = {
+            'success': True,
+            'data': format_ktp_data(result['fields']),
+            'raw': {
+                'text_blocks_count': len(extracted_data.get('text_blocks', [])),
+                'combined_text': extracted_data.get('combined_text', ''),
+            }
+        }
+        if result['roi'] is not None:
+            # Mode roi: waktu recognition per field dan field yang diisi dari OCR full-page
+            response['roi'] = result['roi']
+        return response
+
+    def cache_options(self, request):
+        """Hasil OCR tergantung pada ukuran resize / rektifikasi sebelum OCR"""
+        return {
+            'max_image_size': self.ocr.max_image_size,
+            'rectify': self.ocr.rectify,
+            'field_extractor': self.ocr.field_extractor,
+            'ocr_mode': resolve_ocr_mode(request, self.ocr.ocr_mode),
+            'fields': list(request_fields(request)),
+        }
+    
+    def handle_request(self, request):
+        """Handle one parsed request (file or socket transport)"""
+        # Extract image data
+        image_data = request.get('image')
+        if not image_data:
+            return {
+                'success': False,
+                'error': 'Missing "image" field in request'
+            }
+        
+        try:
+            ocr_mode = resolve_ocr_mode(request, self.ocr.ocr_mode)
+            fields = request_fields(request)
+        except ValueError as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        
+        # Process OCR request
+        return self.process_request(image_data, ocr_mode=ocr_mode, fields=fields)
+    
+    def handle_batch(self, requests):
+        """
+        Micro-batching: satu panggilan PaddleOCR untuk beberapa request
+        
+        Request yang tidak valid (image kosong / gagal decode) dijawab sendiri
+        dan tidak ikut batch, sehingga tidak menggagalkan request lain.
+        Request dikelompokkan per (ocr_mode, fields).
+        """
+        responses = [None] * len(requests)
+        groups = {}
+        
+        for i, request in enumerate(requests):
+            image_data = request.get('image')
+            if not image_data:
+                responses[i] = self.handle_request(request)
+                continue
             try:
-                # Check for request files (exclude .tmp and .processing files)
-                request_files = [
-                    f for f in self.request_dir.glob("*.json")
-                    if f.suffix == '.json' and not f.name.endswith('.tmp') and not f.name.endswith('.processing')
-                ]
-                
-                for request_file in request_files:
-                    # Skip temp files
-                    if request_file.suffix == '.tmp':
-                        continue
-                    
-                    # Lock mechanism: rename file to .processing to claim ownership
-                    # This prevents multiple daemon instances from processing the same file
-                    processing_file = request_file.with_suffix('.processing')
-                    request_id = request_file.stem
-                    
-                    try:
-                        # Try to claim the file by renaming it
-                        # If rename fails, another process is already handling it
-                        try:
-                            request_file.rename(processing_file)
-                        except (FileNotFoundError, OSError):
-                            # File was already claimed or deleted, skip
-                            continue
-                        
-                        # Now we own the file, read it safely
-                        max_retries = 10
-                        retry_count = 0
-                        file_ready = False
-                        request = None
-                        
-                        while retry_count < max_retries:
-                            try:
-                                # Check file size
-                                if not processing_file.exists():
-                                    # File was deleted somehow, skip
-                                    break
-                                
-                                file_size = processing_file.stat().st_size
-                                if file_size == 0:
-                                    # File is empty, might still be writing (shouldn't happen after rename)
-                                    retry_count += 1
-                                    time.sleep(0.1)
-                                    continue
-                                
-                                # Try to read file
-                                with open(processing_file, 'r') as f:
-                                    request = json.load(f)
-                                
-                                # Verify request has required fields
-                                if request and isinstance(request, dict) and 'image' in request:
-                                    file_ready = True
-                                    break
-                                else:
-                                    # Invalid request format, skip
-                                    break
-                                    
-                            except (json.JSONDecodeError, IOError, OSError, FileNotFoundError) as e:
-                                # File might still be writing or was deleted
-                                if isinstance(e, FileNotFoundError):
-                                    # File was deleted, skip
-                                    break
-                                retry_count += 1
-                                time.sleep(0.1)
-                        
-                        if not file_ready or request is None:
-                            # File not ready after retries or was deleted, cleanup and skip
-                            try:
-                                if processing_file.exists():
-                                    processing_file.unlink()
-                            except:
-                                pass
-                            continue
-                        
-                        # Extract image data
-                        image_data = request.get('image')
-                        if not image_data:
-                            response = {
-                                'success': False,
-                                'error': 'Missing "image" field in request'
-                            }
-                        else:
-                            # Process OCR request
-                            response = self.process_request(image_data)
-                        
-                        # Write response
-                        response_file = self.response_dir / f"{request_id}.json"
-                        
-                        # Ensure response directory exists
-                        response_file.parent.mkdir(parents=True, exist_ok=True)
-                        
-                        # Write response atomically using temp file then rename
-                        temp_response_file = response_file.with_suffix('.tmp')
-                        with open(temp_response_file, 'w') as f:
-                            json.dump(response, f, ensure_ascii=False)
-                        temp_response_file.replace(response_file)
-                        
-                        # Delete processing file after response is written
-                        try:
-                            if processing_file.exists():
-                                processing_file.unlink()
-                        except:
-                            pass
-                        
-                    except FileNotFoundError:
-                        # File was deleted before we could process it (race condition)
-                        # This is normal, just cleanup and continue
-                        try:
-                            if 'processing_file' in locals() and processing_file.exists():
-                                processing_file.unlink()
-                        except:
-                            pass
-                        continue
-                    except Exception as e:
-                        # Write error response only if we successfully claimed the file
-                        if 'processing_file' in locals() and processing_file.exists():
-                            response_file = self.response_dir / f"{request_id}.json"
-                            error_response = {
-                                'success': False,
-                                'error': f'Processing error: {str(e)}'
-                            }
-                            try:
-                                # Ensure response directory exists
-                                response_file.parent.mkdir(parents=True, exist_ok=True)
-                                
-                                # Write error response atomically
-                                temp_response_file = response_file.with_suffix('.tmp')
-                                with open(temp_response_file, 'w') as f:
-                                    json.dump(error_response, f, ensure_ascii=False)
-                                temp_response_file.replace(response_file)
-                            except Exception as cleanup_error:
-                                if os.getenv('SUPPRESS_OCR_LOGS') != '1':
-                                    print(f"Error writing error response: {cleanup_error}", file=sys.stderr)
-                        
-                        # Always cleanup processing file
-                        try:
-                            if 'processing_file' in locals() and processing_file.exists():
-                                processing_file.unlink()
-                        except:
-                            pass
-                        
-                        if os.getenv('SUPPRESS_OCR_LOGS') != '1':
-                            print(f"Error processing request {request_id}: {e}", file=sys.stderr)
-                
-                # Sleep a bit to avoid busy waiting
-                time.sleep(0.1)
-                
-            except KeyboardInterrupt:
-                # Graceful shutdown on Ctrl+C
-                break
+                options = (resolve_ocr_mode(request, self.ocr.ocr_mode), request_fields(request))
+                image = self.ocr.load_image(decode_image_data(image_data))[0]
+                groups.setdefault(options, []).append((i, image))
             except Exception as e:
-                if os.getenv('SUPPRESS_OCR_LOGS') != '1':
-                    print(f"Error in daemon loop: {e}", file=sys.stderr)
-                time.sleep(1)  # Wait before retrying
+                responses[i] = {
+                    'success': False,
+                    'error': str(e)
+                }
+        
+        for (ocr_mode, fields), members in groups.items():
+            results = self.ocr.extract_ktp_batch(
+                [image for _, image in members], ocr_mode=ocr_mode, fields=fields
+            )
+            for (i, _), result in zip(members, results):
+                responses[i] = self._format_response(result)
+        
+        return responses
 
 if __name__ == '__main__':
-    if len(sys.argv) < 3:
-        print("Usage: ocr_daemon.py <request_dir> <response_dir>", file=sys.stderr)
-        sys.exit(1)
-    
-    request_dir = sys.argv[1]
-    response_dir = sys.argv[2]
+    parser = argparse.ArgumentParser(description='OCR daemon (PaddleOCR model cached in memory)')
+    parser.add_argument('request_dir', help='Directory untuk request file')
+    parser.add_argument('response_dir', help='Directory untuk response file')
+    parser.add_argument('--field-extractor', choices=['text', 'layout'], default='text',
+                        help="Ekstraksi field: 'text' (pattern) atau 'layout' (posisi bbox)")
+    parser.add_argument('--ocr-mode', choices=list(OCR_MODES), default='full',
+                        help="Mode OCR default: 'full' atau 'roi' (region field dari template, fallback full-page)")
+    parser.add_argument('--roi-template', help='Path template region JSON untuk mode roi (lihat ktp_template.py)')
+    parser.add_argument('--max-image-size', type=int, default=1200,
+                        help='Ukuran maksimal gambar (lebar/tinggi) sebelum OCR. Default: 1200. Set 0 untuk disable resize.')
+    parser.add_argument('--rectify', action='store_true',
+                        help='Warp kartu di dalam crop ke rasio kanonik (maks 1000x630, tanpa upscale) sebelum OCR')
+    add_daemon_arguments(parser)
+    args = parser.parse_args()
     
-    daemon = OCRDaemon(request_dir, response_dir)
-    daemon.run()
-
+    daemon = OCRDaemon(
+        args.request_dir, args.response_dir, field_extractor=args.field_extractor,
+        ocr_mode=args.ocr_mode, roi_template=args.roi_template, rectify=args.rectify,
+        max_image_size=args.max_image_size or None
+    )
+    serve_daemon(daemon, args)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Deadline per request untuk daemon
+
+Request boleh membawa salah satu / kedua field berikut:
+- "deadline":  waktu absolut (epoch ms) setelah itu caller sudah berhenti menunggu
+- "budget_ms": budget relatif (ms) sejak request diterima daemon
+
+Daemon mengecek deadline saat pickup dan di antara stage pemrosesan
+(setelah decode, setelah deteksi, sebelum OCR) dengan check_deadline().
+Pengecekan memakai deadline yang aktif di thread tersebut (deadline_scope),
+jadi modul OCR / deteksi tidak perlu tahu request mana yang sedang diproses.
+
+Jika deadline lewat, check_deadline() melempar DeadlineExceeded dan menandai
+scope-nya. Layer yang menangkap semua exception (mis. detect_and_crop yang
+mengubah error menjadi dict) tetap aman: daemon melihat tanda di scope dan
+menjawab "deadline_exceeded" alih-alih error generik.
+"""
+
+import threading
+import time
+
+DEADLINE_EXCEEDED = 'deadline_exceeded'
+
+
+class DeadlineExceeded(Exception):
+    """Deadline request sudah lewat sebelum stage berikutnya dimulai"""
+
+    def __init__(self, stage_name=None):
+        super().__init__(DEADLINE_EXCEEDED)
+        self.stage = stage_name
+
+
+def resolve_deadline(request, received_at=None):
+    """
+    Deadline request sebagai time.monotonic()
+
+    Args:
+        request: Request dict ("deadline" epoch ms dan / atau "budget_ms")
+        received_at: time.monotonic() saat request diterima (basis budget_ms; default: sekarang)
+
+    Returns:
+        Deadline monotonic (yang paling awal jika keduanya ada), atau None jika tidak ada
+
+    Raises:
+        ValueError: Jika nilai deadline / budget_ms bukan angka
+    """
+    deadlines = []
+    deadline_ms = request.get('deadline')
+    budget_ms = request.get('budget_ms')
+    if deadline_ms is not None:
+        if isinstance(deadline_ms, bool) or not isinstance(deadline_ms, (int, float)):
+            raise ValueError(f"Invalid deadline: {deadline_ms!r} (expected epoch ms)")
+        deadlines.append(time.monotonic() + (deadline_ms / 1000.0 - time.time()))
+    if budget_ms is not None:
+        if isinstance(budget_ms, bool) or not isinstance(budget_ms, (int, float)):
+            raise ValueError(f"Invalid budget_ms: {budget_ms!r}")
+        base = received_at if received_at is not None else time.monotonic()
+        deadlines.append(base + budget_ms / 1000.0)
+    return min(deadlines) if deadlines else None
+
+
+# Scope deadline aktif di thread ini (deadline_scope), None = tanpa deadline
+_local = threading.local()
+
+
+class deadline_scope:
+    """
+    Context manager: aktifkan deadline (monotonic, None = tanpa deadline) di thread ini
+
+    Setelah blok selesai, `exceeded` berisi nama stage tempat deadline terdeteksi
+    lewat (atau None).
+    """
+
+    __slots__ = ('deadline', 'exceeded', '_previous')
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.exceeded = None
+
+    def __enter__(self):
+        self._previous = getattr(_local, 'scope', None)
+        _local.scope = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.scope = self._previous
+        if exc_type is not None and issubclass(exc_type, DeadlineExceeded) and self.exceeded is None:
+            self.exceeded = exc.stage
+        return False
+
+
+def check_deadline(stage_name):
+    """
+    Lempar DeadlineExceeded jika deadline request yang sedang diproses sudah lewat
+
+    Args:
+        stage_name: Stage yang baru selesai (untuk response / log)
+    """
+    scope = getattr(_local, 'scope', None)
+    if scope is None or scope.deadline is None:
+        return
+    if time.monotonic() >= scope.deadline:
+        if scope.exceeded is None:
+            scope.exceeded = stage_name
+        raise DeadlineExceeded(stage_name)
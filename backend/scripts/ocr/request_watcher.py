@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Watcher untuk request directory (file protocol daemon)
+
+Backend:
+- inotify (Linux): kernel memberi tahu saat <uuid>.json di-rename masuk (IN_MOVED_TO)
+  atau selesai ditulis (IN_CLOSE_WRITE), sehingga request langsung di-pickup
+  tanpa glob berulang dan tanpa CPU idle
+- polling: fallback jika inotify tidak tersedia (glob setiap 100 ms, perilaku lama)
+
+Kedua backend juga melaporkan request file yang hilang dari directory (di-claim
+daemon / worker mana pun, atau dihapus) lewat take_removed(), sehingga daemon bisa
+menghitung backlog tanpa listing directory (IN_MOVED_FROM / IN_DELETE).
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+POLL_INTERVAL = 0.1
+
+# Walaupun event inotify tidak hilang, rescan sesekali untuk jaga-jaga
+# (misalnya file yang ditulis sebelum watch terpasang atau event overflow)
+RESCAN_INTERVAL = 5.0
+
+# Konstanta dari <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def is_request_file(name):
+    """True jika nama file adalah request yang siap diproses (<uuid>.json)"""
+    return name.endswith('.json') and not name.startswith('.')
+
+
+def list_request_files(request_dir):
+    # Check for request files (exclude .tmp and .processing files)
+    return [
+        f for f in Path(request_dir).glob("*.json")
+        if f.suffix == '.json' and not f.name.endswith('.tmp') and not f.name.endswith('.processing')
+    ]
+
+
+class PollingWatcher:
+    """Fallback watcher: glob request directory secara berkala"""
+
+    backend = 'poll'
+
+    def __init__(self, request_dir, interval=POLL_INTERVAL):
+        self.request_dir = Path(request_dir)
+        self.interval = interval
+        self._known = set()
+        self._removed = []
+
+    def wait(self, timeout=None):
+        """
+        Tunggu request file baru
+
+        Returns:
+            List of Path request file yang ada saat ini
+        """
+        # Selalu tidur dulu: file yang masih antri di daemon tetap ada di directory,
+        # scan langsung tanpa jeda akan membuat loop ini busy-wait
+        time.sleep(self.interval if timeout is None else min(self.interval, timeout))
+        files = list_request_files(self.request_dir)
+        names = {f.name for f in files}
+        self._removed.extend(self._known - names)
+        self._known = names
+        return files
+
+    def take_removed(self):
+        """Nama request file yang hilang (di-claim / dihapus) sejak panggilan sebelumnya"""
+        removed, self._removed = self._removed, []
+        return removed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Watcher berbasis inotify (Linux) via ctypes, tanpa dependency tambahan"""
+
+    backend = 'inotify'
+
+    def __init__(self, request_dir):
+        self.request_dir = Path(request_dir)
+
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            raise OSError('libc not found')
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available on this platform')
+
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f'inotify_init1 failed: {os.strerror(errno)}')
+
+        wd = libc.inotify_add_watch(
+            fd, os.fsencode(str(self.request_dir)), IN_MOVED_TO | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_DELETE
+        )
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, f'inotify_add_watch failed: {os.strerror(errno)}')
+
+        self.fd = fd
+        self._poller = select.poll()
+        self._poller.register(fd, select.POLLIN)
+        # File yang sudah ada sebelum watch terpasang ikut diproses di wait() pertama
+        self._needs_rescan = True
+        self._last_scan = 0.0
+        # Request file yang ada di directory (untuk take_removed setelah rescan)
+        self._known = set()
+        self._removed = []
+
+    def _read_events(self):
+        names = []
+        removed = []
+        overflow = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                _, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + name_len].rstrip(b'\0').decode('utf-8', 'replace')
+                offset += name_len
+
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif mask & IN_IGNORED:
+                    # Directory dihapus / watch dilepas: kembali ke rescan
+                    overflow = True
+                elif name and is_request_file(name):
+                    # MOVED_FROM / DELETE: di-claim (rename ke .processing) atau dihapus
+                    (removed if mask & (IN_MOVED_FROM | IN_DELETE) else names).append(name)
+        return names, removed, overflow
+
+    def wait(self, timeout=None):
+        """
+        Tunggu request file baru (blocking sampai ada event atau timeout)
+
+        Returns:
+            List of Path request file baru
+        """
+        now = time.monotonic()
+        if self._needs_rescan or now - self._last_scan >= RESCAN_INTERVAL:
+            self._needs_rescan = False
+            self._last_scan = now
+            files = list_request_files(self.request_dir)
+            names = {f.name for f in files}
+            # Event yang hilang (overflow) tidak membuat file yang sudah di-claim tetap terhitung
+            self._removed.extend(self._known - names)
+            self._known = names
+            if files:
+                return files
+
+        wait_for = RESCAN_INTERVAL if timeout is None else min(timeout, RESCAN_INTERVAL)
+        if not self._poller.poll(int(wait_for * 1000)):
+            return []
+
+        names, removed, overflow = self._read_events()
+        if overflow:
+            self._needs_rescan = True
+        self._known.update(names)
+        self._known.difference_update(removed)
+        self._removed.extend(removed)
+        # Event bisa duplikat (misalnya CLOSE_WRITE lalu MOVED_TO), pertahankan urutan
+        return [self.request_dir / name for name in dict.fromkeys(names)]
+
+    def take_removed(self):
+        """Nama request file yang hilang (di-claim / dihapus) sejak panggilan sebelumnya"""
+        removed, self._removed = self._removed, []
+        return removed
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+def create_watcher(request_dir, backend='auto'):
+    """
+    Buat watcher untuk request directory
+
+    Args:
+        request_dir: Directory yang di-watch
+        backend: 'auto' (inotify jika tersedia, jika tidak polling), 'inotify', atau 'poll'
+    """
+    if backend in ('auto', 'inotify'):
+        try:
+            return InotifyWatcher(request_dir)
+        except (OSError, AttributeError) as e:
+            if backend == 'inotify':
+                raise
+            if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+                print(f"inotify unavailable ({e}), falling back to polling", file=sys.stderr)
+    return PollingWatcher(request_dir)
+
+
+class PickupStats:
+    """Statistik latency pickup: waktu dari file request ditulis sampai diterima watcher daemon"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+
+    def record(self, latency_ms):
+        self.count += 1
+        self.total_ms += latency_ms
+        self.last_ms = latency_ms
+        if latency_ms > self.max_ms:
+            self.max_ms = latency_ms
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.count if self.count else 0.0
+
+    def summary(self):
+        return (
+            f"pickup latency: n={self.count} mean={self.mean_ms:.1f}ms "
+            f"max={self.max_ms:.1f}ms last={self.last_ms:.1f}ms"
+        )
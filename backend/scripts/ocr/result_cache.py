@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Cache hasil OCR / deteksi berbasis isi request (content-addressed)
+
+Key = hash dari bytes gambar yang sudah di-decode + opsi yang mempengaruhi hasil
+(return_multiple, min_confidence, max_image_size, ...). Foto KTP yang di-upload
+ulang atau request yang di-retry frontend langsung dijawab dari cache.
+
+Dua tier:
+- memory: LRU dengan batas total ukuran (bytes JSON response)
+- disk (opsional): satu file JSON per key, bertahan setelah restart dan
+  bisa dipakai bersama oleh beberapa worker
+Kedua tier memakai TTL yang sama.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+# Default batas memory cache dan TTL
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL = 3600.0
+
+# Setiap N put, hapus file disk cache yang sudah expired
+DISK_PRUNE_EVERY = 200
+
+
+def make_cache_key(image_bytes, options=None):
+    """
+    Hitung cache key dari bytes gambar dan opsi request
+
+    Args:
+        image_bytes: Raw image bytes (sudah di-decode dari base64)
+        options: Dict opsi yang mempengaruhi hasil
+
+    Returns:
+        Hex string
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(json.dumps(options or {}, sort_keys=True).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(image_bytes)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL, disk_dir=None):
+        """
+        Args:
+            max_bytes: Batas total ukuran entry di memory (bytes)
+            ttl: Umur entry dalam detik (None = tidak expired)
+            disk_dir: Folder untuk disk tier (None = memory saja)
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._entries = OrderedDict()  # key -> (expires_at, response, size)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._puts = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self.prune_disk()
+
+    def _expires_at(self):
+        return time.time() + self.ttl if self.ttl else None
+
+    @staticmethod
+    def _expired(expires_at):
+        return expires_at is not None and expires_at <= time.time()
+
+    def _disk_path(self, key):
+        return self.disk_dir / f'{key}.json'
+
+    def get(self, key):
+        """
+        Ambil response dari cache
+
+        Returns:
+            Salinan response dict, atau None jika tidak ada / expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._expired(entry[0]):
+                    self._remove(key)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(entry[1])
+
+        response = self._disk_get(key)
+        with self._lock:
+            if response is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+        return response
+
+    def _disk_get(self, key):
+        if self.disk_dir is None:
+            return None
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        expires_at = entry.get('expires_at')
+        if self._expired(expires_at):
+            try:
+                self._disk_path(key).unlink()
+            except OSError:
+                pass
+            return None
+
+        response = entry.get('response')
+        if not isinstance(response, dict):
+            return None
+
+        # Naikkan ke memory tier
+        self._memory_put(key, response, expires_at, len(json.dumps(response, ensure_ascii=False)))
+        return dict(response)
+
+    def put(self, key, response):
+        """Simpan response ke cache (memory dan disk jika aktif)"""
+        encoded = json.dumps(response, ensure_ascii=False)
+        expires_at = self._expires_at()
+        self._memory_put(key, response, expires_at, len(encoded))
+
+        if self.disk_dir is not None:
+            self._disk_put(key, response, expires_at)
+
+    def _memory_put(self, key, response, expires_at, size):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (expires_at, dict(response), size)
+            self._size += size
+            # Evict entry yang paling lama tidak dipakai sampai di bawah batas
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._size -= size
+
+    def _disk_put(self, key, response, expires_at):
+        path = self._disk_path(key)
+        temp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'expires_at': expires_at, 'response': response}, f, ensure_ascii=False)
+            temp_path.replace(path)
+        except OSError as e:
+            if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+                print(f"Error writing cache entry {key}: {e}", file=sys.stderr)
+            return
+
+        self._puts += 1
+        if self._puts % DISK_PRUNE_EVERY == 0:
+            self.prune_disk()
+
+    def prune_disk(self):
+        """Hapus file disk cache yang sudah expired"""
+        if self.disk_dir is None or not self.ttl:
+            return
+        cutoff = time.time() - self.ttl
+        for path in self.disk_dir.glob('*.json'):
+            try:
+                # mtime = waktu put, jadi tidak perlu membaca isi file
+                if path.stat().st_mtime <= cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._size,
+            }
+
+    def summary(self):
+        s = self.stats()
+        return (f"cache: hits={s['hits']} (disk {s['disk_hits']}) misses={s['misses']} "
+                f"evictions={s['evictions']} entries={s['entries']} size={s['bytes'] / 1024:.0f}KB")
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Metrics latency per stage untuk OCR / KTP detection daemon
+
+Setiap stage pemrosesan (pickup, parse JSON, decode base64, decode gambar,
+preprocess, inference YOLO, encode crop, predict PaddleOCR, ekstraksi field,
+tulis response) diukur dengan:
+
+    with stage('image_decode'):
+        img = cv2.imdecode(...)
+
+Durasi masuk ke histogram in-process (bucket tetap, seperti Prometheus),
+ditambah counter (requests, errors, batch) dan gauge (queue depth, cache).
+Biaya per observasi hanya perf_counter + bisect + increment di bawah lock,
+jadi aman dibiarkan aktif di production.
+
+Durasi yang sama juga bisa dikumpulkan per request (request "trace": true)
+dengan collect_timings(): selama blok tersebut aktif, setiap stage di thread
+yang sama ikut dijumlahkan ke dict timings milik request.
+
+Ekspos (opsional, lihat MetricsExporter):
+- --metrics-file: file text format Prometheus, ditulis ulang secara atomik
+  setiap METRICS_FILE_INTERVAL detik (untuk node_exporter textfile collector)
+- --metrics-port: endpoint HTTP lokal GET /metrics
+"""
+
+import bisect
+import http.server
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Prefix nama metric
+METRIC_PREFIX = 'ktp_daemon'
+
+# Stage yang diukur; dipakai untuk urutan output (stage lain tetap direkam)
+STAGES = (
+    'pickup',          # file request ditulis (mtime) sampai diterima watcher daemon
+    'queue_wait',      # request diterima (watcher / socket) sampai mulai diproses
+    'json_parse',      # parse request file JSON
+    'base64_decode',   # decode field "image" (file protocol)
+    'image_decode',    # cv2.imdecode / imread
+    'preprocess',      # resize / grayscale / rektifikasi / letterbox
+    'detect',          # inference model deteksi KTP (YOLO / ONNX)
+    'crop_encode',     # encode crop hasil deteksi (JPEG / WebP / PNG, crop_mode)
+    'crop_write',      # tulis crop ke file per penerima (crop_output=file)
+    'ocr_predict',     # PaddleOCR predict (full-page atau recognition region)
+    'field_extract',   # ekstraksi field KTP dari hasil OCR
+    'response_write',  # tulis response file / kirim reply socket
+    'total',           # request diterima sampai response terkirim
+)
+
+# Batas bucket histogram (detik)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Interval penulisan ulang --metrics-file
+METRICS_FILE_INTERVAL = 10.0
+
+
+class Histogram:
+    """Histogram kumulatif dengan bucket tetap (nilai dalam detik)"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # counts[i] = jumlah observasi dengan buckets[i-1] < nilai <= buckets[i]; terakhir = +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Perkiraan kuantil (batas atas bucket), None jika kosong"""
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float('inf')
+
+
+class Metrics:
+    """Registry histogram per stage, counter dan gauge (thread-safe)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.labels = {}
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        # name -> (type, help, callable); nilai dibaca saat render
+        self._callbacks = {}
+
+    def observe(self, stage_name, seconds):
+        """Rekam satu durasi stage (detik)"""
+        with self._lock:
+            histogram = self._histograms.get(stage_name)
+            if histogram is None:
+                histogram = self._histograms[stage_name] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def inc(self, name, value=1):
+        """Tambah counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def register(self, name, fn, kind='gauge', help_text=''):
+        """
+        Metric yang nilainya dibaca dari fn() saat render (mis. queue depth, counter cache)
+
+        Args:
+            kind: 'gauge' atau 'counter'
+        """
+        self._callbacks[name] = (kind, help_text, fn)
+
+    def reset(self):
+        """Kosongkan histogram dan counter (mis. setelah warmup)"""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self):
+        """
+        Ringkasan untuk stats / log
+
+        Returns:
+            Dictionary dengan counters dan per stage: count, mean_ms, p50_ms, p95_ms (batas bucket)
+        """
+        with self._lock:
+            stages = {}
+            for name, h in self._histograms.items():
+                stages[name] = {
+                    'count': h.count,
+                    'mean_ms': round(h.sum / h.count * 1000, 2) if h.count else None,
+                    'p50_ms': _bound_ms(h.quantile(0.5)),
+                    'p95_ms': _bound_ms(h.quantile(0.95)),
+                }
+            return {'counters': dict(self._counters), 'stages': stages}
+
+    def render(self):
+        """Text exposition format Prometheus"""
+        base_labels = ''.join(f',{k}="{v}"' for k, v in self.labels.items())
+        plain_labels = '{' + base_labels[1:] + '}' if base_labels else ''
+
+        with self._lock:
+            histograms = {name: (list(h.counts), h.sum, h.count) for name, h in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        name = f'{METRIC_PREFIX}_stage_duration_seconds'
+        lines.append(f'# HELP {name} Durasi stage pemrosesan request')
+        lines.append(f'# TYPE {name} histogram')
+        order = [s for s in STAGES if s in histograms] + sorted(s for s in histograms if s not in STAGES)
+        for stage_name in order:
+            counts, total, count = histograms[stage_name]
+            labels = f'stage="{stage_name}"{base_labels}'
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{name}_sum{{{labels}}} {total:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {count}')
+
+        for counter, value in sorted(counters.items()):
+            metric = f'{METRIC_PREFIX}_{counter}_total'
+            lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric}{plain_labels} {value}')
+
+        for metric_name, (kind, help_text, fn) in sorted(self._callbacks.items()):
+            try:
+                value = fn()
+            except Exception:
+                continue
+            if value is None:
+                continue
+            metric = f'{METRIC_PREFIX}_{metric_name}' + ('_total' if kind == 'counter' else '')
+            if help_text:
+                lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} {kind}')
+            lines.append(f'{metric}{plain_labels} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _bound_ms(seconds):
+    if seconds is None:
+        return None
+    return seconds * 1000 if seconds != float('inf') else None
+
+
+# Registry global proses: modul OCR / deteksi merekam ke sini tanpa perlu referensi daemon
+METRICS = Metrics()
+
+
+class _StageTimer:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_stage(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def stage(name):
+    """Context manager: ukur durasi blok sebagai stage `name`"""
+    return _StageTimer(name)
+
+
+def record_stage(name, seconds):
+    """Rekam durasi stage yang diukur di luar context manager (detik)"""
+    METRICS.observe(name, seconds)
+    timings = getattr(_local, 'timings', None)
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+# Dict timings aktif di thread ini (collect_timings), None = tidak ada trace
+_local = threading.local()
+
+
+class collect_timings:
+    """
+    Context manager: jumlahkan durasi stage di thread ini ke dict timings (detik per stage)
+
+    Bisa bersarang; dict sebelumnya aktif kembali setelah blok selesai.
+    """
+
+    __slots__ = ('timings', '_previous')
+
+    def __init__(self, timings):
+        self.timings = timings
+
+    def __enter__(self):
+        self._previous = getattr(_local, 'timings', None)
+        _local.timings = self.timings
+        return self.timings
+
+    def __exit__(self, *exc):
+        _local.timings = self._previous
+        return False
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    metrics = METRICS
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = self.metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrape berkala tidak perlu masuk log
+        pass
+
+
+class MetricsExporter:
+    """Ekspos Metrics sebagai file Prometheus dan / atau endpoint HTTP lokal"""
+
+    def __init__(self, metrics=METRICS, path=None, port=None, host='127.0.0.1', interval=METRICS_FILE_INTERVAL):
+        self.metrics = metrics
+        self.path = Path(path) if path else None
+        self.port = port
+        self.host = host
+        self.interval = interval
+        self._server = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.write_file()
+            threading.Thread(target=self._write_loop, name='metrics-file', daemon=True).start()
+
+        if self.port is not None:
+            handler = type('MetricsHandler', (_MetricsHandler,), {'metrics': self.metrics})
+            self._server = http.server.ThreadingHTTPServer((self.host, self.port), handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+            if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+                print(f"Metrics endpoint: http://{self.host}:{self._server.server_address[1]}/metrics",
+                      file=sys.stderr)
+
+    def write_file(self):
+        """Tulis file metrics secara atomik (temp file lalu rename)"""
+        temp_file = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(temp_file, 'w') as f:
+            f.write(self.metrics.render())
+        temp_file.replace(self.path)
+
+    def _write_loop(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.write_file()
+            except OSError as e:
+                if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+                    print(f"Error writing metrics file: {e}", file=sys.stderr)
+
+    def stop(self):
+        self._stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        if self.path is not None:
+            try:
+                self.write_file()
+            except OSError:
+                pass
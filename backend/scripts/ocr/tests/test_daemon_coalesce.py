@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Request identik yang masuk bersamaan hanya diproses sekali (BaseDaemon._in_flight)
+
+Usage:
+    python -m pytest tests/test_daemon_coalesce.py
+"""
+
+import base64
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from daemon_base import BaseDaemon, PendingRequest
+
+IMAGE = base64.b64encode(b'\xff\xd8 not really a jpeg \xff\xd9').decode()
+
+
+class SlowDaemon(BaseDaemon):
+    """handle_request yang menunggu `release` supaya request pertama tetap in-flight"""
+
+    def __init__(self, request_dir, response_dir):
+        super().__init__(request_dir, response_dir)
+        self.warmup_enabled = False
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def handle_request(self, request):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return {'success': True, 'calls': self.calls}
+
+
+class FakeConnection:
+    def __init__(self):
+        self.replies = []
+        self.replied = threading.Event()
+
+    def reply(self, response):
+        self.replies.append(response)
+        self.replied.set()
+
+
+def test_concurrent_identical_requests_are_computed_once(tmp_path):
+    daemon = SlowDaemon(tmp_path / 'requests', tmp_path / 'responses')
+    runner = threading.Thread(target=daemon.run, daemon=True)
+    runner.start()
+    try:
+        first, second = FakeConnection(), FakeConnection()
+        daemon._on_socket_request(first, {'id': 1, 'image': IMAGE}, b'')
+        assert daemon.started.wait(5)
+
+        # Request kedua datang saat request pertama masih diproses
+        daemon._on_socket_request(second, {'id': 2, 'image': IMAGE}, b'')
+        daemon.release.set()
+
+        assert first.replied.wait(5) and second.replied.wait(5)
+        assert daemon.calls == 1
+        assert daemon.coalesced == 1
+        assert first.replies[0] == {'id': 1, 'success': True, 'calls': 1}
+        assert second.replies[0] == {'id': 2, 'success': True, 'calls': 1}
+        assert not daemon._in_flight
+    finally:
+        daemon.release.set()
+        daemon.stop()
+        runner.join(5)
+
+
+def test_identical_requests_in_one_batch_without_cache(tmp_path):
+    daemon = SlowDaemon(tmp_path / 'requests', tmp_path / 'responses')
+    daemon.release.set()
+    assert daemon.cache is None
+
+    responses = []
+    pending = [
+        PendingRequest(i, {'image': IMAGE}, responses.append, time.monotonic())
+        for i in range(3)
+    ]
+    daemon._process_pending(pending)
+
+    assert daemon.calls == 1
+    assert daemon.coalesced == 2
+    assert [r['calls'] for r in responses] == [1, 1, 1]
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+"crop_output": "file" tetap memakai cache dan request identik; setiap penerima
+mendapat file crop sendiri (KTPDetectionDaemon.finalize_response)
+
+Usage:
+    python -m pytest tests/test_detection_crop_file.py
+"""
+
+import base64
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from daemon_base import BaseDaemon, PendingRequest
+from ktp_detection_daemon import KTPDetectionDaemon
+from result_cache import ResultCache
+
+IMAGE = base64.b64encode(b'\xff\xd8 not really a jpeg \xff\xd9').decode()
+
+
+class FakeDetector:
+    """Pengganti KTPDetector: satu kartu dengan crop BGR tetap, tanpa model"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def detect_and_crop(self, image_input, return_multiple=False, min_confidence=0.5, crop_format='bgr'):
+        self.calls += 1
+        crop = np.full((40, 64, 3), 128, np.uint8)
+        return {
+            'success': True,
+            'cropped_image': crop,
+            'bbox': [1, 2, 65, 42],
+            'confidence': 0.9,
+            'original_size': [100, 80],
+        }
+
+
+def make_daemon(tmp_path):
+    daemon = KTPDetectionDaemon.__new__(KTPDetectionDaemon)
+    daemon.detector = FakeDetector()
+    BaseDaemon.__init__(daemon, tmp_path / 'requests', tmp_path / 'responses')
+    daemon.shared_dir = tmp_path / 'shared'
+    daemon.shared_dir.mkdir()
+    daemon.cache = ResultCache()
+    return daemon
+
+
+def submit(daemon, count):
+    responses = []
+    pending = [
+        PendingRequest(i, {'image': IMAGE, 'crop_output': 'file'}, responses.append, time.monotonic())
+        for i in range(count)
+    ]
+    daemon._process_pending(pending)
+    return responses
+
+
+def assert_crop_files(responses):
+    paths = [r['cropped_image_file'] for r in responses]
+    assert len(set(paths)) == len(paths)
+    for response, path in zip(responses, paths):
+        assert response['success'] and 'cropped_image' not in response
+        assert os.path.getsize(path) == response['crop_encoding']['bytes']
+
+
+def test_identical_file_requests_are_coalesced(tmp_path):
+    daemon = make_daemon(tmp_path)
+
+    responses = submit(daemon, 2)
+
+    assert daemon.detector.calls == 1
+    assert daemon.coalesced == 1
+    assert_crop_files(responses)
+
+
+def test_file_request_hits_cache(tmp_path):
+    daemon = make_daemon(tmp_path)
+
+    first = submit(daemon, 1)
+    # Penerima pertama menghapus file crop-nya setelah dibaca
+    os.unlink(first[0]['cropped_image_file'])
+    second = submit(daemon, 1)
+
+    assert daemon.detector.calls == 1
+    assert daemon.cache.stats()['hits'] == 1
+    assert_crop_files(second)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Anonimisasi corpus OCR (ktp_corpus.anonymize_entry)
+
+Usage:
+    python -m pytest tests/test_ktp_corpus.py
+"""
+
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ktp_corpus import anonymize_entry
+
+# Nama yang memuat kata label / nilai KTP (islam, hindu, guru, ...)
+NAMES = ('ISLAMIATI', 'BALIANTO', 'HINDUNINGSIH', 'SUMARNI', 'GURUH')
+
+
+def _anonymize(lines):
+    return anonymize_entry(lines, rng=random.Random(0))['full_text']
+
+
+def test_names_containing_label_words_are_replaced():
+    lines = ['Nama : ISLAMIATI BALIANTO', 'Nama : HINDUNINGSIH', 'Nama: SUMARNI GURUH']
+    text = ' '.join(_anonymize(lines))
+    for name in NAMES:
+        assert name not in text
+    assert _anonymize(lines)[0].startswith('Nama : ')
+
+
+def test_names_on_their_own_line_are_replaced():
+    text = ' '.join(_anonymize(['NIK', '3273172602770010', 'ISLAMIATI BALIANTO', 'guruh']))
+    for name in NAMES:
+        assert name not in text.upper()
+
+
+def test_labels_and_value_words_are_kept():
+    lines = [
+        'Agama : ISLAM',
+        'Status Perkawinan CERAI HIDUP',
+        'Pekerjaan : KARYAWAN SWASTA',
+        # Label terpotong / tergabung oleh OCR (posisi label)
+        'camatan',
+        'ToiLahir : ',
+        'negaraan : WNI',
+    ]
+    assert _anonymize(lines) == lines
+
+
+def test_blocks_use_the_same_replacement():
+    entry = anonymize_entry(
+        ['Nama : ISLAMIATI'],
+        [{'text': 'ISLAMIATI', 'confidence': 0.9, 'bbox': [0, 0, 1, 1]}],
+        rng=random.Random(0),
+    )
+    replacement = entry['full_text'][0].split(': ')[1]
+    assert replacement != 'ISLAMIATI'
+    assert entry['text_blocks'][0]['text'] == replacement
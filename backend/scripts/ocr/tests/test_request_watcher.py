@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Backlog admission control dihitung dari event watcher (take_removed), tanpa
+listing request_dir
+
+Usage:
+    python -m pytest tests/test_request_watcher.py
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from daemon_base import BaseDaemon
+from request_watcher import create_watcher
+
+
+def wait_for(watcher, predicate, attempts=20):
+    files = []
+    for _ in range(attempts):
+        files.extend(watcher.wait(timeout=0.1))
+        if predicate(files):
+            break
+    return files
+
+
+@pytest.mark.parametrize('backend', ['inotify', 'poll'])
+def test_claimed_files_are_reported_as_removed(tmp_path, backend):
+    try:
+        watcher = create_watcher(tmp_path, backend)
+    except OSError:
+        pytest.skip('inotify tidak tersedia')
+    try:
+        request_file = tmp_path / 'a.json'
+        request_file.write_text('{}')
+        assert wait_for(watcher, lambda files: request_file in files)
+
+        # Claim oleh worker lain: rename ke .processing
+        request_file.rename(request_file.with_suffix('.processing'))
+        removed = []
+        for _ in range(20):
+            watcher.wait(timeout=0.1)
+            removed.extend(watcher.take_removed())
+            if removed:
+                break
+        assert removed == ['a.json']
+    finally:
+        watcher.close()
+
+
+def test_files_claimed_elsewhere_leave_the_backlog(tmp_path):
+    daemon = BaseDaemon(tmp_path / 'requests', tmp_path / 'responses')
+    daemon.max_queue = 8
+    daemon.watcher = create_watcher(daemon.request_dir, 'poll')
+    threading.Thread(target=daemon._watch_loop, daemon=True).start()
+
+    request_file = daemon.request_dir / 'a.json'
+    request_file.write_text('{}')
+    assert until(lambda: daemon.queue_depth() == 1)
+
+    # Worker lain meng-claim file; job lokal belum diambil dari antrian
+    request_file.rename(request_file.with_suffix('.processing'))
+    assert until(lambda: daemon.queue_depth() == 0)
+    assert daemon._jobs.qsize() == 1
+
+
+def until(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
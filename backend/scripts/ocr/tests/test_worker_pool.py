@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Autoscale pre-fork ikut menghitung request socket yang menunggu di antrian worker
+(BaseDaemon.socket_backlog -> PreforkSupervisor._backlog)
+
+Usage:
+    python -m pytest tests/test_worker_pool.py
+"""
+
+import base64
+import sys
+from multiprocessing.sharedctypes import RawValue
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from daemon_base import BaseDaemon
+from worker_pool import PreforkSupervisor
+
+IMAGE = base64.b64encode(b'\xff\xd8 not really a jpeg \xff\xd9').decode()
+
+
+class FakeConnection:
+    def reply(self, response):
+        raise AssertionError(f'unexpected reply: {response}')
+
+
+def test_worker_reports_queued_socket_requests(tmp_path):
+    daemon = BaseDaemon(tmp_path / 'requests', tmp_path / 'responses')
+    daemon.socket_backlog = RawValue('i', 0)
+
+    daemon._on_socket_request(FakeConnection(), {'id': 1, 'image': IMAGE}, b'')
+    daemon._on_socket_request(FakeConnection(), {'id': 2, 'image': IMAGE + 'x'}, b'')
+    assert daemon.socket_backlog.value == 2
+
+    daemon._accept_job(daemon._jobs.get_nowait())
+    assert daemon.socket_backlog.value == 1
+
+
+def test_supervisor_backlog_includes_socket_requests(tmp_path):
+    daemon = BaseDaemon(tmp_path / 'requests', tmp_path / 'responses')
+    supervisor = PreforkSupervisor(daemon, min_workers=1, max_workers=4)
+    (daemon.request_dir / 'a.json').write_text('{}')
+    supervisor.socket_backlog = {101: RawValue('i', 2), 102: RawValue('i', 3)}
+
+    assert supervisor._backlog() == 6
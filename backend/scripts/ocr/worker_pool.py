@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Supervisor pre-fork untuk OCR / KTP detection daemon
+
+Model (KTPOCR / KTPDetector) di-load sekali di proses parent, lalu worker
+di-fork sehingga weights dibagi copy-on-write. Setiap worker menjalankan
+daemon.run() biasa; rename .json → .processing sudah aman untuk banyak consumer.
+
+Supervisor:
+- restart worker yang mati
+- menambah worker (sampai max_workers) selama backlog request lebih besar dari jumlah worker
+- backlog = request file di request_dir + request socket yang menunggu di antrian
+  lokal worker (dilaporkan worker lewat counter shared memory, lihat _spawn_worker)
+- mengurangi worker (sampai min_workers) setelah backlog kosong cukup lama
+
+Catatan: parent sebaiknya tidak menjalankan inference sebelum fork; thread pool
+OpenMP / MKL milik torch dan Paddle tidak ikut ter-fork dan bisa membuat worker hang.
+Karena itu warmup inference (BaseDaemon.warmup) dijalankan oleh setiap worker
+di awal daemon.run(), setelah fork.
+"""
+
+import gc
+import os
+import signal
+import sys
+import time
+from multiprocessing.sharedctypes import RawValue
+
+from request_watcher import list_request_files
+
+# Interval supervisor mengecek worker dan backlog
+SUPERVISE_INTERVAL = 1.0
+
+# Worker tambahan dihentikan setelah backlog kosong selama ini
+SCALE_DOWN_IDLE = 30.0
+
+
+def add_worker_arguments(parser):
+    """Argumen CLI untuk worker pool"""
+    parser.add_argument('--workers',
+                        help="Jumlah worker pre-fork (angka atau 'auto'). Default: single process")
+    parser.add_argument('--min-workers', type=int,
+                        help='Jumlah worker minimum saat autoscale (default: 1 untuk auto, --workers untuk angka)')
+    parser.add_argument('--max-workers', type=int,
+                        help='Jumlah worker maksimum saat autoscale (default: CPU/2 untuk auto, --workers untuk angka)')
+
+
+def resolve_worker_counts(workers, min_workers=None, max_workers=None):
+    """
+    Hitung (min_workers, max_workers) dari opsi CLI
+
+    Args:
+        workers: None, angka (string/int) atau 'auto'
+        min_workers: Override jumlah minimum
+        max_workers: Override jumlah maksimum
+
+    Returns:
+        Tuple (min_workers, max_workers), atau None jika worker pool tidak dipakai
+    """
+    if workers is None:
+        return None
+
+    if str(workers) == 'auto':
+        # Inference PaddleOCR / torch sendiri sudah multi-thread, jadi satu worker per
+        # dua core memberi throughput yang lebih baik daripada satu worker per core
+        default_min, default_max = 1, max(1, (os.cpu_count() or 2) // 2)
+    else:
+        count = int(workers)
+        if count < 1:
+            raise ValueError('--workers must be >= 1')
+        default_min = default_max = count
+
+    min_count = min_workers if min_workers is not None else default_min
+    max_count = max_workers if max_workers is not None else default_max
+    min_count = max(1, min_count)
+    max_count = max(min_count, max_count)
+    return min_count, max_count
+
+
+class PreforkSupervisor:
+    def __init__(self, daemon, min_workers=1, max_workers=1):
+        """
+        Args:
+            daemon: Instance daemon (subclass BaseDaemon) dengan model yang sudah di-load
+            min_workers: Jumlah worker yang selalu hidup
+            max_workers: Jumlah worker maksimum saat backlog tinggi
+        """
+        self.daemon = daemon
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.workers = {}  # pid -> waktu start
+        self.socket_backlog = {}  # pid -> RawValue jumlah request socket di antrian worker
+        self.target = min_workers
+        self._stopping = False
+        self._idle_since = None
+
+    def _log(self, message):
+        if os.getenv('SUPPRESS_OCR_LOGS') != '1':
+            print(f"[supervisor] {message}", file=sys.stderr)
+
+    def _spawn_worker(self):
+        # Dibuat sebelum fork supaya parent dan worker berbagi page yang sama
+        socket_backlog = RawValue('i', 0)
+        pid = os.fork()
+        if pid == 0:
+            # Child: jalankan loop daemon biasa sampai SIGTERM
+            exit_code = 0
+            try:
+                self.daemon.socket_backlog = socket_backlog
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                signal.signal(signal.SIGTERM, lambda *_: self.daemon.stop())
+                self.daemon.run()
+            except BaseException as e:
+                self._log(f"worker {os.getpid()} crashed: {e}")
+                exit_code = 1
+            finally:
+                sys.stderr.flush()
+                os._exit(exit_code)
+
+        self.workers[pid] = time.monotonic()
+        self.socket_backlog[pid] = socket_backlog
+        self._log(f"started worker {pid} ({len(self.workers)} running)")
+        return pid
+
+    def _reap_workers(self):
+        """Ambil status worker yang sudah exit (non-blocking)"""
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                self.socket_backlog.clear()
+                return
+            if pid == 0:
+                return
+            if pid in self.workers:
+                del self.workers[pid]
+                self.socket_backlog.pop(pid, None)
+                if not self._stopping:
+                    self._log(f"worker {pid} exited with status {os.waitstatus_to_exitcode(status)}")
+
+    def _backlog(self):
+        sockets = sum(counter.value for counter in self.socket_backlog.values())
+        try:
+            return len(list_request_files(self.daemon.request_dir)) + sockets
+        except OSError:
+            return sockets
+
+    def _scale(self):
+        # Restart worker yang mati sampai jumlah target
+        while len(self.workers) < self.target:
+            self._spawn_worker()
+
+        backlog = self._backlog()
+        now = time.monotonic()
+
+        if backlog > len(self.workers) and self.target < self.max_workers:
+            # Tambah satu worker per interval supaya tidak overshoot
+            self._idle_since = None
+            self.target += 1
+            self._spawn_worker()
+        elif backlog == 0 and self.target > self.min_workers:
+            if self._idle_since is None:
+                self._idle_since = now
+            elif now - self._idle_since >= SCALE_DOWN_IDLE:
+                # Hentikan worker termuda; SIGTERM = selesaikan request yang sedang jalan lalu exit
+                pid = max(self.workers, key=self.workers.get)
+                self._log(f"scaling down: stopping worker {pid}")
+                self.target -= 1
+                os.kill(pid, signal.SIGTERM)
+                self._idle_since = now
+        elif backlog > 0:
+            self._idle_since = None
+
+    def _handle_stop(self, *_):
+        self._stopping = True
+
+    def run(self):
+        """Fork worker dan supervise sampai SIGTERM / SIGINT"""
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        # Pindahkan semua objek yang sudah ada (termasuk model) ke generasi permanen
+        # supaya GC di worker tidak menyentuh page-nya dan memicu copy-on-write
+        gc.collect()
+        gc.freeze()
+
+        self._log(f"starting pre-fork pool (min={self.min_workers}, max={self.max_workers})")
+        try:
+            while not self._stopping:
+                self._reap_workers()
+                self._scale()
+                time.sleep(SUPERVISE_INTERVAL)
+        finally:
+            for pid in list(self.workers):
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+            deadline = time.monotonic() + 30
+            while self.workers and time.monotonic() < deadline:
+                self._reap_workers()
+                time.sleep(0.1)
+            for pid in list(self.workers):
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            if self.daemon.socket_server is not None:
+                self.daemon.socket_server.stop()
+            self._log("pool stopped")
+
+
+def create_supervisor(daemon, args):
+    """Buat PreforkSupervisor dari opsi CLI, atau None untuk mode single process"""
+    counts = resolve_worker_counts(args.workers, args.min_workers, args.max_workers)
+    if counts is None:
+        return None
+    return PreforkSupervisor(daemon, min_workers=counts[0], max_workers=counts[1])
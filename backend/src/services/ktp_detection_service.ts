@@ -11,24 +11,62 @@ import { existsSync } from "fs";
 import { tmpdir } from "os";
 import { randomUUID } from "node:crypto";
 
+// Maximum daemon backlog; beyond it the daemon answers "busy" immediately
+// instead of queueing work we would time out on (~30 s timeout / ~0.5 s per detection)
+const MAX_QUEUE = process.env.KTP_DETECTION_MAX_QUEUE ?? "50";
+
+// Result cache is opt-in on the daemon: identical uploads / frontend retries are
+// answered from memory instead of re-running inference ("0" disables it)
+const CACHE_SIZE_MB = process.env.KTP_DETECTION_CACHE_SIZE_MB ?? "64";
+
+// How images reach the daemon: "file" hands over raw bytes by reference (a file in
+// /dev/shm/ktp-images, or a sidecar next to the request JSON) which the daemon memory-maps;
+// "base64" embeds the image in the request JSON (legacy)
+const IMAGE_TRANSFER = process.env.OCR_IMAGE_TRANSFER ?? "file";
+const SHM_DIR = "/dev/shm";
+// Private (0700) folder for image refs; the daemon only accepts files directly inside it
+const SHM_IMAGE_DIR = join(SHM_DIR, "ktp-images");
+
+type CropMode = "none" | "jpeg" | "webp" | "png";
+
+interface CropOptions {
+  mode?: CropMode;
+  quality?: number;
+  maxDim?: number;
+}
+
 interface DetectionRequest {
-  image: string; // base64 encoded image
+  image?: string; // base64 encoded image
+  image_file?: string; // Raw image bytes by reference (in /dev/shm/ktp-images or relative to the request dir)
   return_multiple?: boolean; // If true, return all detections
   min_confidence?: number; // Minimum confidence threshold (default: 0.5)
+  crop_output?: "base64" | "file"; // "file": crops come back as cropped_image_file paths
+  crop_mode?: CropMode; // Default: "jpeg"; "none" returns bbox only
+  crop_quality?: number; // JPEG / WebP quality 1-100 (default: 95)
+  crop_max_dim?: number; // Downscale crops so the longest side fits (default: original size)
+  trace?: boolean; // Add per-stage "timings" (ms) to the response
+  deadline?: number; // Epoch ms after which we stop waiting; daemon skips the work past this
 }
 
 interface DetectionResponse {
   success: boolean;
   cropped_image?: string; // base64 encoded cropped image (single detection)
+  cropped_image_file?: string; // crop_output "file": crop file path, replaced by cropped_image before returning
   cropped_images?: Array<{
-    cropped_image: string; // base64 encoded
+    cropped_image: string; // base64 encoded (absent with crop_mode "none")
+    cropped_image_file?: string;
     bbox: [number, number, number, number];
     confidence: number;
   }>;
   bbox?: [number, number, number, number];
   original_size?: [number, number];
   confidence?: number;
+  crop_encoding?: { mode: CropMode; media_type: string; bytes: number; encode_ms: number };
+  timings?: Record<string, number>; // Only when request.trace is set
   error?: string;
+  retry_after_ms?: number; // error "busy": daemon queue is full, retry after this long
+  stage?: string; // error "deadline_exceeded": stage reached when the deadline passed
+  queue?: { depth: number; max: number | null; estimated_wait_ms: number | null };
 }
 
 class KTPDetectionService {
@@ -38,19 +76,26 @@ class KTPDetectionService {
   private initPromise: Promise<void> | null = null;
   private requestDir: string;
   private responseDir: string;
+  private readyFile: string; // Ditulis daemon setelah model ter-load dan warmup selesai
   private modelPath: string;
 
   private constructor() {
     // Create temp directories for request/response communication
     this.requestDir = join(tmpdir(), "ktp_detection_requests");
     this.responseDir = join(tmpdir(), "ktp_detection_responses");
+    this.readyFile = join(tmpdir(), "ktp_detection_daemon.ready");
     
     // Model path - default to project root, will be verified during initialization
     // Check which model exists (synchronous check using fs.existsSync)
     const projectRootModel = join(process.cwd(), "best.pt");
     const scriptsModel = join(process.cwd(), "scripts/ocr/models/best.pt");
     
-    if (existsSync(projectRootModel)) {
+    // KTP_DETECTION_MODEL override, mis. scripts/ocr/models/best.int8.onnx (lihat export_onnx.py)
+    const envModel = process.env.KTP_DETECTION_MODEL;
+
+    if (envModel) {
+      this.modelPath = envModel;
+    } else if (existsSync(projectRootModel)) {
       this.modelPath = projectRootModel;
     } else if (existsSync(scriptsModel)) {
       this.modelPath = scriptsModel;
@@ -89,6 +134,8 @@ class KTPDetectionService {
         // Ensure directories exist before spawning Python daemon
         await mkdir(this.requestDir, { recursive: true });
         await mkdir(this.responseDir, { recursive: true });
+        // Hapus readiness file lama supaya tidak dianggap siap sebelum warmup selesai
+        await unlink(this.readyFile).catch(() => {});
 
         const pythonScriptPath = join(
           process.cwd(),
@@ -118,6 +165,12 @@ class KTPDetectionService {
           this.requestDir,
           this.responseDir,
           this.modelPath, // Pass model path as argument
+          "--ready-file",
+          this.readyFile,
+          "--max-queue",
+          MAX_QUEUE,
+          "--cache-size-mb",
+          CACHE_SIZE_MB,
         ], {
           stdout: "pipe",
           stderr: "pipe",
@@ -181,10 +234,11 @@ class KTPDetectionService {
           this.pythonProcess = null;
         });
 
-        // Wait for model to load (YOLO model can take 5-15 seconds on first load)
+        // Wait until the daemon has loaded the model and finished its warmup inference
         console.log("Waiting for KTP Detection daemon to initialize (this may take 5-15 seconds on first load)...");
-        const initTimeout = 60000; // 60 seconds for initial model load
+        const initTimeout = 120000; // 120 seconds for model load + warmup
         const initStartTime = Date.now();
+        let ready: { load_ms?: number; warmup_ms?: number; ready_ms?: number } | null = null;
         
         while (Date.now() - initStartTime < initTimeout) {
           if (!this.pythonProcess || this.pythonProcess.killed) {
@@ -194,16 +248,19 @@ class KTPDetectionService {
             throw new Error(errorMsg);
           }
           
-          // Check if daemon is ready by looking for "ready" signal or checking if it's processing
-          // For now, just wait a bit and check process status
-          await new Promise((resolve) => setTimeout(resolve, 1000));
-          
-          // If process is still running after 5 seconds, assume it's ready
-          if (Date.now() - initStartTime > 5000) {
+          // Readiness file is written atomically (temp file + rename) by the daemon
+          try {
+            ready = JSON.parse(await readFile(this.readyFile, "utf-8"));
             break;
+          } catch {
+            await new Promise((resolve) => setTimeout(resolve, 200));
           }
         }
 
+        if (!ready) {
+          throw new Error(`KTP Detection daemon not ready after ${initTimeout}ms`);
+        }
+
         // Final check
         if (!this.pythonProcess || this.pythonProcess.killed) {
           const errorMsg = stderrChunks.length > 0
@@ -212,7 +269,7 @@ class KTPDetectionService {
           throw new Error(errorMsg);
         }
 
-        console.log("KTP Detection daemon initialized - model cached in memory");
+        console.log(`KTP Detection daemon initialized - model cached in memory (load ${ready.load_ms}ms, warmup ${ready.warmup_ms}ms)`);
       } catch (error) {
         console.error("Failed to initialize KTP Detection daemon:", error);
         throw error;
@@ -231,7 +288,8 @@ class KTPDetectionService {
   async detectAndCrop(
     imageFile: File,
     returnMultiple: boolean = false,
-    minConfidence: number = 0.5
+    minConfidence: number = 0.5,
+    crop: CropOptions = {}
   ): Promise<DetectionResponse> {
     // Ensure daemon is initialized
     await this.initialize();
@@ -244,25 +302,51 @@ class KTPDetectionService {
     await mkdir(this.requestDir, { recursive: true });
     await mkdir(this.responseDir, { recursive: true });
 
-    // Convert image file to base64
     const arrayBuffer = await imageFile.arrayBuffer();
     const buffer = Buffer.from(arrayBuffer);
-    const imageBase64 = buffer.toString("base64");
 
     // Create unique request ID
     const requestId = randomUUID();
     const requestFile = join(this.requestDir, `${requestId}.json`);
     const responseFile = join(this.responseDir, `${requestId}.json`);
+    // Raw image bytes handed to the daemon by reference (IMAGE_TRANSFER=file); we own and delete it
+    const imageFileRef = IMAGE_TRANSFER === "file"
+      ? join(existsSync(SHM_DIR) ? SHM_IMAGE_DIR : this.requestDir, `ktp-${requestId}.img`)
+      : null;
 
     try {
+      // Detection processing can take 2-5 seconds depending on image size
+      const timeout = 30000; // 30 seconds
+
       // Write request to file atomically (write to temp file first, then rename)
       const tempRequestFile = `${requestFile}.tmp`;
       const request: DetectionRequest = { 
-        image: imageBase64,
         return_multiple: returnMultiple,
-        min_confidence: minConfidence
+        min_confidence: minConfidence,
+        crop_mode: crop.mode,
+        crop_quality: crop.quality,
+        crop_max_dim: crop.maxDim
       };
+      if (imageFileRef) {
+        request.image_file = imageFileRef;
+        request.crop_output = "file";
+      } else {
+        request.image = buffer.toString("base64");
+      }
+      // Past our timeout nobody reads the response, so let the daemon drop the request
+      request.deadline = Date.now() + timeout;
+      if (process.env.OCR_TRACE === "1") {
+        request.trace = true;
+      }
       const requestJson = JSON.stringify(request);
+
+      // Image bytes must be complete before the daemon sees the request
+      if (imageFileRef) {
+        if (imageFileRef.startsWith(SHM_IMAGE_DIR)) {
+          await mkdir(SHM_IMAGE_DIR, { recursive: true, mode: 0o700 });
+        }
+        await writeFile(imageFileRef, buffer, { mode: 0o600 });
+      }
       
       // Write to temp file first
       await writeFile(tempRequestFile, requestJson, 'utf8');
@@ -276,8 +360,6 @@ class KTPDetectionService {
       await new Promise((resolve) => setTimeout(resolve, 200));
 
       // Wait for response file (polling with timeout)
-      // Detection processing can take 2-5 seconds depending on image size
-      const timeout = 30000; // 30 seconds
       const startTime = Date.now();
       let response: DetectionResponse | null = null;
       let lastError: Error | null = null;
@@ -289,6 +371,15 @@ class KTPDetectionService {
           const responseData = await readFile(responseFile, "utf-8");
           response = JSON.parse(responseData);
           console.log(`[KTP Detection] Response received after ${Date.now() - startTime}ms`);
+          if (response?.timings) {
+            // OCR_TRACE=1: daemon-side stage breakdown next to our polling time
+            console.log(`[KTP Detection] Daemon timings: ${JSON.stringify(response.timings)}`);
+          }
+          if (response?.error === "busy") {
+            console.warn(
+              `[KTP Detection] Daemon busy (queue ${response.queue?.depth}/${response.queue?.max}), retry after ${response.retry_after_ms}ms`
+            );
+          }
           break;
         } catch (e) {
           lastError = e instanceof Error ? e : new Error(String(e));
@@ -311,8 +402,14 @@ class KTPDetectionService {
         throw new Error(`KTP Detection request timeout after ${timeout}ms. Daemon may be overloaded or processing failed.`);
       }
 
+      // Crops handed over as files (crop_output "file"): callers still get base64
+      await this.loadCropFiles(response);
+
       // Cleanup files
       try {
+        if (imageFileRef) {
+          await unlink(imageFileRef).catch(() => {});
+        }
         await unlink(requestFile);
         await unlink(responseFile);
       } catch (e) {
@@ -325,6 +422,9 @@ class KTPDetectionService {
       try {
         await unlink(requestFile).catch(() => {});
         await unlink(responseFile).catch(() => {});
+        if (imageFileRef) {
+          await unlink(imageFileRef).catch(() => {});
+        }
       } catch (e) {
         // Ignore cleanup errors
       }
@@ -336,6 +436,25 @@ class KTPDetectionService {
     }
   }
 
+  /**
+   * Replace cropped_image_file paths with base64 cropped_image and delete the files
+   */
+  private async loadCropFiles(response: DetectionResponse): Promise<void> {
+    const crops = [response, ...(response.cropped_images ?? [])];
+    for (const crop of crops) {
+      if (!crop.cropped_image_file) {
+        continue;
+      }
+      const cropFile = crop.cropped_image_file;
+      delete crop.cropped_image_file;
+      try {
+        crop.cropped_image = (await readFile(cropFile)).toString("base64");
+      } finally {
+        await unlink(cropFile).catch(() => {});
+      }
+    }
+  }
+
   /**
    * Restart daemon if it crashes
    */
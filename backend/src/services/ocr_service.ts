@@ -7,11 +7,33 @@
 import { spawn } from "bun";
 import { join } from "path";
 import { writeFile, readFile, unlink, mkdir, access, constants, rename } from "fs/promises";
+import { existsSync } from "fs";
 import { tmpdir } from "os";
 import { randomUUID } from "node:crypto";
 
+// Maximum daemon backlog; beyond it the daemon answers "busy" immediately
+// instead of queueing work we would time out on (~60 s timeout / ~3 s per OCR request)
+const MAX_QUEUE = process.env.OCR_MAX_QUEUE ?? "20";
+
+// Result cache is opt-in on the daemon: identical uploads / frontend retries are
+// answered from memory instead of re-running inference ("0" disables it)
+const CACHE_SIZE_MB = process.env.OCR_CACHE_SIZE_MB ?? "64";
+
+// How images reach the daemon: "file" hands over raw bytes by reference (a file in
+// /dev/shm/ktp-images, or a sidecar next to the request JSON) which the daemon memory-maps;
+// "base64" embeds the image in the request JSON (legacy)
+const IMAGE_TRANSFER = process.env.OCR_IMAGE_TRANSFER ?? "file";
+const SHM_DIR = "/dev/shm";
+// Private (0700) folder for image refs; the daemon only accepts files directly inside it
+const SHM_IMAGE_DIR = join(SHM_DIR, "ktp-images");
+
 interface OCRRequest {
-  image: string; // base64 encoded image
+  image?: string; // base64 encoded image
+  image_file?: string; // Raw image bytes by reference (in /dev/shm/ktp-images or relative to the request dir)
+  ocr_mode?: "full" | "roi"; // Default: daemon --ocr-mode
+  fields?: string[]; // KTP fields to extract (default: nik, nama, jenis_kelamin, alamat)
+  trace?: boolean; // Add per-stage "timings" (ms) to the response
+  deadline?: number; // Epoch ms after which we stop waiting; daemon skips the work past this
 }
 
 interface OCRResponse {
@@ -26,7 +48,11 @@ interface OCRResponse {
     text_blocks_count: number;
     combined_text: string;
   };
+  timings?: Record<string, number>; // Only when request.trace is set
   error?: string;
+  retry_after_ms?: number; // error "busy": daemon queue is full, retry after this long
+  stage?: string; // error "deadline_exceeded": stage reached when the deadline passed
+  queue?: { depth: number; max: number | null; estimated_wait_ms: number | null };
 }
 
 class OCRService {
@@ -36,11 +62,13 @@ class OCRService {
   private initPromise: Promise<void> | null = null;
   private requestDir: string;
   private responseDir: string;
+  private readyFile: string; // Ditulis daemon setelah model ter-load dan warmup selesai
 
   private constructor() {
     // Create temp directories for request/response communication
     this.requestDir = join(tmpdir(), "ocr_requests");
     this.responseDir = join(tmpdir(), "ocr_responses");
+    this.readyFile = join(tmpdir(), "ocr_daemon.ready");
     console.log(`[OCR] Request dir: ${this.requestDir}`);
     console.log(`[OCR] Response dir: ${this.responseDir}`);
   }
@@ -70,6 +98,8 @@ class OCRService {
         // Ensure directories exist before spawning Python daemon
         await mkdir(this.requestDir, { recursive: true });
         await mkdir(this.responseDir, { recursive: true });
+        // Hapus readiness file lama supaya tidak dianggap siap sebelum warmup selesai
+        await unlink(this.readyFile).catch(() => {});
 
         const pythonScriptPath = join(
           process.cwd(),
@@ -98,6 +128,12 @@ class OCRService {
           pythonScriptPath,
           this.requestDir,
           this.responseDir,
+          "--ready-file",
+          this.readyFile,
+          "--max-queue",
+          MAX_QUEUE,
+          "--cache-size-mb",
+          CACHE_SIZE_MB,
         ], {
           stdout: "pipe",
           stderr: "pipe",
@@ -161,10 +197,11 @@ class OCRService {
           this.pythonProcess = null;
         });
 
-        // Wait longer for model to load (OCR model can take 10-30 seconds on first load)
+        // Wait until the daemon has loaded the model and finished its warmup inference
         console.log("Waiting for OCR daemon to initialize (this may take 10-30 seconds on first load)...");
-        const initTimeout = 60000; // 60 seconds for initial model load
+        const initTimeout = 120000; // 120 seconds for model load + warmup
         const initStartTime = Date.now();
+        let ready: { load_ms?: number; warmup_ms?: number; ready_ms?: number } | null = null;
         
         while (Date.now() - initStartTime < initTimeout) {
           if (!this.pythonProcess || this.pythonProcess.killed) {
@@ -174,16 +211,19 @@ class OCRService {
             throw new Error(errorMsg);
           }
           
-          // Check if daemon is ready by looking for "ready" signal or checking if it's processing
-          // For now, just wait a bit and check process status
-          await new Promise((resolve) => setTimeout(resolve, 1000));
-          
-          // If process is still running after 5 seconds, assume it's ready
-          if (Date.now() - initStartTime > 5000) {
+          // Readiness file is written atomically (temp file + rename) by the daemon
+          try {
+            ready = JSON.parse(await readFile(this.readyFile, "utf-8"));
             break;
+          } catch {
+            await new Promise((resolve) => setTimeout(resolve, 200));
           }
         }
 
+        if (!ready) {
+          throw new Error(`OCR daemon not ready after ${initTimeout}ms`);
+        }
+
         // Final check
         if (!this.pythonProcess || this.pythonProcess.killed) {
           const errorMsg = stderrChunks.length > 0
@@ -192,7 +232,7 @@ class OCRService {
           throw new Error(errorMsg);
         }
 
-        console.log("OCR daemon initialized - model cached in memory");
+        console.log(`OCR daemon initialized - model cached in memory (load ${ready.load_ms}ms, warmup ${ready.warmup_ms}ms)`);
       } catch (error) {
         console.error("Failed to initialize OCR daemon:", error);
         throw error;
@@ -220,21 +260,44 @@ class OCRService {
     await mkdir(this.requestDir, { recursive: true });
     await mkdir(this.responseDir, { recursive: true });
 
-    // Convert image file to base64
     const arrayBuffer = await imageFile.arrayBuffer();
     const buffer = Buffer.from(arrayBuffer);
-    const imageBase64 = buffer.toString("base64");
 
     // Create unique request ID
     const requestId = randomUUID();
     const requestFile = join(this.requestDir, `${requestId}.json`);
     const responseFile = join(this.responseDir, `${requestId}.json`);
+    // Raw image bytes handed to the daemon by reference (IMAGE_TRANSFER=file); we own and delete it
+    const imageFileRef = IMAGE_TRANSFER === "file"
+      ? join(existsSync(SHM_DIR) ? SHM_IMAGE_DIR : this.requestDir, `ktp-${requestId}.img`)
+      : null;
 
     try {
+      // OCR processing can take 5-15 seconds depending on image size and complexity
+      const timeout = 60000; // 60 seconds (increased from 30)
+
       // Write request to file atomically (write to temp file first, then rename)
       const tempRequestFile = `${requestFile}.tmp`;
-      const request: OCRRequest = { image: imageBase64 };
+      const request: OCRRequest = {};
+      if (imageFileRef) {
+        request.image_file = imageFileRef;
+      } else {
+        request.image = buffer.toString("base64");
+      }
+      // Past our timeout nobody reads the response, so let the daemon drop the request
+      request.deadline = Date.now() + timeout;
+      if (process.env.OCR_TRACE === "1") {
+        request.trace = true;
+      }
       const requestJson = JSON.stringify(request);
+
+      // Image bytes must be complete before the daemon sees the request
+      if (imageFileRef) {
+        if (imageFileRef.startsWith(SHM_IMAGE_DIR)) {
+          await mkdir(SHM_IMAGE_DIR, { recursive: true, mode: 0o700 });
+        }
+        await writeFile(imageFileRef, buffer, { mode: 0o600 });
+      }
       
       // Write to temp file first
       await writeFile(tempRequestFile, requestJson, 'utf8');
@@ -248,8 +311,6 @@ class OCRService {
       await new Promise((resolve) => setTimeout(resolve, 200));
 
       // Wait for response file (polling with timeout)
-      // OCR processing can take 5-15 seconds depending on image size and complexity
-      const timeout = 60000; // 60 seconds (increased from 30)
       const startTime = Date.now();
       let response: OCRResponse | null = null;
       let lastError: Error | null = null;
@@ -261,6 +322,15 @@ class OCRService {
           const responseData = await readFile(responseFile, "utf-8");
           response = JSON.parse(responseData);
           console.log(`[OCR] Response received after ${Date.now() - startTime}ms`);
+          if (response?.timings) {
+            // OCR_TRACE=1: daemon-side stage breakdown next to our polling time
+            console.log(`[OCR] Daemon timings: ${JSON.stringify(response.timings)}`);
+          }
+          if (response?.error === "busy") {
+            console.warn(
+              `[OCR] Daemon busy (queue ${response.queue?.depth}/${response.queue?.max}), retry after ${response.retry_after_ms}ms`
+            );
+          }
           break;
         } catch (e) {
           lastError = e instanceof Error ? e : new Error(String(e));
@@ -285,6 +355,9 @@ class OCRService {
 
       // Cleanup files
       try {
+        if (imageFileRef) {
+          await unlink(imageFileRef).catch(() => {});
+        }
         await unlink(requestFile);
         await unlink(responseFile);
       } catch (e) {
@@ -297,6 +370,9 @@ class OCRService {
       try {
         await unlink(requestFile).catch(() => {});
         await unlink(responseFile).catch(() => {});
+        if (imageFileRef) {
+          await unlink(imageFileRef).catch(() => {});
+        }
       } catch (e) {
         // Ignore cleanup errors
       }